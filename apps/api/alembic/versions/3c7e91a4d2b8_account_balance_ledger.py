@@ -0,0 +1,68 @@
+"""account balance ledger: numeric balances and opening_balance
+
+Revision ID: 3c7e91a4d2b8
+Revises: 1da0675abd0b
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c7e91a4d2b8'
+down_revision: Union[str, None] = '1da0675abd0b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Saldo exacto: de Float a Numeric(18, 2)
+    op.alter_column(
+        'accounts', 'current_balance',
+        existing_type=sa.Float(),
+        type_=sa.Numeric(18, 2),
+        existing_nullable=True,
+        postgresql_using='round(current_balance::numeric, 2)',
+        schema='app'
+    )
+    op.add_column(
+        'accounts',
+        sa.Column('opening_balance', sa.Numeric(18, 2), nullable=False, server_default='0'),
+        schema='app'
+    )
+
+    # Saldo inicial = saldo actual - movimientos registrados, para que la
+    # conciliación parta sin diferencias sobre los datos existentes
+    op.execute("UPDATE app.accounts SET opening_balance = COALESCE(current_balance, 0)")
+    op.execute("""
+        UPDATE app.accounts a
+        SET opening_balance = a.opening_balance - m.total
+        FROM (
+            SELECT account_id, SUM(delta) AS total
+            FROM (
+                SELECT account_id, amount AS delta FROM app.transactions
+                UNION ALL
+                SELECT transfer_account_id AS account_id, -amount AS delta
+                FROM app.transactions
+                WHERE transfer_account_id IS NOT NULL AND amount < 0
+            ) movements
+            GROUP BY account_id
+        ) m
+        WHERE m.account_id = a.id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('accounts', 'opening_balance', schema='app')
+    op.alter_column(
+        'accounts', 'current_balance',
+        existing_type=sa.Numeric(18, 2),
+        type_=sa.Float(),
+        existing_nullable=True,
+        schema='app'
+    )
@@ -0,0 +1,42 @@
+"""file import fingerprints
+
+Revision ID: 5e2b8c7d9f14
+Revises: 7a4d9e2c1b60
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2b8c7d9f14'
+down_revision: Union[str, None] = '7a4d9e2c1b60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('file_imports', sa.Column('file_sha256', sa.String(length=64), nullable=True), schema='app')
+    op.add_column('file_imports', sa.Column('content_fingerprint', sa.String(length=64), nullable=True), schema='app')
+    op.add_column('file_imports', sa.Column('row_digests', sa.LargeBinary(), nullable=True), schema='app')
+    op.add_column('file_imports', sa.Column('first_transaction_date', sa.Date(), nullable=True), schema='app')
+    op.add_column('file_imports', sa.Column('last_transaction_date', sa.Date(), nullable=True), schema='app')
+    op.create_index('idx_file_imports_account_sha256', 'file_imports',
+                    ['user_id', 'account_id', 'file_sha256'], unique=False, schema='app')
+    op.create_index('idx_file_imports_account_fingerprint', 'file_imports',
+                    ['user_id', 'account_id', 'content_fingerprint'], unique=False, schema='app')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_file_imports_account_fingerprint', table_name='file_imports', schema='app')
+    op.drop_index('idx_file_imports_account_sha256', table_name='file_imports', schema='app')
+    op.drop_column('file_imports', 'last_transaction_date', schema='app')
+    op.drop_column('file_imports', 'first_transaction_date', schema='app')
+    op.drop_column('file_imports', 'row_digests', schema='app')
+    op.drop_column('file_imports', 'content_fingerprint', schema='app')
+    op.drop_column('file_imports', 'file_sha256', schema='app')
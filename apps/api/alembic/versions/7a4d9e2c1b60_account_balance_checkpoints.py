@@ -0,0 +1,75 @@
+"""account balance checkpoints
+
+Revision ID: 7a4d9e2c1b60
+Revises: 3c7e91a4d2b8
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a4d9e2c1b60'
+down_revision: Union[str, None] = '3c7e91a4d2b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'account_balance_checkpoints',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('account_id', sa.Integer(), nullable=False),
+        sa.Column('month_start', sa.Date(), nullable=False),
+        sa.Column('closing_movements', sa.Numeric(18, 2), nullable=False, server_default='0'),
+        sa.Column('month_movements', sa.Numeric(18, 2), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['account_id'], ['app.accounts.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('account_id', 'month_start', name='uq_balance_checkpoint_account_month'),
+        schema='app'
+    )
+
+    # Backfill: un checkpoint por mes desde el primer movimiento de cada cuenta
+    # hasta el mes actual, con la suma acumulada de movimientos
+    op.execute("""
+        INSERT INTO app.account_balance_checkpoints (account_id, month_start, closing_movements, month_movements)
+        WITH movements AS (
+            SELECT account_id, transaction_date, amount AS delta FROM app.transactions
+            UNION ALL
+            SELECT transfer_account_id AS account_id, transaction_date, -amount AS delta
+            FROM app.transactions
+            WHERE transfer_account_id IS NOT NULL AND amount < 0
+        ),
+        monthly AS (
+            SELECT account_id, date_trunc('month', transaction_date)::date AS month_start, SUM(delta) AS total
+            FROM movements
+            GROUP BY account_id, date_trunc('month', transaction_date)
+        ),
+        bounds AS (
+            SELECT account_id, MIN(month_start) AS first_month,
+                   GREATEST(MAX(month_start), date_trunc('month', CURRENT_DATE)::date) AS last_month
+            FROM monthly
+            GROUP BY account_id
+        ),
+        months AS (
+            SELECT b.account_id, gs::date AS month_start
+            FROM bounds b
+            CROSS JOIN LATERAL generate_series(b.first_month, b.last_month, interval '1 month') gs
+        )
+        SELECT m.account_id,
+               m.month_start,
+               SUM(COALESCE(mo.total, 0)) OVER (PARTITION BY m.account_id ORDER BY m.month_start),
+               COALESCE(mo.total, 0)
+        FROM months m
+        LEFT JOIN monthly mo ON mo.account_id = m.account_id AND mo.month_start = m.month_start
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('account_balance_checkpoints', schema='app')
@@ -0,0 +1,62 @@
+"""transaction description normalized
+
+Revision ID: 9c3f1e6a2d47
+Revises: 5e2b8c7d9f14
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3f1e6a2d47'
+down_revision: Union[str, None] = '5e2b8c7d9f14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Filas por lote del backfill: cada lote es una lectura por rango de id y un UPDATE por lotes
+BACKFILL_CHUNK_SIZE = 5000
+
+
+def _normalize(description):
+    # Copia de app.utils.transaction_utils.normalize_description al momento de la migración
+    return ' '.join(description.lower().split()) if description else ''
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('transactions', sa.Column('description_normalized', sa.Text(), nullable=True), schema='app')
+
+    # Backfill por rangos de id para no cargar ni bloquear toda la tabla de una vez
+    bind = op.get_bind()
+    select_chunk = sa.text("""
+        SELECT id, description FROM app.transactions
+        WHERE id > :last_id AND description IS NOT NULL
+        ORDER BY id
+        LIMIT :chunk_size
+    """)
+    update_row = sa.text("UPDATE app.transactions SET description_normalized = :normalized WHERE id = :id")
+    last_id = 0
+    while True:
+        rows = bind.execute(select_chunk, {'last_id': last_id, 'chunk_size': BACKFILL_CHUNK_SIZE}).all()
+        if not rows:
+            break
+        bind.execute(update_row, [{'id': row.id, 'normalized': _normalize(row.description)} for row in rows])
+        last_id = rows[-1].id
+
+    op.create_index('idx_transactions_user_description_normalized', 'transactions',
+                    ['user_id', 'description_normalized'], unique=False, schema='app')
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index('idx_transactions_description_normalized_trgm', 'transactions',
+                    ['description_normalized'], unique=False, schema='app',
+                    postgresql_using='gin', postgresql_ops={'description_normalized': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_transactions_description_normalized_trgm', table_name='transactions', schema='app')
+    op.drop_index('idx_transactions_user_description_normalized', table_name='transactions', schema='app')
+    op.drop_column('transactions', 'description_normalized', schema='app')
@@ -0,0 +1,37 @@
+"""file import invalidation
+
+Revision ID: a4c8e1f6b3d9
+Revises: e2b7f4a9c1d8
+Create Date: 2026-10-20 08:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4c8e1f6b3d9'
+down_revision: Union[str, None] = 'e2b7f4a9c1d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('file_imports', sa.Column('profile_updated_at', sa.TIMESTAMP(), nullable=True), schema='app')
+    op.add_column('file_imports', sa.Column('invalidated_at', sa.TIMESTAMP(), nullable=True), schema='app')
+    # Las importaciones anteriores no enlazaron sus transacciones: no pueden invalidarse,
+    # así que dejan de responder re-subidas y de aportar filas conocidas
+    op.execute("""
+        UPDATE app.file_imports
+        SET invalidated_at = NOW(), row_digests = NULL
+        WHERE NOT EXISTS (SELECT 1 FROM app.transactions t WHERE t.import_id = file_imports.id)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('file_imports', 'invalidated_at', schema='app')
+    op.drop_column('file_imports', 'profile_updated_at', schema='app')
@@ -0,0 +1,42 @@
+"""goal forecasts
+
+Revision ID: a9d4f7e2c6b3
+Revises: e3f6b1c8a472
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d4f7e2c6b3'
+down_revision: Union[str, None] = 'e3f6b1c8a472'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'goal_forecasts',
+        sa.Column('goal_id', sa.Integer(), nullable=False),
+        sa.Column('input_hash', sa.String(length=64), nullable=False),
+        sa.Column('success_probability', sa.Numeric(), nullable=True),
+        sa.Column('expected_completion_date', sa.Date(), nullable=True),
+        sa.Column('completion_probability', sa.Numeric(), nullable=False),
+        sa.Column('paths', sa.Integer(), nullable=False),
+        sa.Column('computed_at', sa.TIMESTAMP(), nullable=True),
+        sa.ForeignKeyConstraint(['goal_id'], ['app.financial_goals.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('goal_id'),
+        schema='app'
+    )
+    op.create_index('idx_goal_contributions_goal_id', 'goal_contributions', ['goal_id'], unique=False, schema='app')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_goal_contributions_goal_id', table_name='goal_contributions', schema='app')
+    op.drop_table('goal_forecasts', schema='app')
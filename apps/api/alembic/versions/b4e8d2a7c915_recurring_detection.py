@@ -0,0 +1,54 @@
+"""recurring detection
+
+Revision ID: b4e8d2a7c915
+Revises: 9c3f1e6a2d47
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e8d2a7c915'
+down_revision: Union[str, None] = '9c3f1e6a2d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('recurring_patterns', sa.Column('account_id', sa.Integer(), nullable=True), schema='app')
+    op.add_column('recurring_patterns', sa.Column('match_key', sa.Text(), nullable=True), schema='app')
+    op.add_column('recurring_patterns', sa.Column('occurrence_count', sa.Integer(), nullable=False,
+                                                  server_default='0'), schema='app')
+    op.add_column('recurring_patterns', sa.Column('last_transaction_date', sa.Date(), nullable=True), schema='app')
+    op.add_column('recurring_patterns', sa.Column('next_expected_date', sa.Date(), nullable=True), schema='app')
+    op.create_foreign_key('fk_recurring_patterns_account_id', 'recurring_patterns', 'accounts',
+                          ['account_id'], ['id'], source_schema='app', referent_schema='app')
+    op.create_index('idx_recurring_patterns_user_match_key', 'recurring_patterns',
+                    ['user_id', 'match_key'], unique=False, schema='app')
+
+    op.create_table(
+        'recurring_detection_state',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('last_transaction_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.TIMESTAMP(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['app.users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id'),
+        schema='app'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('recurring_detection_state', schema='app')
+    op.drop_index('idx_recurring_patterns_user_match_key', table_name='recurring_patterns', schema='app')
+    op.drop_constraint('fk_recurring_patterns_account_id', 'recurring_patterns', type_='foreignkey', schema='app')
+    op.drop_column('recurring_patterns', 'next_expected_date', schema='app')
+    op.drop_column('recurring_patterns', 'last_transaction_date', schema='app')
+    op.drop_column('recurring_patterns', 'occurrence_count', schema='app')
+    op.drop_column('recurring_patterns', 'match_key', schema='app')
+    op.drop_column('recurring_patterns', 'account_id', schema='app')
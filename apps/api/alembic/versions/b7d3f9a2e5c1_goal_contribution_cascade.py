@@ -0,0 +1,34 @@
+"""goal contribution cascade
+
+Revision ID: b7d3f9a2e5c1
+Revises: a4c8e1f6b3d9
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d3f9a2e5c1'
+down_revision: Union[str, None] = 'a4c8e1f6b3d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_constraint('goal_contributions_transaction_id_fkey', 'goal_contributions', schema='app',
+                       type_='foreignkey')
+    op.create_foreign_key('goal_contributions_transaction_id_fkey', 'goal_contributions', 'transactions',
+                          ['transaction_id'], ['id'], source_schema='app', referent_schema='app',
+                          ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('goal_contributions_transaction_id_fkey', 'goal_contributions', schema='app',
+                       type_='foreignkey')
+    op.create_foreign_key('goal_contributions_transaction_id_fkey', 'goal_contributions', 'transactions',
+                          ['transaction_id'], ['id'], source_schema='app', referent_schema='app')
@@ -0,0 +1,55 @@
+"""bucket analytics
+
+Revision ID: b8e2d4f6a1c7
+Revises: f1a7c3e9b2d4
+Create Date: 2026-10-20 01:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e2d4f6a1c7'
+down_revision: Union[str, None] = 'f1a7c3e9b2d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'subcategory_buckets',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('subcategory_id', sa.Integer(), nullable=False),
+        sa.Column('bucket', sa.String(length=10), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(), nullable=True),
+        sa.Column('updated_at', sa.TIMESTAMP(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['app.users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['subcategory_id'], ['app.subcategories.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'subcategory_id', name='uq_subcategory_buckets_user_subcategory'),
+        schema='app'
+    )
+    op.create_table(
+        'bucket_monthly_totals',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('income', sa.Numeric(18, 2), nullable=False),
+        sa.Column('needs', sa.Numeric(18, 2), nullable=False),
+        sa.Column('wants', sa.Numeric(18, 2), nullable=False),
+        sa.Column('savings', sa.Numeric(18, 2), nullable=False),
+        sa.Column('computed_at', sa.TIMESTAMP(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['app.users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'month'),
+        schema='app'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('bucket_monthly_totals', schema='app')
+    op.drop_table('subcategory_buckets', schema='app')
@@ -0,0 +1,47 @@
+"""budget variance
+
+Revision ID: c3f9a6d2e8b1
+Revises: b8e2d4f6a1c7
+Create Date: 2026-10-20 02:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f9a6d2e8b1'
+down_revision: Union[str, None] = 'b8e2d4f6a1c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('budget_items', sa.Column('month_start', sa.Date(), nullable=True), schema='app')
+    op.add_column('budget_items', sa.Column('actual_amount', sa.Numeric(18, 2), nullable=True), schema='app')
+    op.add_column('budget_items', sa.Column('actual_computed_at', sa.TIMESTAMP(), nullable=True), schema='app')
+    # Mismos formatos que utils.date_parser.MONTH_YEAR_FORMATS; los demás quedan nulos
+    op.execute(r"""
+        UPDATE app.budget_items
+        SET month_start = CASE
+            WHEN trim(month_year) ~ '^\d{4}-\d{2}(-\d{2})?$' THEN to_date(left(trim(month_year), 7), 'YYYY-MM')
+            WHEN trim(month_year) ~ '^\d{4}/\d{2}$' THEN to_date(trim(month_year), 'YYYY/MM')
+            WHEN trim(month_year) ~ '^\d{2}/\d{4}$' THEN to_date(trim(month_year), 'MM/YYYY')
+            WHEN trim(month_year) ~ '^\d{2}-\d{4}$' THEN to_date(trim(month_year), 'MM-YYYY')
+        END
+    """)
+    op.create_index('idx_budget_items_budget_id', 'budget_items', ['budget_id'], unique=False, schema='app')
+    op.create_index('idx_budget_items_subcategory_month', 'budget_items', ['subcategory_id', 'month_start'],
+                    unique=False, schema='app')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_budget_items_subcategory_month', table_name='budget_items', schema='app')
+    op.drop_index('idx_budget_items_budget_id', table_name='budget_items', schema='app')
+    op.drop_column('budget_items', 'actual_computed_at', schema='app')
+    op.drop_column('budget_items', 'actual_amount', schema='app')
+    op.drop_column('budget_items', 'month_start', schema='app')
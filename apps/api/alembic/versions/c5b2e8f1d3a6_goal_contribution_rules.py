@@ -0,0 +1,46 @@
+"""goal contribution rules
+
+Revision ID: c5b2e8f1d3a6
+Revises: a9d4f7e2c6b3
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5b2e8f1d3a6'
+down_revision: Union[str, None] = 'a9d4f7e2c6b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'goal_contribution_rules',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('goal_id', sa.Integer(), nullable=False),
+        sa.Column('account_id', sa.Integer(), nullable=True),
+        sa.Column('pattern', sa.Text(), nullable=True),
+        sa.Column('pattern_type', sa.String(length=20), nullable=False, server_default='contains'),
+        sa.Column('is_case_sensitive', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('is_active', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column('created_at', sa.TIMESTAMP(), nullable=True),
+        sa.Column('updated_at', sa.TIMESTAMP(), nullable=True),
+        sa.ForeignKeyConstraint(['goal_id'], ['app.financial_goals.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['account_id'], ['app.accounts.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        schema='app'
+    )
+    op.create_index('idx_goal_contributions_transaction_id', 'goal_contributions', ['transaction_id'],
+                    unique=False, schema='app')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_goal_contributions_transaction_id', table_name='goal_contributions', schema='app')
+    op.drop_table('goal_contribution_rules', schema='app')
@@ -0,0 +1,32 @@
+"""duplicate filter stamp
+
+Revision ID: c5e9a2d7f1b3
+Revises: b7d3f9a2e5c1
+Create Date: 2026-10-20 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e9a2d7f1b3'
+down_revision: Union[str, None] = 'b7d3f9a2e5c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'accounts',
+        sa.Column('duplicate_filter_stamp', sa.Integer(), nullable=False, server_default='0'),
+        schema='app'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('accounts', 'duplicate_filter_stamp', schema='app')
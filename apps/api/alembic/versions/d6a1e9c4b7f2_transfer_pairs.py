@@ -0,0 +1,32 @@
+"""transfer pairs
+
+Revision ID: d6a1e9c4b7f2
+Revises: c3f9a6d2e8b1
+Create Date: 2026-10-20 03:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6a1e9c4b7f2'
+down_revision: Union[str, None] = 'c3f9a6d2e8b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('transactions', sa.Column('transfer_transaction_id', sa.Integer(), nullable=True), schema='app')
+    op.create_foreign_key('fk_transactions_transfer_transaction_id', 'transactions', 'transactions',
+                          ['transfer_transaction_id'], ['id'], source_schema='app', referent_schema='app',
+                          ondelete='SET NULL')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('fk_transactions_transfer_transaction_id', 'transactions', schema='app', type_='foreignkey')
+    op.drop_column('transactions', 'transfer_transaction_id', schema='app')
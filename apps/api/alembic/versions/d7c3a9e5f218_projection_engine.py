@@ -0,0 +1,51 @@
+"""projection engine
+
+Revision ID: d7c3a9e5f218
+Revises: b4e8d2a7c915
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7c3a9e5f218'
+down_revision: Union[str, None] = 'b4e8d2a7c915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Conservar solo la proyección base más reciente de cada mes antes de exigir unicidad
+    op.execute("""
+        DELETE FROM app.projection_details d
+        USING app.monthly_projections p
+        WHERE d.projection_id = p.id
+          AND NOT p.is_simulation
+          AND p.id NOT IN (
+              SELECT MAX(id) FROM app.monthly_projections
+              WHERE NOT is_simulation GROUP BY user_id, month_year
+          )
+    """)
+    op.execute("""
+        DELETE FROM app.monthly_projections
+        WHERE NOT is_simulation
+          AND id NOT IN (
+              SELECT MAX(id) FROM app.monthly_projections
+              WHERE NOT is_simulation GROUP BY user_id, month_year
+          )
+    """)
+    op.create_index('uq_monthly_projections_user_month', 'monthly_projections', ['user_id', 'month_year'],
+                    unique=True, schema='app', postgresql_where=sa.text('is_simulation IS false'))
+    op.create_index('idx_projection_details_projection_id', 'projection_details', ['projection_id'],
+                    unique=False, schema='app')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_projection_details_projection_id', table_name='projection_details', schema='app')
+    op.drop_index('uq_monthly_projections_user_month', table_name='monthly_projections', schema='app')
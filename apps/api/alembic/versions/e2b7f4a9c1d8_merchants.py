@@ -0,0 +1,66 @@
+"""merchants
+
+Revision ID: e2b7f4a9c1d8
+Revises: d6a1e9c4b7f2
+Create Date: 2026-10-20 05:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b7f4a9c1d8'
+down_revision: Union[str, None] = 'd6a1e9c4b7f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'merchants',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('key', sa.String(length=120), nullable=False),
+        sa.Column('name', sa.String(length=120), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(), nullable=True),
+        sa.Column('updated_at', sa.TIMESTAMP(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('key'),
+        schema='app'
+    )
+    op.create_table(
+        'merchant_rules',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('rule_type', sa.String(length=10), nullable=False),
+        sa.Column('pattern', sa.Text(), nullable=False),
+        sa.Column('replacement', sa.Text(), nullable=True),
+        sa.Column('merchant_id', sa.Integer(), nullable=True),
+        sa.Column('priority', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('is_active', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column('created_at', sa.TIMESTAMP(), nullable=True),
+        sa.Column('updated_at', sa.TIMESTAMP(), nullable=True),
+        sa.ForeignKeyConstraint(['merchant_id'], ['app.merchants.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        schema='app'
+    )
+    op.add_column('transactions', sa.Column('merchant_id', sa.Integer(), nullable=True), schema='app')
+    op.add_column('transactions', sa.Column('merchant_version', sa.String(length=16), nullable=True), schema='app')
+    op.create_foreign_key('fk_transactions_merchant_id', 'transactions', 'merchants',
+                          ['merchant_id'], ['id'], source_schema='app', referent_schema='app',
+                          ondelete='SET NULL')
+    op.create_index('idx_transactions_user_merchant_date', 'transactions',
+                    ['user_id', 'merchant_id', 'transaction_date'], unique=False, schema='app')
+    # Las transacciones existentes quedan sin versión: scripts/normalize_merchants.py les asigna comercio
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_transactions_user_merchant_date', table_name='transactions', schema='app')
+    op.drop_constraint('fk_transactions_merchant_id', 'transactions', schema='app', type_='foreignkey')
+    op.drop_column('transactions', 'merchant_version', schema='app')
+    op.drop_column('transactions', 'merchant_id', schema='app')
+    op.drop_table('merchant_rules', schema='app')
+    op.drop_table('merchants', schema='app')
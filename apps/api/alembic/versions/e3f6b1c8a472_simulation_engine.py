@@ -0,0 +1,31 @@
+"""simulation engine
+
+Revision ID: e3f6b1c8a472
+Revises: d7c3a9e5f218
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3f6b1c8a472'
+down_revision: Union[str, None] = 'd7c3a9e5f218'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('simulation_scenarios', sa.Column('input_hash', sa.String(length=64), nullable=True), schema='app')
+    op.create_index('idx_simulation_results_scenario_id', 'simulation_results', ['scenario_id'],
+                    unique=False, schema='app')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_simulation_results_scenario_id', table_name='simulation_results', schema='app')
+    op.drop_column('simulation_scenarios', 'input_hash', schema='app')
@@ -0,0 +1,41 @@
+"""envelope balances
+
+Revision ID: f1a7c3e9b2d4
+Revises: c5b2e8f1d3a6
+Create Date: 2026-10-20 00:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1a7c3e9b2d4'
+down_revision: Union[str, None] = 'c5b2e8f1d3a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('envelopes', sa.Column('allocated_amount', sa.Numeric(), nullable=False, server_default='0'),
+                  schema='app')
+    op.add_column('envelopes', sa.Column('last_rollover_month', sa.Date(), nullable=True), schema='app')
+    # La base asignada es lo que el saldo actual no explica con transacciones
+    op.execute("""
+        UPDATE app.envelopes e
+        SET allocated_amount = e.current_balance - COALESCE(
+            (SELECT SUM(t.amount) FROM app.transactions t WHERE t.envelope_id = e.id), 0
+        )
+    """)
+    op.create_index('idx_transactions_envelope_id', 'transactions', ['envelope_id'], unique=False, schema='app',
+                    postgresql_where=sa.text('envelope_id IS NOT NULL'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_transactions_envelope_id', table_name='transactions', schema='app')
+    op.drop_column('envelopes', 'last_rollover_month', schema='app')
+    op.drop_column('envelopes', 'allocated_amount', schema='app')
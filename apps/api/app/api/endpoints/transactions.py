@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date
@@ -13,7 +13,8 @@ from ...schemas.transactions import (
     TransactionResponse,
     TransactionImportResponse,
     TransactionPreviewResponse,
-    TransactionPreviewConfirmRequest
+    TransactionPreviewConfirmRequest,
+    NearDuplicateReportResponse
 )
 from ...services.transaction_service import (
     create_transaction,
@@ -27,6 +28,7 @@ from ...services.transaction_service import (
     preview_transactions_with_profile,
     confirm_transaction_preview
 )
+from ...services.near_duplicate_service import find_near_duplicates
 from ...utils.fastapi_auth import get_current_user
 from ...models.users import User
 
@@ -263,7 +265,14 @@ async def import_csv_endpoint(
             total_records=result['total_records'],
             successful_imports=result['successful_imports'],
             failed_imports=result['failed_imports'],
-            errors=result['errors']
+            errors=result['errors'],
+            amount_errors=result.get('amount_errors', []),
+            skipped_duplicates=result.get('skipped_duplicates', 0),
+            import_id=result.get('import_id'),
+            duplicate_of_import_id=result.get('duplicate_of_import_id'),
+            possible_duplicates=result.get('possible_duplicates', []),
+            goal_contributions=result.get('goal_contributions', 0),
+            transfer_pairs=result.get('transfer_pairs', 0)
         )
         
     except HTTPException:
@@ -307,7 +316,14 @@ async def import_excel_endpoint(
             total_records=result['total_records'],
             successful_imports=result['successful_imports'],
             failed_imports=result['failed_imports'],
-            errors=result['errors']
+            errors=result['errors'],
+            amount_errors=result.get('amount_errors', []),
+            skipped_duplicates=result.get('skipped_duplicates', 0),
+            import_id=result.get('import_id'),
+            duplicate_of_import_id=result.get('duplicate_of_import_id'),
+            possible_duplicates=result.get('possible_duplicates', []),
+            goal_contributions=result.get('goal_contributions', 0),
+            transfer_pairs=result.get('transfer_pairs', 0)
         )
         
     except HTTPException:
@@ -488,4 +504,37 @@ async def confirm_import_endpoint(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error confirmando importación: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.get("/near-duplicates", response_model=NearDuplicateReportResponse)
+async def near_duplicates_endpoint(
+    account_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    threshold: Optional[float] = Query(None, gt=0, le=1, description="Similitud mínima de descripciones (0-1)"),
+    window_days: Optional[int] = Query(None, ge=0, le=31, description="Diferencia máxima de fechas en días"),
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Reporte de posibles duplicados en el historial del usuario"""
+    try:
+        report = find_near_duplicates(
+            db,
+            getattr(current_user, 'id'),
+            account_id=account_id,
+            start_date=start_date,
+            end_date=end_date,
+            threshold=threshold,
+            window_days=window_days,
+            limit=limit
+        )
+        return NearDuplicateReportResponse(**report)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error generando reporte de duplicados: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor generando el reporte"
+        )
@@ -44,7 +44,33 @@ class Settings(BaseSettings):
     jwt_algorithm: str
     jwt_access_token_expire_minutes: int
     jwt_refresh_token_expire_days: int
-    
+
+    # Arranque - opcional: las réplicas pueden omitir el bootstrap de base de datos
+    SKIP_DB_BOOTSTRAP: bool = False
+
+    # Importación - motor de lectura .xlsx: "openpyxl" o "stream" (iterparse sobre el XML de la hoja)
+    IMPORT_XLSX_ENGINE: str = "openpyxl"
+    # Importación - CSV desde este tamaño se parsean en paralelo (0 workers = núcleos disponibles)
+    IMPORT_PARALLEL_CSV_MIN_BYTES: int = 5 * 1024 * 1024
+    IMPORT_PARALLEL_CSV_WORKERS: int = 0
+    # Importación - filtro de Bloom por cuenta para descartar duplicados sin consultar la base
+    IMPORT_DUPLICATE_FILTER_ENABLED: bool = True
+    IMPORT_DUPLICATE_FILTER_TTL_SECONDS: int = 300
+    IMPORT_DUPLICATE_FILTER_DIR: Optional[str] = None  # Si se define, los filtros se guardan en disco
+    # Casi-duplicados (MinHash/LSH): similitud mínima de descripciones y ventana de ±días
+    NEAR_DUPLICATE_THRESHOLD: float = 0.5
+    NEAR_DUPLICATE_WINDOW_DAYS: int = 3
+    # Importación - comparar cada fila con el historial de la cuenta; rechazar en vez de solo informar
+    IMPORT_NEAR_DUPLICATE_CHECK: bool = True
+    IMPORT_NEAR_DUPLICATE_REJECT: bool = False
+    # Simulaciones - desde esta cantidad de escenarios distintos se evalúan en procesos (0 workers = núcleos)
+    SIMULATION_PARALLEL_MIN_SCENARIOS: int = 5000
+    SIMULATION_WORKERS: int = 0
+    # Transferencias internas - días de diferencia aceptados entre el egreso y el abono en otra cuenta
+    TRANSFER_MATCH_WINDOW_DAYS: int = 3
+    # Saldos - días máximos de una serie diaria (un punto por día)
+    BALANCE_SERIES_MAX_DAYS: int = 366
+
     # Property para computar hosts permitidos
     @property
     def ALLOWED_HOSTS(self) -> List[str]:
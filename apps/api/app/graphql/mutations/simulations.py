@@ -0,0 +1,30 @@
+from __future__ import annotations
+import strawberry
+from strawberry.types import Info
+from starlette.concurrency import run_in_threadpool
+
+from ..types.simulations import SimulationRun, convert_simulation_run_to_graphql
+from ..types.projections import ProjectionRefresh, convert_projection_refresh_to_graphql
+from ...services.simulation_service import get_simulation_results, run_simulation
+from ...services.projection_service import refresh_projection
+from ...utils.auth import get_authenticated_user
+
+
+async def run_my_simulation(info: Info, simulation_id: int, force: bool = False) -> SimulationRun:
+    """Evalúa los escenarios con cambios de una simulación del usuario autenticado y devuelve sus series"""
+    current_user = await get_authenticated_user(info)
+    db = info.context.db
+
+    # Parámetros inválidos o simulación ajena: ValueError con el mensaje para el cliente.
+    # En un hilo: con muchos escenarios espera al pool de procesos sin bloquear el event loop
+    summary = await run_in_threadpool(run_simulation, db, simulation_id, current_user.id, force=force)
+    results = get_simulation_results(db, simulation_id, current_user.id)
+    return convert_simulation_run_to_graphql(simulation_id, summary, results)
+
+
+async def refresh_my_projection(info: Info) -> ProjectionRefresh:
+    """Recalcula la proyección base del usuario autenticado; solo reescribe los meses que cambiaron"""
+    current_user = await get_authenticated_user(info)
+    db = info.context.db
+
+    return convert_projection_refresh_to_graphql(refresh_projection(db, current_user.id))
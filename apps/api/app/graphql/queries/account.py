@@ -2,9 +2,11 @@ from __future__ import annotations
 import strawberry
 from strawberry.types import Info
 from typing import List, Optional
+from datetime import date
 
-from ..types.accounts import Account, convert_account_model_to_graphql
-from ...services.account_service import get_user_accounts, get_user_account_by_id
+from ..types.accounts import Account, AccountBalancePoint, convert_account_model_to_graphql
+from ...services.account_service import get_user_accounts, get_user_account, get_user_account_by_id
+from ...services.balance_checkpoint_service import get_balance_at, get_balance_series
 from ...utils.auth import get_authenticated_user
 
 
@@ -40,4 +42,39 @@ async def get_my_account(info: Info, account_id: int) -> Optional[Account]:
         return None
     
     # Convertir el modelo SQLAlchemy a tipo GraphQL
-    return convert_account_model_to_graphql(account_model)
\ No newline at end of file
+    return convert_account_model_to_graphql(account_model)
+
+
+async def get_my_account_balance_at(info: Info, account_id: int, at_date: date) -> Optional[AccountBalancePoint]:
+    """Obtiene el saldo de una cuenta del usuario al cierre de una fecha"""
+    current_user = await get_authenticated_user(info)
+    db = info.context.db
+    
+    # Verificar que la cuenta pertenece al usuario
+    if not get_user_account(db, current_user.id, account_id):
+        return None
+    
+    balance = get_balance_at(db, account_id, at_date)
+    return AccountBalancePoint(account_id=account_id, date=at_date, balance=balance)
+
+
+async def get_my_account_balance_series(
+    info: Info,
+    account_id: int,
+    start_date: date,
+    end_date: date,
+    granularity: str = "month"
+) -> List[AccountBalancePoint]:
+    """Obtiene la serie de saldos (mensual o diaria) de una cuenta del usuario"""
+    current_user = await get_authenticated_user(info)
+    db = info.context.db
+    
+    # Verificar que la cuenta pertenece al usuario
+    if not get_user_account(db, current_user.id, account_id):
+        return []
+    
+    series = get_balance_series(db, account_id, start_date, end_date, granularity)
+    return [
+        AccountBalancePoint(account_id=account_id, date=point["date"], balance=point["balance"])
+        for point in series
+    ]
@@ -0,0 +1,39 @@
+from __future__ import annotations
+import strawberry
+from strawberry.types import Info
+from datetime import date
+from typing import List, Optional
+
+from ..types.bucket_analytics import BucketMonth, convert_bucket_month_to_graphql
+from ...services.bucket_analytics_service import get_bucket_series
+from ...utils.auth import get_authenticated_user
+
+DEFAULT_YEARS = 3
+MAX_YEARS = DEFAULT_YEARS * 4
+
+
+async def get_my_bucket_analytics(
+    info: Info,
+    start_year: Optional[int] = None,
+    end_year: Optional[int] = None
+) -> List[BucketMonth]:
+    """
+    Serie mensual 50/30/20 (gasto real contra metas) del usuario autenticado,
+    de enero de `start_year` a diciembre de `end_year` (por defecto los
+    últimos tres años hasta el mes actual), con a lo más `MAX_YEARS` años.
+    """
+    current_user = await get_authenticated_user(info)
+    db = info.context.db
+
+    today = date.today()
+    end_year = end_year or today.year
+    start_year = start_year or end_year - DEFAULT_YEARS + 1
+    if start_year > end_year:
+        raise ValueError("El año inicial no puede ser posterior al final")
+    if end_year - start_year + 1 > MAX_YEARS:
+        raise ValueError(f"El rango admite a lo más {MAX_YEARS} años")
+
+    end = date(end_year, 12, 1)
+    start = date(start_year, 1, 1)
+    series = get_bucket_series(db, current_user.id, start, min(end, today))
+    return [convert_bucket_month_to_graphql(item) for item in series]
@@ -0,0 +1,20 @@
+from __future__ import annotations
+import strawberry
+from strawberry.types import Info
+from typing import Optional
+
+from ..types.budget import BudgetVariance, convert_budget_variance_to_graphql
+from ...services.budget_variance_service import get_budget_variance
+from ...utils.auth import get_authenticated_user
+
+
+async def get_my_budget_variance(info: Info, budget_id: int) -> Optional[BudgetVariance]:
+    """Presupuesto contra gasto real, por partida, de un plan del usuario autenticado"""
+    current_user = await get_authenticated_user(info)
+    db = info.context.db
+
+    try:
+        variance = get_budget_variance(db, current_user.id, budget_id)
+    except ValueError:
+        return None
+    return convert_budget_variance_to_graphql(variance)
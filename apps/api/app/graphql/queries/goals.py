@@ -0,0 +1,18 @@
+from __future__ import annotations
+import strawberry
+from strawberry.types import Info
+from typing import List
+
+from ..types.goals import GoalForecast, convert_goal_forecast_to_graphql
+from ...services.goal_forecast_service import get_goal_forecasts
+from ...utils.auth import get_authenticated_user
+
+
+async def get_my_goal_forecasts(info: Info) -> List[GoalForecast]:
+    """Obtiene el pronóstico Monte Carlo de las metas pendientes del usuario autenticado"""
+    current_user = await get_authenticated_user(info)
+    db = info.context.db
+
+    # Los pronósticos vigentes salen de caché; solo se recalculan las metas con cambios
+    forecasts = get_goal_forecasts(db, current_user.id)
+    return [convert_goal_forecast_to_graphql(forecast) for forecast in forecasts]
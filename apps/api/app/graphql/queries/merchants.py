@@ -0,0 +1,41 @@
+from __future__ import annotations
+import strawberry
+from strawberry.types import Info
+from datetime import date
+from typing import List, Optional
+
+from ..types.merchants import (
+    MerchantMonthlySpend, MerchantSpend, convert_merchant_month_to_graphql, convert_merchant_spend_to_graphql
+)
+from ...services.merchant_service import merchant_spend, top_merchants
+from ...utils.auth import get_authenticated_user
+
+MAX_MERCHANTS = 100
+
+
+async def get_my_top_merchants(
+    info: Info,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: int = 10
+) -> List[MerchantSpend]:
+    """Comercios con mayor gasto del usuario autenticado en el rango"""
+    current_user = await get_authenticated_user(info)
+    db = info.context.db
+
+    rows = top_merchants(db, current_user.id, start_date, end_date, max(1, min(limit, MAX_MERCHANTS)))
+    return [convert_merchant_spend_to_graphql(row) for row in rows]
+
+
+async def get_my_merchant_spend(
+    info: Info,
+    merchant_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> List[MerchantMonthlySpend]:
+    """Gasto mensual del usuario autenticado en un comercio"""
+    current_user = await get_authenticated_user(info)
+    db = info.context.db
+
+    rows = merchant_spend(db, current_user.id, merchant_id, start_date, end_date)
+    return [convert_merchant_month_to_graphql(row) for row in rows]
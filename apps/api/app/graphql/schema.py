@@ -51,7 +51,10 @@ except Exception as e:
         return "Google auth not available"
 
 try:
-    from .queries.account import get_my_accounts, get_my_account
+    from .queries.account import (
+        get_my_accounts, get_my_account,
+        get_my_account_balance_at, get_my_account_balance_series
+    )
     logger.debug("✅ Account queries importadas correctamente")
 except Exception as e:
     logger.error(f"❌ Error importando account queries: {e}")
@@ -63,6 +66,14 @@ except Exception as e:
     @strawberry.field
     def get_my_account(info: Info, account_id: int) -> None:
         return None
+    
+    @strawberry.field
+    def get_my_account_balance_at(info: Info, account_id: int) -> None:
+        return None
+    
+    @strawberry.field
+    def get_my_account_balance_series(info: Info, account_id: int) -> list:
+        return []
 
 # Importar queries de bancos
 try:
@@ -163,6 +174,69 @@ except Exception as e:
     def get_my_subcategory(info: Info, subcategory_id: int) -> None:
         return None
 
+# Importar queries de metas financieras
+try:
+    from .queries.goals import get_my_goal_forecasts
+    logger.debug("✅ Goal queries importadas correctamente")
+except Exception as e:
+    logger.error(f"❌ Error importando goal queries: {e}")
+    # Crear resolver fallback
+    @strawberry.field
+    def get_my_goal_forecasts(info: Info) -> list:
+        return []
+
+# Importar queries de análisis 50/30/20
+try:
+    from .queries.bucket_analytics import get_my_bucket_analytics
+    logger.debug("✅ Bucket analytics queries importadas correctamente")
+except Exception as e:
+    logger.error(f"❌ Error importando bucket analytics queries: {e}")
+    # Crear resolver fallback
+    @strawberry.field
+    def get_my_bucket_analytics(info: Info) -> list:
+        return []
+
+# Importar queries de presupuestos
+try:
+    from .queries.budget import get_my_budget_variance
+    logger.debug("✅ Budget queries importadas correctamente")
+except Exception as e:
+    logger.error(f"❌ Error importando budget queries: {e}")
+    # Crear resolver fallback
+    @strawberry.field
+    def get_my_budget_variance(info: Info, budget_id: int) -> Optional[str]:
+        return None
+
+# Importar queries de comercios
+try:
+    from .queries.merchants import get_my_merchant_spend, get_my_top_merchants
+    logger.debug("✅ Merchant queries importadas correctamente")
+except Exception as e:
+    logger.error(f"❌ Error importando merchant queries: {e}")
+    # Crear resolvers fallback
+    @strawberry.field
+    def get_my_top_merchants(info: Info) -> list:
+        return []
+
+    @strawberry.field
+    def get_my_merchant_spend(info: Info, merchant_id: int) -> list:
+        return []
+
+# Importar mutations de simulaciones y proyecciones
+try:
+    from .mutations.simulations import refresh_my_projection, run_my_simulation
+    logger.debug("✅ Simulation mutations importadas correctamente")
+except Exception as e:
+    logger.error(f"❌ Error importando simulation mutations: {e}")
+    # Crear mutations fallback
+    @strawberry.field
+    def run_my_simulation(info: Info, simulation_id: int) -> Optional[str]:
+        return None
+
+    @strawberry.field
+    def refresh_my_projection(info: Info) -> Optional[str]:
+        return None
+
 # Importar mutations de patrones de descripción
 try:
     from .mutations.description_pattern import DescriptionPatternMutations
@@ -204,6 +278,8 @@ class Query:
     # Consultas de cuentas
     my_accounts = strawberry.field(resolver=get_my_accounts)
     my_account = strawberry.field(resolver=get_my_account)
+    my_account_balance_at = strawberry.field(resolver=get_my_account_balance_at)
+    my_account_balance_series = strawberry.field(resolver=get_my_account_balance_series)
     
     # Consultas de bancos
     banks = strawberry.field(resolver=get_banks)
@@ -223,6 +299,19 @@ class Query:
     my_subcategories_by_category = strawberry.field(resolver=get_my_subcategories_by_category)
     my_subcategory = strawberry.field(resolver=get_my_subcategory)
     
+    # Consultas de metas financieras
+    my_goal_forecasts = strawberry.field(resolver=get_my_goal_forecasts)
+    
+    # Consultas de análisis 50/30/20
+    my_bucket_analytics = strawberry.field(resolver=get_my_bucket_analytics)
+    
+    # Consultas de presupuestos
+    my_budget_variance = strawberry.field(resolver=get_my_budget_variance)
+    
+    # Consultas de comercios
+    my_top_merchants = strawberry.field(resolver=get_my_top_merchants)
+    my_merchant_spend = strawberry.field(resolver=get_my_merchant_spend)
+    
     # Consultas de patrones de descripción
     @strawberry.field
     async def my_description_patterns(
@@ -279,6 +368,10 @@ class Mutation:
     refresh_token = strawberry.field(resolver=refresh_token)
     logout = strawberry.field(resolver=logout)
     
+    # Mutaciones de simulaciones y proyecciones
+    run_my_simulation = strawberry.field(resolver=run_my_simulation)
+    refresh_my_projection = strawberry.field(resolver=refresh_my_projection)
+    
     # Mutaciones de patrones de descripción
     @strawberry.field
     async def create_description_pattern(self, info: Info, input: DescriptionPatternCreateInput) -> Optional[DescriptionPattern]:
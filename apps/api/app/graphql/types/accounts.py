@@ -1,6 +1,7 @@
 from __future__ import annotations
 import strawberry
 from typing import Optional
+from datetime import date
 from decimal import Decimal
 
 from .bank import Bank, convert_bank_model_to_graphql
@@ -34,4 +35,10 @@ def convert_account_model_to_graphql(account_model) -> Account:
         updated_at=account_model.updated_at.isoformat() if account_model.updated_at else None,
         bank=convert_bank_model_to_graphql(account_model.bank),
         account_type=convert_account_type_model_to_graphql(account_model.account_type)
-    )
\ No newline at end of file
+    )
+
+@strawberry.type
+class AccountBalancePoint:
+    account_id: int
+    date: date
+    balance: Decimal
@@ -0,0 +1,33 @@
+from __future__ import annotations
+import strawberry
+from typing import List, Optional
+from datetime import date
+from decimal import Decimal
+
+
+@strawberry.type
+class BucketAmount:
+    actual: Decimal
+    target: Decimal
+    target_percentage: Decimal
+    actual_percentage: Optional[Decimal] = None  # Nulo en meses sin ingresos
+
+
+@strawberry.type
+class BucketMonth:
+    month: date
+    income: Decimal
+    allocated_savings: Decimal  # Egresos asignados explícitamente a ahorro
+    needs: BucketAmount
+    wants: BucketAmount
+    savings: BucketAmount  # Ingreso menos needs y wants
+
+
+def convert_bucket_month_to_graphql(item: dict) -> BucketMonth:
+    """Convierte un mes de bucket_analytics_service a tipo GraphQL"""
+    return BucketMonth(
+        month=item["month"],
+        income=item["income"],
+        allocated_savings=item["allocated_savings"],
+        **{name: BucketAmount(**item[name]) for name in ("needs", "wants", "savings")}
+    )
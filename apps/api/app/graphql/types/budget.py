@@ -0,0 +1,45 @@
+from __future__ import annotations
+import strawberry
+from typing import List, Optional
+from datetime import date
+from decimal import Decimal
+
+
+@strawberry.type
+class BudgetVarianceCell:
+    item_id: int
+    subcategory_id: int
+    subcategory_name: str
+    envelope_id: Optional[int] = None
+    month: date
+    is_income: bool
+    budgeted: Decimal
+    actual: Decimal
+    variance: Decimal  # Presupuestado menos real
+    status: str  # on_track, near_limit, over_budget o below_target
+
+
+@strawberry.type
+class BudgetVariance:
+    budget_id: int
+    name: str
+    start_date: date
+    end_date: date
+    total_budgeted: Decimal  # Totales de las partidas de gasto
+    total_actual: Decimal
+    total_variance: Decimal
+    cells: List[BudgetVarianceCell]
+
+
+def convert_budget_variance_to_graphql(variance: dict) -> BudgetVariance:
+    """Convierte la varianza de budget_variance_service a tipo GraphQL"""
+    return BudgetVariance(
+        budget_id=variance["budget_id"],
+        name=variance["name"],
+        start_date=variance["start_date"],
+        end_date=variance["end_date"],
+        total_budgeted=variance["total_budgeted"],
+        total_actual=variance["total_actual"],
+        total_variance=variance["total_variance"],
+        cells=[BudgetVarianceCell(**cell) for cell in variance["cells"]]
+    )
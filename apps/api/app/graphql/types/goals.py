@@ -0,0 +1,36 @@
+from __future__ import annotations
+import strawberry
+from typing import Optional
+from datetime import date, datetime
+from decimal import Decimal
+
+
+@strawberry.type
+class GoalForecast:
+    goal_id: int
+    name: str
+    target_amount: Decimal
+    current_amount: Decimal
+    target_date: Optional[date] = None
+    success_probability: Optional[float] = None  # Nula si la meta no tiene fecha objetivo
+    expected_completion_date: Optional[date] = None
+    completion_probability: float
+    paths: int
+    computed_at: Optional[str] = None
+
+
+def convert_goal_forecast_to_graphql(forecast: dict) -> GoalForecast:
+    """Convierte un pronóstico de goal_forecast_service a tipo GraphQL"""
+    computed_at: Optional[datetime] = forecast["computed_at"]
+    return GoalForecast(
+        goal_id=forecast["goal_id"],
+        name=forecast["name"],
+        target_amount=forecast["target_amount"],
+        current_amount=forecast["current_amount"],
+        target_date=forecast["target_date"],
+        success_probability=None if forecast["success_probability"] is None else float(forecast["success_probability"]),
+        expected_completion_date=forecast["expected_completion_date"],
+        completion_probability=float(forecast["completion_probability"]),
+        paths=forecast["paths"],
+        computed_at=computed_at.isoformat() if computed_at else None
+    )
@@ -0,0 +1,38 @@
+from __future__ import annotations
+import strawberry
+from datetime import date
+from decimal import Decimal
+
+
+@strawberry.type
+class MerchantSpend:
+    merchant_id: int
+    name: str
+    total_spent: Decimal  # Egresos netos (positivos)
+    transaction_count: int
+
+
+@strawberry.type
+class MerchantMonthlySpend:
+    month: date  # Primer día del mes
+    total_spent: Decimal
+    transaction_count: int
+
+
+def convert_merchant_spend_to_graphql(item: dict) -> MerchantSpend:
+    """Convierte una fila de top_merchants a tipo GraphQL"""
+    return MerchantSpend(
+        merchant_id=item["merchant_id"],
+        name=item["name"],
+        total_spent=item["total_spent"],
+        transaction_count=item["transaction_count"]
+    )
+
+
+def convert_merchant_month_to_graphql(item: dict) -> MerchantMonthlySpend:
+    """Convierte un mes de merchant_spend a tipo GraphQL"""
+    return MerchantMonthlySpend(
+        month=item["month"],
+        total_spent=item["total_spent"],
+        transaction_count=item["transaction_count"]
+    )
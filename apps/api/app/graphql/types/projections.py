@@ -0,0 +1,17 @@
+from __future__ import annotations
+import strawberry
+
+
+@strawberry.type
+class ProjectionRefresh:
+    months: int
+    actual_months: int  # Meses cerrados con montos reales
+    subcategories: int
+    months_written: int
+    months_unchanged: int
+    months_deleted: int
+
+
+def convert_projection_refresh_to_graphql(summary: dict) -> ProjectionRefresh:
+    """Convierte el resumen de projection_service a tipo GraphQL"""
+    return ProjectionRefresh(**summary)
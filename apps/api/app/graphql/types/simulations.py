@@ -0,0 +1,50 @@
+from __future__ import annotations
+import strawberry
+from typing import List
+from decimal import Decimal
+
+
+@strawberry.type
+class SimulationMonth:
+    month_year: str
+    income_total: Decimal
+    expense_total: Decimal
+    monthly_savings: Decimal
+    accumulated_savings: Decimal
+    net_worth: Decimal
+
+
+@strawberry.type
+class SimulationScenarioSeries:
+    scenario_id: int
+    name: str
+    is_baseline: bool
+    months: List[SimulationMonth]
+
+
+@strawberry.type
+class SimulationRun:
+    simulation_id: int
+    scenarios: int
+    evaluated: int  # Escenarios recalculados
+    cached: int  # Escenarios cuyos resultados guardados siguen vigentes
+    results: List[SimulationScenarioSeries]
+
+
+def convert_simulation_run_to_graphql(simulation_id: int, summary: dict, results: List[dict]) -> SimulationRun:
+    """Convierte el resumen y los resultados de simulation_service a tipo GraphQL"""
+    return SimulationRun(
+        simulation_id=simulation_id,
+        scenarios=summary["scenarios"],
+        evaluated=summary["evaluated"],
+        cached=summary["cached"],
+        results=[
+            SimulationScenarioSeries(
+                scenario_id=scenario["scenario_id"],
+                name=scenario["name"],
+                is_baseline=bool(scenario["is_baseline"]),
+                months=[SimulationMonth(**month) for month in scenario["months"]]
+            )
+            for scenario in results
+        ]
+    )
@@ -1,13 +1,35 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+import logging
 
 # Imports internos
 from .db_config import DB_HOST, DB_PORT, DB_NAME, DB_USER
 from .config import settings
+from . import startup_profile
+from .services.simulation_service import shutdown_process_pool
 
 # Version constant (moved from main.py)
 VERSION = "0.1.0"
 
+logger = logging.getLogger("moneydiary.api")
+
+def run_database_bootstrap(app: FastAPI):
+    """
+    Ejecuta el bootstrap de base de datos registrado por la factory
+    (mappers y tablas). Se omite con SKIP_DB_BOOTSTRAP=true, pensado para
+    réplicas que arrancan contra una base ya inicializada.
+    """
+    bootstrap = getattr(app.state, "database_bootstrap", None)
+    if bootstrap is None:
+        return
+
+    if settings.SKIP_DB_BOOTSTRAP:
+        logger.info("Bootstrap de base de datos omitido (SKIP_DB_BOOTSTRAP)")
+        return
+
+    with startup_profile.section("bootstrap base de datos"):
+        bootstrap()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Handle startup and shutdown events"""
@@ -21,17 +43,26 @@ async def lifespan(app: FastAPI):
         "DATABASE_URL": "postgresql://{user}:****@{host}:{port}/{database}".format(
             user=DB_USER, host=DB_HOST, port=DB_PORT, database=DB_NAME
         ),
+        "SKIP_DB_BOOTSTRAP": settings.SKIP_DB_BOOTSTRAP,
         "google_auth_scopes": settings.GOOGLE_AUTH_SCOPES_LIST,
         "frontend_url": settings.frontend_url,
         "frontend_auth_callback_path": settings.frontend_auth_callback_path,
         "frontend_auth_error_path": settings.frontend_auth_error_path,
     }
-    
+
     # Print configuration to logs
     print(f"\n{'='*50}\nMoneyDiary API v{VERSION} starting with configuration:\n")
     for key, value in config_dict.items():
         print(f"{key}: {value}")
     print(f"{'='*50}\n")
-    
+
+    # Inicializar la base de datos fuera del import del módulo
+    run_database_bootstrap(app)
+
+    logger.info(startup_profile.report())
+
     # Startup code finished, yield control back to FastAPI
     yield
+
+    # Procesos de las simulaciones en paralelo
+    shutdown_process_pool()
@@ -21,6 +21,9 @@ Patrón de aplicación:
 - Builder para la configuración progresiva de componentes
 """
 
+# Perfil de arranque: debe importarse antes que el resto de módulos internos
+from . import startup_profile
+
 # FastAPI
 from fastapi import FastAPI
 
@@ -39,19 +42,21 @@ from .lifecycle import lifespan, VERSION
 from .middleware import setup_middleware
 
 # Router imports
-from .routers import basic
-from .routers import categories
-from .api.router import api_router
+with startup_profile.section("import routers REST"):
+    from .routers import basic
+    from .routers import categories
+    from .api.router import api_router
 
 # Database imports
 from .init_db import initialize_database
 
 # GraphQL imports
-from .graphql.schema import schema
-from .graphql.test_schema import test_schema
-from .graphql.context import get_context
-from .graphql.client_utils import SnakeCaseGraphQLMiddleware
-from .graphql.debug import debug_query, debug_result
+with startup_profile.section("import schema GraphQL"):
+    from .graphql.schema import schema
+    from .graphql.test_schema import test_schema
+    from .graphql.context import get_context
+    from .graphql.client_utils import SnakeCaseGraphQLMiddleware
+    from .graphql.debug import debug_query, debug_result
 
 # from .services.bank_service import BankService
 from .services.auth_service import AuthService
@@ -96,6 +101,7 @@ def import_models():
     from apps.api.app.models.categories import CategoryGroup, Category, Subcategory
     from apps.api.app.models.account_types import AccountType
     from apps.api.app.models.accounts import Account
+    from apps.api.app.models.balance_checkpoints import AccountBalanceCheckpoint
     
     # Métodos financieros
     from apps.api.app.models.financial_methods import (
@@ -145,7 +151,8 @@ def initialize_app():
     configurando mappers SQLAlchemy e inicializando la base de datos.
     
     Sigue el principio de responsabilidad única separando las tareas
-    en funciones especializadas.
+    en funciones especializadas. Se ejecuta desde el hook `lifespan`
+    (ver lifecycle.run_database_bootstrap), no al importar el módulo.
     """
     import_models()
     setup_database()
@@ -212,8 +219,9 @@ def create_application() -> FastAPI:
         redoc_url="/redoc",
     )
     
-    # Inicializar la base de datos
-    initialize_app()
+    # Registrar la inicialización de la base de datos; se ejecuta en el
+    # arranque (lifespan) y no al importar el módulo
+    app.state.database_bootstrap = initialize_app
     
     # Configurar middleware
     setup_middleware(app)
@@ -231,7 +239,8 @@ def create_application() -> FastAPI:
     return app
 
 # Crear la instancia de la aplicación utilizando el factory
-app = create_application()
+with startup_profile.section("create_application"):
+    app = create_application()
 
 # Esta línea es útil para depuración y para confirmación de inicialización correcta
 logger.debug("MoneyDiary API inicializada con GraphQL y debugging habilitados")
\ No newline at end of file
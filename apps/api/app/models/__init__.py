@@ -21,6 +21,7 @@ from .categories import CategoryGroup, Category, Subcategory
 # Cuentas y tipos
 from .account_types import AccountType
 from .accounts import Account
+from .balance_checkpoints import AccountBalanceCheckpoint
 
 # Métodos financieros
 from .financial_methods import (
@@ -37,14 +38,20 @@ from .envelopes import Envelope
 from .budget import BudgetPlan, BudgetItem
 
 # Metas financieras
-from .financial_goals import FinancialGoal, GoalContribution
+from .financial_goals import FinancialGoal, GoalContribution, GoalContributionRule, GoalForecast
 
 # Patrones recurrentes
-from .recurring_patterns import RecurringPattern
+from .recurring_patterns import RecurringPattern, RecurringDetectionState
+
+# Comercios normalizados
+from .merchants import Merchant, MerchantRule
 
 # Transacciones - último ya que depende de muchos modelos anteriores
 from .transactions import TransactionStatus, Transaction
 
+# Análisis 50/30/20 (invalida su caché al cambiar transacciones)
+from .bucket_analytics import SubcategoryBucket, BucketMonthlyTotal
+
 # Proyecciones y simulaciones
 from .projections import ProjectionSettings, MonthlyProjections, ProjectionDetails
 from .simulations import (
@@ -64,7 +71,7 @@ __all__ = [
     'User', 'Role', 'Permission', 'OAuth2Token', 'InvalidatedToken',
     
     # Cuentas
-    'AccountType', 'Account',
+    'AccountType', 'Account', 'AccountBalanceCheckpoint',
     
     # Categorías
     'CategoryGroup', 'Category', 'Subcategory',
@@ -72,15 +79,17 @@ __all__ = [
     # Métodos financieros
     'FinancialMethod', 'MethodFiftyThirtyTwenty', 'MethodEnvelope',
     'MethodZeroBased', 'MethodKakebo', 'MethodPayYourselfFirst',
+    'SubcategoryBucket', 'BucketMonthlyTotal',
     
     # Presupuestos
     'Envelope', 'BudgetPlan', 'BudgetItem',
     
     # Transacciones
-    'TransactionStatus', 'Transaction', 'RecurringPattern',
+    'TransactionStatus', 'Transaction', 'RecurringPattern', 'RecurringDetectionState',
+    'Merchant', 'MerchantRule',
     
     # Metas
-    'FinancialGoal', 'GoalContribution',
+    'FinancialGoal', 'GoalContribution', 'GoalContributionRule', 'GoalForecast',
     
     # Proyecciones
     'ProjectionSettings', 'MonthlyProjections', 'ProjectionDetails',
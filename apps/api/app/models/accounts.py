@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, Float, Integer, String, ForeignKey, Boolean, func
+from sqlalchemy import Column, DateTime, Numeric, Integer, String, ForeignKey, Boolean, func
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -9,7 +9,9 @@ class Account(Base):
     id = Column(Integer, primary_key=True, autoincrement=True) # ID de la cuenta
     name = Column(String(100), nullable=False) # Nombre de la cuenta
     account_number = Column(String(50), nullable=True)  # Número de cuenta
-    current_balance = Column(Float, default=0.0) # Saldo actual de la cuenta
+    current_balance = Column(Numeric(18, 2), default=0) # Saldo actual de la cuenta (se actualiza por deltas, ver services/balance_ledger.py)
+    opening_balance = Column(Numeric(18, 2), nullable=False, default=0, server_default="0") # Saldo inicial: current_balance = opening_balance + suma de transacciones
+    duplicate_filter_stamp = Column(Integer, nullable=False, default=0, server_default="0") # Sube al editar transacciones: invalida los filtros de duplicados de todos los procesos (ver services/duplicate_filter.py)
     active = Column(Boolean, default=True) # Indica si la cuenta está activa
     created_at = Column(DateTime, default=func.now()) # Fecha de creación de la cuenta
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now()) # Fecha de última actualización de la cuenta
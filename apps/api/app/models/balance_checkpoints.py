@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, ForeignKey, Date, Numeric, TIMESTAMP, UniqueConstraint, func
+from sqlalchemy.orm import relationship
+from .base import Base
+
+class AccountBalanceCheckpoint(Base):
+    __tablename__ = 'account_balance_checkpoints'
+    __table_args__ = (
+        UniqueConstraint('account_id', 'month_start', name='uq_balance_checkpoint_account_month'),
+        {'schema': 'app'}
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    account_id = Column(Integer, ForeignKey('accounts.id', ondelete='CASCADE'), nullable=False) # Cuenta del checkpoint
+    month_start = Column(Date, nullable=False) # Primer día del mes que cierra el checkpoint
+    # Suma acumulada de movimientos hasta el último día del mes, sin el saldo
+    # inicial de la cuenta: saldo al cierre = accounts.opening_balance + closing_movements
+    closing_movements = Column(Numeric(18, 2), nullable=False, default=0)
+    month_movements = Column(Numeric(18, 2), nullable=False, default=0) # Movimientos netos dentro del mes
+    updated_at = Column(TIMESTAMP, default=func.now(), onupdate=func.now())
+
+    account = relationship("Account")
@@ -0,0 +1,55 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, Numeric, TIMESTAMP, UniqueConstraint, event
+from sqlalchemy.orm import Session
+from .base import Base
+from .transactions import flushed_transaction_keys
+
+BUCKETS = ('needs', 'wants', 'savings')
+
+
+class SubcategoryBucket(Base):
+    """Bucket 50/30/20 (needs, wants o savings) al que el usuario asigna una subcategoría"""
+    __tablename__ = 'subcategory_buckets'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'subcategory_id', name='uq_subcategory_buckets_user_subcategory'),
+        {'schema': 'app'}
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    subcategory_id = Column(Integer, ForeignKey('subcategories.id', ondelete='CASCADE'), nullable=False)
+    bucket = Column(String(10), nullable=False)
+    created_at = Column(TIMESTAMP)
+    updated_at = Column(TIMESTAMP)
+
+
+class BucketMonthlyTotal(Base):
+    """Totales reales por bucket de un mes; se borran al cambiar las transacciones del mes"""
+    __tablename__ = 'bucket_monthly_totals'
+    __table_args__ = {'schema': 'app'}
+
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    month = Column(Date, primary_key=True)  # Primer día del mes
+    income = Column(Numeric(18, 2), nullable=False, default=0)
+    needs = Column(Numeric(18, 2), nullable=False, default=0)  # Gastos netos (positivos) del bucket
+    wants = Column(Numeric(18, 2), nullable=False, default=0)
+    savings = Column(Numeric(18, 2), nullable=False, default=0)  # Egresos asignados explícitamente a ahorro
+    computed_at = Column(TIMESTAMP)
+
+
+# Campos de la transacción que cambian los totales por bucket
+BUCKET_FIELDS = ('user_id', 'amount', 'transaction_date', 'subcategory_id', 'transfer_account_id', 'is_planned')
+
+
+@event.listens_for(Session, 'before_flush')
+def _invalidate_bucket_totals(session, flush_context, instances):
+    """Borra, en la misma transacción, los meses en caché de las transacciones que cambian"""
+    months = {}
+    for user_id, when in flushed_transaction_keys(session, ('user_id', 'transaction_date'), BUCKET_FIELDS):
+        if user_id is not None and when is not None:
+            months.setdefault(user_id, set()).add(when.replace(day=1))
+
+    table = BucketMonthlyTotal.__table__
+    for user_id, stale in months.items():
+        session.connection().execute(
+            table.delete().where(table.c.user_id == user_id, table.c.month.in_(sorted(stale)))
+        )
@@ -1,7 +1,9 @@
 from decimal import Decimal
-from sqlalchemy import Column, Integer, String, ForeignKey, Numeric, Date, Text, Boolean, TIMESTAMP
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, Numeric, Date, Text, Boolean, TIMESTAMP, Index, event, select, tuple_
+from sqlalchemy.orm import Session, relationship, validates
 from .base import Base
+from .transactions import flushed_transaction_keys
+from ..utils.date_parser import parse_month_year
 
 class BudgetPlan(Base):
     __tablename__ = 'budget_plans'
@@ -39,7 +41,12 @@ class BudgetPlan(Base):
 
 class BudgetItem(Base):
     __tablename__ = 'budget_items'
-    __table_args__ = {'schema': 'app'}
+    __table_args__ = (
+        Index('idx_budget_items_budget_id', 'budget_id'),
+        # Celdas (subcategoría, mes) afectadas por cambios en transacciones
+        Index('idx_budget_items_subcategory_month', 'subcategory_id', 'month_start'),
+        {'schema': 'app'}
+    )
     """Modelo para representar partidas presupuestarias dentro de un plan de presupuesto.
     Cada partida presupuestaria está asociada a una categoría, subcategoría y sobres (envelopes) específicos.
     Permite definir montos específicos para cada partida en un mes y año determinados."""
@@ -50,6 +57,9 @@ class BudgetItem(Base):
     envelope_id = Column(Integer, ForeignKey('envelopes.id')) # ID del sobre (envelope) asociado a la partida presupuestaria
     amount = Column(Numeric, nullable=False) # Monto de la partida presupuestaria
     month_year = Column(String, nullable=False) # Mes y año de la partida presupuestaria
+    month_start = Column(Date) # Primer día del mes de `month_year`; se asigna junto con `month_year`
+    actual_amount = Column(Numeric(18, 2)) # Monto real del mes; nulo mientras esté pendiente de recalcular
+    actual_computed_at = Column(TIMESTAMP) # Fecha del último cálculo del monto real
     notes = Column(Text) # Notas adicionales sobre la partida presupuestaria
     created_at = Column(TIMESTAMP) # Fecha de creación de la partida presupuestaria
     updated_at = Column(TIMESTAMP) # Fecha de última actualización de la partida presupuestaria
@@ -65,3 +75,38 @@ class BudgetItem(Base):
     @property
     def category(self):
         return self.subcategory.category if self.subcategory else None
+
+    @validates('month_year', 'subcategory_id')
+    def _reset_actual(self, key, value):
+        # Celda nueva o distinta: el monto real se recalcula en la próxima lectura
+        if key == 'month_year':
+            self.month_start = parse_month_year(value)
+        self.actual_amount = None
+        return value
+
+
+# Campos de la transacción que cambian el monto real de una partida
+BUDGET_FIELDS = ('user_id', 'amount', 'transaction_date', 'subcategory_id', 'transfer_account_id', 'is_planned')
+
+
+@event.listens_for(Session, 'before_flush')
+def _invalidate_budget_actuals(session, flush_context, instances):
+    """Marca como pendientes, en la misma transacción, las celdas (subcategoría, mes) que cambian"""
+    cells = {}
+    for user_id, subcategory_id, when in flushed_transaction_keys(
+        session, ('user_id', 'subcategory_id', 'transaction_date'), BUDGET_FIELDS
+    ):
+        if user_id is not None and subcategory_id is not None and when is not None:
+            cells.setdefault(user_id, set()).add((subcategory_id, when.replace(day=1)))
+
+    table = BudgetItem.__table__
+    plans = BudgetPlan.__table__
+    for user_id, stale in cells.items():
+        session.connection().execute(
+            table.update()
+            .where(
+                tuple_(table.c.subcategory_id, table.c.month_start).in_(sorted(stale)),
+                table.c.budget_id.in_(select(plans.c.id).where(plans.c.user_id == user_id)),
+            )
+            .values(actual_amount=None)
+        )
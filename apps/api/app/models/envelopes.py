@@ -1,5 +1,5 @@
 from decimal import Decimal
-from sqlalchemy import Column, Integer, String, ForeignKey, Numeric, TIMESTAMP, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, Numeric, TIMESTAMP, Boolean, Date
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -19,6 +19,8 @@ class Envelope(Base):
     name = Column(String, nullable=False) # Nombre específico del sobre (ej: "Comida Familiar", "Gasolina Auto")
     budget_amount = Column(Numeric, nullable=False, default=0) # Monto presupuestado para el sobre
     current_balance = Column(Numeric, nullable=False, default=0) # Saldo actual del sobre
+    allocated_amount = Column(Numeric, nullable=False, default=0) # Monto asignado al sobre (base del saldo, sin movimientos)
+    last_rollover_month = Column(Date, nullable=True) # Primer día del último periodo abierto por el cierre de mes
     is_active = Column(Boolean, nullable=False, default=True) # Indica si el sobre está activo
     created_at = Column(TIMESTAMP) # Fecha de creación del sobre
     updated_at = Column(TIMESTAMP) # Fecha de última actualización del sobre
@@ -1,7 +1,10 @@
-from sqlalchemy import Column, Integer, String, Text, Date, ForeignKey, Boolean, TIMESTAMP, Enum
-from sqlalchemy.orm import relationship
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Text, Date, ForeignKey, Boolean, TIMESTAMP, Enum, LargeBinary, Index, event, inspect
+from sqlalchemy.orm import Session, relationship
 import enum
 from .base import Base
+from .transactions import Transaction
 
 class ImportFileType(enum.Enum):
     CSV = "CSV"
@@ -39,7 +42,12 @@ class TransactionTypeDetection(enum.Enum):
 
 class FileImport(Base):
     __tablename__ = 'file_imports'
-    __table_args__ = {'schema': 'app'}
+    __table_args__ = (
+        # Detección de re-subidas del mismo archivo antes de parsearlo
+        Index('idx_file_imports_account_sha256', 'user_id', 'account_id', 'file_sha256'),
+        Index('idx_file_imports_account_fingerprint', 'user_id', 'account_id', 'content_fingerprint'),
+        {'schema': 'app'}
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True) # ID del import
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False) # ID del usuario que realiza el import
@@ -54,6 +62,13 @@ class FileImport(Base):
     error_count = Column(Integer, nullable=False, default=0) # Número de registros con errores
     duplicate_count = Column(Integer, nullable=False, default=0) # Número de registros duplicados
     status = Column(Enum(ImportStatus), nullable=False, default=ImportStatus.PENDING) # Estado del import
+    file_sha256 = Column(String(64)) # SHA-256 del archivo subido tal cual
+    content_fingerprint = Column(String(64)) # Huella del contenido normalizado (ignora BOM, finales de línea, metadatos)
+    row_digests = Column(LargeBinary) # Resumen de filas: 8 bytes por fila importada, en orden del archivo
+    profile_updated_at = Column(TIMESTAMP) # Versión (updated_at) del perfil con que se importó
+    invalidated_at = Column(TIMESTAMP) # Se eliminó o editó una de sus transacciones: el archivo ya no cuenta como importado
+    first_transaction_date = Column(Date) # Rango de fechas de las filas del archivo
+    last_transaction_date = Column(Date)
     started_at = Column(TIMESTAMP) # Fecha y hora de inicio del import
     completed_at = Column(TIMESTAMP) # Fecha y hora de finalización del import
     created_at = Column(TIMESTAMP) # Fecha y hora de creación del registro
@@ -231,4 +246,32 @@ Banco con campo explícito de tipo:
 - Mapeos:
   * "Monto" -> "amount"
   * "Tipo" -> "transaction_type"
-"""
\ No newline at end of file
+"""
+
+# Campos de la transacción que definen la fila importada (ver generate_transaction_hash)
+IMPORTED_ROW_FIELDS = ('account_id', 'amount', 'description', 'transaction_date', 'external_id')
+
+
+@event.listens_for(Session, 'before_flush')
+def _invalidate_file_imports(session, flush_context, instances):
+    """
+    Invalida, en la misma transacción, las importaciones cuyas transacciones se
+    eliminan o cambian: una re-subida del archivo vuelve a procesarse y sus
+    filas dejan de descartarse por solapamiento.
+    """
+    import_ids = {transaction.import_id for transaction in session.deleted
+                  if isinstance(transaction, Transaction)}
+    for transaction in session.dirty:
+        if isinstance(transaction, Transaction) and any(
+                inspect(transaction).attrs[field].history.has_changes() for field in IMPORTED_ROW_FIELDS):
+            import_ids.add(transaction.import_id)
+    import_ids.discard(None)
+    if not import_ids:
+        return
+
+    table = FileImport.__table__
+    session.connection().execute(
+        table.update()
+        .where(table.c.id.in_(sorted(import_ids)), table.c.invalidated_at.is_(None))
+        .values(invalidated_at=datetime.utcnow(), row_digests=None)
+    )
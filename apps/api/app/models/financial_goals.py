@@ -1,5 +1,5 @@
 from decimal import Decimal
-from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, Date, Text, Boolean, TIMESTAMP
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, Date, Text, Boolean, TIMESTAMP, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -22,13 +22,18 @@ class FinancialGoal(Base):
     user = relationship("User", back_populates="financial_goals")
     category = relationship("Category", back_populates="financial_goals")
     contributions = relationship("GoalContribution", back_populates="goal")
+    contribution_rules = relationship("GoalContributionRule", back_populates="goal")
 
 class GoalContribution(Base):
     __tablename__ = 'goal_contributions'
+    __table_args__ = (
+        Index('idx_goal_contributions_goal_id', 'goal_id'),
+        Index('idx_goal_contributions_transaction_id', 'transaction_id'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     goal_id = Column(Integer, ForeignKey('financial_goals.id'), nullable=False)
-    transaction_id = Column(Integer, ForeignKey('transactions.id'))
+    transaction_id = Column(Integer, ForeignKey('transactions.id', ondelete='CASCADE'))
     amount = Column(Numeric, nullable=False)
     contribution_date = Column(Date, nullable=False)
     notes = Column(Text)
@@ -36,4 +41,36 @@ class GoalContribution(Base):
     updated_at = Column(TIMESTAMP)
 
     goal = relationship("FinancialGoal", back_populates="contributions")
-    transaction = relationship("Transaction", back_populates="goal_contributions")
\ No newline at end of file
+    transaction = relationship("Transaction", back_populates="goal_contributions")
+
+class GoalContributionRule(Base):
+    """
+    Regla para registrar transacciones como aportes a una meta: transferencias
+    hacia (o abonos en) `account_id`, o descripciones que coinciden con
+    `pattern` según `pattern_type`, como en los patrones de descripción.
+    """
+    __tablename__ = 'goal_contribution_rules'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    goal_id = Column(Integer, ForeignKey('financial_goals.id', ondelete='CASCADE'), nullable=False)
+    account_id = Column(Integer, ForeignKey('accounts.id', ondelete='CASCADE'))  # Cuenta de ahorro de la meta
+    pattern = Column(Text)
+    pattern_type = Column(String(20), nullable=False, default='contains')
+    is_case_sensitive = Column(Boolean, nullable=False, default=False)
+    is_active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(TIMESTAMP)
+    updated_at = Column(TIMESTAMP)
+
+    goal = relationship("FinancialGoal", back_populates="contribution_rules")
+
+class GoalForecast(Base):
+    """Pronóstico Monte Carlo de una meta, válido mientras no cambie `input_hash`"""
+    __tablename__ = 'goal_forecasts'
+
+    goal_id = Column(Integer, ForeignKey('financial_goals.id', ondelete='CASCADE'), primary_key=True)
+    input_hash = Column(String(64), nullable=False)
+    success_probability = Column(Numeric)  # Probabilidad de cumplir la meta a su target_date
+    expected_completion_date = Column(Date)  # Mediana de las trayectorias; nula si la mayoría no la cumple
+    completion_probability = Column(Numeric, nullable=False)  # Probabilidad de cumplirla dentro del horizonte
+    paths = Column(Integer, nullable=False)
+    computed_at = Column(TIMESTAMP)
@@ -0,0 +1,40 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, Boolean, TIMESTAMP
+from sqlalchemy.orm import relationship
+from .base import Base
+
+
+class Merchant(Base):
+    """Comercio canónico al que se normalizan las descripciones bancarias"""
+    __tablename__ = 'merchants'
+    __table_args__ = {'schema': 'app'}
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    key = Column(String(120), nullable=False, unique=True)  # Descripción limpia ("lider"); identifica al comercio
+    name = Column(String(120), nullable=False)  # Nombre para mostrar ("Lider")
+    created_at = Column(TIMESTAMP)
+    updated_at = Column(TIMESTAMP)
+
+    rules = relationship("MerchantRule", back_populates="merchant")
+
+
+class MerchantRule(Base):
+    """
+    Regla de normalización de descripciones:
+    - strip: expresión regular cuyas coincidencias se eliminan (ciudades, glosas del banco)
+    - regex: expresión regular reemplazada por `replacement`
+    - alias: descripción limpia (o su inicio, por palabras) que corresponde a `merchant_id`
+    """
+    __tablename__ = 'merchant_rules'
+    __table_args__ = {'schema': 'app'}
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    rule_type = Column(String(10), nullable=False)
+    pattern = Column(Text, nullable=False)
+    replacement = Column(Text)
+    merchant_id = Column(Integer, ForeignKey('merchants.id', ondelete='CASCADE'))
+    priority = Column(Integer, nullable=False, default=0)  # Mayor prioridad se aplica primero
+    is_active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(TIMESTAMP)
+    updated_at = Column(TIMESTAMP)
+
+    merchant = relationship("Merchant", back_populates="rules")
@@ -1,5 +1,5 @@
 from decimal import Decimal
-from sqlalchemy import Column, Integer, String, Numeric, Date, ForeignKey, Boolean, Text, TIMESTAMP
+from sqlalchemy import Column, Integer, String, Numeric, Date, ForeignKey, Boolean, Text, TIMESTAMP, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -19,6 +19,12 @@ class ProjectionSettings(Base):
 
 class MonthlyProjections(Base):
     __tablename__ = 'monthly_projections'
+    __table_args__ = (
+        # Una proyección base por usuario y mes (las simulaciones pueden repetir meses)
+        Index('uq_monthly_projections_user_month', 'user_id', 'month_year', unique=True,
+              postgresql_where=Column('is_simulation').is_(False),
+              sqlite_where=Column('is_simulation').is_(False)),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -40,10 +46,15 @@ class MonthlyProjections(Base):
 
 class ProjectionDetails(Base):
     __tablename__ = 'projection_details'
+    __table_args__ = (
+        Index('idx_projection_details_projection_id', 'projection_id'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     projection_id = Column(Integer, ForeignKey('monthly_projections.id'), nullable=False)
-    subcategory_id = Column(Integer, ForeignKey('subcategories.id'), nullable=False)
+    category_id = Column(Integer, ForeignKey('categories.id'), nullable=False)
+    subcategory_id = Column(Integer, ForeignKey('subcategories.id'))
+    envelope_id = Column(Integer, ForeignKey('envelopes.id'))
     amount = Column(Numeric, nullable=False)
     is_actual = Column(Boolean, nullable=False, default=False)
     financial_bucket = Column(String)
@@ -51,4 +62,6 @@ class ProjectionDetails(Base):
     updated_at = Column(TIMESTAMP)
 
     projection = relationship("MonthlyProjections", back_populates="projection_details")
-    subcategory = relationship("Subcategory")
\ No newline at end of file
+    category = relationship("Category")
+    subcategory = relationship("Subcategory")
+    envelope = relationship("Envelope")
\ No newline at end of file
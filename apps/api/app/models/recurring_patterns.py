@@ -1,5 +1,5 @@
 from decimal import Decimal
-from sqlalchemy import Column, Integer, String, ForeignKey, Numeric, TIMESTAMP, Boolean, Text, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, Numeric, TIMESTAMP, Boolean, Text, DateTime, Date, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -18,10 +18,29 @@ class RecurringPattern(Base):
     is_active = Column(Boolean, nullable=False, default=True)
     created_at = Column(TIMESTAMP)
     updated_at = Column(TIMESTAMP)
+    # Campos del detector de recurrencias (recurring_detection_service)
+    account_id = Column(Integer, ForeignKey('accounts.id'), nullable=True)
+    match_key = Column(Text, nullable=True)  # description_normalized de las transacciones del patrón
+    occurrence_count = Column(Integer, nullable=False, default=0)
+    last_transaction_date = Column(Date, nullable=True)
+    next_expected_date = Column(Date, nullable=True)
 
     user = relationship("User", back_populates="recurring_patterns")
     transactions = relationship("Transaction", back_populates="recurring_pattern")
 
+    __table_args__ = (
+        Index('idx_recurring_patterns_user_match_key', 'user_id', 'match_key'),
+    )
+
+
+class RecurringDetectionState(Base):
+    """Última transacción analizada por el detector de recurrencias, por usuario"""
+    __tablename__ = 'recurring_detection_state'
+
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    last_transaction_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(TIMESTAMP)
+
 
 class DescriptionPattern(Base):
     """
@@ -1,5 +1,5 @@
 from decimal import Decimal
-from sqlalchemy import Column, Integer, String, Text, Date, Numeric, ForeignKey, Boolean, TIMESTAMP
+from sqlalchemy import Column, Integer, String, Text, Date, Numeric, ForeignKey, Boolean, TIMESTAMP, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -28,6 +28,7 @@ class SimulationScenario(Base):
     name = Column(String, nullable=False)
     description = Column(Text)
     is_baseline = Column(Boolean, nullable=False, default=False)
+    input_hash = Column(String(64))  # Hash de las entradas con que se calcularon los resultados guardados
     created_at = Column(TIMESTAMP)
     updated_at = Column(TIMESTAMP)
     financial_simulation = relationship("FinancialSimulation", back_populates="scenarios")
@@ -47,6 +48,9 @@ class SimulationParameter(Base):
 
 class SimulationResult(Base):
     __tablename__ = 'simulation_results'
+    __table_args__ = (
+        Index('idx_simulation_results_scenario_id', 'scenario_id'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     scenario_id = Column(Integer, ForeignKey('simulation_scenarios.id'), nullable=False)
@@ -1,7 +1,11 @@
 from decimal import Decimal
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, Text, Numeric, Boolean, TIMESTAMP, Index
-from sqlalchemy.orm import relationship
+from itertools import chain
+from typing import Sequence, Set, Tuple
+
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, Text, Numeric, Boolean, TIMESTAMP, Index, DDL, event, inspect
+from sqlalchemy.orm import relationship, validates
 from .base import Base
+from ..utils.transaction_utils import normalize_description
 
 class TransactionStatus(Base):
     __tablename__ = 'transaction_statuses'
@@ -21,10 +25,14 @@ class Transaction(Base):
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     account_id = Column(Integer, ForeignKey('accounts.id'), nullable=False)
     transfer_account_id = Column(Integer, ForeignKey('accounts.id'))
+    # Contraparte de una transferencia interna emparejada (egreso <-> abono en otra cuenta)
+    transfer_transaction_id = Column(Integer, ForeignKey('transactions.id', ondelete='SET NULL'), nullable=True)
     subcategory_id = Column(Integer, ForeignKey('subcategories.id'))
     envelope_id = Column(Integer, ForeignKey('envelopes.id'))
     status_id = Column(Integer, ForeignKey('transaction_statuses.id'), nullable=False)
     recurring_pattern_id = Column(Integer, ForeignKey('recurring_patterns.id'))
+    merchant_id = Column(Integer, ForeignKey('merchants.id', ondelete='SET NULL'), nullable=True)
+    merchant_version = Column(String(16), nullable=True)  # Versión de las reglas de comercio aplicadas
     import_id = Column(Integer, ForeignKey('file_imports.id'))
     import_row_number = Column(Integer, nullable=True)
     external_id = Column(String)  # Ya existe
@@ -34,6 +42,8 @@ class Transaction(Base):
     
     amount = Column(Numeric, nullable=False)
     description = Column(Text)
+    # Descripción en minúsculas y con espacios colapsados; se asigna junto con `description`
+    description_normalized = Column(Text, nullable=True)
     notes = Column(Text)
     transaction_date = Column(Date, nullable=False)
     is_recurring = Column(Boolean, nullable=False, default=False)
@@ -52,7 +62,9 @@ class Transaction(Base):
     status = relationship("TransactionStatus", back_populates="transactions")
     recurring_pattern = relationship("RecurringPattern", back_populates="transactions")
     import_data = relationship("FileImport", back_populates="transactions")
-    goal_contributions = relationship("GoalContribution", back_populates="transaction")
+    # Los aportes se revierten en el servicio (ver goal_contribution_service) y la base los elimina en cascada
+    goal_contributions = relationship("GoalContribution", back_populates="transaction", passive_deletes=True)
+    merchant = relationship("Merchant")
 
     # ÍNDICES PARA PREVENIR DUPLICADOS
     __table_args__ = (
@@ -67,4 +79,52 @@ class Transaction(Base):
         # Índice compuesto para detección de duplicados similares
         Index('idx_user_duplicate_detection', 'user_id', 'account_id', 'amount', 
               'transaction_date', 'description', unique=True),
+        
+        # Agrupación y coincidencias exactas por descripción normalizada
+        Index('idx_transactions_user_description_normalized', 'user_id', 'description_normalized'),
+        
+        # Búsqueda por subcadena (LIKE '%...%') de patrones y buscadores; requiere pg_trgm
+        Index('idx_transactions_description_normalized_trgm', 'description_normalized',
+              postgresql_using='gin', postgresql_ops={'description_normalized': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+
+        # Gasto por comercio (top de comercios y serie por comercio)
+        Index('idx_transactions_user_merchant_date', 'user_id', 'merchant_id', 'transaction_date'),
+
+        # Conciliación y cierre de saldos de sobres
+        Index('idx_transactions_envelope_id', 'envelope_id',
+              postgresql_where=Column('envelope_id').isnot(None)),
     )
+
+    @validates('description')
+    def _normalize_description(self, key, value):
+        self.description_normalized = normalize_description(value) if value is not None else None
+        return value
+
+
+event.listen(
+    Transaction.__table__,
+    'before_create',
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect='postgresql')
+)
+
+
+def flushed_transaction_keys(session, keys: Sequence[str], watched: Sequence[str]) -> Set[Tuple]:
+    """
+    Valores de `keys` de las transacciones que el flush en curso crea, elimina
+    o modifica en alguno de los campos `watched`. De las modificadas se
+    devuelven los valores actuales y los anteriores.
+
+    Lo usan los listeners `before_flush` que invalidan cachés derivadas de las
+    transacciones.
+    """
+    result = {tuple(getattr(transaction, key) for key in keys)
+              for transaction in chain(session.new, session.deleted) if isinstance(transaction, Transaction)}
+    for transaction in session.dirty:
+        if not isinstance(transaction, Transaction):
+            continue
+        state = inspect(transaction)
+        if not any(state.attrs[field].history.has_changes() for field in watched):
+            continue
+        result.add(tuple(getattr(transaction, key) for key in keys))
+        result.add(tuple((state.attrs[key].history.deleted or [getattr(transaction, key)])[0] for key in keys))
+    return result
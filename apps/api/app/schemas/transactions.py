@@ -19,6 +19,8 @@ class TransactionBase(BaseModel):
     external_id: Optional[str] = None
 
 class TransactionCreateRequest(TransactionBase):
+    amount: Decimal  # Exacto desde el parseo de la cartola hasta la transacción
+
     @field_validator('amount')
     def validate_amount(cls, v):
         if v == 0:
@@ -66,11 +68,29 @@ class TransactionResponse(TransactionBase):
     class Config:
         orm_mode = True
 
+class AmountParseErrorItem(BaseModel):
+    """Monto que no se pudo interpretar durante una importación"""
+    row_number: int
+    value: str
+
+class PossibleDuplicateItem(BaseModel):
+    """Fila importada que se parece a una transacción existente (fecha corrida o glosa distinta)"""
+    row_number: int
+    transaction_id: int
+    similarity: float
+
 class TransactionImportResponse(BaseModel):
     total_records: int
     successful_imports: int
     failed_imports: int
     errors: List[str]
+    amount_errors: List[AmountParseErrorItem] = []
+    skipped_duplicates: int = 0  # Filas ya importadas en una cartola anterior que se solapa
+    import_id: Optional[int] = None
+    duplicate_of_import_id: Optional[int] = None  # Re-subida de un archivo ya importado
+    possible_duplicates: List[PossibleDuplicateItem] = []
+    goal_contributions: int = 0  # Transacciones registradas como aportes a metas
+    transfer_pairs: int = 0  # Transferencias internas emparejadas con movimientos de otras cuentas
 
 class TransactionPreviewItem(BaseModel):
     """Representa una transacción en preview antes de ser confirmada"""
@@ -113,4 +133,22 @@ class TransactionPreviewConfirmRequest(BaseModel):
     """Request para confirmar la importación después del preview"""
     preview_id: str
     selected_transactions: Optional[List[int]] = None  # Números de fila a importar, si None importa todas las válidas
-    modifications: Optional[Dict[int, TransactionPreviewItem]] = None  # Modificaciones por número de fila
\ No newline at end of file
+    modifications: Optional[Dict[int, TransactionPreviewItem]] = None  # Modificaciones por número de fila
+class NearDuplicateTransaction(BaseModel):
+    id: int
+    transaction_date: date
+    amount: Decimal
+    description: Optional[str] = None
+
+class NearDuplicateGroup(BaseModel):
+    """Transacciones de una misma cuenta y monto que parecen el mismo movimiento"""
+    account_id: int
+    similarity: float
+    transactions: List[NearDuplicateTransaction]
+
+class NearDuplicateReportResponse(BaseModel):
+    """Reporte de posibles duplicados en el historial"""
+    threshold: float
+    window_days: int
+    total_groups: int
+    groups: List[NearDuplicateGroup]
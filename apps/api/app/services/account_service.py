@@ -8,6 +8,7 @@ from ..models.accounts import Account
 from ..models.banks import Bank
 from ..models.account_types import AccountType
 from ..schemas.accounts import AccountCreateRequest, AccountUpdateRequest
+from .balance_ledger import to_money
 
 
 def get_user_accounts(db: Session, user_id: int) -> List[Account]:
@@ -66,6 +67,7 @@ def create_account(db: Session, user_id: int, account_data: AccountCreateRequest
         bank_id=account_data.bank_id,
         account_type_id=account_data.account_type_id,
         current_balance=account_data.current_balance,
+        opening_balance=account_data.current_balance,
         active=account_data.active,
         user_id=user_id
     )
@@ -106,6 +108,14 @@ def update_account(db: Session, user_id: int, account_id: int, account_data: Acc
         if not account_type:
             raise ValueError("El tipo de cuenta especificado no existe")
     
+    # Un ajuste manual del saldo se registra como ajuste del saldo inicial,
+    # aplicado por delta para no pisar importaciones concurrentes
+    new_balance = update_data.pop('current_balance', None)
+    if new_balance is not None:
+        adjustment = to_money(new_balance) - to_money(account.current_balance or 0)
+        account.current_balance = Account.current_balance + adjustment
+        account.opening_balance = Account.opening_balance + adjustment
+    
     # Aplicar actualizaciones directamente (los nombres ya son correctos)
     for field, value in update_data.items():
         if hasattr(account, field):
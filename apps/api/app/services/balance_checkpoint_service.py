@@ -0,0 +1,355 @@
+"""
+Checkpoints mensuales de saldo por cuenta.
+
+Cada fila de `account_balance_checkpoints` guarda la suma acumulada de
+movimientos de una cuenta al cierre de un mes. Los checkpoints de una cuenta
+son contiguos desde el mes de su primer movimiento, de modo que el saldo en
+cualquier fecha se obtiene con un checkpoint más, como máximo, un mes de
+transacciones.
+
+Se mantienen de forma incremental desde `BalanceLedger.apply`: un movimiento
+en el mes M suma su delta a todos los checkpoints desde M en adelante, lo que
+repara automáticamente los meses posteriores cuando llega una transacción con
+fecha pasada.
+"""
+
+import calendar
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, case, extract, func, select, union_all, update, delete
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.accounts import Account
+from ..models.balance_checkpoints import AccountBalanceCheckpoint
+from ..models.transactions import Transaction
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ("month", "day")
+
+
+# ============================
+# Utilidades de fechas y montos
+# ============================
+
+def month_start(value: date) -> date:
+    return value.replace(day=1)
+
+
+def month_end(value: date) -> date:
+    return value.replace(day=calendar.monthrange(value.year, value.month)[1])
+
+
+def next_month(value: date) -> date:
+    return (month_start(value) + timedelta(days=32)).replace(day=1)
+
+
+def iter_months(first: date, last: date) -> Iterable[date]:
+    """Primeros días de mes entre dos fechas, ambos meses incluidos"""
+    current = month_start(first)
+    while current <= last:
+        yield current
+        current = next_month(current)
+
+
+def _money(value: Any) -> Decimal:
+    return Decimal(str(value or 0)).quantize(Decimal("0.01"))
+
+
+# ============================
+# Movimientos
+# ============================
+
+def movements_subquery(account_ids: Optional[Iterable[int]] = None):
+    """
+    Movimientos que afectan el saldo de cada cuenta: el monto de sus propias
+    transacciones y el valor absoluto de los egresos transferidos hacia ella.
+    Los egresos emparejados con su abono (`transfer_transaction_id`) no
+    abonan a la cuenta destino: el abono ya es una transacción de esa cuenta.
+    """
+    own = select(
+        Transaction.account_id.label("account_id"),
+        Transaction.transaction_date.label("transaction_date"),
+        Transaction.amount.label("delta"),
+    )
+    incoming = select(
+        Transaction.transfer_account_id.label("account_id"),
+        Transaction.transaction_date.label("transaction_date"),
+        (-Transaction.amount).label("delta"),
+    ).where(Transaction.transfer_account_id.isnot(None), Transaction.transfer_transaction_id.is_(None),
+            Transaction.amount < 0)
+
+    if account_ids is not None:
+        account_ids = list(account_ids)
+        own = own.where(Transaction.account_id.in_(account_ids))
+        incoming = incoming.where(Transaction.transfer_account_id.in_(account_ids))
+
+    return union_all(own, incoming).subquery("movements")
+
+
+def _sum_movements(db: Session, account_id: int, start: Optional[date], end: date) -> Decimal:
+    movements = movements_subquery([account_id])
+    query = select(func.sum(movements.c.delta)).where(movements.c.transaction_date <= end)
+    if start is not None:
+        query = query.where(movements.c.transaction_date >= start)
+    return _money(db.execute(query).scalar())
+
+
+# ============================
+# Construcción y mantenimiento
+# ============================
+
+def rebuild_account_checkpoints(db: Session, account_id: int) -> int:
+    """
+    Reconstruye desde cero los checkpoints de una cuenta (sin commit) con una
+    única consulta agrupada por mes. Devuelve el número de checkpoints creados.
+    """
+    movements = movements_subquery([account_id])
+    year = extract("year", movements.c.transaction_date)
+    month = extract("month", movements.c.transaction_date)
+    monthly = db.execute(
+        select(year.label("year"), month.label("month"), func.sum(movements.c.delta).label("total"))
+        .group_by(year, month)
+    ).all()
+
+    db.execute(delete(AccountBalanceCheckpoint).where(AccountBalanceCheckpoint.account_id == account_id))
+    if not monthly:
+        return 0
+
+    totals = {date(int(row.year), int(row.month), 1): _money(row.total) for row in monthly}
+    running = Decimal("0.00")
+    rows = []
+    for current in iter_months(min(totals), max(totals)):
+        month_total = totals.get(current, Decimal("0.00"))
+        running += month_total
+        rows.append({
+            "account_id": account_id,
+            "month_start": current,
+            "closing_movements": running,
+            "month_movements": month_total,
+        })
+
+    db.execute(AccountBalanceCheckpoint.__table__.insert(), rows)
+    logger.debug(f"Checkpoints reconstruidos para cuenta {account_id}: {len(rows)} meses")
+    return len(rows)
+
+
+def _insert_ignoring_conflicts(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """Inserta checkpoints ignorando los que otra sesión haya creado en paralelo"""
+    if not rows:
+        return
+    table = AccountBalanceCheckpoint.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        db.execute(table.insert(), rows)
+        return
+    db.execute(insert(table).on_conflict_do_nothing(index_elements=["account_id", "month_start"]), rows)
+
+
+def _checkpoint_range(db: Session, account_id: int) -> Tuple[Optional[date], Optional[date]]:
+    return db.execute(
+        select(func.min(AccountBalanceCheckpoint.month_start), func.max(AccountBalanceCheckpoint.month_start))
+        .where(AccountBalanceCheckpoint.account_id == account_id)
+    ).one()
+
+
+def _extend_range(db: Session, account_id: int, first_month: date, last_month: date) -> bool:
+    """
+    Garantiza checkpoints contiguos que cubran [first_month, last_month].
+
+    Devuelve False si la cuenta aún no tenía checkpoints y se reconstruyeron
+    desde las transacciones (en ese caso no hay que aplicar deltas).
+    """
+    lowest, highest = _checkpoint_range(db, account_id)
+    if lowest is None:
+        rebuild_account_checkpoints(db, account_id)
+        return False
+
+    rows = []
+    # Meses anteriores al primer checkpoint: antes no había movimientos
+    for current in iter_months(first_month, lowest - timedelta(days=1)):
+        rows.append({"account_id": account_id, "month_start": current, "closing_movements": 0, "month_movements": 0})
+
+    # Meses posteriores al último checkpoint: heredan su cierre
+    if last_month > highest:
+        last_closing = db.execute(
+            select(AccountBalanceCheckpoint.closing_movements).where(
+                AccountBalanceCheckpoint.account_id == account_id,
+                AccountBalanceCheckpoint.month_start == highest,
+            )
+        ).scalar()
+        for current in iter_months(next_month(highest), last_month):
+            rows.append({"account_id": account_id, "month_start": current, "closing_movements": last_closing, "month_movements": 0})
+
+    _insert_ignoring_conflicts(db, rows)
+    return True
+
+
+def apply_checkpoint_deltas(db: Session, deltas: Dict[Tuple[int, date], Decimal]) -> None:
+    """
+    Aplica deltas por (cuenta, mes) a los checkpoints (sin commit).
+
+    El delta de un mes se suma al cierre de ese mes y de todos los siguientes
+    con un UPDATE por mes afectado.
+    """
+    by_account: Dict[int, Dict[date, Decimal]] = defaultdict(dict)
+    for (account_id, month), delta in deltas.items():
+        if delta:
+            months = by_account[account_id]
+            months[month_start(month)] = months.get(month_start(month), Decimal("0.00")) + delta
+
+    if not by_account:
+        return
+
+    # Los deltas se calcularon sobre cambios que deben estar visibles en la base
+    db.flush()
+
+    for account_id in sorted(by_account):
+        months = by_account[account_id]
+        if not _extend_range(db, account_id, min(months), max(months)):
+            continue
+
+        for current in sorted(months):
+            delta = months[current]
+            db.execute(
+                update(AccountBalanceCheckpoint)
+                .where(
+                    AccountBalanceCheckpoint.account_id == account_id,
+                    AccountBalanceCheckpoint.month_start >= current,
+                )
+                .values(
+                    closing_movements=AccountBalanceCheckpoint.closing_movements + delta,
+                    month_movements=AccountBalanceCheckpoint.month_movements
+                    + case((AccountBalanceCheckpoint.month_start == current, delta), else_=0),
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+
+# ============================
+# Consultas de saldo
+# ============================
+
+def get_balance_at(db: Session, account_id: int, at: date) -> Decimal:
+    """
+    Saldo de la cuenta al cierre del día `at`: saldo inicial + último checkpoint
+    anterior al mes de `at` + movimientos del mes hasta `at`.
+    """
+    account = db.execute(select(Account.opening_balance).where(Account.id == account_id)).first()
+    if account is None:
+        raise ValueError("Cuenta no encontrada")
+
+    checkpoint = db.execute(
+        select(AccountBalanceCheckpoint.month_start, AccountBalanceCheckpoint.closing_movements)
+        .where(
+            AccountBalanceCheckpoint.account_id == account_id,
+            AccountBalanceCheckpoint.month_start < month_start(at),
+        )
+        .order_by(AccountBalanceCheckpoint.month_start.desc())
+        .limit(1)
+    ).first()
+
+    if checkpoint:
+        base = _money(checkpoint.closing_movements)
+        tail_start = next_month(checkpoint.month_start)
+    else:
+        base = Decimal("0.00")
+        tail_start = None
+
+    return _money(account.opening_balance) + base + _sum_movements(db, account_id, tail_start, at)
+
+
+def get_balance_series(
+    db: Session,
+    account_id: int,
+    start: date,
+    end: date,
+    granularity: str = "month"
+) -> List[Dict[str, Any]]:
+    """
+    Serie de saldos entre dos fechas.
+
+    Con granularity="month" devuelve el saldo al cierre de cada mes (el último
+    punto se corta en `end`) leyendo los checkpoints del rango; con "day", el
+    saldo diario a partir de un único saldo base y los movimientos del rango,
+    en rangos de a lo más `BALANCE_SERIES_MAX_DAYS` días.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Granularidad no soportada: {granularity}. Opciones: {', '.join(GRANULARITIES)}")
+    if end < start:
+        raise ValueError("La fecha final debe ser posterior a la inicial")
+
+    if granularity == "day":
+        days = (end - start).days + 1
+        if days > settings.BALANCE_SERIES_MAX_DAYS:
+            raise ValueError(
+                f"La serie diaria admite a lo más {settings.BALANCE_SERIES_MAX_DAYS} días ({days} solicitados); "
+                f"use granularity=\"month\""
+            )
+        return _daily_series(db, account_id, start, end)
+
+    opening = _money(db.execute(select(Account.opening_balance).where(Account.id == account_id)).scalar())
+    first_month = month_start(start)
+
+    checkpoints = {
+        row.month_start: _money(row.closing_movements)
+        for row in db.execute(
+            select(AccountBalanceCheckpoint.month_start, AccountBalanceCheckpoint.closing_movements).where(
+                AccountBalanceCheckpoint.account_id == account_id,
+                AccountBalanceCheckpoint.month_start >= first_month,
+                AccountBalanceCheckpoint.month_start <= month_start(end),
+            )
+        )
+    }
+
+    previous = db.execute(
+        select(AccountBalanceCheckpoint.closing_movements)
+        .where(AccountBalanceCheckpoint.account_id == account_id, AccountBalanceCheckpoint.month_start < first_month)
+        .order_by(AccountBalanceCheckpoint.month_start.desc())
+        .limit(1)
+    ).scalar()
+    running = _money(previous)
+
+    series = []
+    for current in iter_months(first_month, end):
+        point_date = min(month_end(current), end)
+        if point_date < month_end(current):
+            # Mes parcial: checkpoint anterior + cola de transacciones
+            series.append({"date": point_date, "balance": get_balance_at(db, account_id, point_date)})
+            continue
+        # Sin checkpoint en un mes del rango: no hubo movimientos, se arrastra el cierre
+        running = checkpoints.get(current, running)
+        series.append({"date": point_date, "balance": opening + running})
+
+    return series
+
+
+def _daily_series(db: Session, account_id: int, start: date, end: date) -> List[Dict[str, Any]]:
+    balance = get_balance_at(db, account_id, start - timedelta(days=1))
+
+    movements = movements_subquery([account_id])
+    daily = {
+        row.transaction_date: _money(row.total)
+        for row in db.execute(
+            select(movements.c.transaction_date, func.sum(movements.c.delta).label("total"))
+            .where(and_(movements.c.transaction_date >= start, movements.c.transaction_date <= end))
+            .group_by(movements.c.transaction_date)
+        )
+    }
+
+    series = []
+    current = start
+    while current <= end:
+        balance += daily.get(current, Decimal("0.00"))
+        series.append({"date": current, "balance": balance})
+        current += timedelta(days=1)
+    return series
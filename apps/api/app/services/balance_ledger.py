@@ -0,0 +1,216 @@
+"""
+Mantenimiento de saldos de cuentas mediante deltas.
+
+Los saldos no se leen y reescriben desde Python: cada lote acumula la
+variación neta por cuenta y la aplica con
+`UPDATE accounts SET current_balance = current_balance + :delta`, una sola
+sentencia por cuenta. Así dos importaciones concurrentes sobre la misma cuenta
+no pisan el saldo de la otra y el bloqueo de la fila dura solo el UPDATE.
+
+El saldo esperado de una cuenta es `opening_balance` más la suma de sus
+transacciones (y de las transferencias entrantes); `reconcile_account_balances`
+lo recalcula con un único GROUP BY. Cuando se registra la fecha del movimiento,
+el mismo lote mantiene los checkpoints mensuales de saldo
+(ver balance_checkpoint_service), y con `envelope_id` el saldo del sobre
+(ver envelope_service).
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select, update, literal
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from ..models.accounts import Account
+from .balance_checkpoint_service import apply_checkpoint_deltas, month_start, movements_subquery
+from .envelope_service import apply_envelope_deltas
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal("0.01")
+
+
+def to_money(value: Any) -> Decimal:
+    """Convierte un monto a Decimal con dos decimales (sin pasar por float)"""
+    if isinstance(value, Decimal):
+        return value.quantize(CENT)
+    return Decimal(str(value)).quantize(CENT)
+
+
+class BalanceLedger:
+    """
+    Acumula las variaciones de saldo de un lote de transacciones.
+
+    Uso:
+        ledger = BalanceLedger()
+        for transaction in lote:
+            ledger.record(transaction.account_id, transaction.amount, transaction.transfer_account_id,
+                          transaction_date=transaction.transaction_date)
+        ledger.apply(db)   # un UPDATE por cuenta afectada
+        db.commit()
+    """
+
+    def __init__(self):
+        self._deltas: Dict[int, Decimal] = defaultdict(Decimal)
+        self._month_deltas: Dict[Tuple[int, date], Decimal] = defaultdict(Decimal)
+        self._envelope_deltas: Dict[Tuple[int, Optional[date]], Decimal] = defaultdict(Decimal)
+
+    def add(self, account_id: int, delta: Any, transaction_date: Optional[date] = None) -> None:
+        """
+        Suma un delta al saldo de una cuenta. Con `transaction_date` el delta
+        también se aplica a los checkpoints mensuales desde ese mes.
+        """
+        if account_id is None:
+            return
+        delta = to_money(delta)
+        self._deltas[account_id] += delta
+        if transaction_date is not None:
+            self._month_deltas[(account_id, month_start(transaction_date))] += delta
+
+    def record(
+        self,
+        account_id: int,
+        amount: Any,
+        transfer_account_id: Optional[int] = None,
+        sign: int = 1,
+        transaction_date: Optional[date] = None,
+        envelope_id: Optional[int] = None
+    ) -> None:
+        """
+        Registra el efecto de una transacción en los saldos.
+
+        Con sign=-1 revierte el efecto (eliminación o cambio de monto). Un
+        egreso con cuenta de transferencia abona su valor absoluto a la cuenta
+        destino, igual que al crear la transacción. Con `envelope_id` el monto
+        también se aplica al saldo del sobre.
+        """
+        amount = to_money(amount)
+        self.add(account_id, sign * amount, transaction_date)
+        if transfer_account_id and amount < 0:
+            self.add(transfer_account_id, sign * -amount, transaction_date)
+        if envelope_id is not None:
+            month = month_start(transaction_date) if transaction_date is not None else None
+            self._envelope_deltas[(envelope_id, month)] += sign * amount
+
+    @property
+    def deltas(self) -> Dict[int, Decimal]:
+        """Deltas netos distintos de cero por cuenta"""
+        return {account_id: delta for account_id, delta in self._deltas.items() if delta != 0}
+
+    def __bool__(self) -> bool:
+        return bool(self.deltas) or any(delta != 0 for delta in self._envelope_deltas.values())
+
+    def apply(self, db: Session) -> Dict[int, Decimal]:
+        """
+        Aplica los deltas acumulados (sin hacer commit) y vacía el ledger.
+
+        Las instancias de Account ya cargadas en la sesión se expiran para que
+        la próxima lectura traiga el saldo actualizado desde la base.
+        """
+        deltas = self.deltas
+        for account_id in sorted(deltas):  # orden fijo: evita interbloqueos entre lotes concurrentes
+            db.execute(
+                update(Account)
+                .where(Account.id == account_id)
+                .values(current_balance=Account.current_balance + deltas[account_id])
+                .execution_options(synchronize_session=False)
+            )
+            loaded = db.identity_map.get(identity_key(Account, account_id))
+            if loaded is not None:
+                db.expire(loaded, ["current_balance"])
+
+        apply_checkpoint_deltas(db, dict(self._month_deltas))
+        apply_envelope_deltas(db, dict(self._envelope_deltas))
+
+        if deltas:
+            logger.debug(f"Saldos actualizados por delta en {len(deltas)} cuenta(s): {deltas}")
+        self._deltas.clear()
+        self._month_deltas.clear()
+        self._envelope_deltas.clear()
+        return deltas
+
+
+def apply_transaction_delta(
+    db: Session,
+    account_id: int,
+    amount: Any,
+    transfer_account_id: Optional[int] = None,
+    sign: int = 1,
+    transaction_date: Optional[date] = None,
+    envelope_id: Optional[int] = None
+) -> None:
+    """Aplica de inmediato (sin commit) el efecto de una sola transacción en los saldos"""
+    ledger = BalanceLedger()
+    ledger.record(account_id, amount, transfer_account_id, sign, transaction_date, envelope_id)
+    ledger.apply(db)
+
+
+def _ledger_sums_query(account_ids: Optional[Iterable[int]] = None):
+    """Suma por cuenta de los montos propios más las transferencias entrantes"""
+    movements = movements_subquery(account_ids)
+    return select(
+        movements.c.account_id,
+        func.coalesce(func.sum(movements.c.delta), literal(0)).label("total"),
+    ).group_by(movements.c.account_id)
+
+
+def reconcile_account_balances(
+    db: Session,
+    user_id: Optional[int] = None,
+    account_ids: Optional[List[int]] = None,
+    fix: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Recalcula los saldos desde las transacciones y reporta las diferencias.
+
+    Args:
+        db: Sesión de base de datos
+        user_id: Limitar a las cuentas de un usuario (opcional)
+        account_ids: Limitar a cuentas específicas (opcional)
+        fix: Si es True corrige los saldos con diferencias y hace commit
+
+    Returns:
+        Lista de discrepancias con el saldo almacenado y el esperado
+    """
+    accounts_query = select(Account.id, Account.current_balance, Account.opening_balance)
+    if user_id is not None:
+        accounts_query = accounts_query.where(Account.user_id == user_id)
+    if account_ids is not None:
+        accounts_query = accounts_query.where(Account.id.in_(account_ids))
+    accounts = db.execute(accounts_query).all()
+    if not accounts:
+        return []
+
+    sums = {
+        row.account_id: to_money(row.total)
+        for row in db.execute(_ledger_sums_query([account.id for account in accounts]))
+    }
+
+    discrepancies = []
+    for account in accounts:
+        stored = to_money(account.current_balance or 0)
+        expected = to_money(account.opening_balance or 0) + sums.get(account.id, Decimal("0.00"))
+        if stored != expected:
+            discrepancies.append({
+                "account_id": account.id,
+                "stored_balance": stored,
+                "expected_balance": expected,
+                "difference": stored - expected,
+            })
+
+    if discrepancies:
+        logger.warning(f"Se encontraron {len(discrepancies)} cuenta(s) con saldo descuadrado")
+        if fix:
+            # Se corrige con deltas para no pisar movimientos concurrentes
+            ledger = BalanceLedger()
+            for item in discrepancies:
+                ledger.add(item["account_id"], -item["difference"])
+            ledger.apply(db)
+            db.commit()
+            logger.info(f"Saldos corregidos en {len(discrepancies)} cuenta(s)")
+
+    return discrepancies
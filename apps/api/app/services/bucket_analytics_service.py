@@ -0,0 +1,184 @@
+"""
+Análisis 50/30/20: gasto real por bucket contra los porcentajes del usuario.
+
+Cada subcategoría se asigna a un bucket (needs, wants o savings) en
+`subcategory_buckets`. Los ingresos son las transacciones de categorías de
+ingreso y los abonos sin subcategoría; los egresos sin asignación cuentan
+como `DEFAULT_BUCKET`. Los traspasos y movimientos planificados no cuentan
+(mismos filtros que las proyecciones).
+
+Los totales por mes salen de un único GROUP BY (mes, bucket) y se guardan en
+`bucket_monthly_totals` por (usuario, mes). La caché se invalida en el mismo
+flush que escribe las transacciones del mes (ver models/bucket_analytics), y
+al cambiar una asignación se borran los meses del usuario. Una serie de
+varios años solo consulta las transacciones de los meses que faltan.
+
+El ahorro real de un mes es el ingreso menos needs y wants: incluye tanto lo
+no gastado como los egresos asignados explícitamente a savings.
+"""
+
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, case, delete, extract, func, literal_column, select
+from sqlalchemy.orm import Session
+
+from ..models.bucket_analytics import BUCKETS, BucketMonthlyTotal, SubcategoryBucket
+from ..models.categories import Category, Subcategory
+from ..models.financial_methods import MethodFiftyThirtyTwenty
+from ..models.transactions import Transaction
+from .balance_checkpoint_service import month_start
+from .projection_service import add_months, cash_flow_filters, months_between
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKET = 'wants'
+DEFAULT_PERCENTAGES = {'needs': Decimal('50'), 'wants': Decimal('30'), 'savings': Decimal('20')}
+CENT = Decimal("0.01")
+
+
+def _money(value: Any) -> Decimal:
+    return Decimal(str(value or 0)).quantize(CENT)
+
+
+def set_subcategory_bucket(db: Session, user_id: int, subcategory_id: int, bucket: Optional[str]) -> None:
+    """
+    Asigna una subcategoría a un bucket (None vuelve al bucket por defecto).
+    Invalida toda la caché del usuario y hace commit.
+    """
+    if bucket is not None and bucket not in BUCKETS:
+        raise ValueError(f"Bucket no válido: {bucket}. Valores permitidos: {', '.join(BUCKETS)}")
+    if db.get(Subcategory, subcategory_id) is None:
+        raise ValueError("Subcategoría no encontrada")
+
+    assignment = db.query(SubcategoryBucket).filter(
+        SubcategoryBucket.user_id == user_id,
+        SubcategoryBucket.subcategory_id == subcategory_id
+    ).first()
+    now = datetime.utcnow()
+    if bucket is None:
+        if assignment is not None:
+            db.delete(assignment)
+    elif assignment is None:
+        db.add(SubcategoryBucket(user_id=user_id, subcategory_id=subcategory_id, bucket=bucket,
+                                 created_at=now, updated_at=now))
+    else:
+        assignment.bucket = bucket
+        assignment.updated_at = now
+
+    db.execute(delete(BucketMonthlyTotal).where(BucketMonthlyTotal.user_id == user_id))
+    db.commit()
+
+
+def _insert_ignoring_conflicts(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """Guarda meses en caché ignorando los que otra sesión haya guardado en paralelo"""
+    table = BucketMonthlyTotal.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        db.execute(table.insert(), rows)
+        return
+    db.execute(insert(table).on_conflict_do_nothing(index_elements=["user_id", "month"]), rows)
+
+
+def _bucket_totals(db: Session, user_id: int, start: date, end: date) -> Dict[date, Dict[str, Decimal]]:
+    """Totales por mes y bucket de [start, end) con un único GROUP BY"""
+    bucket = case(
+        (Category.is_income.is_(True), literal_column("'income'")),
+        (and_(Transaction.subcategory_id.is_(None), Transaction.amount > literal_column("0")),
+         literal_column("'income'")),
+        else_=func.coalesce(SubcategoryBucket.bucket, literal_column(f"'{DEFAULT_BUCKET}'")),
+    )
+    rows = (
+        select(Transaction.transaction_date, Transaction.amount, bucket.label("bucket"))
+        .select_from(Transaction)
+        .outerjoin(Subcategory, Subcategory.id == Transaction.subcategory_id)
+        .outerjoin(Category, Category.id == Subcategory.category_id)
+        .outerjoin(SubcategoryBucket, and_(SubcategoryBucket.user_id == Transaction.user_id,
+                                           SubcategoryBucket.subcategory_id == Transaction.subcategory_id))
+        .where(*cash_flow_filters(user_id), Transaction.transaction_date >= start, Transaction.transaction_date < end)
+        .subquery()
+    )
+    year = extract("year", rows.c.transaction_date)
+    month = extract("month", rows.c.transaction_date)
+
+    totals: Dict[date, Dict[str, Decimal]] = {}
+    for row in db.execute(
+        select(year.label("year"), month.label("month"), rows.c.bucket, func.sum(rows.c.amount).label("total"))
+        .group_by(year, month, rows.c.bucket)
+    ):
+        month_totals = totals.setdefault(date(int(row.year), int(row.month), 1), {})
+        # Los ingresos suman positivo; los buckets de gasto, el egreso neto
+        month_totals[row.bucket] = _money(row.total) if row.bucket == 'income' else -_money(row.total)
+    return totals
+
+
+def get_bucket_series(db: Session, user_id: int, start: date, end: date) -> List[Dict[str, Any]]:
+    """
+    Serie mensual de ingresos, gasto por bucket y metas 50/30/20 de los meses
+    de `start` a `end` (inclusive). Calcula y guarda solo los meses sin caché.
+    """
+    start, end = month_start(start), month_start(end)
+    if end < start:
+        raise ValueError("El mes final no puede ser anterior al inicial")
+    months = [add_months(start, offset) for offset in range(months_between(start, end) + 1)]
+
+    cached = {
+        row.month: row for row in db.query(BucketMonthlyTotal).filter(
+            BucketMonthlyTotal.user_id == user_id,
+            BucketMonthlyTotal.month >= start,
+            BucketMonthlyTotal.month <= end,
+        )
+    }
+    missing = [month for month in months if month not in cached]
+    if missing:
+        totals = _bucket_totals(db, user_id, missing[0], add_months(missing[-1], 1))
+        now = datetime.utcnow()
+        rows = [
+            {
+                "user_id": user_id,
+                "month": month,
+                "income": totals.get(month, {}).get("income", Decimal("0.00")),
+                **{name: totals.get(month, {}).get(name, Decimal("0.00")) for name in BUCKETS},
+                "computed_at": now,
+            }
+            for month in missing
+        ]
+        _insert_ignoring_conflicts(db, rows)
+        db.commit()
+        cached.update({row["month"]: BucketMonthlyTotal(**row) for row in rows})
+        logger.debug(f"Totales por bucket calculados para {len(missing)} de {len(months)} meses del usuario {user_id}")
+
+    method = db.query(MethodFiftyThirtyTwenty).filter(MethodFiftyThirtyTwenty.user_id == user_id).first()
+    percentages = DEFAULT_PERCENTAGES if method is None else {
+        'needs': Decimal(str(method.needs_percentage)),
+        'wants': Decimal(str(method.wants_percentage)),
+        'savings': Decimal(str(method.savings_percentage)),
+    }
+
+    series = []
+    for month in months:
+        row = cached[month]
+        income = _money(row.income)
+        actual = {'needs': _money(row.needs), 'wants': _money(row.wants)}
+        actual['savings'] = income - actual['needs'] - actual['wants']
+        series.append({
+            "month": month,
+            "income": income,
+            "allocated_savings": _money(row.savings),
+            **{
+                name: {
+                    "actual": actual[name],
+                    "target": (income * percentages[name] / 100).quantize(CENT),
+                    "target_percentage": percentages[name],
+                    "actual_percentage": (actual[name] * 100 / income).quantize(CENT) if income > 0 else None,
+                }
+                for name in BUCKETS
+            },
+        })
+    return series
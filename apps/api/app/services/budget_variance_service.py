@@ -0,0 +1,172 @@
+"""
+Presupuesto contra gasto real (varianza) de las partidas de un BudgetPlan.
+
+Cada partida es una celda (subcategoría, mes): `month_start` normaliza el
+texto `month_year` y se indexa junto a la subcategoría. El monto real de la
+celda se guarda en `budget_items.actual_amount`:
+
+- Al escribir transacciones, el mismo flush marca como pendientes
+  (actual_amount nulo) solo las celdas de su (subcategoría, mes)
+  (ver models/budget).
+- `refresh_budget_actuals` recalcula las celdas pendientes con una única
+  consulta agrupada de transacciones unida a las partidas. La importación la
+  ejecuta después de cada lote, de modo que solo se recalculan las celdas que
+  tocó el lote, y la lectura del plan la ejecuta para lo que quede pendiente.
+
+El monto real es el gasto neto (egresos positivos) o, en subcategorías de
+ingreso, lo recibido; sin traspasos ni movimientos planificados.
+"""
+
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, bindparam, extract, func, literal, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from ..models.budget import BudgetItem, BudgetPlan
+from ..models.categories import Category, Subcategory
+from ..models.transactions import Transaction
+from .projection_service import add_months
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal("0.01")
+NEAR_LIMIT_RATIO = Decimal("0.9")
+
+
+def _money(value: Any) -> Decimal:
+    return Decimal(str(value or 0)).quantize(CENT)
+
+
+def variance_status(budgeted: Decimal, actual: Decimal, is_income: bool) -> str:
+    """Estado de una celda: on_track, near_limit, over_budget o (ingresos) below_target"""
+    if is_income:
+        return "on_track" if actual >= budgeted else "below_target"
+    if actual > budgeted:
+        return "over_budget"
+    if budgeted > 0 and actual >= budgeted * NEAR_LIMIT_RATIO:
+        return "near_limit"
+    return "on_track"
+
+
+def refresh_budget_actuals(db: Session, user_id: int, budget_id: Optional[int] = None) -> int:
+    """
+    Recalcula (sin commit) el monto real de las partidas pendientes del
+    usuario, o solo las de un plan. Devuelve el número de partidas
+    recalculadas.
+    """
+    pending = [
+        BudgetPlan.user_id == user_id,
+        BudgetItem.actual_amount.is_(None),
+        BudgetItem.month_start.isnot(None),
+    ]
+    if budget_id is not None:
+        pending.append(BudgetItem.budget_id == budget_id)
+
+    bounds = db.execute(
+        select(func.min(BudgetItem.month_start), func.max(BudgetItem.month_start))
+        .join(BudgetPlan, BudgetPlan.id == BudgetItem.budget_id)
+        .where(*pending)
+    ).one()
+    if bounds[0] is None:
+        return 0
+
+    same_cell = and_(
+        Transaction.user_id == BudgetPlan.user_id,
+        Transaction.subcategory_id == BudgetItem.subcategory_id,
+        # El rango fijo permite usar el índice por fecha; el mes exacto se compara por partes
+        Transaction.transaction_date >= bounds[0],
+        Transaction.transaction_date < add_months(bounds[1], 1),
+        extract("year", Transaction.transaction_date) == extract("year", BudgetItem.month_start),
+        extract("month", Transaction.transaction_date) == extract("month", BudgetItem.month_start),
+        Transaction.transfer_account_id.is_(None),
+        Transaction.is_planned.is_(False),
+    )
+    rows = db.execute(
+        select(BudgetItem.id, Category.is_income, func.coalesce(func.sum(Transaction.amount), literal(0)).label("total"))
+        .select_from(BudgetItem)
+        .join(BudgetPlan, BudgetPlan.id == BudgetItem.budget_id)
+        .join(Subcategory, Subcategory.id == BudgetItem.subcategory_id)
+        .join(Category, Category.id == Subcategory.category_id)
+        .outerjoin(Transaction, same_cell)
+        .where(*pending)
+        .group_by(BudgetItem.id, Category.is_income)
+    ).all()
+
+    if not rows:
+        return 0
+    now = datetime.utcnow()
+    values = [
+        {"item_id": row.id, "actual": _money(row.total) if row.is_income else -_money(row.total)}
+        for row in rows
+    ]
+    db.execute(
+        update(BudgetItem.__table__)
+        .where(BudgetItem.__table__.c.id == bindparam("item_id"))
+        .values(actual_amount=bindparam("actual"), actual_computed_at=now),
+        values,
+    )
+    for row in rows:
+        loaded = db.identity_map.get(identity_key(BudgetItem, row.id))
+        if loaded is not None:
+            db.expire(loaded, ["actual_amount", "actual_computed_at"])
+
+    logger.debug(f"Montos reales recalculados en {len(values)} partida(s) del usuario {user_id}")
+    return len(values)
+
+
+def get_budget_variance(db: Session, user_id: int, budget_id: int) -> Dict[str, Any]:
+    """
+    Presupuestado, real, varianza y estado de cada partida del plan, más los
+    totales. Recalcula antes las celdas pendientes del plan.
+    """
+    plan = db.query(BudgetPlan).filter(BudgetPlan.id == budget_id, BudgetPlan.user_id == user_id).first()
+    if plan is None:
+        raise ValueError("Plan de presupuesto no encontrado")
+
+    if refresh_budget_actuals(db, user_id, budget_id):
+        db.commit()
+
+    items = db.execute(
+        select(BudgetItem.id, BudgetItem.subcategory_id, Subcategory.name.label("subcategory_name"),
+               BudgetItem.envelope_id, BudgetItem.month_start, BudgetItem.amount, BudgetItem.actual_amount,
+               Category.is_income)
+        .join(Subcategory, Subcategory.id == BudgetItem.subcategory_id)
+        .join(Category, Category.id == Subcategory.category_id)
+        .where(BudgetItem.budget_id == budget_id, BudgetItem.month_start.isnot(None))
+        .order_by(BudgetItem.month_start, Subcategory.name, BudgetItem.id)
+    ).all()
+
+    cells = []
+    for item in items:
+        budgeted = _money(item.amount)
+        actual = _money(item.actual_amount)
+        cells.append({
+            "item_id": item.id,
+            "subcategory_id": item.subcategory_id,
+            "subcategory_name": item.subcategory_name,
+            "envelope_id": item.envelope_id,
+            "month": item.month_start,
+            "is_income": bool(item.is_income),
+            "budgeted": budgeted,
+            "actual": actual,
+            "variance": budgeted - actual,
+            "status": variance_status(budgeted, actual, bool(item.is_income)),
+        })
+
+    expenses = [cell for cell in cells if not cell["is_income"]]
+    total_budgeted = sum((cell["budgeted"] for cell in expenses), Decimal("0.00"))
+    total_actual = sum((cell["actual"] for cell in expenses), Decimal("0.00"))
+    return {
+        "budget_id": plan.id,
+        "name": plan.name,
+        "start_date": plan.start_date,
+        "end_date": plan.end_date,
+        "total_budgeted": total_budgeted,
+        "total_actual": total_actual,
+        "total_variance": total_budgeted - total_actual,
+        "cells": cells,
+    }
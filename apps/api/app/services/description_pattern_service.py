@@ -9,6 +9,7 @@ from collections import Counter
 from ..models.recurring_patterns import DescriptionPattern, PatternMatch
 from ..models.transactions import Transaction
 from ..models.categories import Subcategory, Category
+from ..utils.transaction_utils import normalize_description
 from ..schemas.description_patterns import (
     DescriptionPatternCreate, 
     DescriptionPatternUpdate,
@@ -217,6 +218,30 @@ class DescriptionPatternService:
 
         return False, None
 
+    @staticmethod
+    def pattern_prefilter(pattern: DescriptionPattern):
+        """
+        Condición SQL sobre `Transaction.description_normalized` que cumplen
+        todas las descripciones con las que el patrón coincide (y quizás
+        algunas más, p. ej. con mayúsculas distintas en patrones sensibles a
+        mayúsculas). Permite filtrar en la base antes de confirmar con
+        test_pattern_match. None si el patrón no se puede filtrar así (regex).
+        """
+        pattern_text = normalize_description(pattern.pattern)
+        if not pattern_text:
+            return None
+
+        column = Transaction.description_normalized
+        if pattern.pattern_type == PatternType.EXACT.value:
+            return column == pattern_text
+        if pattern.pattern_type == PatternType.CONTAINS.value:
+            return column.contains(pattern_text, autoescape=True)
+        if pattern.pattern_type == PatternType.STARTS_WITH.value:
+            return column.startswith(pattern_text, autoescape=True)
+        if pattern.pattern_type == PatternType.ENDS_WITH.value:
+            return column.endswith(pattern_text, autoescape=True)
+        return None
+
     @staticmethod
     def test_patterns(db: Session, user_id: int, request: PatternTestRequest) -> PatternTestResponse:
         """Probar patrones contra una descripción"""
@@ -386,10 +411,13 @@ class DescriptionPatternService:
         """Analizar transacciones categorizadas para generar sugerencias"""
         # Agrupar por subcategoría y analizar descripciones
         subcategory_descriptions = {}
+        subcategory_normalized = {}
         for transaction in transactions:
             if transaction.subcategory_id not in subcategory_descriptions:
                 subcategory_descriptions[transaction.subcategory_id] = []
+                subcategory_normalized[transaction.subcategory_id] = []
             subcategory_descriptions[transaction.subcategory_id].append(transaction.description.strip())
+            subcategory_normalized[transaction.subcategory_id].append(transaction.description_normalized)
 
         suggestions = []
 
@@ -398,7 +426,9 @@ class DescriptionPatternService:
                 continue
 
             # Analizar patrones comunes
-            suggested_patterns = DescriptionPatternService._analyze_descriptions(descriptions)
+            suggested_patterns = DescriptionPatternService._analyze_descriptions(
+                descriptions, subcategory_normalized[subcategory_id]
+            )
             
             for pattern_info in suggested_patterns:
                 if pattern_info['count'] >= request.min_occurrences:
@@ -427,7 +457,9 @@ class DescriptionPatternService:
         suggestions = []
         
         # Analizar patrones comunes en descripciones no categorizadas
-        suggested_patterns = DescriptionPatternService._analyze_descriptions(descriptions)
+        suggested_patterns = DescriptionPatternService._analyze_descriptions(
+            descriptions, [t.description_normalized for t in transactions]
+        )
         
         for pattern_info in suggested_patterns:
             if pattern_info['count'] >= request.min_occurrences:
@@ -447,20 +479,30 @@ class DescriptionPatternService:
         return suggestions
 
     @staticmethod
-    def _analyze_descriptions(descriptions: List[str]) -> List[Dict[str, Any]]:
-        """Analizar descripciones para encontrar patrones comunes mejorado"""
+    def _analyze_descriptions(descriptions: List[str], normalized: Optional[List[Optional[str]]] = None) -> List[Dict[str, Any]]:
+        """
+        Analizar descripciones para encontrar patrones comunes mejorado.
+        `normalized` son las mismas descripciones ya normalizadas
+        (`description_normalized`); si falta alguna se calcula.
+        """
         patterns = []
+        if normalized is None:
+            normalized = [None] * len(descriptions)
         
         # Filtrar descripciones vacías o muy cortas
-        valid_descriptions = [desc for desc in descriptions if len(desc.strip()) >= 3]
+        valid_pairs = [
+            (desc, norm if norm is not None else normalize_description(desc))
+            for desc, norm in zip(descriptions, normalized) if len(desc.strip()) >= 3
+        ]
+        valid_descriptions = [desc for desc, _ in valid_pairs]
         if len(valid_descriptions) < 2:
             return patterns
         
         # 1. Análisis de palabras comunes (mejorado)
         all_words = []
-        for desc in valid_descriptions:
+        for _, norm in valid_pairs:
             # Limpiar y normalizar palabras
-            words = desc.lower().replace(',', ' ').replace('.', ' ').split()
+            words = norm.replace(',', ' ').replace('.', ' ').split()
             # Filtrar palabras comunes en español que no son útiles
             stop_words = {'de', 'la', 'el', 'en', 'a', 'y', 'que', 'es', 'se', 'no', 'te', 'lo', 'le', 'da', 'su', 'por', 'son', 'con', 'para', 'una', 'sus', 'les', 'del', 'las', 'al', 'un', 'ser', 'son', 'está', 'están'}
             filtered_words = [word for word in words if len(word) > 2 and word not in stop_words]
@@ -471,7 +513,8 @@ class DescriptionPatternService:
         # Sugerir patrones basados en palabras frecuentes
         for word, count in word_counts.most_common(15):
             if count >= 2:  # Al menos 2 ocurrencias
-                matching_descriptions = [desc for desc in valid_descriptions if word.lower() in desc.lower()]
+                # Las palabras no tienen espacios: buscarlas en la forma normalizada equivale a desc.lower()
+                matching_descriptions = [desc for desc, norm in valid_pairs if word in norm]
                 if len(matching_descriptions) >= 2:
                     patterns.append({
                         'pattern': word,
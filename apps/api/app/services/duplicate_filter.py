@@ -0,0 +1,433 @@
+"""
+Filtro de Bloom por cuenta para la detección de duplicados.
+
+`check_transaction_exists` hace hasta cuatro consultas por fila aunque casi
+todas las filas de una cartola nueva no existan. Por cada (usuario, cuenta)
+se mantiene en memoria un filtro de Bloom con dos claves por transacción:
+su `content_hash` y la combinación (monto, fecha). Si ninguna de las dos está
+en el filtro, ninguna de las verificaciones de duplicado puede encontrar
+coincidencia (las de transacción idéntica y similar exigen misma cuenta, monto
+y fecha), así que la fila es nueva sin consultar la base.
+
+Las filas que el filtro marca como posibles duplicados se verifican en bloque
+(`prefetch`): una consulta por content_hash y otra por (monto, fecha) para
+todo el bloque, con la misma lógica que check_transaction_exists.
+
+El filtro se construye al primer uso desde los índices de duplicados de
+`transactions` y se mantiene al día:
+- las inserciones de este proceso se agregan al confirmarse;
+- las de otros procesos se incorporan al pedir el filtro y en cada bloque
+  verificado (`prefetch`), releyendo una ventana de ids bajo el último visto:
+  los ids se asignan al insertar y no en orden de commit, así que una fila
+  con id menor puede confirmarse después de una con id mayor;
+- las eliminaciones no lo invalidan (solo aumentan los falsos positivos) y,
+  si son muchas, se reconstruye;
+- las ediciones de monto, fecha o cuenta suben `accounts.duplicate_filter_stamp`
+  en el mismo commit; cada proceso compara el sello de su filtro con el de la
+  base al pedirlo y lo reconstruye si difiere;
+- además expira tras IMPORT_DUPLICATE_FILTER_TTL_SECONDS.
+
+Con IMPORT_DUPLICATE_FILTER_DIR los filtros se guardan en disco en formato
+compacto (con su sello) y se retoman al reiniciar (poniéndose al día por el
+último id).
+"""
+
+import hashlib
+import logging
+import math
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.accounts import Account
+from ..models.transactions import Transaction
+from ..utils.transaction_utils import check_transaction_exists, generate_transaction_hash, similar_transaction_reason
+
+logger = logging.getLogger(__name__)
+
+FALSE_POSITIVE_RATE = 0.01
+MIN_CAPACITY = 1024
+# Reconstruir cuando las eliminaciones superan esta fracción de las claves
+MAX_DELETED_FRACTION = 0.25
+# Filtros en memoria (uno por cuenta)
+MAX_FILTERS = 256
+BATCH_SIZE = 500
+# Ids bajo el último visto que se vuelven a revisar: cubre las transacciones
+# de otros procesos que confirman después de filas con ids mayores
+CATCH_UP_ID_WINDOW = 5000
+
+_HEADER = struct.Struct("<4sIIIIqq")  # magic, bits, hashes, claves, capacidad, último id, sello
+_MAGIC = b"BLM2"
+_CENT = Decimal("0.01")
+
+
+def amount_key(amount, transaction_date: date) -> bytes:
+    return f"k:{Decimal(str(amount)).quantize(_CENT)}|{transaction_date.isoformat()}".encode()
+
+
+def hash_key(content_hash: str) -> bytes:
+    return f"h:{content_hash}".encode()
+
+
+class BloomFilter:
+    """Filtro de Bloom con doble hashing sobre blake2b"""
+
+    def __init__(self, capacity: int, false_positive_rate: float = FALSE_POSITIVE_RATE, bits: Optional[bytearray] = None,
+                 size: Optional[int] = None, hash_count: Optional[int] = None):
+        self.capacity = max(int(capacity), 1)
+        self.size = size or max(int(-self.capacity * math.log(false_positive_rate) / (math.log(2) ** 2)), 64)
+        self.hash_count = hash_count or max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.bits = bits if bits is not None else bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: bytes):
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return [(first + i * second) % size for i in range(self.hash_count)]
+
+    def add(self, key: bytes) -> None:
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: bytes) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    @property
+    def is_full(self) -> bool:
+        return self.count > self.capacity
+
+
+class AccountDuplicateFilter:
+    """Filtro de duplicados de una cuenta, con verificación en bloque de los posibles aciertos"""
+
+    def __init__(self, user_id: int, account_id: int, bloom: BloomFilter, last_id: int = 0, stamp: int = 0):
+        self.user_id = user_id
+        self.account_id = account_id
+        self.bloom = bloom
+        self.last_id = last_id
+        self.stamp = stamp  # accounts.duplicate_filter_stamp con que se construyó
+        self.deleted = 0
+        self._window_ids: Set[int] = set()  # Ids ya incorporados dentro de la ventana de revisión
+        self.created_at = time.monotonic()
+        self.lock = threading.Lock()
+        # Verificaciones en bloque: content_hash -> motivo de duplicado (None = no existe)
+        self._verified: Dict[str, Optional[str]] = {}
+        self._verified_by_key: Dict[bytes, Set[str]] = defaultdict(set)
+        self.stats = {"definitely_new": 0, "verified": 0, "fallback": 0}
+
+    # ---- Construcción y mantenimiento ----
+
+    @classmethod
+    def build(cls, db: Session, user_id: int, account_id: int, stamp: int = 0) -> "AccountDuplicateFilter":
+        """
+        Construye el filtro desde las transacciones de la cuenta. `stamp` se
+        lee antes que las transacciones: una edición intermedia deja el
+        filtro con un sello viejo y fuerza otra reconstrucción.
+        """
+        rows = db.execute(
+            select(Transaction.id, Transaction.content_hash, Transaction.amount, Transaction.transaction_date)
+            .where(Transaction.user_id == user_id, Transaction.account_id == account_id)
+        ).all()
+        duplicate_filter = cls(user_id, account_id, BloomFilter(max(MIN_CAPACITY, 4 * len(rows))), stamp=stamp)
+        duplicate_filter._add_rows(rows)
+        logger.debug(f"Filtro de duplicados construido para cuenta {account_id}: {len(rows)} transacciones")
+        return duplicate_filter
+
+    def _add_rows(self, rows) -> None:
+        for row in rows:
+            if row.id in self._window_ids:
+                continue
+            self.add(row.content_hash, row.amount, row.transaction_date)
+            self._window_ids.add(row.id)
+            self.last_id = max(self.last_id, row.id)
+        floor = self.last_id - CATCH_UP_ID_WINDOW
+        self._window_ids = {row_id for row_id in self._window_ids if row_id > floor}
+
+    def catch_up(self, db: Session) -> None:
+        """
+        Incorpora las transacciones confirmadas por otros procesos, incluidas
+        las de ids menores al último visto que confirmaron tarde
+        """
+        rows = db.execute(
+            select(Transaction.id, Transaction.content_hash, Transaction.amount, Transaction.transaction_date)
+            .where(
+                Transaction.user_id == self.user_id,
+                Transaction.account_id == self.account_id,
+                Transaction.id > self.last_id - CATCH_UP_ID_WINDOW,
+            )
+        ).all()
+        if rows:
+            self._add_rows(rows)
+
+    def add(self, content_hash: Optional[str], amount, transaction_date: date) -> None:
+        key = amount_key(amount, transaction_date)
+        self.bloom.add(key)
+        # Las verificaciones previas de la misma clave ya no son válidas
+        for verified_hash in self._verified_by_key.pop(key, ()):
+            self._verified.pop(verified_hash, None)
+        if content_hash:
+            self.bloom.add(hash_key(content_hash))
+            self._verified.pop(content_hash, None)
+
+    @property
+    def needs_rebuild(self) -> bool:
+        return (
+            self.bloom.is_full
+            or self.deleted > MAX_DELETED_FRACTION * max(self.bloom.count, 1)
+            or time.monotonic() - self.created_at > settings.IMPORT_DUPLICATE_FILTER_TTL_SECONDS
+        )
+
+    # ---- Consultas ----
+
+    def might_exist(self, content_hash: str, amount, transaction_date: date) -> bool:
+        return hash_key(content_hash) in self.bloom or amount_key(amount, transaction_date) in self.bloom
+
+    def prefetch(self, db: Session, transactions: Iterable) -> None:
+        """
+        Verifica en bloque las filas que el filtro marca como posibles
+        duplicados: dos consultas para todo el bloque en lugar de hasta cuatro
+        por fila. Las filas con external_id se siguen verificando una a una.
+        Antes se incorporan las transacciones que otros procesos confirmaron
+        durante la importación.
+        """
+        with self.lock:
+            self.catch_up(db)
+            self._verified.clear()
+            self._verified_by_key.clear()
+
+        pending: List[Tuple[str, bytes, Decimal, date, str]] = []  # (hash, clave, monto, fecha, descripción)
+        for transaction_data in transactions:
+            if transaction_data.external_id:
+                continue
+            amount = Decimal(str(transaction_data.amount))
+            description = transaction_data.description or ''
+            content_hash = generate_transaction_hash(
+                user_id=self.user_id, account_id=self.account_id, amount=amount,
+                description=description, transaction_date=transaction_data.transaction_date
+            )
+            if self.might_exist(content_hash, amount, transaction_data.transaction_date):
+                pending.append((content_hash, amount_key(amount, transaction_data.transaction_date),
+                                amount, transaction_data.transaction_date, description))
+        if not pending:
+            return
+
+        existing_hashes = set(db.execute(
+            select(Transaction.content_hash).where(
+                Transaction.user_id == self.user_id,
+                Transaction.content_hash.in_({item[0] for item in pending}),
+            )
+        ).scalars())
+
+        candidates: Dict[Tuple[Decimal, date], List] = defaultdict(list)
+        for row in db.execute(
+            select(Transaction.id, Transaction.amount, Transaction.transaction_date,
+                   Transaction.description, Transaction.description_normalized).where(
+                Transaction.user_id == self.user_id,
+                Transaction.account_id == self.account_id,
+                Transaction.transaction_date.in_({item[3] for item in pending}),
+                Transaction.amount.in_({item[2] for item in pending}),
+            ).order_by(Transaction.id)
+        ):
+            candidates[(row.amount, row.transaction_date)].append(row)
+
+        verified: List[Tuple[str, bytes, Optional[str]]] = []
+        for content_hash, key, amount, transaction_date, description in pending:
+            if content_hash in existing_hashes:
+                reason = f"content_hash duplicado: {content_hash[:16]}..."
+            else:
+                same_key = candidates.get((amount, transaction_date), [])
+                identical = next((row for row in same_key if row.description == description), None)
+                if identical is not None:
+                    reason = f"transacción idéntica encontrada (ID: {identical.id})"
+                else:
+                    reason = similar_transaction_reason(description, same_key)
+            verified.append((content_hash, key, reason))
+
+        # `add` (desde otros hilos) invalida estas entradas bajo el mismo lock
+        with self.lock:
+            for content_hash, key, reason in verified:
+                self._verified[content_hash] = reason
+                self._verified_by_key[key].add(content_hash)
+
+    def check(
+        self,
+        db: Session,
+        content_hash: str,
+        amount: Decimal,
+        description: str,
+        transaction_date: date,
+        external_id: Optional[str] = None
+    ) -> Tuple[bool, Optional[str]]:
+        """Mismo resultado que check_transaction_exists, consultando la base solo si hace falta"""
+        if not external_id:
+            if not self.might_exist(content_hash, amount, transaction_date):
+                self.stats["definitely_new"] += 1
+                return False, None
+            with self.lock:
+                verified = content_hash in self._verified
+                reason = self._verified.get(content_hash)
+            if verified:
+                self.stats["verified"] += 1
+                return reason is not None, reason
+
+        self.stats["fallback"] += 1
+        return check_transaction_exists(
+            db=db, user_id=self.user_id, account_id=self.account_id, amount=amount,
+            description=description, transaction_date=transaction_date,
+            external_id=external_id, content_hash=content_hash
+        )
+
+    # ---- Persistencia ----
+
+    def to_bytes(self) -> bytes:
+        bloom = self.bloom
+        return _HEADER.pack(_MAGIC, bloom.size, bloom.hash_count, bloom.count, bloom.capacity, self.last_id,
+                            self.stamp) + bytes(bloom.bits)
+
+    @classmethod
+    def from_bytes(cls, user_id: int, account_id: int, data: bytes) -> "AccountDuplicateFilter":
+        magic, size, hash_count, count, capacity, last_id, stamp = _HEADER.unpack_from(data)
+        if magic != _MAGIC or len(data) - _HEADER.size != (size + 7) // 8:
+            raise ValueError("Filtro de duplicados con formato inválido")
+        bloom = BloomFilter(capacity, bits=bytearray(data[_HEADER.size:]), size=size, hash_count=hash_count)
+        bloom.count = count
+        return cls(user_id, account_id, bloom, last_id, stamp)
+
+
+# ============================
+# Registro de filtros por cuenta
+# ============================
+
+_filters: "OrderedDict[Tuple[int, int], AccountDuplicateFilter]" = OrderedDict()
+_registry_lock = threading.Lock()
+
+
+def _filter_path(user_id: int, account_id: int) -> Optional[str]:
+    directory = settings.IMPORT_DUPLICATE_FILTER_DIR
+    if not directory:
+        return None
+    return os.path.join(directory, f"duplicates_{user_id}_{account_id}.bloom")
+
+
+def _load_persisted(user_id: int, account_id: int) -> Optional[AccountDuplicateFilter]:
+    path = _filter_path(user_id, account_id)
+    if not path or not os.path.exists(path):
+        return None
+    if time.time() - os.path.getmtime(path) > settings.IMPORT_DUPLICATE_FILTER_TTL_SECONDS:
+        return None
+    try:
+        with open(path, "rb") as handle:
+            return AccountDuplicateFilter.from_bytes(user_id, account_id, handle.read())
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"No se pudo leer el filtro de duplicados {path}: {str(e)}")
+        return None
+
+
+def persist_account_filter(duplicate_filter: AccountDuplicateFilter) -> None:
+    """Guarda el filtro en disco si IMPORT_DUPLICATE_FILTER_DIR está configurado"""
+    path = _filter_path(duplicate_filter.user_id, duplicate_filter.account_id)
+    if not path:
+        return
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as handle:
+            handle.write(duplicate_filter.to_bytes())
+        os.replace(temporary, path)
+    except OSError as e:
+        logger.warning(f"No se pudo guardar el filtro de duplicados {path}: {str(e)}")
+
+
+def _account_stamp(db: Session, account_id: int) -> int:
+    return db.execute(select(Account.duplicate_filter_stamp).where(Account.id == account_id)).scalar() or 0
+
+
+def get_account_filter(db: Session, user_id: int, account_id: int) -> Optional[AccountDuplicateFilter]:
+    """Filtro de la cuenta al día con la base, o None si está desactivado"""
+    if not settings.IMPORT_DUPLICATE_FILTER_ENABLED:
+        return None
+
+    key = (user_id, account_id)
+    stamp = _account_stamp(db, account_id)
+    with _registry_lock:
+        duplicate_filter = _filters.get(key)
+        if duplicate_filter is not None and (duplicate_filter.needs_rebuild or duplicate_filter.stamp != stamp):
+            duplicate_filter = None
+        if duplicate_filter is None:
+            duplicate_filter = _load_persisted(user_id, account_id)
+            if duplicate_filter is not None and duplicate_filter.stamp != stamp:
+                duplicate_filter = None
+            if duplicate_filter is None:
+                duplicate_filter = AccountDuplicateFilter.build(db, user_id, account_id, stamp)
+            _filters[key] = duplicate_filter
+            if len(_filters) > MAX_FILTERS:
+                _filters.popitem(last=False)
+        _filters.move_to_end(key)
+
+    with duplicate_filter.lock:
+        duplicate_filter.catch_up(db)
+    return duplicate_filter
+
+
+def note_transaction_created(
+    user_id: int,
+    account_id: int,
+    content_hash: Optional[str],
+    amount,
+    transaction_date: date,
+    transaction_id: Optional[int] = None,
+) -> None:
+    duplicate_filter = _filters.get((user_id, account_id))
+    if duplicate_filter is not None:
+        with duplicate_filter.lock:
+            duplicate_filter.add(content_hash, amount, transaction_date)
+            # Evita volver a contarla al releer la ventana de ids
+            if transaction_id is not None:
+                duplicate_filter._window_ids.add(transaction_id)
+
+
+def note_transaction_deleted(user_id: int, account_id: int) -> None:
+    duplicate_filter = _filters.get((user_id, account_id))
+    if duplicate_filter is not None:
+        duplicate_filter.deleted += 1
+
+
+def invalidate_account_filters(db: Session, user_id: int, account_ids: Iterable[int]) -> None:
+    """
+    Descarta los filtros de cuentas cuyas transacciones cambiaron de monto,
+    fecha o cuenta. Sube el sello de las cuentas sin commit: el llamador lo
+    confirma junto con la edición y los demás procesos reconstruyen su filtro.
+    """
+    account_ids = set(account_ids)
+    db.execute(
+        update(Account)
+        .where(Account.id.in_(account_ids), Account.user_id == user_id)
+        .values(duplicate_filter_stamp=Account.duplicate_filter_stamp + 1)
+    )
+    with _registry_lock:
+        for account_id in account_ids:
+            _filters.pop((user_id, account_id), None)
+            path = _filter_path(user_id, account_id)
+            if path and os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def clear_account_filters() -> None:
+    with _registry_lock:
+        _filters.clear()
@@ -0,0 +1,177 @@
+"""
+Saldos de sobres (método envelope).
+
+`Envelope.current_balance` se mantiene por deltas, igual que los saldos de
+cuentas: `BalanceLedger` acumula los montos de las transacciones con
+`envelope_id` por sobre y mes, y los aplica con un UPDATE por par
+(sobre, mes) en el mismo commit que las transacciones. Una importación
+completa cuesta así unos pocos UPDATE por sobre.
+
+Al cierre de mes, `run_envelope_rollover` asigna el presupuesto del nuevo
+periodo a todos los sobres activos con dos UPDATE en bloque:
+
+- Con `MethodEnvelope.rollover_unused` el saldo se acumula: saldo anterior
+  más `budget_amount`.
+- Sin él, el saldo se reinicia a `budget_amount` más los movimientos ya
+  registrados con fecha del nuevo periodo.
+
+`last_rollover_month` marca el periodo vigente (el job es idempotente) y
+`allocated_amount` la base asignada, de modo que el saldo esperado es
+`allocated_amount` más la suma de las transacciones que cuentan: todas en
+los sobres acumulativos, y las del periodo vigente en los que se reinician.
+Un movimiento con fecha de un periodo ya cerrado no cambia el saldo de un
+sobre que se reinicia. `reconcile_envelope_balances` recalcula esa suma con
+un único GROUP BY.
+"""
+
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, case, func, literal, or_, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from ..models.envelopes import Envelope
+from ..models.financial_methods import MethodEnvelope
+from ..models.transactions import Transaction
+from .balance_checkpoint_service import month_start
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal("0.01")
+
+
+def _money(value: Any) -> Decimal:
+    return Decimal(str(value or 0)).quantize(CENT)
+
+
+def _accumulates():
+    """Condición SQL: el sobre acumula el saldo no usado entre periodos"""
+    return (
+        select(MethodEnvelope.rollover_unused)
+        .where(MethodEnvelope.id == Envelope.method_envelope_id)
+        .scalar_subquery()
+    )
+
+
+def apply_envelope_deltas(db: Session, deltas: Dict[Tuple[int, Optional[date]], Decimal]) -> None:
+    """
+    Aplica (sin commit) deltas por (envelope_id, mes del movimiento). Sin
+    mes, el delta se aplica siempre (correcciones de conciliación).
+    """
+    for (envelope_id, month), delta in sorted(deltas.items(), key=lambda item: (item[0][0], item[0][1] or date.min)):
+        if not delta:
+            continue
+        amount = Envelope.current_balance + delta
+        if month is not None:
+            counted = or_(_accumulates(), Envelope.last_rollover_month.is_(None),
+                          Envelope.last_rollover_month <= literal(month))
+            amount = Envelope.current_balance + case((counted, delta), else_=literal(0))
+        db.execute(
+            update(Envelope)
+            .where(Envelope.id == envelope_id)
+            .values(current_balance=amount)
+            .execution_options(synchronize_session=False)
+        )
+        loaded = db.identity_map.get(identity_key(Envelope, envelope_id))
+        if loaded is not None:
+            db.expire(loaded, ["current_balance"])
+
+
+def run_envelope_rollover(db: Session, month: Optional[date] = None, user_id: Optional[int] = None) -> Dict[str, int]:
+    """
+    Abre el periodo `month` (por defecto el mes actual) en todos los sobres
+    activos que aún no lo tienen. Hace commit y devuelve cuántos sobres se
+    acumularon y cuántos se reiniciaron.
+    """
+    month = month_start(month or date.today())
+    now = datetime.utcnow()
+    pending = [
+        Envelope.is_active.is_(True),
+        or_(Envelope.last_rollover_month.is_(None), Envelope.last_rollover_month < month),
+    ]
+    if user_id is not None:
+        pending.append(Envelope.user_id == user_id)
+    accumulating = Envelope.method_envelope_id.in_(
+        select(MethodEnvelope.id).where(MethodEnvelope.rollover_unused.is_(True))
+    )
+    period_movements = (
+        select(func.coalesce(func.sum(Transaction.amount), literal(0)))
+        .where(Transaction.envelope_id == Envelope.id, Transaction.transaction_date >= month)
+        .scalar_subquery()
+    )
+
+    rolled_over = db.execute(
+        update(Envelope)
+        .where(*pending, accumulating)
+        .values(
+            allocated_amount=Envelope.allocated_amount + Envelope.budget_amount,
+            current_balance=Envelope.current_balance + Envelope.budget_amount,
+            last_rollover_month=month,
+            updated_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    reset = db.execute(
+        update(Envelope)
+        .where(*pending, ~accumulating)
+        .values(
+            allocated_amount=Envelope.budget_amount,
+            current_balance=Envelope.budget_amount + period_movements,
+            last_rollover_month=month,
+            updated_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    db.expire_all()
+
+    summary = {"rolled_over": rolled_over, "reset": reset}
+    logger.info(f"Cierre de sobres para {month.isoformat()}: {summary}")
+    return summary
+
+
+def reconcile_envelope_balances(db: Session, user_id: Optional[int] = None, fix: bool = False) -> List[Dict[str, Any]]:
+    """
+    Recalcula los saldos de los sobres desde las transacciones y reporta las
+    diferencias. Con fix=True las corrige por delta y hace commit.
+    """
+    counted = or_(
+        MethodEnvelope.rollover_unused.is_(True),
+        Envelope.last_rollover_month.is_(None),
+        Transaction.transaction_date >= Envelope.last_rollover_month,
+    )
+    query = (
+        select(Envelope.id, Envelope.current_balance, Envelope.allocated_amount,
+               func.coalesce(func.sum(Transaction.amount), literal(0)).label("total"))
+        .select_from(Envelope)
+        .join(MethodEnvelope, MethodEnvelope.id == Envelope.method_envelope_id)
+        .outerjoin(Transaction, and_(Transaction.envelope_id == Envelope.id, counted))
+        .group_by(Envelope.id, Envelope.current_balance, Envelope.allocated_amount)
+    )
+    if user_id is not None:
+        query = query.where(Envelope.user_id == user_id)
+
+    discrepancies = []
+    for row in db.execute(query):
+        stored = _money(row.current_balance)
+        expected = _money(row.allocated_amount) + _money(row.total)
+        if stored != expected:
+            discrepancies.append({
+                "envelope_id": row.id,
+                "stored_balance": stored,
+                "expected_balance": expected,
+                "difference": stored - expected,
+            })
+
+    if discrepancies:
+        logger.warning(f"Se encontraron {len(discrepancies)} sobre(s) con saldo descuadrado")
+        if fix:
+            # Se corrige con deltas para no pisar movimientos concurrentes
+            apply_envelope_deltas(db, {(item["envelope_id"], None): -item["difference"] for item in discrepancies})
+            db.commit()
+            logger.info(f"Saldos corregidos en {len(discrepancies)} sobre(s)")
+
+    return discrepancies
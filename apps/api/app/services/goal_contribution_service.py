@@ -0,0 +1,233 @@
+"""
+Registro automático de aportes a metas.
+
+Las reglas (`goal_contribution_rules`) enlazan transacciones a una meta de
+dos formas:
+
+- Por cuenta de ahorro: las transferencias hacia `account_id` (egresos con
+  `transfer_account_id`) y los abonos directos en esa cuenta. De una
+  transferencia interna emparejada solo cuenta el abono.
+- Por descripción: `pattern` con los mismos tipos que los patrones de
+  descripción (contains, starts_with, ends_with, exact, regex). No aplica a
+  los tramos de una transferencia: el abono ya aporta por la regla de cuenta
+  y contar también el egreso duplicaría el aporte.
+
+Cada transacción aporta a una sola meta (la primera regla que coincide,
+por prioridad de la meta) y nunca se enlaza dos veces. Los lotes se procesan
+juntos: un insert en lote de `goal_contributions` y un único UPDATE por meta
+que suma el total del lote a `current_amount` y marca la meta como cumplida
+si alcanzó su objetivo. Al eliminar o editar una transacción su aporte se
+revierte (y, si se editó, se vuelve a evaluar contra las reglas).
+
+Uso:
+    matcher = GoalContributionMatcher(db, user_id)   # una vez por importación
+    matcher.link(db, transactions)                   # por lote, sin commit
+    link_goal_contributions(db, user_id)             # revisar el historial sin aportes
+    reverse_goal_contributions(db, [transaction_id]) # antes de eliminar, sin commit
+    relink_goal_contribution(db, user_id, transaction)  # tras editar, sin commit
+    relink_goal_contributions(db, user_id, transactions)  # tras emparejar transferencias, sin commit
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, desc, or_, select, update
+from sqlalchemy.orm import Session
+
+from ..models.financial_goals import FinancialGoal, GoalContribution, GoalContributionRule
+from ..models.transactions import Transaction
+from .description_pattern_service import DescriptionPatternService
+
+logger = logging.getLogger(__name__)
+
+SCAN_BATCH_SIZE = 1000
+
+
+class GoalContributionMatcher:
+    """Reglas activas de las metas pendientes de un usuario"""
+
+    def __init__(self, db: Session, user_id: int):
+        rules = (
+            db.query(GoalContributionRule)
+            .join(FinancialGoal, FinancialGoal.id == GoalContributionRule.goal_id)
+            .filter(
+                FinancialGoal.user_id == user_id,
+                FinancialGoal.is_completed.is_(False),
+                GoalContributionRule.is_active.is_(True),
+            )
+            .order_by(desc(FinancialGoal.priority), FinancialGoal.id, GoalContributionRule.id)
+            .all()
+        )
+        self.account_goals: Dict[int, int] = {}
+        self.pattern_rules: List[GoalContributionRule] = []
+        for rule in rules:
+            if rule.account_id is not None:
+                self.account_goals.setdefault(rule.account_id, rule.goal_id)
+            if rule.pattern:
+                self.pattern_rules.append(rule)
+
+    def __bool__(self) -> bool:
+        return bool(self.account_goals or self.pattern_rules)
+
+    def match(self, transaction: Any) -> Optional[Tuple[int, Decimal]]:
+        """(goal_id, monto del aporte) de la primera regla que coincide, o None"""
+        amount = Decimal(str(transaction.amount))
+        paired = transaction.transfer_transaction_id is not None
+        if amount < 0 and not paired and transaction.transfer_account_id in self.account_goals:
+            return self.account_goals[transaction.transfer_account_id], -amount
+        if amount > 0 and (paired or transaction.transfer_account_id is None) and transaction.account_id in self.account_goals:
+            return self.account_goals[transaction.account_id], amount
+        if paired or transaction.transfer_account_id is not None:
+            return None
+        for rule in self.pattern_rules:
+            if DescriptionPatternService.test_pattern_match(rule, transaction.description)[0]:
+                return rule.goal_id, abs(amount)
+        return None
+
+    def link(self, db: Session, transactions: Sequence[Any]) -> int:
+        """
+        Registra como aportes las transacciones del lote que coinciden con
+        alguna regla (sin commit). Devuelve el número de aportes creados.
+        """
+        if not self or not transactions:
+            return 0
+
+        linked = set(db.execute(
+            select(GoalContribution.transaction_id)
+            .where(GoalContribution.transaction_id.in_([transaction.id for transaction in transactions]))
+        ).scalars())
+
+        now = datetime.utcnow()
+        rows = []
+        totals: Dict[int, Decimal] = defaultdict(Decimal)
+        for transaction in transactions:
+            if transaction.id in linked:
+                continue
+            matched = self.match(transaction)
+            if matched is None or not matched[1]:
+                continue
+            goal_id, amount = matched
+            rows.append({
+                "goal_id": goal_id,
+                "transaction_id": transaction.id,
+                "amount": amount,
+                "contribution_date": transaction.transaction_date,
+                "created_at": now,
+                "updated_at": now,
+            })
+            totals[goal_id] += amount
+
+        if not rows:
+            return 0
+        db.execute(GoalContribution.__table__.insert(), rows)
+        for goal_id, total in totals.items():
+            new_amount = FinancialGoal.current_amount + total
+            db.execute(
+                update(FinancialGoal)
+                .where(FinancialGoal.id == goal_id)
+                .values(
+                    current_amount=new_amount,
+                    is_completed=or_(FinancialGoal.is_completed, new_amount >= FinancialGoal.target_amount),
+                    updated_at=now,
+                )
+            )
+        logger.debug(f"{len(rows)} aportes registrados en {len(totals)} metas")
+        return len(rows)
+
+
+def reverse_goal_contributions(db: Session, transaction_ids: Sequence[int]) -> int:
+    """
+    Elimina los aportes de las transacciones (sin commit), los descuenta de
+    sus metas y vuelve a evaluar si siguen cumplidas. Devuelve el número de
+    aportes eliminados.
+    """
+    if not transaction_ids:
+        return 0
+    rows = db.execute(
+        select(GoalContribution.goal_id, GoalContribution.amount)
+        .where(GoalContribution.transaction_id.in_(transaction_ids))
+    ).all()
+    if not rows:
+        return 0
+
+    totals: Dict[int, Decimal] = defaultdict(Decimal)
+    for row in rows:
+        totals[row.goal_id] += Decimal(str(row.amount))
+    db.execute(delete(GoalContribution).where(GoalContribution.transaction_id.in_(transaction_ids)))
+    now = datetime.utcnow()
+    for goal_id, total in totals.items():
+        new_amount = FinancialGoal.current_amount - total
+        db.execute(
+            update(FinancialGoal)
+            .where(FinancialGoal.id == goal_id)
+            .values(current_amount=new_amount, is_completed=new_amount >= FinancialGoal.target_amount,
+                    updated_at=now)
+        )
+    logger.debug(f"{len(rows)} aportes revertidos en {len(totals)} metas")
+    return len(rows)
+
+
+def relink_goal_contribution(db: Session, user_id: int, transaction: Transaction) -> int:
+    """
+    Recalcula el aporte de una transacción editada (sin commit): revierte el
+    anterior y la evalúa de nuevo contra las reglas. Devuelve 1 si quedó como
+    aporte.
+    """
+    reverse_goal_contributions(db, [transaction.id])
+    return GoalContributionMatcher(db, user_id).link(db, [transaction])
+
+
+def relink_goal_contributions(db: Session, user_id: int, transactions: Sequence[Any]) -> int:
+    """
+    Vuelve a evaluar las transacciones que ya eran aportes (sin commit), p. ej.
+    al emparejarlas como transferencia interna: un egreso enlazado por patrón
+    deja de aportar cuando su abono aporta por la regla de cuenta. Devuelve el
+    número de aportes que quedaron.
+    """
+    if not transactions:
+        return 0
+    linked = set(db.execute(
+        select(GoalContribution.transaction_id)
+        .where(GoalContribution.transaction_id.in_([transaction.id for transaction in transactions]))
+    ).scalars())
+    if not linked:
+        return 0
+    reverse_goal_contributions(db, sorted(linked))
+    return GoalContributionMatcher(db, user_id).link(
+        db, [transaction for transaction in transactions if transaction.id in linked]
+    )
+
+
+def link_goal_contributions(db: Session, user_id: int) -> int:
+    """
+    Revisa en lotes las transacciones del usuario que aún no son aportes
+    (p. ej. tras crear una regla). Hace commit por lote y devuelve el número
+    de aportes creados.
+    """
+    matcher = GoalContributionMatcher(db, user_id)
+    if not matcher:
+        return 0
+
+    unlinked = ~select(GoalContribution.id).where(GoalContribution.transaction_id == Transaction.id).exists()
+    created = 0
+    last_id = 0
+    while True:
+        batch = db.execute(
+            select(Transaction.id, Transaction.account_id, Transaction.transfer_account_id,
+                   Transaction.transfer_transaction_id, Transaction.amount, Transaction.description,
+                   Transaction.transaction_date)
+            .where(Transaction.user_id == user_id, Transaction.id > last_id, unlinked)
+            .order_by(Transaction.id)
+            .limit(SCAN_BATCH_SIZE)
+        ).all()
+        if not batch:
+            break
+        created += matcher.link(db, batch)
+        db.commit()
+        last_id = batch[-1].id
+
+    logger.info(f"Aportes a metas registrados para usuario {user_id}: {created}")
+    return created
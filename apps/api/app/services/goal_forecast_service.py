@@ -0,0 +1,205 @@
+"""
+Pronósticos Monte Carlo de las metas financieras.
+
+Para cada meta pendiente estima la probabilidad de cumplirla a su
+`target_date` y la fecha de cumplimiento esperada (mediana). Las trayectorias
+de ahorro se generan remuestreando con reemplazo el ahorro neto mensual del
+usuario en sus últimos 24 meses cerrados: una sola matriz trayectorias ×
+meses y su suma acumulada sirven para todas las metas.
+
+El ahorro se asigna a las metas en cascada por prioridad (mayor `priority`
+primero, luego la `target_date` más cercana): una meta se cumple cuando el
+ahorro acumulado cubre lo que le falta a ella y a las metas anteriores.
+
+Los pronósticos se guardan en `goal_forecasts` con un hash de sus entradas
+(historial mensual, campos de la meta, sus aportes y lo que falta a las
+metas previas). Mientras el hash no cambie se devuelve el pronóstico
+guardado; solo se recalculan las metas con aportes, transacciones de meses
+cerrados o cambios nuevos, de modo que el dashboard puede pedir los de todas
+las metas en cada carga.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import delete, extract, func, select
+from sqlalchemy.orm import Session
+
+from ..models.financial_goals import FinancialGoal, GoalContribution, GoalForecast
+from ..models.transactions import Transaction
+from .balance_checkpoint_service import month_end, month_start
+from .projection_service import add_months, cash_flow_filters, months_between
+
+logger = logging.getLogger(__name__)
+
+# Cambiar al modificar el modelo para invalidar los pronósticos guardados
+FORECAST_VERSION = 1
+HISTORY_MONTHS = 24
+SIMULATION_PATHS = 20000
+# Trayectorias que se simulan a la vez: acota la matriz a bloque × horizonte
+SIMULATION_CHUNK_PATHS = 1000
+DEFAULT_HORIZON_MONTHS = 120
+MAX_HORIZON_MONTHS = 600
+
+
+def monthly_net_savings(db: Session, user_id: int, current: date) -> List[float]:
+    """
+    Ahorro neto (ingresos menos gastos) de cada mes cerrado de la ventana,
+    desde el mes de la primera transacción del usuario.
+    """
+    first = add_months(current, -HISTORY_MONTHS)
+    year = extract("year", Transaction.transaction_date)
+    month = extract("month", Transaction.transaction_date)
+    rows = db.execute(
+        select(year.label("year"), month.label("month"), func.sum(Transaction.amount).label("total"))
+        .where(*cash_flow_filters(user_id), Transaction.transaction_date >= first,
+               Transaction.transaction_date < current)
+        .group_by(year, month)
+    ).all()
+    if not rows:
+        return []
+
+    totals = {date(int(row.year), int(row.month), 1): float(row.total or 0) for row in rows}
+    start = min(totals)
+    return [round(totals.get(add_months(start, offset), 0.0), 2) for offset in range(months_between(start, current))]
+
+
+def simulate_completion_months(samples: Sequence[float], needs: Sequence[float], horizon: int,
+                               paths: int = SIMULATION_PATHS, seed: int = 0):
+    """
+    Mes (desde 0) en que cada trayectoria alcanza cada monto requerido, o
+    `horizon` si no lo alcanza. Devuelve una matriz (montos × trayectorias).
+    Las trayectorias se generan por bloques de `SIMULATION_CHUNK_PATHS`, así
+    que la memoria no crece con `paths`.
+    """
+    import numpy as np
+
+    needs = np.asarray(needs, dtype=float)
+    if not len(samples):
+        return np.where(needs[:, None] <= 0, 0, horizon) * np.ones((1, paths), dtype=int)
+
+    months = np.zeros((len(needs), paths), dtype=int)
+    positive = needs > 0
+    targets = needs[positive]
+    if not len(targets):
+        return months
+
+    rng = np.random.default_rng(seed)
+    values = np.asarray(samples, dtype=float)
+    for start in range(0, paths, SIMULATION_CHUNK_PATHS):
+        best = rng.choice(values, size=(min(SIMULATION_CHUNK_PATHS, paths - start), horizon))
+        np.cumsum(best, axis=1, out=best)
+        np.maximum.accumulate(best, axis=1, out=best)
+        # El máximo acumulado es monótono: el mes de cumplimiento es cuántos meses quedan bajo el monto
+        block = np.array([np.searchsorted(row, targets) for row in best])
+        months[positive, start:start + len(best)] = block.T
+    return months
+
+
+def _ordered_goals(goals: List[FinancialGoal]) -> List[FinancialGoal]:
+    return sorted(goals, key=lambda goal: (-(goal.priority or 0), goal.target_date or date.max, goal.id))
+
+
+def _input_hash(samples: List[float], goal: FinancialGoal, contributions: Any, need: Decimal, current: date) -> str:
+    payload = {
+        "version": FORECAST_VERSION,
+        "month": current.isoformat(),
+        "samples": samples,
+        "goal": [str(goal.target_amount), str(goal.current_amount), str(goal.target_date), goal.priority],
+        "contributions": [str(value) for value in contributions] if contributions else None,
+        "need": str(need),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def get_goal_forecasts(db: Session, user_id: int, today: Optional[date] = None) -> List[Dict[str, Any]]:
+    """
+    Pronósticos de todas las metas pendientes del usuario, recalculando solo
+    los que quedaron obsoletos.
+    """
+    import numpy as np
+
+    today = today or date.today()
+    current = month_start(today)
+    goals = _ordered_goals(
+        db.query(FinancialGoal).filter(FinancialGoal.user_id == user_id, FinancialGoal.is_completed.is_(False)).all()
+    )
+    if not goals:
+        return []
+
+    goal_ids = [goal.id for goal in goals]
+    samples = monthly_net_savings(db, user_id, current)
+    contributions = {
+        row.goal_id: (row.count, row.last_id, row.total)
+        for row in db.execute(
+            select(GoalContribution.goal_id, func.count(GoalContribution.id).label("count"),
+                   func.max(GoalContribution.id).label("last_id"), func.sum(GoalContribution.amount).label("total"))
+            .where(GoalContribution.goal_id.in_(goal_ids))
+            .group_by(GoalContribution.goal_id)
+        )
+    }
+    cached = {forecast.goal_id: forecast
+              for forecast in db.query(GoalForecast).filter(GoalForecast.goal_id.in_(goal_ids))}
+
+    # Monto acumulado que debe cubrir el ahorro para cumplir cada meta (cascada por prioridad)
+    needs: Dict[int, Decimal] = {}
+    hashes: Dict[int, str] = {}
+    pending = Decimal("0")
+    for goal in goals:
+        pending += max(Decimal(str(goal.target_amount)) - Decimal(str(goal.current_amount or 0)), Decimal("0"))
+        needs[goal.id] = pending
+        hashes[goal.id] = _input_hash(samples, goal, contributions.get(goal.id), pending, current)
+
+    stale = [goal for goal in goals if goal.id not in cached or cached[goal.id].input_hash != hashes[goal.id]]
+    if stale:
+        target_months = [months_between(current, goal.target_date) + 1 for goal in stale if goal.target_date]
+        horizon = min(max([DEFAULT_HORIZON_MONTHS, *target_months]), MAX_HORIZON_MONTHS)
+        seed = int(hashlib.sha256(json.dumps(samples).encode()).hexdigest()[:8], 16)
+        completion = simulate_completion_months(samples, [float(needs[goal.id]) for goal in stale], horizon, seed=seed)
+
+        now = datetime.utcnow()
+        rows = []
+        for goal, months in zip(stale, completion):
+            success = None
+            if goal.target_date:
+                success = float(np.mean(months < months_between(current, goal.target_date) + 1))
+            median = int(np.ceil(np.median(months)))
+            rows.append({
+                "goal_id": goal.id,
+                "input_hash": hashes[goal.id],
+                "success_probability": None if success is None else round(success, 4),
+                "expected_completion_date": (
+                    None if median >= horizon else
+                    today if needs[goal.id] <= 0 else month_end(add_months(current, median))
+                ),
+                "completion_probability": round(float(np.mean(months < horizon)), 4),
+                "paths": int(months.size),
+                "computed_at": now,
+            })
+
+        db.execute(delete(GoalForecast).where(GoalForecast.goal_id.in_([row["goal_id"] for row in rows])))
+        db.execute(GoalForecast.__table__.insert(), rows)
+        db.commit()
+        cached.update({forecast.goal_id: forecast for forecast in
+                       db.query(GoalForecast).filter(GoalForecast.goal_id.in_([goal.id for goal in stale]))})
+        logger.debug(f"Pronósticos recalculados para {len(stale)} de {len(goals)} metas del usuario {user_id}")
+
+    return [
+        {
+            "goal_id": goal.id,
+            "name": goal.name,
+            "target_amount": goal.target_amount,
+            "current_amount": goal.current_amount,
+            "target_date": goal.target_date,
+            "success_probability": cached[goal.id].success_probability,
+            "expected_completion_date": cached[goal.id].expected_completion_date,
+            "completion_probability": cached[goal.id].completion_probability,
+            "paths": cached[goal.id].paths,
+            "computed_at": cached[goal.id].computed_at,
+        }
+        for goal in goals
+    ]
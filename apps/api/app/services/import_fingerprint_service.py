@@ -0,0 +1,331 @@
+"""
+Huellas de archivos importados.
+
+Cada importación con perfil queda registrada en `file_imports` con el SHA-256
+del archivo subido y una huella de su contenido normalizado (sin BOM ni
+diferencias de fin de línea en CSV; solo hojas y textos en XLSX, sin los
+metadatos que cambian al volver a guardar). Una re-subida que coincide con
+una importación completada de la misma cuenta, con el mismo perfil y versión
+del perfil, se responde con el resultado de esa importación, sin parsear el
+archivo. Las transacciones creadas guardan su `import_id`; eliminar o editar
+una invalida la importación (ver models/file_imports), que deja de responder
+re-subidas y de aportar filas conocidas.
+
+Para cartolas que se solapan parcialmente con una anterior, cada importación
+guarda además un resumen de sus filas (8 bytes del content_hash por fila).
+`ImportRowIndex` compara en memoria las filas nuevas con ese resumen y
+descarta el prefijo y el sufijo ya importados sin consultar la base fila a
+fila; las filas del medio siguen el flujo normal con validación de duplicados.
+El resumen solo incluye filas que están en la base (creadas por la importación
+o descartadas por venir en una anterior): una fila que falló debe volver a
+intentarse en la próxima cartola.
+
+Los errores por fila llegan estructurados en results['row_errors'] como
+{'row_number', 'error_type', 'message'}; results['errors'] conserva el texto
+"Fila N: ..." que se muestra al usuario.
+"""
+
+import hashlib
+import io
+import logging
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..models.file_imports import FileImport, FileImportProfile, ImportError, ImportFileType, ImportStatus
+from ..utils.tabular_reader import FORMAT_CSV, FORMAT_XLS, FORMAT_XLSX
+from ..utils.transaction_utils import generate_transaction_hash
+
+logger = logging.getLogger(__name__)
+
+ROW_DIGEST_SIZE = 8
+# Importaciones previas de la cuenta contra las que se buscan solapamientos
+OVERLAP_LOOKBACK_IMPORTS = 3
+
+FILE_TYPES = {
+    FORMAT_CSV: ImportFileType.CSV,
+    FORMAT_XLSX: ImportFileType.XLSX,
+    FORMAT_XLS: ImportFileType.XLS,
+}
+
+# Partes de un .xlsx que definen su contenido (no docProps ni estilos)
+_XLSX_CONTENT_PARTS = re.compile(r"^xl/(worksheets/[^/]+\.xml|sharedStrings\.xml|workbook\.xml)$")
+_BLANK_LINE = re.compile(rb"[ \t]+(?=\n)")
+
+AMOUNT_ERROR_TYPE = "amount"
+DUPLICATE_ERROR_TYPE = "duplicate"
+ROW_ERROR_TYPE = "validation"
+
+
+# ============================
+# Huellas del archivo
+# ============================
+
+def file_sha256(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def content_fingerprint(content: bytes, file_format: str) -> str:
+    """Huella del contenido normalizado; para .xls coincide con el SHA-256"""
+    digest = hashlib.sha256()
+    if file_format == FORMAT_CSV:
+        text = content[3:] if content.startswith(b"\xef\xbb\xbf") else content
+        text = text.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        for line in _BLANK_LINE.sub(b"", text).split(b"\n"):
+            if line:
+                digest.update(line)
+                digest.update(b"\n")
+        return digest.hexdigest()
+
+    if file_format == FORMAT_XLSX:
+        try:
+            with zipfile.ZipFile(io.BytesIO(content)) as archive:
+                for name in sorted(archive.namelist()):
+                    if _XLSX_CONTENT_PARTS.match(name):
+                        digest.update(name.encode())
+                        digest.update(archive.read(name))
+            return digest.hexdigest()
+        except zipfile.BadZipFile:
+            pass
+
+    return file_sha256(content)
+
+
+def find_matching_import(
+    db: Session,
+    user_id: int,
+    profile: FileImportProfile,
+    sha256: str,
+    fingerprint: str
+) -> Optional[FileImport]:
+    """
+    Última importación vigente (completada y sin transacciones eliminadas ni
+    editadas) del mismo archivo o contenido con la misma versión del perfil
+    """
+    query = db.query(FileImport).filter(
+        FileImport.user_id == user_id,
+        FileImport.account_id == profile.account_id,
+        FileImport.profile_id == profile.id,
+        FileImport.profile_updated_at.is_not_distinct_from(profile.updated_at),
+        FileImport.status == ImportStatus.COMPLETED,
+        FileImport.invalidated_at.is_(None),
+    )
+    match = query.filter(FileImport.file_sha256 == sha256).order_by(FileImport.id.desc()).first()
+    if match is None:
+        match = query.filter(FileImport.content_fingerprint == fingerprint).order_by(FileImport.id.desc()).first()
+    return match
+
+
+def previous_import_result(db: Session, file_import: FileImport) -> Dict[str, Any]:
+    """Resultado de una importación ya registrada, en el formato de import_transactions_with_profile"""
+    errors = db.query(ImportError).filter(ImportError.import_id == file_import.id).order_by(ImportError.id).all()
+    return {
+        'total_records': file_import.record_count,
+        'successful_imports': file_import.success_count,
+        'failed_imports': file_import.error_count,
+        'errors': [f"Fila {error.row_number}: {error.error_message}" for error in errors],
+        'amount_errors': [
+            {'row_number': error.row_number, 'value': error.raw_data}
+            for error in errors if error.error_type == AMOUNT_ERROR_TYPE
+        ],
+        'skipped_duplicates': 0,
+        'duplicate_of_import_id': file_import.id,
+    }
+
+
+# ============================
+# Registro de la importación
+# ============================
+
+def start_file_import(
+    db: Session,
+    user_id: int,
+    profile: FileImportProfile,
+    filename: str,
+    file_format: str,
+    file_size: int,
+    sha256: str,
+    fingerprint: str
+) -> FileImport:
+    now = datetime.now()
+    file_import = FileImport(
+        user_id=user_id,
+        profile_id=profile.id,
+        account_id=profile.account_id,
+        filename=filename,
+        original_filename=filename,
+        file_type=FILE_TYPES.get(file_format, ImportFileType.CSV),
+        file_size=file_size,
+        status=ImportStatus.PROCESSING,
+        file_sha256=sha256,
+        content_fingerprint=fingerprint,
+        profile_updated_at=profile.updated_at,
+        started_at=now,
+        created_at=now,
+        updated_at=now,
+    )
+    db.add(file_import)
+    db.commit()
+    return file_import
+
+
+def finish_file_import(
+    db: Session,
+    file_import: FileImport,
+    results: Dict[str, Any],
+    row_index: Optional["ImportRowIndex"] = None
+) -> None:
+    """Guarda contadores, errores y el resumen de filas de una importación terminada"""
+    amount_values = {item['row_number']: item['value'] for item in results.get('amount_errors', [])}
+    error_rows = []
+    duplicates = results.get('skipped_duplicates', 0)
+    for error in results.get('row_errors', []):
+        if error['error_type'] == DUPLICATE_ERROR_TYPE:
+            duplicates += 1
+        error_rows.append({
+            'import_id': file_import.id,
+            'row_number': error['row_number'],
+            'error_type': error['error_type'],
+            'error_message': error['message'],
+            'raw_data': amount_values.get(error['row_number']) if error['error_type'] == AMOUNT_ERROR_TYPE else None,
+            'created_at': datetime.now(),
+        })
+    if error_rows:
+        db.execute(ImportError.__table__.insert(), error_rows)
+
+    file_import.record_count = results['total_records']
+    file_import.success_count = results['successful_imports']
+    file_import.error_count = results['failed_imports']
+    file_import.duplicate_count = duplicates
+    if row_index is not None:
+        file_import.row_digests = row_index.packed_digests()
+        file_import.first_transaction_date = row_index.first_date
+        file_import.last_transaction_date = row_index.last_date
+    file_import.status = ImportStatus.COMPLETED
+    file_import.completed_at = datetime.now()
+    file_import.updated_at = file_import.completed_at
+    db.commit()
+
+
+def fail_file_import(db: Session, file_import: FileImport) -> None:
+    try:
+        db.rollback()
+        file_import.status = ImportStatus.FAILED
+        file_import.completed_at = datetime.now()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"No se pudo marcar la importación {file_import.id} como fallida: {str(e)}")
+
+
+# ============================
+# Resumen de filas y solapamientos
+# ============================
+
+def row_digest(content_hash: str) -> bytes:
+    return bytes.fromhex(content_hash[:ROW_DIGEST_SIZE * 2])
+
+
+def unpack_row_digests(packed: Optional[bytes]) -> List[bytes]:
+    if not packed:
+        return []
+    return [packed[i:i + ROW_DIGEST_SIZE] for i in range(0, len(packed), ROW_DIGEST_SIZE)]
+
+
+def load_known_digests(db: Session, user_id: int, account_id: int) -> Set[bytes]:
+    """Filas de las últimas importaciones vigentes de la cuenta"""
+    recent = db.query(FileImport.row_digests).filter(
+        FileImport.user_id == user_id,
+        FileImport.account_id == account_id,
+        FileImport.status == ImportStatus.COMPLETED,
+        FileImport.invalidated_at.is_(None),
+        FileImport.row_digests.isnot(None),
+    ).order_by(FileImport.id.desc()).limit(OVERLAP_LOOKBACK_IMPORTS).all()
+
+    known: Set[bytes] = set()
+    for (packed,) in recent:
+        known.update(unpack_row_digests(packed))
+    return known
+
+
+class ImportRowIndex:
+    """
+    Resumen de las filas de una importación y filtro de solapamiento con las
+    anteriores.
+
+    Las filas del comienzo del archivo que ya estaban importadas se descartan
+    de inmediato; más adelante, las filas conocidas se retienen hasta ver si
+    van seguidas de una fila nueva (entonces están en el medio y se procesan)
+    o si llegan hasta el final del archivo (sufijo ya importado: se descartan).
+    """
+
+    def __init__(self, user_id: int, account_id: int, known: Optional[Set[bytes]] = None,
+                 import_id: Optional[int] = None):
+        self.user_id = user_id
+        self.account_id = account_id
+        self.import_id = import_id  # Importación a la que se asocian las transacciones creadas
+        self.known = known or set()
+        self.skipped = 0
+        self.first_date: Optional[date] = None
+        self.last_date: Optional[date] = None
+        self._digests = bytearray()
+        self._in_prefix = True
+        self._held: List[Tuple[Tuple, bytes]] = []
+
+    def _digest(self, transaction_data) -> bytes:
+        content_hash = generate_transaction_hash(
+            user_id=self.user_id,
+            account_id=self.account_id,
+            amount=Decimal(str(transaction_data.amount)),
+            description=transaction_data.description or '',
+            transaction_date=transaction_data.transaction_date,
+            external_id=transaction_data.external_id
+        )
+        return row_digest(content_hash)
+
+    def _track(self, transaction_data) -> bytes:
+        transaction_date = transaction_data.transaction_date
+        if self.first_date is None or transaction_date < self.first_date:
+            self.first_date = transaction_date
+        if self.last_date is None or transaction_date > self.last_date:
+            self.last_date = transaction_date
+        return self._digest(transaction_data)
+
+    def record(self, content_hash: str) -> None:
+        """Agrega al resumen una fila que la importación insertó"""
+        self._digests += row_digest(content_hash)
+
+    def filter(self, parsed_rows: Iterable[Tuple]) -> Iterator[Tuple]:
+        """Deja pasar las filas que hay que procesar, en el orden del archivo"""
+        for item in parsed_rows:
+            transaction_data = item[1]
+            if transaction_data is None:
+                yield item  # Las filas con error no cambian el solapamiento
+                continue
+
+            digest = self._track(transaction_data)
+            if digest not in self.known:
+                self._in_prefix = False
+                yield from (held for held, _ in self._held)
+                self._held.clear()
+                yield item
+            elif self._in_prefix:
+                self.skipped += 1
+                self._digests += digest
+            else:
+                self._held.append((item, digest))
+
+    def finish(self) -> int:
+        """Descarta el sufijo ya importado y devuelve el total de filas descartadas"""
+        self.skipped += len(self._held)
+        for _, digest in self._held:
+            self._digests += digest
+        self._held.clear()
+        return self.skipped
+
+    def packed_digests(self) -> bytes:
+        return bytes(self._digests)
@@ -0,0 +1,360 @@
+"""
+Compilación de perfiles de importación en extractores de filas.
+
+Un FileImportProfile con sus FileColumnMapping se compila una vez en un
+`CompiledProfile` inmutable (estrategia de montos, reglas de signo,
+multiplicadores, valores por defecto y validadores regex ya preparados), que
+se guarda en caché por (id, updated_at). Al conocer los índices reales de las
+columnas (tras leer el header del archivo) se enlaza en un `RowExtractor`
+con los índices fijados: por fila solo quedan unas pocas lecturas de
+atributos y las conversiones de fecha y monto.
+
+Uso:
+    compiled = compile_import_profile(profile, column_mappings)
+    extractor = compiled.bind({'date': 0, 'description': 1, 'amount': 3})
+    transaction_data = extractor.extract(row, row_idx, default_status_id)
+"""
+
+import logging
+import re
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Pattern, Tuple
+
+from ..utils.amount_parser import AmountColumnParser
+from ..utils.date_parser import DateColumnParser
+
+logger = logging.getLogger(__name__)
+
+AMOUNT_SINGLE = "single"
+AMOUNT_SEPARATE = "separate"
+
+AMOUNT_FIELDS = ("amount", "expense_amount", "income_amount", "debit_amount", "credit_amount")
+CORE_FIELDS = ("date", "description", "notes") + AMOUNT_FIELDS
+
+# Perfiles compilados en memoria por (id, updated_at)
+COMPILED_CACHE_SIZE = 128
+_compiled_profiles: "OrderedDict[Tuple[Any, Any], CompiledProfile]" = OrderedDict()
+
+
+class ColumnRule(NamedTuple):
+    """Reglas de un campo destino tomadas de su FileColumnMapping"""
+    field: str
+    default_value: Optional[str] = None
+    multiplier: Optional[Decimal] = None  # None = sin multiplicador ("1")
+    treat_empty_as_zero: bool = True
+    regex: Optional[Pattern] = None
+
+
+class BoundColumn(NamedTuple):
+    """Regla de un campo con el índice de columna ya resuelto"""
+    index: int
+    rule: ColumnRule
+
+
+def _parse_multiplier(value: Optional[str], field: str) -> Optional[Decimal]:
+    if value is None or str(value).strip() in ("", "1"):
+        return None
+    try:
+        multiplier = Decimal(str(value).strip())
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Multiplicador inválido para '{field}': {value}")
+    if not multiplier.is_finite():
+        raise ValueError(f"Multiplicador inválido para '{field}': {value}")
+    return None if multiplier == 1 else multiplier
+
+
+def _compile_rule(mapping) -> ColumnRule:
+    field = getattr(mapping, 'target_field_name', '')
+    pattern = getattr(mapping, 'regex_pattern', None)
+    try:
+        regex = re.compile(pattern) if pattern else None
+    except re.error as e:
+        raise ValueError(f"Expresión regular inválida para '{field}': {str(e)}")
+
+    treat_empty_as_zero = getattr(mapping, 'treat_empty_as_zero', True)
+    return ColumnRule(
+        field=field,
+        default_value=getattr(mapping, 'default_value', None),
+        multiplier=_parse_multiplier(getattr(mapping, 'amount_multiplier', None), field),
+        treat_empty_as_zero=True if treat_empty_as_zero is None else bool(treat_empty_as_zero),
+        regex=regex,
+    )
+
+
+def _amount_strategy(fields: Iterable[str]) -> Optional[str]:
+    fields = set(fields)
+    if {'expense_amount', 'income_amount'} <= fields or {'debit_amount', 'credit_amount'} <= fields:
+        return AMOUNT_SEPARATE
+    if 'amount' in fields:
+        return AMOUNT_SINGLE
+    return None
+
+
+class CompiledProfile:
+    """Configuración del perfil ya interpretada, independiente del archivo"""
+
+    __slots__ = ("profile_id", "updated_at", "rules", "positive_is_income", "debit_column_is_expense", "_bound")
+
+    def __init__(self, profile, column_mappings: Iterable = ()):
+        self.profile_id = getattr(profile, 'id', None) if profile is not None else None
+        self.updated_at = getattr(profile, 'updated_at', None) if profile is not None else None
+        # Con varios mapeos al mismo campo gana el último, como en el mapeo de columnas
+        self.rules: Dict[str, ColumnRule] = {}
+        for mapping in column_mappings:
+            rule = _compile_rule(mapping)
+            self.rules[rule.field] = rule
+        self.positive_is_income = bool(getattr(profile, 'positive_is_income', True)) if profile is not None else True
+        self.debit_column_is_expense = bool(getattr(profile, 'debit_column_is_expense', True)) if profile is not None else True
+        self._bound: Dict[Tuple, RowExtractor] = {}
+
+    def bind(
+        self,
+        column_map: Dict[Any, Any],
+        date_format: Optional[str] = None,
+        amount_separators: Tuple[str, str] = (",", ".")
+    ) -> "RowExtractor":
+        """
+        Enlaza el perfil con los índices de columna del archivo y, si se
+        conocen, el formato fijo de la columna de fecha (ver date_parser) y
+        los separadores (miles, decimal) de los montos (ver amount_parser).
+
+        Acepta el mapeo campo -> índice de la importación o el índice -> campo
+        de la previsualización; en este último gana el primer índice de cada
+        campo y se ignoran los nombres de columna no resueltos.
+        """
+        if column_map and all(isinstance(key, str) for key in column_map):
+            indices = {field: index for field, index in column_map.items() if isinstance(index, int)}
+        else:
+            indices = {}
+            for index, field in column_map.items():
+                if isinstance(index, int) and field not in indices:
+                    indices[field] = index
+
+        key = (tuple(sorted(indices.items())), date_format, tuple(amount_separators))
+        extractor = self._bound.get(key)
+        if extractor is None:
+            extractor = RowExtractor(self, indices, date_format, amount_separators)
+            self._bound[key] = extractor
+        return extractor
+
+
+class RowExtractor:
+    """Extractor inmutable de filas para un perfil y una disposición de columnas"""
+
+    __slots__ = (
+        "date", "description", "notes", "amount", "expense", "income", "debit", "credit",
+        "strategy", "positive_is_income", "debit_column_is_expense", "extra_columns", "date_parser",
+        "amount_parser",
+    )
+
+    def __init__(
+        self,
+        compiled: CompiledProfile,
+        indices: Dict[str, int],
+        date_format: Optional[str] = None,
+        amount_separators: Tuple[str, str] = (",", ".")
+    ):
+        def bound(field: str) -> Optional[BoundColumn]:
+            if field not in indices:
+                return None
+            return BoundColumn(indices[field], compiled.rules.get(field) or ColumnRule(field))
+
+        _freeze(self, (
+            bound('date'), bound('description'), bound('notes'), bound('amount'),
+            bound('expense_amount'), bound('income_amount'), bound('debit_amount'), bound('credit_amount'),
+            _amount_strategy(indices), compiled.positive_is_income, compiled.debit_column_is_expense,
+            tuple((field, index) for field, index in indices.items() if field not in CORE_FIELDS),
+            DateColumnParser(date_format), AmountColumnParser(*amount_separators),
+        ))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RowExtractor es inmutable")
+
+    def __reduce__(self):
+        # Serializable para los workers del parseo paralelo
+        return (_restore_extractor, tuple(getattr(self, name) for name in self.__slots__))
+
+    # ---- Lectura de celdas ----
+
+    @staticmethod
+    def _value(row, column: Optional[BoundColumn], fallback=None):
+        if column is None:
+            return fallback
+        index, rule = column
+        value = row[index] if index < len(row) else None
+        if rule.default_value is not None and (value is None or str(value).strip() == ''):
+            value = rule.default_value
+        if value is None:
+            return fallback
+        if rule.regex is not None and value != '' and not rule.regex.search(str(value)):
+            raise ValueError(f"Valor '{value}' no cumple el formato esperado para '{rule.field}'")
+        return value
+
+    @property
+    def amount_columns(self) -> Tuple[int, ...]:
+        """Índices de las columnas de monto enlazadas"""
+        return tuple(
+            column.index for column in (self.amount, self.expense, self.income, self.debit, self.credit)
+            if column is not None
+        )
+
+    def _amount_value(self, row, column: Optional[BoundColumn]) -> Decimal:
+        value = self._value(row, column, 0)
+        if column is None:
+            return Decimal(0)
+        rule = column.rule
+        if (value is None or value == '') and not rule.treat_empty_as_zero and self.strategy == AMOUNT_SINGLE:
+            raise ValueError(f"Monto vacío en la columna de '{rule.field}'")
+        amount = self.amount_parser.parse_decimal(value)
+        if rule.multiplier is not None:
+            amount = amount * rule.multiplier
+        return amount
+
+    def _compute_amount(self, row) -> Decimal:
+        """Monto según la estrategia del perfil; 0 si no hay monto en la fila"""
+        if self.strategy == AMOUNT_SEPARATE:
+            expense_amount = self._amount_value(row, self.expense)
+            income_amount = self._amount_value(row, self.income)
+            if expense_amount == 0 and income_amount == 0:
+                debit_amount = self._amount_value(row, self.debit)
+                credit_amount = self._amount_value(row, self.credit)
+                if debit_amount != 0:
+                    return -abs(debit_amount) if self.debit_column_is_expense else abs(debit_amount)
+                if credit_amount != 0:
+                    return abs(credit_amount) if not self.debit_column_is_expense else -abs(credit_amount)
+                return Decimal(0)
+            if expense_amount != 0:
+                return -abs(expense_amount)  # Gastos siempre negativos
+            return abs(income_amount)  # Ingresos siempre positivos
+
+        amount = self._amount_value(row, self.amount)
+        # Invertir signo si positivo no es ingreso
+        return amount if self.positive_is_income else -amount
+
+    # ---- Extracción ----
+
+    def prime_dates(self, rows: Iterable) -> None:
+        """Convierte de una vez los seriales de Excel de la columna de fecha de un bloque"""
+        if self.date is None:
+            return
+        index = self.date.index
+        self.date_parser.prime(row[index] for row in rows if index < len(row))
+
+    def extract(self, row, row_idx: int, default_status_id: int):
+        """Fila -> TransactionCreateRequest (lanza ValueError si la fila no es válida)"""
+        from ..schemas.transactions import TransactionCreateRequest
+
+        date_value = self._value(row, self.date)
+        if not date_value:
+            raise ValueError("Fecha requerida")
+        transaction_date = self.date_parser.parse(date_value)
+        if transaction_date is None:
+            raise ValueError("Fecha inválida")
+
+        if self.strategy is None:
+            raise ValueError("No se encontraron columnas de monto válidas en la configuración")
+        amount = self._compute_amount(row)
+        if amount == 0:
+            raise ValueError("El monto no puede ser cero")
+
+        return TransactionCreateRequest(
+            amount=round(amount, 2),  # Decimal exacto a 2 decimales
+            description=str(self._value(row, self.description, '')).strip(),
+            transaction_date=transaction_date,
+            account_id=0,  # Se asigna después
+            notes=str(self._value(row, self.notes, '')).strip(),
+            status_id=default_status_id,
+            subcategory_id=None,
+            envelope_id=None,
+            transfer_account_id=None,
+            is_recurring=False,
+            is_planned=False,
+            kakebo_emotion=None,
+            external_id=None
+        )
+
+    def extract_preview(self, row, row_idx: int) -> Dict[str, Any]:
+        """Fila -> diccionario de previsualización con los errores por campo"""
+
+        transaction_data = {
+            'row_number': row_idx,
+            'raw_data': {f'col_{i}': val for i, val in enumerate(row)},
+        }
+
+        try:
+            date_value = self._value(row, self.date)
+            if date_value:
+                try:
+                    transaction_data['transaction_date'] = self.date_parser.parse(date_value)
+                except Exception as e:
+                    transaction_data['transaction_date'] = None
+                    transaction_data['date_error'] = str(e)
+            else:
+                transaction_data['transaction_date'] = None
+                transaction_data['date_error'] = "Fecha requerida pero no encontrada"
+
+            amount_error = None
+            try:
+                if self.strategy is None:
+                    amount = 0
+                    amount_error = "No se encontraron columnas de monto válidas en la configuración"
+                else:
+                    amount = self._compute_amount(row)
+                transaction_data['amount'] = round(amount, 2)
+            except Exception as e:
+                transaction_data['amount'] = 0
+                amount_error = f"Error procesando monto: {str(e)}"
+            if amount_error:
+                transaction_data['amount_error'] = amount_error
+
+            transaction_data['description'] = str(self._value(row, self.description, '')).strip()
+            transaction_data['notes'] = str(self._value(row, self.notes, '')).strip()
+
+            # Resto de campos mapeados por el perfil
+            for field, index in self.extra_columns:
+                if index < len(row) and row[index] is not None:
+                    transaction_data[field] = row[index]
+
+        except Exception as e:
+            transaction_data['extraction_error'] = str(e)
+
+        return transaction_data
+
+
+def _freeze(extractor: RowExtractor, state: Tuple) -> None:
+    for name, value in zip(RowExtractor.__slots__, state):
+        object.__setattr__(extractor, name, value)
+
+
+def _restore_extractor(*state) -> RowExtractor:
+    extractor = RowExtractor.__new__(RowExtractor)
+    _freeze(extractor, state)
+    return extractor
+
+
+def compile_import_profile(profile, column_mappings: Iterable) -> CompiledProfile:
+    """
+    Compila (o toma de la caché) el perfil con sus mapeos. La clave es
+    (id, updated_at): editar el perfil invalida su versión compilada.
+    """
+    profile_id = getattr(profile, 'id', None)
+    if profile_id is None:
+        return CompiledProfile(profile, column_mappings)
+
+    key = (profile_id, getattr(profile, 'updated_at', None))
+    compiled = _compiled_profiles.get(key)
+    if compiled is not None:
+        _compiled_profiles.move_to_end(key)
+        return compiled
+
+    compiled = CompiledProfile(profile, column_mappings)
+    _compiled_profiles[key] = compiled
+    if len(_compiled_profiles) > COMPILED_CACHE_SIZE:
+        _compiled_profiles.popitem(last=False)
+    logger.debug(f"Perfil de importación {profile_id} compilado ({len(compiled.rules)} campos)")
+    return compiled
+
+
+def clear_compiled_profiles() -> None:
+    _compiled_profiles.clear()
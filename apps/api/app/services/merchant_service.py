@@ -0,0 +1,333 @@
+"""
+Normalización de descripciones bancarias a comercios canónicos.
+
+Las glosas del banco traen números de terminal, fechas, finales de tarjeta y
+códigos de ciudad ("COMPRA LIDER EXPRESS 0123 12/03 ****4521 STGO CL"). Una
+tubería compilada las lleva a una clave estable:
+
+1. minúsculas, sin acentos ni puntuación, sin palabras numéricas o con 3
+   o más dígitos;
+2. reglas `strip` (glosas de operación y de país por defecto, más las de la
+   tabla) eliminadas con una sola expresión regular;
+3. reglas `regex` aplicadas en orden de prioridad;
+4. reglas `alias`: el alias más largo que coincide con el inicio de la clave
+   (por palabras) decide el comercio; sin alias, la clave limpia es el
+   comercio.
+
+La versión de las reglas es un hash de las reglas activas, de las reglas
+`strip` por defecto y de la versión de la tubería. El normalizador
+compilado se guarda en memoria por versión, de modo que solo se recompila
+cuando cambian las reglas. Cada transacción guarda el comercio y la versión
+con que se calculó; `renormalize_merchants` recorre en lotes las que tienen
+otra versión.
+
+Uso:
+    assign_merchants(db, transacciones_del_lote)    # por lote de importación, sin commit
+    renormalize_merchants(db)                       # tras cambiar las reglas
+"""
+
+import hashlib
+import logging
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import bindparam, extract, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from ..models.merchants import Merchant, MerchantRule
+from ..models.transactions import Transaction
+from .near_duplicate_service import normalize_for_shingles
+from .projection_service import cash_flow_filters
+
+logger = logging.getLogger(__name__)
+
+RULE_TYPES = ('strip', 'regex', 'alias')
+MERCHANT_KEY_LENGTH = 120
+MERCHANT_MEMO_SIZE = 4096
+QUERY_CHUNK_SIZE = 1000
+CENT = Decimal("0.01")
+# Subir al cambiar la limpieza de `_clean` (near_duplicate_service.normalize_for_shingles) o `MerchantNormalizer.key`
+PIPELINE_VERSION = 1
+
+# Glosas de operación, de tarjeta/terminal y de país que el banco antepone o agrega
+DEFAULT_STRIP_PATTERNS = (
+    r"^(?:compra|pago|cargo|abono|giro|pos|pat|pac|tef|transf|redcompra|webpay)(?: (?:en|nac|int|pos))*\b",
+    r"\b(?:cl|chl|chile)$",
+    r"\b(?:tarj|term|terminal)\b",
+)
+
+_SPACES = re.compile(r"\s+")
+
+
+def _money(value: Any) -> Decimal:
+    return Decimal(str(value or 0)).quantize(CENT)
+
+
+def _is_code(word: str) -> bool:
+    """Números de terminal, fecha o tarjeta: solo dígitos o 3 dígitos o más"""
+    digits = sum(char.isdigit() for char in word)
+    return digits >= 3 or (digits > 0 and digits == len(word))
+
+
+def _clean(text: str) -> str:
+    """Minúsculas, sin acentos, sin números de terminal/fecha/tarjeta ni puntuación"""
+    # Tras separar la puntuación, "12/03" y "****4521" también quedan como códigos
+    return normalize_for_shingles(text, _is_code)
+
+
+class MerchantNormalizer:
+    """Tubería de reglas compilada para una versión de las reglas"""
+
+    def __init__(self, version: str, strip_patterns: Sequence[str],
+                 regex_rules: Sequence[Tuple[str, str]], aliases: Dict[str, str]):
+        self.version = version
+        self._strip = re.compile("|".join(f"(?:{pattern})" for pattern in strip_patterns)) if strip_patterns else None
+        self._regex = [(re.compile(pattern), replacement) for pattern, replacement in regex_rules]
+        self._aliases = {_clean(alias): key for alias, key in aliases.items() if _clean(alias)}
+        self._alias_lengths = sorted({len(alias.split(" ")) for alias in self._aliases}, reverse=True)
+        self._memo: Dict[str, Optional[str]] = {}
+
+    def key(self, description: Optional[str]) -> Optional[str]:
+        """Clave del comercio de una descripción, o None si no queda texto"""
+        if not description:
+            return None
+        if description in self._memo:
+            return self._memo[description]
+
+        text = _clean(description)
+        if self._strip is not None:
+            text = _SPACES.sub(" ", self._strip.sub(" ", text)).strip()
+        for pattern, replacement in self._regex:
+            text = _SPACES.sub(" ", pattern.sub(replacement, text)).strip()
+
+        words = text.split(" ")
+        key = text[:MERCHANT_KEY_LENGTH] or None
+        for length in self._alias_lengths:
+            alias = self._aliases.get(" ".join(words[:length]))
+            if alias is not None:
+                key = alias
+                break
+
+        if len(self._memo) >= MERCHANT_MEMO_SIZE:
+            self._memo.clear()
+        self._memo[description] = key
+        return key
+
+
+# Normalizador compilado por versión de las reglas
+_normalizers: Dict[str, MerchantNormalizer] = {}
+
+
+def _active_rules(db: Session) -> List[Any]:
+    return db.execute(
+        select(MerchantRule.id, MerchantRule.rule_type, MerchantRule.pattern, MerchantRule.replacement,
+               MerchantRule.priority, Merchant.key.label("merchant_key"))
+        .outerjoin(Merchant, Merchant.id == MerchantRule.merchant_id)
+        .where(MerchantRule.is_active.is_(True))
+        .order_by(MerchantRule.priority.desc(), MerchantRule.id)
+    ).all()
+
+
+def rules_version(rules: Iterable[Any]) -> str:
+    """
+    Hash de las reglas activas; cambia con cualquier alta, edición o baja y
+    con los cambios de la tubería o de las reglas por defecto
+    """
+    digest = hashlib.sha256()
+    digest.update(repr((PIPELINE_VERSION, DEFAULT_STRIP_PATTERNS)).encode("utf-8"))
+    for rule in rules:
+        digest.update(repr((rule.id, rule.rule_type, rule.pattern, rule.replacement,
+                            rule.priority, rule.merchant_key)).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def get_merchant_normalizer(db: Session) -> MerchantNormalizer:
+    """Normalizador de la versión vigente; solo se compila si cambiaron las reglas"""
+    rules = _active_rules(db)
+    version = rules_version(rules)
+    normalizer = _normalizers.get(version)
+    if normalizer is None:
+        normalizer = MerchantNormalizer(
+            version,
+            list(DEFAULT_STRIP_PATTERNS) + [rule.pattern for rule in rules if rule.rule_type == 'strip'],
+            [(rule.pattern, rule.replacement or " ") for rule in rules if rule.rule_type == 'regex'],
+            {rule.pattern: rule.merchant_key for rule in reversed(rules)
+             if rule.rule_type == 'alias' and rule.merchant_key},
+        )
+        _normalizers.clear()
+        _normalizers[version] = normalizer
+        logger.debug(f"Reglas de comercio compiladas (versión {version}, {len(rules)} regla(s))")
+    return normalizer
+
+
+def _insert_ignoring_conflicts(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """Crea comercios ignorando los que otra sesión haya creado en paralelo"""
+    table = Merchant.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        db.execute(table.insert(), rows)
+        return
+    db.execute(insert(table).on_conflict_do_nothing(index_elements=["key"]), rows)
+
+
+def _merchant_ids(db: Session, keys: Set[str]) -> Dict[str, int]:
+    """Id de comercio por clave, creando en bloque los que faltan"""
+    keys = sorted(keys)
+    ids: Dict[str, int] = {}
+    for offset in range(0, len(keys), QUERY_CHUNK_SIZE):
+        chunk = keys[offset:offset + QUERY_CHUNK_SIZE]
+        ids.update(db.execute(select(Merchant.key, Merchant.id).where(Merchant.key.in_(chunk))).all())
+        missing = [key for key in chunk if key not in ids]
+        if missing:
+            now = datetime.utcnow()
+            _insert_ignoring_conflicts(db, [
+                {"key": key, "name": key.title(), "created_at": now, "updated_at": now} for key in missing
+            ])
+            ids.update(db.execute(select(Merchant.key, Merchant.id).where(Merchant.key.in_(missing))).all())
+    return ids
+
+
+def assign_merchants(db: Session, transactions: Sequence[Any]) -> int:
+    """
+    Asigna el comercio a las transacciones de un lote (sin commit). Devuelve
+    el número de transacciones con comercio.
+    """
+    if not transactions:
+        return 0
+    normalizer = get_merchant_normalizer(db)
+    keys = [normalizer.key(transaction.description) for transaction in transactions]
+    ids = _merchant_ids(db, {key for key in keys if key is not None})
+    for transaction, key in zip(transactions, keys):
+        transaction.merchant_id = ids.get(key) if key is not None else None
+        transaction.merchant_version = normalizer.version
+    db.flush()
+    return sum(1 for key in keys if key is not None)
+
+
+def renormalize_merchants(db: Session, batch_size: int = QUERY_CHUNK_SIZE) -> Dict[str, int]:
+    """
+    Recalcula el comercio de las transacciones normalizadas con otra versión
+    de las reglas (o nunca normalizadas). Hace commit por lote.
+    """
+    normalizer = get_merchant_normalizer(db)
+    table = Transaction.__table__
+    stale = or_(Transaction.merchant_version.is_(None), Transaction.merchant_version != normalizer.version)
+    processed = changed = 0
+    last_id = 0
+    while True:
+        batch = db.execute(
+            select(Transaction.id, Transaction.description, Transaction.merchant_id)
+            .where(stale, Transaction.id > last_id)
+            .order_by(Transaction.id)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        keys = [normalizer.key(row.description) for row in batch]
+        ids = _merchant_ids(db, {key for key in keys if key is not None})
+        values = []
+        for row, key in zip(batch, keys):
+            merchant_id = ids.get(key) if key is not None else None
+            changed += merchant_id != row.merchant_id
+            values.append({"transaction_id": row.id, "merchant": merchant_id})
+        # El comercio no participa en saldos ni cachés: basta un UPDATE en bloque
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("transaction_id"))
+            .values(merchant_id=bindparam("merchant"), merchant_version=normalizer.version),
+            values,
+        )
+        db.commit()
+        processed += len(batch)
+
+    logger.info(f"Comercios renormalizados con versión {normalizer.version}: "
+                f"{processed} transacción(es), {changed} cambio(s)")
+    return {"processed": processed, "changed": changed}
+
+
+def create_merchant_rule(db: Session, rule_type: str, pattern: str, replacement: Optional[str] = None,
+                         merchant_name: Optional[str] = None, priority: int = 0) -> MerchantRule:
+    """
+    Crea una regla de normalización y hace commit. Las transacciones existentes
+    se actualizan con `renormalize_merchants`.
+    """
+    if rule_type not in RULE_TYPES:
+        raise ValueError(f"Tipo de regla no válido: {rule_type}. Valores permitidos: {', '.join(RULE_TYPES)}")
+    if not pattern or not pattern.strip():
+        raise ValueError("La regla debe tener un patrón")
+    if rule_type in ('strip', 'regex'):
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"Expresión regular no válida: {e}")
+
+    merchant_id = None
+    if rule_type == 'alias':
+        if not merchant_name or not _clean(merchant_name) or not _clean(pattern):
+            raise ValueError("Un alias debe indicar el comercio al que corresponde")
+        key = _clean(merchant_name)[:MERCHANT_KEY_LENGTH]
+        merchant_id = _merchant_ids(db, {key})[key]
+        db.execute(update(Merchant).where(Merchant.id == merchant_id).values(name=merchant_name.strip()))
+
+    now = datetime.utcnow()
+    rule = MerchantRule(rule_type=rule_type, pattern=pattern, replacement=replacement, merchant_id=merchant_id,
+                        priority=priority, is_active=True, created_at=now, updated_at=now)
+    db.add(rule)
+    db.commit()
+    db.refresh(rule)
+    return rule
+
+
+def _spend_filters(user_id: int, start: Optional[date], end: Optional[date]) -> List[Any]:
+    filters = cash_flow_filters(user_id) + [Transaction.merchant_id.isnot(None), Transaction.amount < 0]
+    if start is not None:
+        filters.append(Transaction.transaction_date >= start)
+    if end is not None:
+        filters.append(Transaction.transaction_date <= end)
+    return filters
+
+
+def top_merchants(db: Session, user_id: int, start: Optional[date] = None, end: Optional[date] = None,
+                  limit: int = 10) -> List[Dict[str, Any]]:
+    """Comercios con mayor gasto del usuario en el rango"""
+    spent = func.sum(-Transaction.amount)
+    rows = db.execute(
+        select(Transaction.merchant_id, Merchant.name, spent.label("total"), func.count().label("count"))
+        .join(Merchant, Merchant.id == Transaction.merchant_id)
+        .where(*_spend_filters(user_id, start, end))
+        .group_by(Transaction.merchant_id, Merchant.name)
+        .order_by(spent.desc(), Transaction.merchant_id)
+        .limit(limit)
+    ).all()
+    return [
+        {"merchant_id": row.merchant_id, "name": row.name, "total_spent": _money(row.total),
+         "transaction_count": row.count}
+        for row in rows
+    ]
+
+
+def merchant_spend(db: Session, user_id: int, merchant_id: int, start: Optional[date] = None,
+                   end: Optional[date] = None) -> List[Dict[str, Any]]:
+    """Gasto mensual del usuario en un comercio"""
+    year = extract("year", Transaction.transaction_date)
+    month = extract("month", Transaction.transaction_date)
+    rows = db.execute(
+        select(year.label("year"), month.label("month"), func.sum(-Transaction.amount).label("total"),
+               func.count().label("count"))
+        .where(*_spend_filters(user_id, start, end), Transaction.merchant_id == merchant_id)
+        .group_by(year, month)
+        .order_by(year, month)
+    ).all()
+    return [
+        {"month": date(int(row.year), int(row.month), 1), "total_spent": _money(row.total),
+         "transaction_count": row.count}
+        for row in rows
+    ]
@@ -0,0 +1,349 @@
+"""
+Detección de casi-duplicados con MinHash/LSH.
+
+El paso "similar" de `check_transaction_exists` solo compara transacciones
+con la misma fecha, cuenta y monto. Un banco que publica el mismo movimiento
+con la fecha corrida o la glosa reescrita ("COMPRA LIDER 1234" y
+"LIDER SANTIAGO") no se detecta, y ampliar la ventana de fechas con
+comparaciones por pares multiplica los candidatos.
+
+Aquí cada descripción se normaliza y se descompone en trigramas de
+caracteres; su firma MinHash se divide en bandas y cada banda se indexa en
+una tabla hash junto con el monto exacto en centavos. Dos transacciones solo
+se comparan si coinciden en el monto y en al menos una banda (probabilidad
+alta si su similitud de Jaccard supera el umbral, baja si no), y después se
+verifica la similitud exacta de sus trigramas y la ventana de ±N días.
+
+Se usa en dos lugares:
+- importación con perfil: cada fila se compara con el historial de la
+  cuenta anterior a la importación (`AccountNearDuplicateIndex`);
+- reporte "posibles duplicados en mi historial" (`find_near_duplicates`).
+"""
+
+import logging
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.transactions import Transaction
+
+logger = logging.getLogger(__name__)
+
+NUM_PERMUTATIONS = 64
+SHINGLE_SIZE = 3
+# Primo de Mersenne 2^31 - 1: a * h + b cabe en 64 bits con hashes de 32 bits
+_PRIME = (1 << 31) - 1
+_SEED = 20240601
+# Carga del historial de una cuenta durante una importación, en tramos de al menos estos días
+LOAD_CHUNK_DAYS = 60
+MAX_REPORT_GROUPS = 500
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+class NearDuplicateMatch(NamedTuple):
+    transaction_id: int
+    similarity: float
+    transaction_date: date
+
+
+# ============================
+# Normalización y firmas
+# ============================
+
+def normalize_for_shingles(description: Optional[str], is_code: Callable[[str], bool] = str.isdigit) -> str:
+    """
+    Minúsculas, sin tildes ni signos y sin las palabras que `is_code` marca
+    como códigos (por defecto los números: folios, fechas, sucursales). No es
+    la `description_normalized` que se guarda (ver utils.transaction_utils).
+    """
+    if not description:
+        return ''
+    text = unicodedata.normalize("NFKD", description.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(word for word in _NON_ALNUM.sub(" ", text).split() if not is_code(word))
+
+
+def description_shingles(description: Optional[str]) -> FrozenSet[str]:
+    """Trigramas de caracteres de la descripción normalizada"""
+    text = normalize_for_shingles(description)
+    if not text:
+        return frozenset()
+    if len(text) <= SHINGLE_SIZE:
+        return frozenset((text,))
+    padded = f" {text} "
+    return frozenset(padded[i:i + SHINGLE_SIZE] for i in range(len(padded) - SHINGLE_SIZE + 1))
+
+
+def jaccard(first: FrozenSet[str], second: FrozenSet[str]) -> float:
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+@lru_cache(maxsize=None)
+def _permutations(num_perm: int):
+    import numpy as np
+
+    generator = np.random.default_rng(_SEED)
+    a = generator.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+    b = generator.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash_signature(shingles: FrozenSet[str], num_perm: int = NUM_PERMUTATIONS):
+    """Firma MinHash (arreglo NumPy de num_perm enteros) de un conjunto de trigramas"""
+    import numpy as np
+
+    a, b = _permutations(num_perm)
+    hashes = np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+    return ((np.outer(hashes, a) + b) % _PRIME).min(axis=0)
+
+
+@lru_cache(maxsize=64)
+def lsh_parameters(threshold: float, num_perm: int = NUM_PERMUTATIONS) -> Tuple[int, int]:
+    """
+    (bandas, filas por banda) que minimizan la suma de falsos positivos y
+    falsos negativos alrededor del umbral de similitud.
+    """
+    def probability(similarity: float, bands: int, rows: int) -> float:
+        return 1 - (1 - similarity ** rows) ** bands
+
+    def integrate(function, start: float, end: float, steps: int = 100) -> float:
+        width = (end - start) / steps
+        return sum(function(start + (i + 0.5) * width) for i in range(steps)) * width
+
+    best, best_error = (num_perm, 1), float("inf")
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        rows = num_perm // bands
+        false_positive = integrate(lambda s: probability(s, bands, rows), 0.0, threshold)
+        false_negative = integrate(lambda s: 1 - probability(s, bands, rows), threshold, 1.0)
+        if false_positive + false_negative < best_error:
+            best, best_error = (bands, rows), false_positive + false_negative
+    return best
+
+
+def _amount_bucket(amount) -> int:
+    return int((Decimal(str(amount)) * 100).to_integral_value())
+
+
+# ============================
+# Índice LSH
+# ============================
+
+class NearDuplicateIndex:
+    """Índice MinHash/LSH de descripciones, separado por monto exacto"""
+
+    def __init__(self, threshold: Optional[float] = None, window_days: Optional[int] = None,
+                 num_perm: int = NUM_PERMUTATIONS):
+        self.threshold = settings.NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+        self.window_days = settings.NEAR_DUPLICATE_WINDOW_DAYS if window_days is None else window_days
+        if not 0 < self.threshold <= 1:
+            raise ValueError("El umbral de similitud debe estar entre 0 y 1")
+        if self.window_days < 0:
+            raise ValueError("La ventana de días no puede ser negativa")
+        self.num_perm = num_perm
+        self.bands, self.rows = lsh_parameters(round(self.threshold, 2), num_perm)
+        self._entries: Dict[int, Tuple[date, FrozenSet[str]]] = {}
+        self._buckets: Dict[Tuple[int, int, bytes], List[int]] = defaultdict(list)
+        # Fechas indexadas por monto: sin ninguna dentro de la ventana no hace falta calcular la firma
+        self._dates_by_amount: Dict[int, List[date]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _band_keys(self, shingles: FrozenSet[str], bucket: int) -> List[Tuple[int, int, bytes]]:
+        signature = minhash_signature(shingles, self.num_perm).reshape(self.bands, self.rows)
+        return [(bucket, band, signature[band].tobytes()) for band in range(self.bands)]
+
+    def add(self, transaction_id: int, description: Optional[str], amount, transaction_date: date) -> None:
+        shingles = description_shingles(description)
+        if not shingles or transaction_id in self._entries:
+            return
+        bucket = _amount_bucket(amount)
+        self._entries[transaction_id] = (transaction_date, shingles)
+        self._dates_by_amount[bucket].append(transaction_date)
+        for key in self._band_keys(shingles, bucket):
+            self._buckets[key].append(transaction_id)
+
+    def query(self, description: Optional[str], amount, transaction_date: date) -> List[NearDuplicateMatch]:
+        """Transacciones indexadas con el mismo monto, a ±window_days y similitud ≥ umbral"""
+        bucket = _amount_bucket(amount)
+        window = self.window_days
+        if not any(abs((indexed - transaction_date).days) <= window for indexed in self._dates_by_amount.get(bucket, ())):
+            return []
+        shingles = description_shingles(description)
+        if not shingles:
+            return []
+
+        candidates = set()
+        for key in self._band_keys(shingles, bucket):
+            candidates.update(self._buckets.get(key, ()))
+
+        matches = []
+        for transaction_id in candidates:
+            candidate_date, candidate_shingles = self._entries[transaction_id]
+            if abs((candidate_date - transaction_date).days) > window:
+                continue
+            similarity = jaccard(shingles, candidate_shingles)
+            if similarity >= self.threshold:
+                matches.append(NearDuplicateMatch(transaction_id, similarity, candidate_date))
+        matches.sort(key=lambda match: (-match.similarity, match.transaction_id))
+        return matches
+
+
+class AccountNearDuplicateIndex(NearDuplicateIndex):
+    """
+    Historial de una cuenta para la importación. Las transacciones se cargan
+    por tramos de fechas a medida que llegan filas, y solo las que existían
+    antes de empezar (las filas del mismo archivo no se comparan entre sí).
+    """
+
+    def __init__(self, db: Session, user_id: int, account_id: int, **kwargs):
+        super().__init__(**kwargs)
+        self.user_id = user_id
+        self.account_id = account_id
+        self.max_id = db.execute(
+            select(func.max(Transaction.id)).where(Transaction.user_id == user_id)
+        ).scalar() or 0
+        self._loaded: Optional[Tuple[date, date]] = None
+
+    def _load(self, db: Session, start: date, end: date) -> None:
+        rows = db.execute(
+            select(Transaction.id, Transaction.description, Transaction.amount, Transaction.transaction_date).where(
+                Transaction.user_id == self.user_id,
+                Transaction.account_id == self.account_id,
+                Transaction.id <= self.max_id,
+                Transaction.transaction_date >= start,
+                Transaction.transaction_date <= end,
+            )
+        ).all()
+        for row in rows:
+            self.add(row.id, row.description, row.amount, row.transaction_date)
+
+    def ensure_loaded(self, db: Session, transaction_date: date) -> None:
+        start = transaction_date - timedelta(days=self.window_days)
+        end = transaction_date + timedelta(days=self.window_days)
+        if self._loaded is None:
+            self._load(db, start, end + timedelta(days=LOAD_CHUNK_DAYS))
+            self._loaded = (start, end + timedelta(days=LOAD_CHUNK_DAYS))
+            return
+
+        loaded_start, loaded_end = self._loaded
+        if start < loaded_start:
+            new_start = min(start, loaded_start - timedelta(days=LOAD_CHUNK_DAYS))
+            self._load(db, new_start, loaded_start - timedelta(days=1))
+            loaded_start = new_start
+        if end > loaded_end:
+            new_end = max(end, loaded_end + timedelta(days=LOAD_CHUNK_DAYS))
+            self._load(db, loaded_end + timedelta(days=1), new_end)
+            loaded_end = new_end
+        self._loaded = (loaded_start, loaded_end)
+
+    def find(self, db: Session, description: Optional[str], amount, transaction_date: date) -> List[NearDuplicateMatch]:
+        self.ensure_loaded(db, transaction_date)
+        return self.query(description, amount, transaction_date)
+
+
+# ============================
+# Reporte de posibles duplicados
+# ============================
+
+def find_near_duplicates(
+    db: Session,
+    user_id: int,
+    account_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    threshold: Optional[float] = None,
+    window_days: Optional[int] = None,
+    limit: int = MAX_REPORT_GROUPS
+) -> Dict[str, Any]:
+    """
+    Grupos de transacciones del usuario que parecen el mismo movimiento:
+    misma cuenta y monto, a ±window_days y con descripciones similares. Cada
+    transacción se compara solo con las anteriores de su cuenta (recorrido
+    por fecha) y los pares encontrados se unen en grupos.
+    """
+    query = select(
+        Transaction.id, Transaction.account_id, Transaction.description,
+        Transaction.amount, Transaction.transaction_date
+    ).where(Transaction.user_id == user_id)
+    if account_id is not None:
+        query = query.where(Transaction.account_id == account_id)
+    if start_date is not None:
+        query = query.where(Transaction.transaction_date >= start_date)
+    if end_date is not None:
+        query = query.where(Transaction.transaction_date <= end_date)
+    query = query.order_by(Transaction.account_id, Transaction.transaction_date, Transaction.id)
+
+    indexes: Dict[int, NearDuplicateIndex] = {}
+    rows: Dict[int, Any] = {}
+    parent: Dict[int, int] = {}
+    best: Dict[int, float] = {}
+
+    def root(transaction_id: int) -> int:
+        while parent[transaction_id] != transaction_id:
+            parent[transaction_id] = parent[parent[transaction_id]]
+            transaction_id = parent[transaction_id]
+        return transaction_id
+
+    index = None
+    for row in db.execute(query):
+        index = indexes.get(row.account_id)
+        if index is None:
+            index = indexes.setdefault(row.account_id, NearDuplicateIndex(threshold, window_days))
+        for match in index.query(row.description, row.amount, row.transaction_date):
+            parent.setdefault(row.id, row.id)
+            parent.setdefault(match.transaction_id, match.transaction_id)
+            first, second = root(row.id), root(match.transaction_id)
+            if first != second:
+                parent[second] = first
+                best[first] = max(best.get(first, 0.0), best.pop(second, 0.0), match.similarity)
+            else:
+                best[first] = max(best.get(first, 0.0), match.similarity)
+        index.add(row.id, row.description, row.amount, row.transaction_date)
+        rows[row.id] = row
+
+    members: Dict[int, List[int]] = defaultdict(list)
+    for transaction_id in parent:
+        members[root(transaction_id)].append(transaction_id)
+
+    groups = []
+    for group_root, transaction_ids in members.items():
+        group_rows = sorted((rows[transaction_id] for transaction_id in transaction_ids),
+                            key=lambda row: (row.transaction_date, row.id))
+        groups.append({
+            'account_id': group_rows[0].account_id,
+            'similarity': round(best.get(group_root, 0.0), 4),
+            'transactions': [
+                {
+                    'id': row.id,
+                    'transaction_date': row.transaction_date,
+                    'amount': row.amount,
+                    'description': row.description,
+                }
+                for row in group_rows
+            ],
+        })
+    groups.sort(key=lambda group: (-group['similarity'], group['transactions'][0]['transaction_date']))
+
+    reference = index or NearDuplicateIndex(threshold, window_days)
+    logger.info(f"Reporte de casi-duplicados para usuario {user_id}: {len(groups)} grupos en {len(rows)} transacciones")
+    return {
+        'threshold': reference.threshold,
+        'window_days': reference.window_days,
+        'total_groups': len(groups),
+        'groups': groups[:limit],
+    }
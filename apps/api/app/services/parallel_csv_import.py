@@ -0,0 +1,158 @@
+"""
+Parseo paralelo de CSV grandes.
+
+Sobre cierto tamaño, el contenido se corta en bloques de bytes en límites de
+fila seguros (un salto de línea fuera de campos entre comillas) y cada bloque se decodifica,
+parsea y valida en un proceso aparte con el extractor compilado del perfil
+(ver import_profile_compiler). Los resultados se consumen en el orden original del archivo y cada
+fila conserva su número real, de modo que los errores se reportan igual que
+en el parseo secuencial. La inserción en la base sigue siendo secuencial.
+"""
+
+import codecs
+import csv
+import io
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..utils.amount_parser import AmountParseError
+
+logger = logging.getLogger(__name__)
+
+# Bloques por worker: algo más de uno para repartir mejor filas de distinto costo
+CHUNKS_PER_WORKER = 4
+
+# Resultado por fila: (número de fila, transacción o None, excepción o None)
+ParsedRow = Tuple[int, Any, Optional[Exception]]
+
+
+def supports_byte_splitting(encoding: str) -> bool:
+    """True si el encoding representa salto de línea y comillas como en ASCII"""
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        return False
+    return "\n".encode(encoding) == b"\n" and '"'.encode(encoding) == b'"'
+
+
+@lru_cache(maxsize=8)
+def _quoted_field_pattern(delimiter: str) -> "re.Pattern[bytes]":
+    """
+    Campo entre comillas completo. Como en el módulo csv, una comilla solo abre
+    un campo al inicio del campo (inicio de línea o tras el delimitador); una
+    comilla suelta dentro de un campo sin comillas (`MONITOR 27" LG`) es literal.
+    """
+    separator = re.escape(delimiter.encode())
+    return re.compile(rb'(?:(?<=' + separator + rb')|(?<=\n)|\A)"[^"]*(?:""[^"]*)*"')
+
+
+def find_record_end(content: bytes, start: int, delimiter: str = ",", record_start: int = 0) -> int:
+    """
+    Posición siguiente al primer salto de línea desde `start` que no queda
+    dentro de un campo entre comillas. `record_start` (<= start) debe ser un
+    inicio de registro: los campos entre comillas se reconocen desde ahí.
+    Devuelve len(content) si no hay más límites.
+    """
+    newline = content.find(b"\n", start)
+    for match in _quoted_field_pattern(delimiter).finditer(content, record_start):
+        if newline == -1 or match.start() > newline:
+            break
+        if match.end() > newline:
+            # El salto de línea es parte del campo: buscar el siguiente tras el cierre
+            newline = content.find(b"\n", max(match.end(), start))
+    return len(content) if newline == -1 else newline + 1
+
+
+def split_csv_chunks(content: bytes, parts: int, start: int = 0, delimiter: str = ",") -> List[Tuple[int, int]]:
+    """Rangos [inicio, fin) de hasta `parts` bloques cortados en límites de fila seguros"""
+    total = len(content)
+    if start >= total:
+        return []
+    target_size = max((total - start) // max(parts, 1), 1)
+
+    chunks = []
+    chunk_start = start
+    while chunk_start < total:
+        target = chunk_start + target_size
+        chunk_end = find_record_end(content, target, delimiter, chunk_start) if target < total else total
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end
+    return chunks
+
+
+def _parse_chunk(task: Dict[str, Any]) -> Tuple[int, List[Tuple[int, Any, Optional[Exception]]]]:
+    """
+    Worker: parsea y valida un bloque. Devuelve la cantidad de registros CSV
+    del bloque y, por cada fila no vacía, (índice local, transacción, error).
+    """
+    extract = task["extractor"].extract
+    default_status_id = task["default_status_id"]
+    text = task["content"].decode(task["encoding"])
+    parsed = []
+    count = 0
+    for local_index, row in enumerate(csv.reader(io.StringIO(text), delimiter=task["delimiter"])):
+        count += 1
+        if not row or all(not cell.strip() for cell in row):
+            continue
+        try:
+            transaction_data = extract(row, local_index, default_status_id)
+            parsed.append((local_index, transaction_data, None))
+        except AmountParseError as e:
+            parsed.append((local_index, None, e))
+        except Exception as e:
+            # Otras excepciones (p. ej. de pydantic) no siempre se pueden serializar
+            parsed.append((local_index, None, ValueError(str(e))))
+    return count, parsed
+
+
+def default_worker_count() -> int:
+    return max(os.cpu_count() or 1, 1)
+
+
+def parse_csv_in_parallel(
+    content: bytes,
+    data_start: int,
+    first_row: int,
+    encoding: str,
+    delimiter: str,
+    extractor,
+    default_status_id: int,
+    workers: Optional[int] = None
+) -> Iterator[ParsedRow]:
+    """
+    Parsea en paralelo las filas de datos que empiezan en el byte `data_start`
+    y cuyo primer registro es la fila `first_row` (base 1) del archivo.
+
+    Devuelve las filas no vacías en el orden del archivo como
+    (número de fila, TransactionCreateRequest o None, excepción o None).
+    """
+    workers = workers or default_worker_count()
+    chunks = split_csv_chunks(content, workers * CHUNKS_PER_WORKER, data_start, delimiter)
+    if not chunks:
+        return
+
+    tasks = [
+        {
+            "content": content[start:end],
+            "encoding": encoding,
+            "delimiter": delimiter,
+            "extractor": extractor,
+            "default_status_id": default_status_id,
+        }
+        for start, end in chunks
+    ]
+    logger.info(f"Parseando CSV de {len(content)} bytes en {len(tasks)} bloques con {workers} procesos")
+
+    # spawn: los workers no heredan conexiones ni locks del proceso de la API
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        row_base = first_row
+        for count, parsed in executor.map(_parse_chunk, tasks):
+            for local_index, transaction_data, error in parsed:
+                yield row_base + local_index, transaction_data, error
+            row_base += count
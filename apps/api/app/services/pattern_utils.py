@@ -2,6 +2,7 @@
 Utilidades para integrar patrones de descripción con transacciones
 """
 
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 from typing import Optional
 import logging
@@ -94,12 +95,6 @@ def apply_patterns_bulk(db: Session, user_id: int, pattern_ids: Optional[list] =
     try:
         from ..models.transactions import Transaction
         
-        # Obtener transacciones del usuario
-        transactions = db.query(Transaction).filter(
-            Transaction.user_id == user_id,
-            Transaction.description.isnot(None)
-        ).all()
-        
         # Obtener patrones del usuario
         patterns = DescriptionPatternService.get_user_patterns(
             db, user_id, active_only=True
@@ -107,15 +102,32 @@ def apply_patterns_bulk(db: Session, user_id: int, pattern_ids: Optional[list] =
         
         if pattern_ids:
             patterns = [p for p in patterns if p.id in pattern_ids]
+        patterns = sorted(patterns, key=lambda x: getattr(x, 'priority', 0), reverse=True)
+        
+        # Obtener transacciones del usuario. Si ningún patrón es regex, solo se
+        # cargan las que podrían coincidir (filtro sobre description_normalized)
+        query = db.query(Transaction).filter(
+            Transaction.user_id == user_id,
+            Transaction.description.isnot(None)
+        )
+        prefilters = [DescriptionPatternService.pattern_prefilter(pattern) for pattern in patterns]
+        if not patterns:
+            transactions = []
+            total_transactions = query.count()
+        elif any(prefilter is None for prefilter in prefilters):
+            transactions = query.all()
+            total_transactions = len(transactions)
+        else:
+            transactions = query.filter(or_(*prefilters)).all()
+            total_transactions = query.count()
         
         applied_count = 0
-        total_transactions = len(transactions)
         
         for transaction in transactions:
             desc = getattr(transaction, 'description', None)
             if desc and str(desc).strip():
                 # Encontrar el patrón con mayor prioridad que coincida
-                for pattern in sorted(patterns, key=lambda x: getattr(x, 'priority', 0), reverse=True):
+                for pattern in patterns:
                     matched, matched_text = DescriptionPatternService.test_pattern_match(
                         pattern, str(desc)
                     )
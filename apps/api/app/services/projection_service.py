@@ -0,0 +1,365 @@
+"""
+Motor de proyecciones financieras.
+
+Llena `monthly_projections` y `projection_details` (la proyección base del
+usuario, no las simulaciones) a partir de `projection_settings` y del
+historial de transacciones.
+
+Todo el cálculo se hace con NumPy sobre una matriz subcategorías × meses:
+
+- La base de cada subcategoría es su monto neto mensual promedio en los
+  últimos 12 meses cerrados (una sola consulta agrupada por subcategoría y
+  mes). Los meses anteriores a la primera transacción del usuario no cuentan
+  en el promedio.
+- Los meses proyectados, desde el mes actual, aplican el crecimiento anual
+  compuesto mes a mes: `income_growth_rate` a las subcategorías de ingreso y
+  `inflation_rate` a las de gasto.
+- Los meses cerrados desde el inicio del plan (máximo 12) usan los montos
+  reales y se marcan con `is_actual`.
+- Los saldos se encadenan desde `initial_balance` con una suma acumulada.
+
+Recalcular la matriz cuesta milisegundos; lo caro es escribir. Por eso la
+persistencia compara cada mes calculado con lo guardado y solo reescribe los
+meses que cambiaron: un cambio de tasas toca los meses proyectados, una
+transacción nueva en un mes cerrado toca ese mes y los saldos posteriores.
+Los encabezados se escriben con un upsert en lote sobre (usuario, mes) y el
+detalle de cada mes modificado se reemplaza con un insert en lote.
+
+Uso:
+    refresh_projection(db, user_id)
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, extract, func, select, update
+from sqlalchemy.orm import Session
+
+from ..models.categories import Subcategory
+from ..models.projections import MonthlyProjections, ProjectionDetails, ProjectionSettings
+from ..models.transactions import Transaction
+from .balance_checkpoint_service import month_start
+
+logger = logging.getLogger(__name__)
+
+# Meses cerrados que se promedian para la base de cada subcategoría
+BASELINE_MONTHS = 12
+# Meses cerrados con montos reales que se conservan al inicio del horizonte
+ACTUAL_MONTHS = 12
+CENT = Decimal("0.01")
+HEADER_FIELDS = ("initial_balance", "income_total", "expense_total", "monthly_balance", "end_balance")
+
+
+class ProjectionResult(NamedTuple):
+    series: Any            # (subcategorías, meses) montos netos por mes
+    is_actual: Any         # (meses,) True para meses con montos reales
+    income: Any            # (meses,)
+    expense: Any           # (meses,) en valor absoluto
+    monthly_balance: Any   # (meses,)
+    initial_balance: Any   # (meses,) saldo al inicio de cada mes
+    end_balance: Any       # (meses,)
+
+
+# ============================
+# Utilidades
+# ============================
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def months_between(first: date, last: date) -> int:
+    """Número de meses desde `first` hasta `last` (excluido)"""
+    return (last.year - first.year) * 12 + last.month - first.month
+
+
+def month_key(value: date) -> str:
+    return value.strftime("%Y-%m")
+
+
+def _money(value: Any) -> Decimal:
+    return Decimal(str(value or 0)).quantize(CENT)
+
+
+# ============================
+# Cálculo vectorizado
+# ============================
+
+def growth_factors(annual_rate: float, months: int):
+    """Factor de crecimiento compuesto de cada mes proyectado respecto del mes actual"""
+    import numpy as np
+
+    return (1.0 + annual_rate) ** (np.arange(months) / 12.0)
+
+
+def compute_projection(
+    history,
+    active_months: int,
+    actuals,
+    horizon: int,
+    initial_balance: float,
+    inflation_rate: float,
+    income_growth_rate: float,
+) -> ProjectionResult:
+    """
+    Calcula la proyección completa.
+
+    `history` (S × BASELINE_MONTHS) son los montos netos mensuales usados como
+    base, de los que `active_months` meses tienen historial. `actuals`
+    (S × A) son los meses cerrados que se copian tal cual al inicio del
+    horizonte, seguidos de `horizon` meses proyectados.
+    """
+    import numpy as np
+
+    history = np.asarray(history, dtype=float)
+    actuals = np.asarray(actuals, dtype=float)
+
+    baseline = history.sum(axis=1) / max(active_months, 1)
+    factors = np.where(
+        (baseline > 0)[:, None],
+        growth_factors(income_growth_rate, horizon),
+        growth_factors(inflation_rate, horizon),
+    )
+    series = np.round(np.hstack([actuals, baseline[:, None] * factors]), 2)
+    is_actual = np.arange(series.shape[1]) < actuals.shape[1]
+
+    income = np.where(series > 0, series, 0.0).sum(axis=0)
+    expense = -np.where(series < 0, series, 0.0).sum(axis=0)
+    monthly_balance = income - expense
+    end_balance = initial_balance + np.cumsum(monthly_balance)
+    return ProjectionResult(series, is_actual, income, expense, monthly_balance,
+                            end_balance - monthly_balance, end_balance)
+
+
+# ============================
+# Carga de datos
+# ============================
+
+def get_or_create_projection_settings(db: Session, user_id: int) -> ProjectionSettings:
+    settings = db.query(ProjectionSettings).filter(ProjectionSettings.user_id == user_id).first()
+    if settings is None:
+        now = datetime.utcnow()
+        settings = ProjectionSettings(
+            user_id=user_id,
+            initial_balance=Decimal("0"),
+            inflation_rate=Decimal("0.03"),
+            income_growth_rate=Decimal("0.03"),
+            projection_months=36,
+            created_at=now,
+            updated_at=now,
+        )
+        db.add(settings)
+        db.flush()
+    return settings
+
+
+def cash_flow_filters(user_id: int) -> List[Any]:
+    # Las transferencias entre cuentas propias y las transacciones planificadas no son flujo real
+    return [
+        Transaction.user_id == user_id,
+        Transaction.transfer_account_id.is_(None),
+        Transaction.is_planned.is_(False),
+    ]
+
+
+def _monthly_matrix(db: Session, user_id: int, first: date, end: date) -> Tuple[List[Tuple[Optional[int], Optional[int]]], Any]:
+    """
+    Montos netos por subcategoría y mes en [first, end) con una consulta
+    agrupada. Devuelve las claves (subcategory_id, category_id) de cada fila
+    de la matriz; las transacciones sin subcategoría quedan en la última fila.
+    """
+    import numpy as np
+
+    year = extract("year", Transaction.transaction_date)
+    month = extract("month", Transaction.transaction_date)
+    rows = db.execute(
+        select(Transaction.subcategory_id, Subcategory.category_id, year.label("year"), month.label("month"),
+               func.sum(Transaction.amount).label("total"))
+        .outerjoin(Subcategory, Subcategory.id == Transaction.subcategory_id)
+        .where(*cash_flow_filters(user_id), Transaction.transaction_date >= first, Transaction.transaction_date < end)
+        .group_by(Transaction.subcategory_id, Subcategory.category_id, year, month)
+    ).all()
+
+    keys = sorted({(row.subcategory_id, row.category_id) for row in rows},
+                  key=lambda key: (key[0] is None, key[0] or 0))
+    matrix = np.zeros((len(keys), months_between(first, end)))
+    if rows:
+        position = {key[0]: index for index, key in enumerate(keys)}
+        matrix[
+            [position[row.subcategory_id] for row in rows],
+            [months_between(first, date(int(row.year), int(row.month), 1)) for row in rows],
+        ] = [float(row.total or 0) for row in rows]
+    return keys, matrix
+
+
+# ============================
+# Persistencia incremental
+# ============================
+
+def _stored_projection(db: Session, user_id: int):
+    headers = {
+        row.month_year: row
+        for row in db.execute(
+            select(MonthlyProjections.id, MonthlyProjections.month_year,
+                   *(getattr(MonthlyProjections, field) for field in HEADER_FIELDS))
+            .where(MonthlyProjections.user_id == user_id, MonthlyProjections.is_simulation.is_(False))
+        )
+    }
+    details: Dict[int, Dict[int, Tuple[Decimal, bool]]] = defaultdict(dict)
+    for row in db.execute(
+        select(ProjectionDetails.projection_id, ProjectionDetails.subcategory_id,
+               ProjectionDetails.amount, ProjectionDetails.is_actual)
+        .join(MonthlyProjections, MonthlyProjections.id == ProjectionDetails.projection_id)
+        .where(MonthlyProjections.user_id == user_id, MonthlyProjections.is_simulation.is_(False))
+    ):
+        details[row.projection_id][row.subcategory_id] = (_money(row.amount), bool(row.is_actual))
+    return headers, details
+
+
+def _upsert_headers(db: Session, rows: List[Dict[str, Any]], existing: Dict[str, int]) -> None:
+    """Upsert en lote de encabezados mensuales sobre (user_id, month_year)"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        updates = [{"id": existing[row["month_year"]], **row} for row in rows if row["month_year"] in existing]
+        inserts = [row for row in rows if row["month_year"] not in existing]
+        if updates:
+            db.execute(update(MonthlyProjections), updates)
+        if inserts:
+            db.execute(MonthlyProjections.__table__.insert(), inserts)
+        return
+
+    statement = insert(MonthlyProjections.__table__)
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=["user_id", "month_year"],
+            index_where=MonthlyProjections.is_simulation.is_(False),
+            set_={field: statement.excluded[field] for field in (*HEADER_FIELDS, "updated_at")},
+        ),
+        rows,
+    )
+
+
+def _delete_months(db: Session, projection_ids: Sequence[int], keep_headers: bool = False) -> None:
+    if not projection_ids:
+        return
+    db.execute(delete(ProjectionDetails).where(ProjectionDetails.projection_id.in_(projection_ids)))
+    if not keep_headers:
+        db.execute(delete(MonthlyProjections).where(MonthlyProjections.id.in_(projection_ids)))
+
+
+def refresh_projection(db: Session, user_id: int, today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Recalcula la proyección base del usuario y persiste solo los meses que
+    cambiaron. Hace commit y devuelve un resumen.
+    """
+    import numpy as np
+
+    current = month_start(today or date.today())
+    settings = get_or_create_projection_settings(db, user_id)
+    for field in ("inflation_rate", "income_growth_rate"):
+        if getattr(settings, field) is not None and not getattr(settings, field) > -1:
+            raise ValueError(f"La tasa '{field}' debe ser mayor que -100%")
+    plan_start = month_start(settings.created_at.date()) if settings.created_at else current
+    first_month = max(min(plan_start, current), add_months(current, -ACTUAL_MONTHS))
+    history_start = min(first_month, add_months(current, -BASELINE_MONTHS))
+
+    keys, matrix = _monthly_matrix(db, user_id, history_start, current)
+    first_transaction = db.execute(
+        select(func.min(Transaction.transaction_date)).where(*cash_flow_filters(user_id))
+    ).scalar()
+    active_months = 0
+    if first_transaction is not None:
+        active_months = min(BASELINE_MONTHS, max(0, months_between(month_start(first_transaction), current)))
+
+    result = compute_projection(
+        matrix[:, matrix.shape[1] - BASELINE_MONTHS:],
+        active_months,
+        matrix[:, months_between(history_start, first_month):],
+        settings.projection_months,
+        float(settings.initial_balance or 0),
+        float(settings.inflation_rate or 0),
+        float(settings.income_growth_rate or 0),
+    )
+    months = [month_key(add_months(first_month, offset)) for offset in range(result.series.shape[1])]
+
+    # Detalle calculado por mes: {subcategory_id: (monto, is_actual)}
+    computed_details: List[Dict[int, Tuple[Decimal, bool]]] = [{} for _ in months]
+    categorized = [index for index, key in enumerate(keys) if key[0] is not None]
+    for row, column in zip(*np.nonzero(result.series[categorized])):
+        computed_details[column][keys[categorized[row]][0]] = (
+            _money(result.series[categorized[row], column]), bool(result.is_actual[column])
+        )
+
+    stored_headers, stored_details = _stored_projection(db, user_id)
+    now = datetime.utcnow()
+    changed_rows = []
+    changed_columns = []
+    for column, month_year in enumerate(months):
+        header = {
+            "initial_balance": _money(result.initial_balance[column]),
+            "income_total": _money(result.income[column]),
+            "expense_total": _money(result.expense[column]),
+            "monthly_balance": _money(result.monthly_balance[column]),
+            "end_balance": _money(result.end_balance[column]),
+        }
+        stored = stored_headers.get(month_year)
+        if (stored is not None
+                and all(_money(getattr(stored, field)) == value for field, value in header.items())
+                and stored_details.get(stored.id, {}) == computed_details[column]):
+            continue
+        changed_rows.append({"user_id": user_id, "month_year": month_year, "is_simulation": False,
+                             "created_at": now, "updated_at": now, **header})
+        changed_columns.append(column)
+
+    horizon_months = set(months)
+    obsolete = [row.id for month_year, row in stored_headers.items() if month_year not in horizon_months]
+    _delete_months(db, obsolete)
+
+    if changed_rows:
+        _upsert_headers(db, changed_rows, {month_year: row.id for month_year, row in stored_headers.items()})
+        projection_ids = dict(db.execute(
+            select(MonthlyProjections.month_year, MonthlyProjections.id).where(
+                MonthlyProjections.user_id == user_id,
+                MonthlyProjections.is_simulation.is_(False),
+                MonthlyProjections.month_year.in_([row["month_year"] for row in changed_rows]),
+            )
+        ).all())
+        _delete_months(db, list(projection_ids.values()), keep_headers=True)
+
+        categories = {key[0]: key[1] for key in keys}
+        detail_rows = [
+            {
+                "projection_id": projection_ids[row["month_year"]],
+                "category_id": categories[subcategory_id],
+                "subcategory_id": subcategory_id,
+                "amount": amount,
+                "is_actual": is_actual,
+                "financial_bucket": "income" if amount > 0 else "expense",
+                "created_at": now,
+                "updated_at": now,
+            }
+            for row, column in zip(changed_rows, changed_columns)
+            for subcategory_id, (amount, is_actual) in computed_details[column].items()
+        ]
+        if detail_rows:
+            db.execute(ProjectionDetails.__table__.insert(), detail_rows)
+
+    db.commit()
+    summary = {
+        "months": len(months),
+        "actual_months": int(result.is_actual.sum()),
+        "subcategories": len(categorized),
+        "months_written": len(changed_rows),
+        "months_unchanged": len(months) - len(changed_rows),
+        "months_deleted": len(obsolete),
+    }
+    logger.info(f"Proyección del usuario {user_id}: {summary}")
+    return summary
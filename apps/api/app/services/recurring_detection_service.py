@@ -0,0 +1,360 @@
+"""
+Detección de transacciones recurrentes.
+
+Llena `recurring_patterns` y `transactions.recurring_pattern_id` a partir
+del historial. Las transacciones se agrupan por cuenta, descripción
+normalizada (`description_normalized`) y banda de monto (montos del mismo
+signo que varían menos de un 15% entre sí, como una cuenta de luz). La
+periodicidad de todos los grupos se analiza de una vez con NumPy sobre las
+diferencias entre fechas consecutivas: un grupo es semanal, mensual o anual
+si al menos el 75% de sus intervalos cae dentro de la tolerancia de ese
+periodo.
+
+La detección es incremental: cada usuario guarda la última transacción
+analizada (`recurring_detection_state`) y cada ejecución solo mira las
+transacciones nuevas. Primero se intenta enlazarlas a un patrón existente
+(misma descripción, monto dentro de la banda y fecha en el calendario del
+patrón); las que no encajan disparan el análisis de su grupo, que solo carga
+el historial sin patrón de esas descripciones. El costo de una ejecución
+nocturna depende de los datos nuevos, no del historial completo.
+
+Uso:
+    detect_recurring_transactions(db, user_id)   # un usuario
+    run_recurring_detection(db)                  # todos los usuarios con datos nuevos
+"""
+
+import calendar
+import logging
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from itertools import chain
+from statistics import median
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from ..models.recurring_patterns import RecurringDetectionState, RecurringPattern
+from ..models.transactions import Transaction
+
+logger = logging.getLogger(__name__)
+
+# Periodo en días y tolerancia (días) de cada frecuencia
+FREQUENCIES: Dict[str, Tuple[float, float]] = {
+    'weekly': (7.0, 1.5),
+    'monthly': (30.44, 4.0),
+    'yearly': (365.25, 7.0),
+}
+MIN_OCCURRENCES = 3
+MIN_REGULARITY = 0.75
+AMOUNT_BAND = Decimal("0.15")
+# Periodos sin movimiento que se toleran al enlazar una transacción nueva a un patrón
+MAX_MISSED_PERIODS = 2
+KEY_CHUNK_SIZE = 500
+LINK_CHUNK_SIZE = 1000
+
+
+class RecurringCandidate(NamedTuple):
+    id: int
+    account_id: int
+    description: Optional[str]
+    description_normalized: str
+    amount: Decimal
+    transaction_date: date
+
+
+_CANDIDATE_COLUMNS = (
+    Transaction.id, Transaction.account_id, Transaction.description,
+    Transaction.description_normalized, Transaction.amount, Transaction.transaction_date,
+)
+
+
+# ============================
+# Análisis
+# ============================
+
+def amount_bands(amounts: Sequence[Decimal]) -> List[int]:
+    """
+    Banda de cada monto (en el orden de entrada). Ordenados, se abre una
+    banda nueva al cambiar de signo o cuando un monto se aleja más de
+    AMOUNT_BAND del anterior.
+    """
+    labels = [0] * len(amounts)
+    band, previous = 0, None
+    for index in sorted(range(len(amounts)), key=lambda i: amounts[i]):
+        amount = amounts[index]
+        if previous is not None and (
+            (amount < 0) != (previous < 0)
+            or abs(amount - previous) > AMOUNT_BAND * max(abs(amount), abs(previous))
+        ):
+            band += 1
+        labels[index] = band
+        previous = amount
+    return labels
+
+
+def classify_periodicity(groups: Sequence[Sequence[date]]) -> List[Optional[str]]:
+    """
+    Frecuencia de cada grupo de fechas (o None). Todos los grupos se evalúan
+    juntos: las fechas se concatenan en un arreglo y los intervalos de cada
+    grupo se cuentan con bincount.
+    """
+    if not groups:
+        return []
+    import numpy as np
+
+    days_per_group = [sorted({value.toordinal() for value in dates}) for dates in groups]
+    lengths = np.fromiter((len(days) for days in days_per_group), dtype=np.int64, count=len(groups))
+    days = np.fromiter(chain.from_iterable(days_per_group), dtype=np.int64, count=int(lengths.sum()))
+    group_ids = np.repeat(np.arange(len(groups)), lengths)
+
+    same_group = group_ids[1:] == group_ids[:-1]
+    deltas = np.diff(days)[same_group]
+    delta_groups = group_ids[1:][same_group]
+    totals = np.maximum(np.bincount(delta_groups, minlength=len(groups)), 1)
+    eligible = lengths >= MIN_OCCURRENCES
+
+    best = np.full(len(groups), -1)
+    best_score = np.zeros(len(groups))
+    for index, (period, tolerance) in enumerate(FREQUENCIES.values()):
+        within = (np.abs(deltas - period) <= tolerance).astype(np.float64)
+        score = np.bincount(delta_groups, weights=within, minlength=len(groups)) / totals
+        better = eligible & (score >= MIN_REGULARITY) & (score > best_score)
+        best[better] = index
+        best_score[better] = score[better]
+
+    names = list(FREQUENCIES)
+    return [names[index] if index >= 0 else None for index in best.tolist()]
+
+
+def _add_months(value: date, months: int, day: int) -> date:
+    month_index = value.month - 1 + months
+    year, month = value.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+def next_expected_date(pattern: RecurringPattern) -> Optional[date]:
+    last = pattern.last_transaction_date
+    if last is None:
+        return None
+    if pattern.frequency == 'weekly':
+        return last + timedelta(days=7)
+    if pattern.frequency == 'monthly':
+        return _add_months(last, 1, pattern.day_of_month or last.day)
+    if pattern.frequency == 'yearly':
+        return _add_months(last, 12, pattern.day_of_month or last.day)
+    return None
+
+
+def _fits_pattern(pattern: RecurringPattern, row: RecurringCandidate) -> bool:
+    """La transacción tiene la cuenta, el monto y la fecha que el patrón espera"""
+    if pattern.account_id is not None and pattern.account_id != row.account_id:
+        return False
+    expected = Decimal(str(pattern.amount))
+    amount = Decimal(str(row.amount))
+    if (amount < 0) != (expected < 0) or abs(amount - expected) > AMOUNT_BAND * abs(expected):
+        return False
+    if pattern.frequency not in FREQUENCIES or pattern.last_transaction_date is None:
+        return False
+
+    period, tolerance = FREQUENCIES[pattern.frequency]
+    gap = abs((row.transaction_date - pattern.last_transaction_date).days)
+    periods = round(gap / period)
+    return 1 <= periods <= MAX_MISSED_PERIODS + 1 and abs(gap - periods * period) <= tolerance * periods ** 0.5
+
+
+def _mode(values) -> Optional[int]:
+    counts = Counter(values)
+    return counts.most_common(1)[0][0] if counts else None
+
+
+def _describe_pattern(pattern: RecurringPattern, rows: List[RecurringCandidate], frequency: str) -> None:
+    """Completa los campos del patrón con las transacciones del grupo"""
+    dates = [row.transaction_date for row in rows]
+    latest = max(rows, key=lambda row: (row.transaction_date, row.id))
+    pattern.name = (latest.description or latest.description_normalized).strip()
+    pattern.description = latest.description
+    pattern.amount = Decimal(str(median(Decimal(str(row.amount)) for row in rows))).quantize(Decimal("0.01"))
+    pattern.frequency = frequency
+    pattern.day_of_week = _mode(value.weekday() for value in dates) if frequency == 'weekly' else None
+    pattern.day_of_month = _mode(value.day for value in dates) if frequency in ('monthly', 'yearly') else None
+    pattern.month = _mode(value.month for value in dates) if frequency == 'yearly' else None
+    pattern.occurrence_count = (pattern.occurrence_count or 0) + len(rows)
+    pattern.last_transaction_date = max(dates + ([pattern.last_transaction_date] if pattern.last_transaction_date else []))
+    pattern.next_expected_date = next_expected_date(pattern)
+    pattern.is_active = True
+    pattern.updated_at = datetime.now()
+
+
+# ============================
+# Detección incremental
+# ============================
+
+def _load_patterns(db: Session, user_id: int, keys: Sequence[str]) -> Dict[str, List[RecurringPattern]]:
+    patterns: Dict[str, List[RecurringPattern]] = defaultdict(list)
+    for start in range(0, len(keys), KEY_CHUNK_SIZE):
+        for pattern in db.query(RecurringPattern).filter(
+            RecurringPattern.user_id == user_id,
+            RecurringPattern.match_key.in_(keys[start:start + KEY_CHUNK_SIZE]),
+        ).order_by(RecurringPattern.id):
+            patterns[pattern.match_key].append(pattern)
+    return patterns
+
+
+def _load_unlinked_history(db: Session, user_id: int, keys: Sequence[str], max_id: int) -> List[RecurringCandidate]:
+    rows: List[RecurringCandidate] = []
+    for start in range(0, len(keys), KEY_CHUNK_SIZE):
+        rows.extend(RecurringCandidate(*row) for row in db.execute(
+            select(*_CANDIDATE_COLUMNS).where(
+                Transaction.user_id == user_id,
+                Transaction.description_normalized.in_(keys[start:start + KEY_CHUNK_SIZE]),
+                Transaction.recurring_pattern_id.is_(None),
+                Transaction.id <= max_id,
+            )
+        ))
+    return rows
+
+
+def _link_transactions(db: Session, links: Dict[int, List[int]]) -> int:
+    linked = 0
+    for pattern_id, transaction_ids in links.items():
+        for start in range(0, len(transaction_ids), LINK_CHUNK_SIZE):
+            chunk = transaction_ids[start:start + LINK_CHUNK_SIZE]
+            db.execute(
+                update(Transaction)
+                .where(Transaction.id.in_(chunk))
+                .values(recurring_pattern_id=pattern_id, is_recurring=True)
+                .execution_options(synchronize_session=False)
+            )
+            linked += len(chunk)
+    return linked
+
+
+def detect_recurring_transactions(db: Session, user_id: int, full: bool = False) -> Dict[str, Any]:
+    """
+    Analiza las transacciones del usuario posteriores a la última ejecución
+    (todas con `full=True`), crea o actualiza sus patrones recurrentes y
+    enlaza las transacciones en bloque.
+    """
+    summary = {'processed_transactions': 0, 'linked_transactions': 0, 'patterns_created': 0, 'patterns_updated': 0}
+
+    state = db.get(RecurringDetectionState, user_id)
+    watermark = 0 if full or state is None else state.last_transaction_id
+    max_id = db.execute(select(func.max(Transaction.id)).where(Transaction.user_id == user_id)).scalar() or 0
+    if max_id <= watermark:
+        return summary
+
+    new_rows = [RecurringCandidate(*row) for row in db.execute(
+        select(*_CANDIDATE_COLUMNS).where(
+            Transaction.user_id == user_id,
+            Transaction.id > watermark,
+            Transaction.id <= max_id,
+            Transaction.recurring_pattern_id.is_(None),
+            Transaction.description_normalized.isnot(None),
+            Transaction.description_normalized != '',
+        )
+    )]
+    summary['processed_transactions'] = len(new_rows)
+
+    links: Dict[int, List[int]] = defaultdict(list)
+    updated = set()
+    leftover: List[RecurringCandidate] = []
+    if new_rows:
+        patterns = _load_patterns(db, user_id, sorted({row.description_normalized for row in new_rows}))
+
+        # 1. Enlazar a patrones activos las transacciones que caen en su calendario
+        for row in sorted(new_rows, key=lambda row: (row.transaction_date, row.id)):
+            pattern = next((
+                candidate for candidate in patterns.get(row.description_normalized, ())
+                if candidate.is_active and _fits_pattern(candidate, row)
+            ), None)
+            if pattern is None:
+                leftover.append(row)
+                continue
+            links[pattern.id].append(row.id)
+            pattern.occurrence_count = (pattern.occurrence_count or 0) + 1
+            pattern.last_transaction_date = max(pattern.last_transaction_date, row.transaction_date)
+            pattern.next_expected_date = next_expected_date(pattern)
+            pattern.updated_at = datetime.now()
+            updated.add(pattern.id)
+
+    # 2. Analizar los grupos de las transacciones que no encajaron
+    if leftover:
+        leftover_ids = {row.id for row in leftover}
+        history = _load_unlinked_history(db, user_id, sorted({row.description_normalized for row in leftover}), max_id)
+        history = [row for row in history if row.id in leftover_ids or row.id <= watermark]
+
+        by_key: Dict[Tuple[int, str], List[RecurringCandidate]] = defaultdict(list)
+        for row in history:
+            if row.amount:
+                by_key[(row.account_id, row.description_normalized)].append(row)
+
+        groups: List[Tuple[Tuple[int, str], List[RecurringCandidate]]] = []
+        for key, rows in by_key.items():
+            banded: Dict[int, List[RecurringCandidate]] = defaultdict(list)
+            for row, band in zip(rows, amount_bands([Decimal(str(row.amount)) for row in rows])):
+                banded[band].append(row)
+            groups.extend(
+                (key, members) for members in banded.values()
+                if any(member.id in leftover_ids for member in members)
+            )
+
+        frequencies = classify_periodicity([[row.transaction_date for row in members] for _, members in groups])
+        now = datetime.now()
+        for ((account_id, match_key), members), frequency in zip(groups, frequencies):
+            if frequency is None:
+                continue
+            # Actualizar un patrón existente equivalente (p. ej. inactivo) en vez de duplicarlo
+            amount = Decimal(str(median(Decimal(str(row.amount)) for row in members)))
+            pattern = next((
+                candidate for candidate in patterns.get(match_key, ())
+                if candidate.account_id == account_id and candidate.frequency == frequency
+                and (Decimal(str(candidate.amount)) < 0) == (amount < 0)
+                and abs(Decimal(str(candidate.amount)) - amount) <= AMOUNT_BAND * abs(amount)
+            ), None)
+            if pattern is None:
+                pattern = RecurringPattern(user_id=user_id, account_id=account_id, match_key=match_key,
+                                           occurrence_count=0, created_at=now)
+                db.add(pattern)
+                summary['patterns_created'] += 1
+            else:
+                updated.add(pattern.id)
+            _describe_pattern(pattern, members, frequency)
+            db.flush()
+            links[pattern.id].extend(row.id for row in members)
+            patterns[match_key].append(pattern)
+
+    summary['patterns_updated'] = len(updated)
+    summary['linked_transactions'] = _link_transactions(db, links)
+
+    if state is None:
+        state = RecurringDetectionState(user_id=user_id)
+        db.add(state)
+    state.last_transaction_id = max_id
+    state.updated_at = datetime.now()
+    db.commit()
+
+    logger.info(
+        f"Recurrencias usuario {user_id}: {summary['processed_transactions']} transacciones nuevas, "
+        f"{summary['linked_transactions']} enlazadas, {summary['patterns_created']} patrones nuevos"
+    )
+    return summary
+
+
+def run_recurring_detection(db: Session, full: bool = False) -> Dict[int, Dict[str, Any]]:
+    """Ejecuta la detección para los usuarios con transacciones posteriores a su última ejecución"""
+    pending = select(Transaction.user_id).outerjoin(
+        RecurringDetectionState, RecurringDetectionState.user_id == Transaction.user_id
+    ).group_by(Transaction.user_id)
+    if not full:
+        pending = pending.having(func.max(Transaction.id) > func.coalesce(func.max(RecurringDetectionState.last_transaction_id), 0))
+
+    results = {}
+    for user_id in db.execute(pending).scalars().all():
+        try:
+            results[user_id] = detect_recurring_transactions(db, user_id, full=full)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error detectando recurrencias del usuario {user_id}: {str(e)}")
+    return results
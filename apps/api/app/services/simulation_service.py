@@ -0,0 +1,296 @@
+"""
+Motor de simulaciones financieras.
+
+Evalúa los escenarios de una `FinancialSimulation` y guarda su serie mensual
+en `simulation_results`. Los parámetros de cada escenario
+(`simulation_parameters`, pares clave/valor de texto) se convierten a un
+vector tipado con el orden de `PARAMETERS`; los que faltan toman su valor por
+defecto. Todos los escenarios se evalúan juntos en un kernel NumPy sobre una
+matriz escenarios × meses, y con muchos escenarios la matriz se reparte en
+bloques entre procesos de un pool compartido por las ejecuciones (se cierra
+con `shutdown_process_pool` al detener la API).
+
+Los resultados se memorizan por escenario: `simulation_scenarios.input_hash`
+es el hash de las entradas de la simulación y del vector de parámetros con
+que se calcularon los resultados guardados. Volver a ejecutar una simulación
+solo evalúa y escribe los escenarios cuyo hash cambió, y los escenarios
+idénticos dentro de una misma ejecución se evalúan una sola vez.
+
+Uso:
+    run_simulation(db, simulation_id, user_id)
+    get_simulation_results(db, simulation_id, user_id)
+"""
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.simulations import FinancialSimulation, SimulationParameter, SimulationResult, SimulationScenario
+from .projection_service import add_months, month_key
+
+logger = logging.getLogger(__name__)
+
+# Cambiar al modificar el kernel para invalidar los resultados memorizados
+KERNEL_VERSION = 1
+
+
+class ScenarioParameter(NamedTuple):
+    kind: type
+    default: float
+
+
+PARAMETERS: Dict[str, ScenarioParameter] = {
+    'income_growth_rate': ScenarioParameter(float, 0.0),    # Crecimiento anual del ingreso
+    'inflation_rate': ScenarioParameter(float, 0.03),       # Crecimiento anual del gasto
+    'expense_ratio': ScenarioParameter(float, 0.8),         # Gasto como fracción del ingreso base
+    'monthly_expenses': ScenarioParameter(float, 0.0),      # Gasto mensual fijo; si es > 0 reemplaza expense_ratio
+    'income_change': ScenarioParameter(float, 0.0),         # Cambio del ingreso mensual (aumento, cesantía...)
+    'change_start_month': ScenarioParameter(int, 0),        # Mes (desde 0) en que aplica income_change
+    'initial_savings': ScenarioParameter(float, 0.0),
+    'savings_return_rate': ScenarioParameter(float, 0.0),   # Rentabilidad anual de los ahorros
+    'other_assets': ScenarioParameter(float, 0.0),          # Patrimonio fuera de los ahorros simulados
+}
+PARAMETER_KEYS = tuple(PARAMETERS)
+# Tasas anuales compuestas: con -100% o menos el factor mensual se anula o no está definido
+RATE_PARAMETERS = ('income_growth_rate', 'inflation_rate', 'savings_return_rate')
+RESULT_FIELDS = ("income_total", "expense_total", "monthly_savings", "accumulated_savings", "net_worth")
+
+
+# ============================
+# Parámetros
+# ============================
+
+def parse_parameter_value(key: str, raw: str) -> float:
+    """Convierte el valor de texto de un parámetro; acepta porcentajes ("5%")"""
+    if key not in PARAMETERS:
+        raise ValueError(f"Parámetro de simulación desconocido: '{key}'")
+    text = (raw or "").strip()
+    try:
+        if text.endswith("%"):
+            value = float(text[:-1]) / 100
+        else:
+            value = float(text)
+    except ValueError:
+        raise ValueError(f"Valor inválido para el parámetro '{key}': '{raw}'")
+
+    if PARAMETERS[key].kind is int:
+        if not value.is_integer() or value < 0:
+            raise ValueError(f"El parámetro '{key}' debe ser un entero no negativo: '{raw}'")
+    if key in RATE_PARAMETERS and not value > -1:
+        raise ValueError(f"La tasa '{key}' debe ser mayor que -100%: '{raw}'")
+    return value
+
+
+def parameter_vector(parameters: Iterable[Tuple[str, str]]) -> Tuple[float, ...]:
+    """Vector tipado de un escenario a partir de sus pares (clave, valor)"""
+    values = {key: spec.default for key, spec in PARAMETERS.items()}
+    for key, raw in parameters:
+        values[key] = parse_parameter_value(key, raw)
+    return tuple(float(values[key]) for key in PARAMETER_KEYS)
+
+
+def scenario_hash(simulation: FinancialSimulation, vector: Tuple[float, ...]) -> str:
+    payload = {
+        "kernel": KERNEL_VERSION,
+        "base_income": str(Decimal(str(simulation.base_income)).normalize()),
+        "start_date": simulation.start_date.isoformat(),
+        "months": simulation.months_duration,
+        "parameters": [repr(value) for value in vector],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+# ============================
+# Kernel
+# ============================
+
+def evaluate_scenarios(base_income: float, months: int, vectors):
+    """
+    Evalúa un lote de escenarios. `vectors` es una matriz (escenarios ×
+    parámetros) y el resultado un arreglo (RESULT_FIELDS × escenarios × meses).
+    """
+    import numpy as np
+
+    matrix = np.atleast_2d(np.asarray(vectors, dtype=float))
+    column = {key: matrix[:, index][:, None] for index, key in enumerate(PARAMETER_KEYS)}
+    steps = np.arange(months)[None, :]
+    years = steps / 12.0
+
+    income = ((base_income + column['income_change'] * (steps >= column['change_start_month']))
+              * (1.0 + column['income_growth_rate']) ** years)
+    expense_base = np.where(column['monthly_expenses'] > 0, column['monthly_expenses'],
+                            column['expense_ratio'] * base_income)
+    expense = expense_base * (1.0 + column['inflation_rate']) ** years
+    savings = income - expense
+
+    # a_m = a_{m-1}·g + s_m, resuelto en forma cerrada con una suma acumulada descontada
+    growth = (1.0 + column['savings_return_rate']) ** (1.0 / 12.0)
+    powers = growth ** (steps + 1)
+    accumulated = powers * (column['initial_savings'] + np.cumsum(savings / powers, axis=1))
+    net_worth = accumulated + column['other_assets']
+    return np.stack([income, expense, savings, accumulated, net_worth])
+
+
+def _evaluate_chunk(task: Tuple[float, int, Any]):
+    return evaluate_scenarios(*task)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    """Pool de procesos compartido; se recrea solo si cambia el número de workers"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn: los workers no heredan conexiones ni locks del proceso de la API
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_process_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def evaluate_in_parallel(base_income: float, months: int, vectors, workers: Optional[int] = None):
+    """Reparte los escenarios en bloques entre procesos; mismo resultado que evaluate_scenarios"""
+    import numpy as np
+
+    workers = workers or settings.SIMULATION_WORKERS or max(os.cpu_count() or 1, 1)
+    chunks = [chunk for chunk in np.array_split(np.asarray(vectors, dtype=float), workers) if len(chunk)]
+    logger.info(f"Evaluando {len(vectors)} escenarios en {len(chunks)} procesos")
+
+    try:
+        results = list(_process_pool(workers).map(_evaluate_chunk, [(base_income, months, chunk) for chunk in chunks]))
+    except BrokenProcessPool:
+        # Un worker murió: la próxima ejecución parte con un pool nuevo
+        shutdown_process_pool()
+        raise
+    return np.concatenate(results, axis=1)
+
+
+# ============================
+# Ejecución y persistencia
+# ============================
+
+def _get_simulation(db: Session, simulation_id: int, user_id: Optional[int]) -> FinancialSimulation:
+    query = db.query(FinancialSimulation).filter(FinancialSimulation.id == simulation_id)
+    if user_id is not None:
+        query = query.filter(FinancialSimulation.user_id == user_id)
+    simulation = query.first()
+    if simulation is None:
+        raise ValueError("Simulación no encontrada")
+    return simulation
+
+
+def run_simulation(db: Session, simulation_id: int, user_id: Optional[int] = None,
+                   force: bool = False) -> Dict[str, Any]:
+    """
+    Evalúa los escenarios de la simulación cuyas entradas cambiaron y
+    reemplaza sus resultados. Hace commit y devuelve un resumen.
+    """
+    simulation = _get_simulation(db, simulation_id, user_id)
+
+    scenarios = db.execute(
+        select(SimulationScenario.id, SimulationScenario.input_hash)
+        .where(SimulationScenario.simulation_id == simulation.id)
+        .order_by(SimulationScenario.id)
+    ).all()
+    parameters: Dict[int, List[Tuple[str, str]]] = {row.id: [] for row in scenarios}
+    for row in db.execute(
+        select(SimulationParameter.scenario_id, SimulationParameter.parameter_key, SimulationParameter.parameter_value)
+        .where(SimulationParameter.scenario_id.in_(list(parameters)))
+        .order_by(SimulationParameter.id)
+    ):
+        parameters[row.scenario_id].append((row.parameter_key, row.parameter_value))
+
+    # Escenarios por evaluar, agrupados por hash para evaluar una vez los idénticos
+    pending: Dict[str, Tuple[Tuple[float, ...], List[int]]] = {}
+    for scenario in scenarios:
+        vector = parameter_vector(parameters[scenario.id])
+        input_hash = scenario_hash(simulation, vector)
+        if force or scenario.input_hash != input_hash:
+            pending.setdefault(input_hash, (vector, []))[1].append(scenario.id)
+
+    evaluated = sum(len(ids) for _, ids in pending.values())
+    summary = {"scenarios": len(scenarios), "evaluated": evaluated, "cached": len(scenarios) - evaluated}
+    if not pending:
+        return summary
+
+    vectors = [vector for vector, _ in pending.values()]
+    months = simulation.months_duration
+    base_income = float(simulation.base_income)
+    if len(vectors) >= settings.SIMULATION_PARALLEL_MIN_SCENARIOS:
+        series = evaluate_in_parallel(base_income, months, vectors)
+    else:
+        series = evaluate_scenarios(base_income, months, vectors)
+
+    labels = [month_key(add_months(simulation.start_date, offset)) for offset in range(months)]
+    values = series.round(2).tolist()
+    now = datetime.utcnow()
+    rows = []
+    hashes = []
+    for index, (input_hash, (_, scenario_ids)) in enumerate(pending.items()):
+        months_values = [
+            {field: Decimal(str(values[position][index][month])) for position, field in enumerate(RESULT_FIELDS)}
+            for month in range(months)
+        ]
+        for scenario_id in scenario_ids:
+            hashes.append({"id": scenario_id, "input_hash": input_hash, "updated_at": now})
+            rows.extend(
+                {"scenario_id": scenario_id, "month_year": label, "created_at": now, "updated_at": now, **month_values}
+                for label, month_values in zip(labels, months_values)
+            )
+
+    db.execute(delete(SimulationResult).where(SimulationResult.scenario_id.in_([row["id"] for row in hashes])))
+    if rows:
+        db.execute(SimulationResult.__table__.insert(), rows)
+    db.execute(update(SimulationScenario), hashes)
+    db.commit()
+
+    logger.info(f"Simulación {simulation.id}: {summary}")
+    return summary
+
+
+def get_simulation_results(db: Session, simulation_id: int, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Serie mensual guardada de cada escenario de la simulación"""
+    simulation = _get_simulation(db, simulation_id, user_id)
+    scenarios = {
+        row.id: {"scenario_id": row.id, "name": row.name, "is_baseline": row.is_baseline, "months": []}
+        for row in db.execute(
+            select(SimulationScenario.id, SimulationScenario.name, SimulationScenario.is_baseline)
+            .where(SimulationScenario.simulation_id == simulation.id)
+            .order_by(SimulationScenario.id)
+        )
+    }
+    for row in db.execute(
+        select(SimulationResult.scenario_id, SimulationResult.month_year,
+               *(getattr(SimulationResult, field) for field in RESULT_FIELDS))
+        .where(SimulationResult.scenario_id.in_(list(scenarios)))
+        .order_by(SimulationResult.scenario_id, SimulationResult.month_year)
+    ):
+        scenarios[row.scenario_id]["months"].append(
+            {"month_year": row.month_year, **{field: getattr(row, field) for field in RESULT_FIELDS}}
+        )
+    return list(scenarios.values())
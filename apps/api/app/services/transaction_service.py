@@ -1,26 +1,47 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
-from typing import List, Optional, Dict, Any
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from itertools import islice
 from datetime import date, datetime, timedelta
 from decimal import Decimal
-import openpyxl
-from openpyxl import load_workbook
-import io
-import csv
-import pandas as pd
-import xlrd
 import logging
 import hashlib
-from ..utils.transaction_utils import generate_transaction_hash, check_transaction_exists
+from ..utils.transaction_utils import DuplicateTransactionError, generate_transaction_hash, check_transaction_exists
 
 from ..models.transactions import Transaction, TransactionStatus
 from ..models.accounts import Account
 from ..models.file_imports import FileImportProfile, FileColumnMapping
 from ..schemas.transactions import TransactionCreateRequest, TransactionUpdateRequest
+from .balance_ledger import BalanceLedger, apply_transaction_delta
+from ..utils.tabular_reader import FORMAT_CSV, TabularReader, open_tabular_reader, sniff_format
+from ..config import settings
+from .import_profile_compiler import CompiledProfile, RowExtractor, compile_import_profile
+from ..utils.amount_parser import AMOUNT_SAMPLE_SIZE, AmountParseError, resolve_amount_separators
+from ..utils.date_parser import DATE_SAMPLE_SIZE, parse_excel_date, resolve_date_format
+from .import_fingerprint_service import (
+    AMOUNT_ERROR_TYPE, DUPLICATE_ERROR_TYPE, ROW_ERROR_TYPE, ImportRowIndex, content_fingerprint,
+    fail_file_import, file_sha256, find_matching_import, finish_file_import, load_known_digests,
+    previous_import_result, start_file_import
+)
+from .duplicate_filter import (
+    BATCH_SIZE as DUPLICATE_FILTER_BATCH_SIZE, AccountDuplicateFilter, get_account_filter,
+    invalidate_account_filters, note_transaction_created, note_transaction_deleted, persist_account_filter
+)
+from .near_duplicate_service import AccountNearDuplicateIndex
+from .goal_contribution_service import GoalContributionMatcher, relink_goal_contribution, reverse_goal_contributions
+from .budget_variance_service import refresh_budget_actuals
+from .transfer_matching_service import credited_transfer_account, link_transfer_pairs, unpair_transfer
+from .merchant_service import assign_merchants
+from .parallel_csv_import import (
+    default_worker_count, find_record_end, parse_csv_in_parallel, supports_byte_splitting
+)
 
 # Configurar logger
 logger = logging.getLogger(__name__)
 
+# Filas de datos que se leen para fijar los formatos de fecha y monto de un archivo
+FORMAT_SAMPLE_SIZE = max(DATE_SAMPLE_SIZE, AMOUNT_SAMPLE_SIZE)
+
 def get_default_transaction_status_id(db: Session):
     """Obtiene el ID de estado de transacción por defecto, creándolo si no existe"""
     
@@ -62,9 +83,25 @@ def create_transaction(
     user_id: int, 
     transaction_data: TransactionCreateRequest,
     import_source: Optional[str] = None,
-    skip_duplicate_check: bool = False
+    skip_duplicate_check: bool = False,
+    ledger: Optional[BalanceLedger] = None,
+    duplicate_filter: Optional[AccountDuplicateFilter] = None,
+    import_id: Optional[int] = None,
+    import_row_number: Optional[int] = None,
+    assign_merchant: bool = True
 ) -> Transaction:
-    """Crea una nueva transacción con validación de duplicados"""
+    """
+    Crea una nueva transacción con validación de duplicados.
+
+    Si se entrega un `ledger`, la fila se inserta en un savepoint sin commit
+    y la variación de saldo se acumula en el ledger: el llamador aplica el
+    ledger y hace commit una vez por lote, de modo que filas y saldos se
+    confirman juntos. Si no, el saldo se aplica por delta en el mismo commit
+    de la transacción. Con `duplicate_filter` (de la misma
+    cuenta) la validación de duplicados solo consulta la base cuando el
+    filtro no descarta la fila. Las importaciones pasan
+    `assign_merchant=False` y asignan el comercio por lote.
+    """
     
     logger.info(f"Iniciando creación de transacción para usuario {user_id}")
     logger.debug(f"Datos de transacción: amount={transaction_data.amount}, account_id={transaction_data.account_id}, description='{transaction_data.description}'")
@@ -95,20 +132,30 @@ def create_transaction(
         )
         
         # Verificar si ya existe
-        exists, reason = check_transaction_exists(
-            db=db,
-            user_id=user_id,
-            account_id=transaction_data.account_id,
-            amount=Decimal(str(transaction_data.amount)),
-            description=transaction_data.description or '',
-            transaction_date=transaction_data.transaction_date,
-            external_id=transaction_data.external_id,
-            content_hash=content_hash
-        )
+        if duplicate_filter is not None and duplicate_filter.account_id == transaction_data.account_id:
+            exists, reason = duplicate_filter.check(
+                db,
+                content_hash,
+                Decimal(str(transaction_data.amount)),
+                transaction_data.description or '',
+                transaction_data.transaction_date,
+                external_id=transaction_data.external_id
+            )
+        else:
+            exists, reason = check_transaction_exists(
+                db=db,
+                user_id=user_id,
+                account_id=transaction_data.account_id,
+                amount=Decimal(str(transaction_data.amount)),
+                description=transaction_data.description or '',
+                transaction_date=transaction_data.transaction_date,
+                external_id=transaction_data.external_id,
+                content_hash=content_hash
+            )
         
         if exists:
             logger.warning(f"Transacción duplicada detectada: {reason}")
-            raise ValueError(f"Transacción duplicada: {reason}")
+            raise DuplicateTransactionError(reason)
         
         logger.debug(f"No se encontraron duplicados, content_hash: {content_hash[:16]}...")
     else:
@@ -142,24 +189,34 @@ def create_transaction(
         external_id=transaction_data.external_id,
         # NUEVOS CAMPOS
         content_hash=content_hash,
-        import_source=import_source
+        import_source=import_source,
+        import_id=import_id,
+        import_row_number=import_row_number
     )
     
+    if ledger is not None:
+        # Fila de un lote: si falla, el savepoint descarta solo esta fila
+        with db.begin_nested():
+            db.add(db_transaction)
+            if assign_merchant:
+                assign_merchants(db, [db_transaction])
+        ledger.record(account.id, amount_decimal, transaction_data.transfer_account_id,
+                      transaction_date=transaction_data.transaction_date,
+                      envelope_id=transaction_data.envelope_id)
+        note_transaction_created(user_id, transaction_data.account_id, content_hash, amount_decimal,
+                                 transaction_data.transaction_date, db_transaction.id)
+        logger.debug(f"Transacción {db_transaction.id} agregada al lote")
+        return db_transaction
+    
     db.add(db_transaction)
     logger.debug(f"Transacción agregada a la sesión de BD")
+    if assign_merchant:
+        assign_merchants(db, [db_transaction])
     
-    # Actualizar balance de la cuenta
-    old_balance = account.current_balance
-    account.current_balance += float(transaction_data.amount)  # type: ignore
-    logger.debug(f"Balance de cuenta {account.id} actualizado: {old_balance} -> {account.current_balance}")
-    
-    # Si es transferencia, actualizar cuenta destino
-    if transaction_data.transfer_account_id and transaction_data.amount < 0:
-        transfer_account = db.query(Account).filter(Account.id == transaction_data.transfer_account_id).first()
-        if transfer_account:
-            old_transfer_balance = transfer_account.current_balance
-            transfer_account.current_balance += abs(float(transaction_data.amount))  # type: ignore
-            logger.debug(f"Balance de cuenta de transferencia {transfer_account.id} actualizado: {old_transfer_balance} -> {transfer_account.current_balance}")
+    # Actualizar saldos (cuenta y, si es transferencia, cuenta destino) por delta
+    apply_transaction_delta(db, account.id, amount_decimal, transaction_data.transfer_account_id,
+                            transaction_date=transaction_data.transaction_date,
+                            envelope_id=transaction_data.envelope_id)
     
     try:
         db.commit()
@@ -169,6 +226,9 @@ def create_transaction(
         db.rollback()
         raise
     
+    note_transaction_created(user_id, transaction_data.account_id, content_hash, amount_decimal,
+                             transaction_data.transaction_date, db_transaction.id)
+    
     db.refresh(db_transaction)
     
     return db_transaction
@@ -259,10 +319,18 @@ def update_transaction(
     # Guardar monto anterior para ajustar balances
     old_amount = db_transaction.amount
     old_account_id = db_transaction.account_id
+    old_transfer_account_id = credited_transfer_account(db_transaction)
+    old_transaction_date = db_transaction.transaction_date
+    old_envelope_id = db_transaction.envelope_id
     
     # Actualizar campos que no son None
     update_data = transaction_data.dict(exclude_unset=True)
     
+    # Cambiar la cuenta de transferencia deshace el emparejamiento de una transferencia interna
+    if (db_transaction.transfer_transaction_id is not None
+            and update_data.get('transfer_account_id', db_transaction.transfer_account_id) != db_transaction.transfer_account_id):
+        unpair_transfer(db, db_transaction)
+    
     for field, value in update_data.items():
         if hasattr(db_transaction, field):
             # Convertir amount a Decimal con precisión adecuada
@@ -273,26 +341,29 @@ def update_transaction(
     
     db_transaction.updated_at = datetime.utcnow()
     
-    # Ajustar balances si cambió el monto o la cuenta
-    if 'amount' in update_data or 'account_id' in update_data:
+    # Ajustar balances si cambió el monto, la cuenta, la cuenta de transferencia o el sobre
+    if {'amount', 'account_id', 'transfer_account_id', 'transaction_date', 'envelope_id'} & update_data.keys():
         logger.debug("Ajustando balances de cuentas por cambio de monto o cuenta")
         
-        # Revertir el monto anterior de la cuenta anterior
-        old_account = db.query(Account).filter(Account.id == old_account_id).first()
-        if old_account:
-            old_balance = old_account.current_balance
-            old_account.current_balance -= float(old_amount)  # type: ignore
-            logger.debug(f"Balance cuenta anterior {old_account_id}: {old_balance} -> {old_account.current_balance}")
-        
-        # Aplicar nuevo monto a la cuenta (nueva o misma)
-        new_account_id = update_data.get('account_id', old_account_id)
-        new_amount = float(update_data.get('amount', old_amount))
-        
-        new_account = db.query(Account).filter(Account.id == new_account_id).first()
-        if new_account:
-            new_balance = new_account.current_balance
-            new_account.current_balance += new_amount  # type: ignore
-            logger.debug(f"Balance cuenta nueva {new_account_id}: {new_balance} -> {new_account.current_balance}")
+        # Revertir el efecto anterior y aplicar el nuevo en un solo UPDATE por cuenta
+        ledger = BalanceLedger()
+        ledger.record(old_account_id, old_amount, old_transfer_account_id, sign=-1,
+                      transaction_date=old_transaction_date, envelope_id=old_envelope_id)
+        ledger.record(db_transaction.account_id, db_transaction.amount, credited_transfer_account(db_transaction),
+                      transaction_date=db_transaction.transaction_date, envelope_id=db_transaction.envelope_id)
+        ledger.apply(db)
+    
+    # El aporte a metas depende del monto, la cuenta, la transferencia, la glosa y la fecha
+    if {'amount', 'account_id', 'transfer_account_id', 'description', 'transaction_date'} & update_data.keys():
+        relink_goal_contribution(db, user_id, db_transaction)
+    
+    # El comercio se recalcula con la glosa nueva y la versión vigente de las reglas
+    if 'description' in update_data:
+        assign_merchants(db, [db_transaction])
+    
+    # Los filtros de duplicados de todos los procesos se reconstruyen con el mismo commit
+    if {'amount', 'account_id', 'transaction_date'} & update_data.keys():
+        invalidate_account_filters(db, user_id, (old_account_id, db_transaction.account_id))
     
     try:
         db.commit()
@@ -322,24 +393,26 @@ def delete_transaction(db: Session, user_id: int, transaction_id: int) -> bool:
     
     logger.debug(f"Transacción encontrada: amount={db_transaction.amount}, account_id={db_transaction.account_id}")
     
-    # Revertir el balance de la cuenta
-    account = db.query(Account).filter(Account.id == db_transaction.account_id).first()
-    if account:
-        old_balance = account.current_balance
-        account.current_balance -= float(db_transaction.amount)  # type: ignore
-        logger.debug(f"Balance cuenta {account.id} revertido: {old_balance} -> {account.current_balance}")
-    
-    # Si era transferencia, revertir cuenta destino
-    if db_transaction.transfer_account_id and db_transaction.amount < 0:  # type: ignore
-        transfer_account = db.query(Account).filter(Account.id == db_transaction.transfer_account_id).first()
-        if transfer_account:
-            old_transfer_balance = transfer_account.current_balance
-            transfer_account.current_balance -= abs(float(db_transaction.amount))  # type: ignore
-            logger.debug(f"Balance cuenta transferencia {transfer_account.id} revertido: {old_transfer_balance} -> {transfer_account.current_balance}")
-    
     try:
+        # La contraparte de una transferencia interna queda como movimiento simple
+        transfer_account_id = credited_transfer_account(db_transaction)
+        if db_transaction.transfer_transaction_id is not None:
+            unpair_transfer(db, db_transaction)
+        reverse_goal_contributions(db, [db_transaction.id])
         db.delete(db_transaction)
+        
+        # Revertir el balance de la cuenta (y de la cuenta destino si era transferencia)
+        apply_transaction_delta(
+            db,
+            db_transaction.account_id,
+            db_transaction.amount,
+            transfer_account_id,
+            sign=-1,
+            transaction_date=db_transaction.transaction_date,
+            envelope_id=db_transaction.envelope_id
+        )
         db.commit()
+        note_transaction_deleted(user_id, db_transaction.account_id)
         logger.info(f"Transacción {transaction_id} eliminada exitosamente")
         return True
     except Exception as e:
@@ -347,61 +420,6 @@ def delete_transaction(db: Session, user_id: int, transaction_id: int) -> bool:
         db.rollback()
         raise
 
-def parse_excel_date(value):
-    """Convierte diferentes formatos de fecha de Excel a date"""
-    if value is None:
-        return None
-    
-    logger.debug(f"Parseando fecha: {value} (tipo: {type(value)})")
-    
-    # Si ya es un objeto datetime
-    if isinstance(value, datetime):
-        result = value.date()
-        logger.debug(f"Fecha convertida desde datetime: {result}")
-        return result
-    
-    # Si ya es un objeto date
-    if isinstance(value, date):
-        logger.debug(f"Fecha ya es date: {value}")
-        return value
-    
-    # Si es string, intentar parsear diferentes formatos
-    if isinstance(value, str):
-        date_formats = [
-            '%Y-%m-%d',      # 2024-01-15
-            '%d/%m/%Y',      # 15/01/2024
-            '%d-%m-%Y',      # 15-01-2024
-            '%m/%d/%Y',      # 01/15/2024
-            '%d/%m/%y',      # 15/01/24
-            '%Y%m%d',        # 20240115
-        ]
-        
-        for fmt in date_formats:
-            try:
-                result = datetime.strptime(value.strip(), fmt).date()
-                logger.debug(f"Fecha parseada con formato {fmt}: {result}")
-                return result
-            except ValueError:
-                continue
-        
-        logger.error(f"Formato de fecha no válido: {value}")
-        raise ValueError(f"Formato de fecha no válido: {value}")
-    
-    # Si es un número (serial date de Excel)
-    if isinstance(value, (int, float)):
-        try:
-            # Excel cuenta días desde 1900-01-01 (con ajuste por bug de año bisiesto)
-            excel_epoch = datetime(1899, 12, 30)
-            result = (excel_epoch + timedelta(days=value)).date()
-            logger.debug(f"Fecha convertida desde serial Excel {value}: {result}")
-            return result
-        except Exception as e:
-            logger.error(f"Error convirtiendo fecha numérica {value}: {str(e)}")
-            raise ValueError(f"Fecha numérica no válida: {value}")
-    
-    logger.error(f"Tipo de fecha no soportado: {type(value)}")
-    raise ValueError(f"Tipo de fecha no soportado: {type(value)}")
-
 def parse_excel_amount(value):
     """Convierte valores de Excel a float"""
     if value is None or value == '':
@@ -434,7 +452,7 @@ def parse_excel_amount(value):
     logger.error(f"Tipo de monto no soportado: {type(value)}")
     raise ValueError(f"Tipo de monto no soportado: {type(value)}")
 
-def detect_excel_columns(worksheet):
+def detect_excel_columns(reader: TabularReader):
     """Detecta automáticamente las columnas en la primera fila"""
     header_row = 1
     headers = {}
@@ -448,9 +466,9 @@ def detect_excel_columns(worksheet):
     }
     
     # Leer la primera fila para encontrar headers
-    for col_idx, cell in enumerate(worksheet[header_row], 1):
-        if cell.value:
-            cell_value = str(cell.value).lower().strip()
+    for col_idx, value in enumerate(reader.read_row(header_row) or (), 1):
+        if value:
+            cell_value = str(value).lower().strip()
             
             # Buscar matches en los mapeos
             for field, possible_names in column_mappings.items():
@@ -463,6 +481,51 @@ def detect_excel_columns(worksheet):
     
     return headers, header_row
 
+def _open_profile_reader(profile: FileImportProfile, file_content: bytes, file_format: Optional[str] = None) -> TabularReader:
+    """Abre el lector tabular del archivo con la configuración del perfil (hoja, encoding, delimitador)"""
+    return open_tabular_reader(
+        file_content,
+        sheet_name=getattr(profile, 'sheet_name', None),
+        encoding=getattr(profile, 'encoding', 'utf-8') or 'utf-8',
+        delimiter=getattr(profile, 'delimiter', ',') or ',',
+        file_format=file_format,
+        xlsx_engine=settings.IMPORT_XLSX_ENGINE
+    )
+
+def _bind_profile_extractor(
+    profile: FileImportProfile,
+    column_mappings: List[FileColumnMapping],
+    column_map: Dict,
+    reader: TabularReader,
+    start_row: int
+) -> RowExtractor:
+    """
+    Extractor compilado del perfil para este archivo. El formato de la columna
+    de fecha y los separadores de los montos se fijan a partir de una muestra
+    de las primeras filas de datos.
+    """
+    compiled = compile_import_profile(profile, column_mappings)
+    unbound = compiled.bind(column_map)
+    if unbound.date is None and not unbound.amount_columns:
+        return unbound
+    
+    sample = [row for _, row in islice(reader.iter_rows(start_row=start_row), FORMAT_SAMPLE_SIZE)]
+    
+    def cells(index: int) -> List:
+        return [row[index] for row in sample if index < len(row)]
+    
+    date_format = resolve_date_format(profile, cells(unbound.date.index)) if unbound.date else None
+    amount_separators = resolve_amount_separators(
+        profile, [cell for index in unbound.amount_columns for cell in cells(index)]
+    )
+    logger.debug(f"Formato de fecha: {date_format}, separadores de monto (miles, decimal): {amount_separators}")
+    return compiled.bind(column_map, date_format=date_format, amount_separators=amount_separators)
+
+def _commit_import_batch(db: Session, ledger: BalanceLedger) -> None:
+    """Confirma las filas pendientes de un lote junto con sus saldos: un UPDATE por cuenta"""
+    ledger.apply(db)
+    db.commit()
+
 def import_transactions_from_excel(
     db: Session, 
     user_id: int, 
@@ -471,7 +534,7 @@ def import_transactions_from_excel(
     filename: str,
     allow_duplicates: bool = False  # NUEVO PARÁMETRO
 ) -> Dict[str, Any]:
-    """Importa transacciones desde contenido Excel con prevención de duplicados"""
+    """Importa transacciones desde contenido Excel (o CSV) con prevención de duplicados"""
     
     logger.info(f"Iniciando importación de Excel para usuario {user_id}, cuenta {account_id}, archivo: {filename}")
     
@@ -496,118 +559,124 @@ def import_transactions_from_excel(
         'errors': []
     }
     
+    # Las filas se confirman por lotes, cada lote con sus saldos en el mismo commit
+    ledger = BalanceLedger()
+    pending_rows = 0
+    
     try:
-        # Cargar el workbook desde bytes
-        logger.debug("Cargando workbook de Excel")
-        workbook = load_workbook(io.BytesIO(file_content), read_only=True, data_only=True)
-        
-        # Usar la primera hoja
-        worksheet = workbook.active
-        logger.debug(f"Hoja activa seleccionada: {worksheet.title if worksheet else 'None'}")
-        
-        # Detectar columnas automáticamente
-        logger.debug("Detectando columnas automáticamente")
-        column_map, header_row = detect_excel_columns(worksheet)
-        logger.debug(f"Columnas detectadas: {column_map}")
-        logger.debug(f"Fila de encabezados: {header_row}")
-        
-        if not column_map.get('date') or not column_map.get('amount'):
-            error_msg = "No se pudieron detectar las columnas requeridas (fecha y monto). Verifica que el archivo tenga headers en la primera fila."
-            logger.error(error_msg)
-            raise ValueError(error_msg)
-        
-        # Procesar filas
-        logger.debug("Iniciando procesamiento de filas")
-        if worksheet is None:
-            logger.error("No se pudo obtener una hoja de trabajo válida del archivo Excel")
-            raise ValueError("No se pudo obtener una hoja de trabajo válida del archivo Excel")
-        for row_idx, row in enumerate(worksheet.iter_rows(min_row=header_row + 1), start=header_row + 1):
-            # Saltar filas vacías
-            if all(cell.value is None or str(cell.value).strip() == '' for cell in row):
-                logger.debug(f"Saltando fila vacía {row_idx}")
-                continue
+        # Abrir el archivo (formato detectado por magic bytes) sobre la primera hoja
+        logger.debug("Abriendo archivo tabular")
+        with open_tabular_reader(file_content, xlsx_engine=settings.IMPORT_XLSX_ENGINE) as reader:
+            logger.debug(f"Formato detectado: {reader.format}, hoja: {reader.sheet_title}")
+        
+            # Detectar columnas automáticamente
+            logger.debug("Detectando columnas automáticamente")
+            column_map, header_row = detect_excel_columns(reader)
+            logger.debug(f"Columnas detectadas: {column_map}")
+            logger.debug(f"Fila de encabezados: {header_row}")
+        
+            if not column_map.get('date') or not column_map.get('amount'):
+                error_msg = "No se pudieron detectar las columnas requeridas (fecha y monto). Verifica que el archivo tenga headers en la primera fila."
+                logger.error(error_msg)
+                raise ValueError(error_msg)
+            reader.select_columns(index - 1 for index in column_map.values())
+        
+            # Procesar filas
+            logger.debug("Iniciando procesamiento de filas")
+            for row_idx, row in reader.iter_rows(start_row=header_row + 1):
+                # Saltar filas vacías
+                if all(value is None or str(value).strip() == '' for value in row):
+                    logger.debug(f"Saltando fila vacía {row_idx}")
+                    continue
                 
-            results['total_records'] += 1
-            logger.debug(f"Procesando fila {row_idx}")
+                results['total_records'] += 1
+                logger.debug(f"Procesando fila {row_idx}")
             
-            try:
-                # Extraer valores de las celdas
-                date_value = row[column_map['date'] - 1].value if column_map.get('date') else None
-                amount_value = row[column_map['amount'] - 1].value if column_map.get('amount') else None
-                description_value = row[column_map['description'] - 1].value if column_map.get('description') else ""
-                notes_value = row[column_map['notes'] - 1].value if column_map.get('notes') else ""
+                try:
+                    # Extraer valores de las celdas
+                    date_value = row[column_map['date'] - 1] if column_map.get('date') else None
+                    amount_value = row[column_map['amount'] - 1] if column_map.get('amount') else None
+                    description_value = row[column_map['description'] - 1] if column_map.get('description') else ""
+                    notes_value = row[column_map['notes'] - 1] if column_map.get('notes') else ""
                 
-                logger.debug(f"Fila {row_idx} - Valores extraídos: date={date_value}, amount={amount_value}, description='{description_value}'")
+                    logger.debug(f"Fila {row_idx} - Valores extraídos: date={date_value}, amount={amount_value}, description='{description_value}'")
                 
-                # Validar y convertir valores
-                transaction_date = parse_excel_date(date_value)
-                amount = parse_excel_amount(amount_value)
+                    # Validar y convertir valores
+                    transaction_date = parse_excel_date(date_value)
+                    amount = parse_excel_amount(amount_value)
                 
-                if transaction_date is None:
-                    raise ValueError("Fecha requerida")
+                    if transaction_date is None:
+                        raise ValueError("Fecha requerida")
                 
-                if amount == 0:
-                    raise ValueError("El monto no puede ser cero")
+                    if amount == 0:
+                        raise ValueError("El monto no puede ser cero")
                 
-                # Redondear el monto a 2 decimales para evitar problemas de precisión
-                amount = round(amount, 2)
+                    # Redondear el monto a 2 decimales para evitar problemas de precisión
+                    amount = round(amount, 2)
                 
-                # Obtener un status_id válido
-                default_status_id = get_default_transaction_status_id(db)
-                # Asegurarse de que sea un int y no un SQLAlchemy Column
-                if hasattr(default_status_id, 'id'):
-                    default_status_id = default_status_id.id
-                elif hasattr(default_status_id, 'value'):
-                    default_status_id = default_status_id.value
-                elif isinstance(default_status_id, int):
-                    pass  # already int
-                else:
-                    # If it's a SQLAlchemy Column, raise an error or set a default
-                    logger.error(f"default_status_id is not an int: {default_status_id} (type: {type(default_status_id)})")
-                    raise ValueError("No se pudo obtener un status_id válido para la transacción")
+                    # Obtener un status_id válido
+                    default_status_id = get_default_transaction_status_id(db)
+                    # Asegurarse de que sea un int y no un SQLAlchemy Column
+                    if hasattr(default_status_id, 'id'):
+                        default_status_id = default_status_id.id
+                    elif hasattr(default_status_id, 'value'):
+                        default_status_id = default_status_id.value
+                    elif isinstance(default_status_id, int):
+                        pass  # already int
+                    else:
+                        # If it's a SQLAlchemy Column, raise an error or set a default
+                        logger.error(f"default_status_id is not an int: {default_status_id} (type: {type(default_status_id)})")
+                        raise ValueError("No se pudo obtener un status_id válido para la transacción")
 
-                # Crear transacción
-                transaction_data = TransactionCreateRequest(
-                    amount=amount,
-                    description=str(description_value) if description_value else "",
-                    transaction_date=transaction_date,
-                    account_id=account_id,
-                    notes=str(notes_value) if notes_value else "",
-                    status_id=default_status_id,
-                    external_id=f"{filename}_{row_idx}"  # GENERAR external_id ÚNICO
-                )
-                
-                # CREAR CON VALIDACIÓN DE DUPLICADOS
-                try:
-                    create_transaction(
-                        db=db, 
-                        user_id=user_id, 
-                        transaction_data=transaction_data,
-                        import_source=filename,
-                        skip_duplicate_check=allow_duplicates
+                    # Crear transacción
+                    transaction_data = TransactionCreateRequest(
+                        amount=amount,
+                        description=str(description_value) if description_value else "",
+                        transaction_date=transaction_date,
+                        account_id=account_id,
+                        notes=str(notes_value) if notes_value else "",
+                        status_id=default_status_id,
+                        external_id=f"{filename}_{row_idx}"  # GENERAR external_id ÚNICO
                     )
-                    results['successful_imports'] += 1
-                    logger.debug(f"Fila {row_idx} importada exitosamente")
+                
+                    # CREAR CON VALIDACIÓN DE DUPLICADOS
+                    try:
+                        create_transaction(
+                            db=db, 
+                            user_id=user_id, 
+                            transaction_data=transaction_data,
+                            import_source=filename,
+                            skip_duplicate_check=allow_duplicates,
+                            ledger=ledger
+                        )
+                        results['successful_imports'] += 1
+                        logger.debug(f"Fila {row_idx} importada exitosamente")
+                        pending_rows += 1
+                        if pending_rows >= DUPLICATE_FILTER_BATCH_SIZE:
+                            _commit_import_batch(db, ledger)
+                            pending_rows = 0
                     
-                except ValueError as e:
-                    if "duplicada" in str(e):
-                        results['skipped_duplicates'] += 1
-                        logger.info(f"Fila {row_idx} saltada (duplicado): {str(e)}")
-                        if not allow_duplicates:
-                            continue  # Saltar sin contar como error
-                    raise  # Re-lanzar otros errores
+                    except ValueError as e:
+                        if "duplicada" in str(e):
+                            results['skipped_duplicates'] += 1
+                            logger.info(f"Fila {row_idx} saltada (duplicado): {str(e)}")
+                            if not allow_duplicates:
+                                continue  # Saltar sin contar como error
+                        raise  # Re-lanzar otros errores
                 
-            except Exception as e:
-                results['failed_imports'] += 1
-                error_msg = f"Fila {row_idx}: {str(e)}"
-                results['errors'].append(error_msg)
-                logger.warning(error_msg)
-                continue
-        
-        workbook.close()
+                except Exception as e:
+                    results['failed_imports'] += 1
+                    error_msg = f"Fila {row_idx}: {str(e)}"
+                    results['errors'].append(error_msg)
+                    logger.warning(error_msg)
+                    continue
+        
+        _commit_import_batch(db, ledger)
         logger.info(f"Importación completada: {results['successful_imports']} exitosas, {results['skipped_duplicates']} duplicados saltados, {results['failed_imports']} fallidas de {results['total_records']} total")
                 
     except Exception as e:
+        # El lote pendiente se descarta completo: filas y saldos
+        db.rollback()
         error_msg = f"Error procesando archivo Excel: {str(e)}"
         logger.error(error_msg)
         raise ValueError(error_msg)
@@ -683,9 +752,14 @@ def import_transactions_with_profile(
         'total_records': 0,
         'successful_imports': 0,
         'failed_imports': 0,
-        'errors': []
+        'errors': [],
+        'skipped_duplicates': 0
     }
     
+    # Cada lote confirma sus filas junto con sus saldos (ver _import_parsed_rows)
+    ledger = BalanceLedger()
+    file_import = None
+    
     try:
         # Verificar que el archivo no esté vacío
         if not file_content:
@@ -694,32 +768,42 @@ def import_transactions_with_profile(
         
         logger.debug(f"Procesando archivo: {filename}, tamaño: {len(file_content)} bytes")
         
-        # Determinar el tipo de archivo y procesarlo
-        filename_lower = filename.lower()
-        if filename_lower.endswith('.csv'):
+        # Determinar el formato por contenido (magic bytes), no por la extensión
+        file_format = sniff_format(file_content)
+        
+        # Re-subida de un archivo ya importado: se responde sin parsearlo
+        sha256 = file_sha256(file_content)
+        fingerprint = content_fingerprint(file_content, file_format)
+        previous = find_matching_import(db, user_id, profile, sha256, fingerprint)
+        if previous is not None:
+            logger.info(f"Archivo ya importado en la importación {previous.id}, se devuelve su resultado")
+            return previous_import_result(db, previous)
+        
+        file_import = start_file_import(db, user_id, profile, filename, file_format, len(file_content), sha256, fingerprint)
+        row_index = ImportRowIndex(user_id, account.id, load_known_digests(db, user_id, account.id),
+                                   import_id=file_import.id)
+        
+        if file_format == FORMAT_CSV:
             logger.info("Procesando como CSV")
-            return _process_csv_with_profile(db, user_id, profile, column_mappings, file_content, results)
-        elif filename_lower.endswith(('.xlsx', '.xls')):
-            logger.info("Procesando como Excel")
-            return _process_excel_with_profile(db, user_id, profile, column_mappings, file_content, results)
+            _process_csv_with_profile(db, user_id, profile, column_mappings, file_content, results, ledger,
+                                      row_index=row_index)
         else:
-            # Intentar detectar por contenido si la extensión no es clara
-            logger.debug("Extensión no reconocida, intentando detectar por contenido")
-            try:
-                # Intentar como texto (CSV)
-                content_preview = file_content[:1024].decode('utf-8', errors='ignore')
-                if any(delimiter in content_preview for delimiter in [',', ';', '\t']):
-                    logger.info("Detectado como CSV por contenido")
-                    return _process_csv_with_profile(db, user_id, profile, column_mappings, file_content, results)
-            except Exception as e:
-                logger.debug(f"Error detectando como CSV: {str(e)}")
-                pass
-            
-            # Si no se puede detectar, asumir Excel
-            logger.info("Procesando como Excel por defecto")
-            return _process_excel_with_profile(db, user_id, profile, column_mappings, file_content, results)
+            logger.info(f"Procesando como Excel (.{file_format})")
+            _process_excel_with_profile(db, user_id, profile, column_mappings, file_content, results, ledger,
+                                        file_format, row_index=row_index)
+        
+        # Filas del prefijo/sufijo que ya venían en una importación anterior
+        results['skipped_duplicates'] = row_index.finish()
+        results['total_records'] += results['skipped_duplicates']
+        finish_file_import(db, file_import, results, row_index)
+        results['import_id'] = file_import.id
+        return results
             
     except Exception as e:
+        # El lote pendiente se descarta completo: filas y saldos
+        db.rollback()
+        if file_import is not None:
+            fail_file_import(db, file_import)
         error_msg = f"Error procesando archivo: {str(e)}"
         logger.error(f"Error en import_transactions_with_profile: {str(e)}")
         raise ValueError(error_msg)
@@ -730,88 +814,68 @@ def _process_csv_with_profile(
     profile: FileImportProfile,
     column_mappings: List[FileColumnMapping],
     file_content: bytes,
-    results: Dict[str, Any]
+    results: Dict[str, Any],
+    ledger: Optional[BalanceLedger] = None,
+    row_index: Optional[ImportRowIndex] = None
 ) -> Dict[str, Any]:
     """Procesa un archivo CSV usando el perfil de importación"""
     
     logger.info(f"Procesando CSV para usuario {user_id} con perfil {profile.id}")
     
     try:
-        # Decodificar el contenido
-        encoding = getattr(profile, 'encoding', 'utf-8') or 'utf-8'
-        logger.debug(f"Decodificando CSV con encoding: {encoding}")
-        csv_content = file_content.decode(encoding)
-        
-        # Crear un reader CSV
-        delimiter = getattr(profile, 'delimiter', ',') or ','
-        logger.debug(f"Usando delimitador: '{delimiter}'")
-        csv_reader = csv.reader(
-            io.StringIO(csv_content),
-            delimiter=delimiter
-        )
-        
-        rows = list(csv_reader)
-        logger.debug(f"CSV cargado: {len(rows)} filas totales")
-        
-        # Saltar headers si existen
-        has_header = getattr(profile, 'has_header', True)
-        start_row = 1 if has_header else 0
-        logger.debug(f"Tiene headers: {has_header}, fila de inicio: {start_row}")
-        
-        # Crear mapeo de columnas por nombre o índice
-        column_map = {}
-        for mapping in column_mappings:
-            source_column_name = getattr(mapping, 'source_column_name', None)
-            source_column_index = getattr(mapping, 'source_column_index', None)
-            target_field_name = getattr(mapping, 'target_field_name', '')
+        with _open_profile_reader(profile, file_content, FORMAT_CSV) as reader:
+            logger.debug(f"CSV abierto con delimitador: '{reader.delimiter}'")
             
-            if has_header and source_column_name:
-                # Buscar el índice de la columna por nombre
-                try:
-                    header_row = rows[0]
-                    column_index = header_row.index(source_column_name)
-                    column_map[target_field_name] = column_index
-                    logger.debug(f"Mapeo por nombre: {target_field_name} -> columna {column_index} ('{source_column_name}')")
-                except (IndexError, ValueError):
-                    # Si no se encuentra, usar el índice configurado
+            # Saltar headers si existen
+            has_header = getattr(profile, 'has_header', True)
+            start_row = 1 if has_header else 0
+            logger.debug(f"Tiene headers: {has_header}, fila de inicio: {start_row}")
+            
+            # Crear mapeo de columnas por nombre o índice
+            header_row = list(reader.read_row(1) or []) if has_header else []
+            column_map = {}
+            for mapping in column_mappings:
+                source_column_name = getattr(mapping, 'source_column_name', None)
+                source_column_index = getattr(mapping, 'source_column_index', None)
+                target_field_name = getattr(mapping, 'target_field_name', '')
+                
+                if has_header and source_column_name:
+                    # Buscar el índice de la columna por nombre
+                    try:
+                        column_index = header_row.index(source_column_name)
+                        column_map[target_field_name] = column_index
+                        logger.debug(f"Mapeo por nombre: {target_field_name} -> columna {column_index} ('{source_column_name}')")
+                    except ValueError:
+                        # Si no se encuentra, usar el índice configurado
+                        if source_column_index is not None:
+                            column_map[target_field_name] = source_column_index
+                            logger.debug(f"Mapeo por índice (fallback): {target_field_name} -> columna {source_column_index}")
+                else:
+                    # Usar el índice configurado
                     if source_column_index is not None:
                         column_map[target_field_name] = source_column_index
-                        logger.debug(f"Mapeo por índice (fallback): {target_field_name} -> columna {source_column_index}")
-            else:
-                # Usar el índice configurado
-                if source_column_index is not None:
-                    column_map[target_field_name] = source_column_index
-                    logger.debug(f"Mapeo por índice: {target_field_name} -> columna {source_column_index}")
-        
-        logger.debug(f"Mapeo final de columnas: {column_map}")
-        
-        # Procesar filas de datos
-        data_rows = rows[start_row:]
-        logger.debug(f"Procesando {len(data_rows)} filas de datos")
-        
-        for row_idx, row in enumerate(data_rows, start=start_row + 1):
-            if not row or all(not cell.strip() for cell in row):
-                logger.debug(f"Saltando fila vacía {row_idx}")
-                continue
-                
-            results['total_records'] += 1
-            logger.debug(f"Procesando fila {row_idx}: {row}")
+                        logger.debug(f"Mapeo por índice: {target_field_name} -> columna {source_column_index}")
             
-            try:
-                transaction_data = _extract_transaction_data(db, row, column_map, profile, row_idx)
-                account_id = getattr(profile, 'account_id')
-                transaction_data.account_id = account_id
-                
-                create_transaction(db, user_id, transaction_data)
-                results['successful_imports'] += 1
-                logger.debug(f"Fila {row_idx} importada exitosamente")
-                
-            except Exception as e:
-                results['failed_imports'] += 1
-                error_msg = f"Fila {row_idx}: {str(e)}"
-                results['errors'].append(error_msg)
-                logger.warning(f"Error en fila {row_idx}: {str(e)}")
-                continue
+            logger.debug(f"Mapeo final de columnas: {column_map}")
+            extractor = _bind_profile_extractor(profile, column_mappings, column_map, reader, start_row + 1)
+            default_status_id = get_default_transaction_status_id(db)
+            
+            workers = settings.IMPORT_PARALLEL_CSV_WORKERS or default_worker_count()
+            encoding = getattr(profile, 'encoding', 'utf-8') or 'utf-8'
+            if (len(file_content) >= settings.IMPORT_PARALLEL_CSV_MIN_BYTES and workers > 1
+                    and supports_byte_splitting(encoding)):
+                # CSV grande: parseo y validación en paralelo, inserción secuencial
+                data_start = find_record_end(file_content, 0, reader.delimiter) if has_header else 0
+                parsed_rows = parse_csv_in_parallel(
+                    file_content, data_start, start_row + 1, encoding, reader.delimiter,
+                    extractor, default_status_id, workers
+                )
+                _import_parsed_rows(db, user_id, profile, parsed_rows, results, ledger, row_index)
+            else:
+                # Procesar filas de datos por bloques, con un solo estado de importación
+                parsed_rows = _extract_profile_rows(reader.iter_chunks(start_row=start_row + 1), extractor,
+                                                    default_status_id, skip_empty_rows=True)
+                _import_parsed_rows(db, user_id, profile, parsed_rows, results, ledger, row_index)
                 
         logger.info(f"CSV procesado: {results['successful_imports']} exitosas, {results['failed_imports']} fallidas de {results['total_records']} total")
                 
@@ -828,7 +892,10 @@ def _process_excel_with_profile(
     profile: FileImportProfile,
     column_mappings: List[FileColumnMapping],
     file_content: bytes,
-    results: Dict[str, Any]
+    results: Dict[str, Any],
+    ledger: Optional[BalanceLedger] = None,
+    file_format: Optional[str] = None,
+    row_index: Optional[ImportRowIndex] = None
 ) -> Dict[str, Any]:
     """Procesa un archivo Excel usando el perfil de importación - soporta .xlsx y .xls"""
     
@@ -845,214 +912,68 @@ def _process_excel_with_profile(
             logger.error(f"Archivo demasiado pequeño: {len(file_content)} bytes")
             raise ValueError("El archivo es demasiado pequeño para ser un Excel válido")
         
-        # Intentar cargar primero como .xlsx, luego como .xls
-        worksheet = None
-        workbook = None
-        is_xls_format = False
-        
-        try:
-            logger.debug(f"Intentando cargar como Excel .xlsx, primeros 50 bytes: {file_content[:50]}")
-            workbook = load_workbook(io.BytesIO(file_content), read_only=True, data_only=True)
-            logger.info(f"Excel .xlsx cargado exitosamente, hojas disponibles: {workbook.sheetnames}")
+        # Un único intento de apertura: el formato sale de los magic bytes
+        with _open_profile_reader(profile, file_content, file_format) as reader:
+            logger.info(f"Excel .{reader.format} cargado exitosamente, hoja: {reader.sheet_title}")
             
-            # Seleccionar la hoja
-            sheet_name = getattr(profile, 'sheet_name', None)
-            if sheet_name:
-                try:
-                    worksheet = workbook[sheet_name]
-                    logger.debug(f"Hoja seleccionada: {sheet_name}")
-                except KeyError:
-                    available_sheets = workbook.sheetnames
-                    error_msg = f"Hoja '{sheet_name}' no encontrada. Hojas disponibles: {', '.join(available_sheets)}"
-                    logger.error(error_msg)
-                    raise ValueError(error_msg)
-            else:
-                worksheet = workbook.active
-                logger.debug(f"Hoja activa seleccionada: {worksheet.title if worksheet else 'None'}")
-                
-        except Exception as xlsx_error:
-            logger.warning(f"Error cargando como .xlsx: {str(xlsx_error)}")
-            try:
-                logger.debug("Intentando cargar como Excel .xls...")
-                workbook = xlrd.open_workbook(file_contents=file_content)
-                is_xls_format = True
-                
-                # Para .xls, seleccionar la hoja
-                sheet_name = getattr(profile, 'sheet_name', None)
-                if sheet_name:
-                    try:
-                        worksheet = workbook.sheet_by_name(sheet_name)
-                        logger.debug(f"Hoja .xls seleccionada: {sheet_name}")
-                    except Exception:  # xlrd puede lanzar diferentes tipos de errores
-                        available_sheets = workbook.sheet_names()
-                        error_msg = f"Hoja '{sheet_name}' no encontrada. Hojas disponibles: {', '.join(available_sheets)}"
-                        logger.error(error_msg)
-                        raise ValueError(error_msg)
-                else:
-                    worksheet = workbook.sheet_by_index(0)
-                    logger.debug("Hoja activa .xls seleccionada (índice 0)")
-                    
-                logger.info("Excel .xls cargado exitosamente")
-                
-            except Exception as xls_error:
-                logger.error(f"Error cargando como .xls: {str(xls_error)}")
-                # Si falla como Excel, intentar detectar si es realmente un CSV
-                try:
-                    content_str = file_content.decode('utf-8')
-                    if ',' in content_str or ';' in content_str:
-                        error_msg = "El archivo parece ser CSV, no Excel. Use el endpoint de CSV o cambie la extensión del archivo."
-                        logger.error(error_msg)
-                        raise ValueError(error_msg)
-                except UnicodeDecodeError:
-                    pass
-                error_msg = f"Archivo Excel inválido. Errores: .xlsx: {str(xlsx_error)}, .xls: {str(xls_error)}"
-                logger.error(error_msg)
-                raise ValueError(error_msg)
+            # Crear mapeo de columnas
+            logger.debug("Creando mapeo de columnas")
+            column_map = {}
+            has_header = getattr(profile, 'has_header', True)
+            header_row_num = getattr(profile, 'header_row', 1)
+            logger.debug(f"Configuración: has_header={has_header}, header_row={header_row_num}")
             
-        if worksheet is None:
-            logger.error("No se pudo obtener una hoja de trabajo válida")
-            raise ValueError("No se pudo obtener una hoja de trabajo válida del archivo Excel")
-        
-        # Crear mapeo de columnas
-        logger.debug("Creando mapeo de columnas")
-        column_map = {}
-        has_header = getattr(profile, 'has_header', True)
-        header_row_num = getattr(profile, 'header_row', 1)
-        logger.debug(f"Configuración: has_header={has_header}, header_row={header_row_num}")
-        
-        if has_header and header_row_num:
-            # Leer la fila de headers según el formato
-            header_row = None
-            
-            if is_xls_format:
-                # Para .xls usar xlrd (índices 0-based)
-                header_row_idx = header_row_num - 1
-                logger.debug(f"Leyendo headers .xls en fila {header_row_idx}")
-                # Usar hasattr para verificar si existen los atributos antes de usarlos
-                if hasattr(worksheet, 'nrows') and hasattr(worksheet, 'ncols') and hasattr(worksheet, 'cell_value'):
-                    if header_row_idx < worksheet.nrows:  # type: ignore
-                        header_row = [worksheet.cell_value(header_row_idx, col) for col in range(worksheet.ncols)]  # type: ignore
-                        logger.debug(f"Headers .xls encontrados: {header_row}")
+            if has_header and header_row_num:
+                header_row = reader.read_row(header_row_num)
+                logger.debug(f"Headers encontrados en fila {header_row_num}: {header_row}")
+                
+                if header_row:
+                    header_row = list(header_row)
+                    for mapping in column_mappings:
+                        source_column_name = getattr(mapping, 'source_column_name', None)
+                        source_column_index = getattr(mapping, 'source_column_index', None)
+                        target_field_name = getattr(mapping, 'target_field_name', '')
+                        
+                        if source_column_name:
+                            try:
+                                column_index = header_row.index(source_column_name)
+                                column_map[target_field_name] = column_index
+                                logger.debug(f"Mapeo por nombre: {target_field_name} -> columna {column_index} ('{source_column_name}')")
+                            except ValueError:
+                                if source_column_index is not None:
+                                    column_map[target_field_name] = source_column_index
+                                    logger.debug(f"Mapeo por índice (fallback): {target_field_name} -> columna {source_column_index}")
+                        else:
+                            if source_column_index is not None:
+                                column_map[target_field_name] = source_column_index
+                                logger.debug(f"Mapeo por índice: {target_field_name} -> columna {source_column_index}")
             else:
-                # Para .xlsx usar openpyxl
-                logger.debug(f"Leyendo headers .xlsx en fila {header_row_num}")
-                if hasattr(worksheet, 'iter_rows'):
-                    header_row = list(worksheet.iter_rows(  # type: ignore
-                        min_row=header_row_num,
-                        max_row=header_row_num,
-                        values_only=True
-                    ))[0]
-                    logger.debug(f"Headers .xlsx encontrados: {header_row}")
-            
-            if header_row:
+                # Usar índices configurados
+                logger.debug("Usando mapeo por índices (sin headers)")
                 for mapping in column_mappings:
-                    source_column_name = getattr(mapping, 'source_column_name', None)
                     source_column_index = getattr(mapping, 'source_column_index', None)
                     target_field_name = getattr(mapping, 'target_field_name', '')
-                    
-                    if source_column_name:
-                        try:
-                            column_index = header_row.index(source_column_name)
-                            column_map[target_field_name] = column_index
-                            logger.debug(f"Mapeo por nombre: {target_field_name} -> columna {column_index} ('{source_column_name}')")
-                        except ValueError:
-                            if source_column_index is not None:
-                                column_map[target_field_name] = source_column_index
-                                logger.debug(f"Mapeo por índice (fallback): {target_field_name} -> columna {source_column_index}")
-                    else:
-                        if source_column_index is not None:
-                            column_map[target_field_name] = source_column_index
-                            logger.debug(f"Mapeo por índice: {target_field_name} -> columna {source_column_index}")
-        else:
-            # Usar índices configurados
-            logger.debug("Usando mapeo por índices (sin headers)")
-            for mapping in column_mappings:
-                source_column_index = getattr(mapping, 'source_column_index', None)
-                target_field_name = getattr(mapping, 'target_field_name', '')
-                if source_column_index is not None:
-                    column_map[target_field_name] = source_column_index
-                    logger.debug(f"Mapeo por índice: {target_field_name} -> columna {source_column_index}")
-        
-        logger.debug(f"Mapeo final de columnas: {column_map}")
-        
-        # Procesar filas de datos
-        start_row_num = getattr(profile, 'start_row', None)
-        if start_row_num is None:
-            start_row_num = header_row_num + 1 if header_row_num else 1
-        
-        skip_empty_rows = getattr(profile, 'skip_empty_rows', True)
-        logger.debug(f"Configuración procesamiento: start_row={start_row_num}, skip_empty_rows={skip_empty_rows}")
-        
-        if is_xls_format:
-            # Procesar filas para .xls
-            start_row_idx = start_row_num - 1  # xlrd usa índices 0-based
-            logger.debug(f"Procesando filas .xls desde índice {start_row_idx}")
+                    if source_column_index is not None:
+                        column_map[target_field_name] = source_column_index
+                        logger.debug(f"Mapeo por índice: {target_field_name} -> columna {source_column_index}")
             
-            if hasattr(worksheet, 'nrows') and hasattr(worksheet, 'ncols') and hasattr(worksheet, 'cell_value'):
-                total_rows = worksheet.nrows  # type: ignore
-                logger.debug(f"Total de filas en .xls: {total_rows}")
-                
-                for row_idx in range(start_row_idx, total_rows):
-                    row = [worksheet.cell_value(row_idx, col) for col in range(worksheet.ncols)]  # type: ignore
-                    
-                    if skip_empty_rows and (not row or all(cell is None or str(cell).strip() == '' for cell in row)):
-                        logger.debug(f"Saltando fila vacía {row_idx + 1}")
-                        continue
-                        
-                    results['total_records'] += 1
-                    logger.debug(f"Procesando fila .xls {row_idx + 1}: {row}")
-                    
-                    try:
-                        transaction_data = _extract_transaction_data(db, row, column_map, profile, row_idx + 1)
-                        account_id = getattr(profile, 'account_id')
-                        transaction_data.account_id = account_id
-                        
-                        create_transaction(db, user_id, transaction_data)
-                        results['successful_imports'] += 1
-                        logger.debug(f"Fila .xls {row_idx + 1} importada exitosamente")
-                        
-                    except Exception as e:
-                        results['failed_imports'] += 1
-                        error_msg = f"Fila {row_idx + 1}: {str(e)}"
-                        results['errors'].append(error_msg)
-                        logger.warning(f"Error en fila .xls {row_idx + 1}: {str(e)}")
-                        continue
-        else:
-            # Procesar filas para .xlsx
-            logger.debug(f"Procesando filas .xlsx desde fila {start_row_num}")
-            if hasattr(worksheet, 'iter_rows'):
-                for row_idx, row in enumerate(worksheet.iter_rows(  # type: ignore
-                    min_row=start_row_num,
-                    values_only=True
-                ), start=start_row_num):
-                    
-                    if skip_empty_rows and (not row or all(cell is None or str(cell).strip() == '' for cell in row)):
-                        logger.debug(f"Saltando fila vacía {row_idx}")
-                        continue
-                        
-                    results['total_records'] += 1
-                    logger.debug(f"Procesando fila .xlsx {row_idx}: {row}")
-                    
-                    try:
-                        transaction_data = _extract_transaction_data(db, list(row), column_map, profile, row_idx)
-                        account_id = getattr(profile, 'account_id')
-                        transaction_data.account_id = account_id
-                        
-                        create_transaction(db, user_id, transaction_data)
-                        results['successful_imports'] += 1
-                        logger.debug(f"Fila .xlsx {row_idx} importada exitosamente")
-                        
-                    except Exception as e:
-                        results['failed_imports'] += 1
-                        error_msg = f"Fila {row_idx}: {str(e)}"
-                        results['errors'].append(error_msg)
-                        logger.warning(f"Error en fila .xlsx {row_idx}: {str(e)}")
-                        continue
-        
-        # Cerrar el workbook si es openpyxl
-        if not is_xls_format and hasattr(workbook, 'close'):
-            workbook.close()  # type: ignore
-            logger.debug("Workbook .xlsx cerrado")
+            logger.debug(f"Mapeo final de columnas: {column_map}")
+            # Las filas de datos solo necesitan las columnas mapeadas
+            reader.select_columns(column_map.values())
+            
+            # Procesar filas de datos
+            start_row_num = getattr(profile, 'start_row', None)
+            if start_row_num is None:
+                start_row_num = header_row_num + 1 if header_row_num else 1
+            extractor = _bind_profile_extractor(profile, column_mappings, column_map, reader, start_row_num)
+            default_status_id = get_default_transaction_status_id(db)
+            
+            skip_empty_rows = getattr(profile, 'skip_empty_rows', True)
+            logger.debug(f"Configuración procesamiento: start_row={start_row_num}, skip_empty_rows={skip_empty_rows}")
+            
+            parsed_rows = _extract_profile_rows(reader.iter_chunks(start_row=start_row_num), extractor,
+                                                default_status_id, skip_empty_rows=skip_empty_rows)
+            _import_parsed_rows(db, user_id, profile, parsed_rows, results, ledger, row_index)
         
         logger.info(f"Excel procesado: {results['successful_imports']} exitosas, {results['failed_imports']} fallidas de {results['total_records']} total")
         
@@ -1063,157 +984,188 @@ def _process_excel_with_profile(
     
     return results
 
-def _extract_transaction_data(
+def _extract_profile_rows(
+    chunks: Iterable[List],
+    extractor: RowExtractor,
+    default_status_id: int,
+    skip_empty_rows: bool = True
+) -> Iterator[Tuple[int, Any, Optional[Exception]]]:
+    """Extrae, bloque a bloque, las filas (número de fila, valores) con el extractor compilado del perfil"""
+    extract = extractor.extract
+    for rows in chunks:
+        logger.debug(f"Procesando bloque de {len(rows)} filas desde la fila {rows[0][0]}")
+        extractor.prime_dates(row for _, row in rows)
+        for row_idx, row in rows:
+            if skip_empty_rows and (not row or all(cell is None or str(cell).strip() == '' for cell in row)):
+                continue
+            try:
+                yield row_idx, extract(row, row_idx, default_status_id), None
+            except Exception as e:
+                yield row_idx, None, e
+
+def _import_parsed_rows(
     db: Session,
-    row: List,
-    column_map: Dict[str, int],
+    user_id: int,
     profile: FileImportProfile,
-    row_idx: int
-) -> TransactionCreateRequest:
-    """Extrae los datos de transacción de una fila usando el mapeo de columnas"""
-    
-    logger.debug(f"Extrayendo datos de transacción de fila {row_idx}")
-    
-    def get_cell_value(field_name: str, default=None):
-        if field_name in column_map and column_map[field_name] < len(row):
-            value = row[column_map[field_name]]
-            logger.debug(f"  {field_name}: {value} (columna {column_map[field_name]})")
-            return value if value is not None else default
-        logger.debug(f"  {field_name}: {default} (no mapeado o fuera de rango)")
-        return default
-    
-    # Extraer fecha
-    date_value = get_cell_value('date')
-    if not date_value:
-        logger.error(f"Fila {row_idx}: Fecha requerida pero no encontrada")
-        raise ValueError("Fecha requerida")
-    
-    transaction_date = parse_excel_date(date_value)
-    if transaction_date is None:
-        logger.error(f"Fila {row_idx}: Fecha inválida: {date_value}")
-        raise ValueError("Fecha inválida")
-    
-    logger.debug(f"  Fecha procesada: {transaction_date}")
-    
-    # Extraer montos - detectar automáticamente el esquema disponible
-    amount = 0.0
-    amount_schema = getattr(profile, 'amount_schema')
-    
-    if hasattr(amount_schema, 'value'):
-        schema_value = amount_schema.value
-    else:
-        schema_value = str(amount_schema)
-    
-    logger.debug(f"  Esquema configurado: {schema_value}")
-    
-    # Detectar qué tipos de columnas están disponibles
-    has_single_amount = 'amount' in column_map
-    has_separate_amounts = ('expense_amount' in column_map and 'income_amount' in column_map) or \
-                          ('debit_amount' in column_map and 'credit_amount' in column_map)
-    
-    logger.debug(f"  Columnas disponibles: single_amount={has_single_amount}, separate_amounts={has_separate_amounts}")
-    logger.debug(f"  Mapeo de columnas: {list(column_map.keys())}")
-    
-    if has_separate_amounts:
-        # Usar columnas separadas (prioritario)
-        logger.debug("  Usando lógica de columnas separadas")
-        
-        # Primero intentar con expense_amount/income_amount
-        expense_amount = parse_excel_amount(get_cell_value('expense_amount', 0))
-        income_amount = parse_excel_amount(get_cell_value('income_amount', 0))
+    parsed_rows,
+    results: Dict[str, Any],
+    ledger: Optional[BalanceLedger],
+    row_index: Optional[ImportRowIndex] = None
+) -> None:
+    """
+    Inserta las filas ya extraídas de una importación como (número de fila,
+    transacción o None, excepción o None). Se llama una vez por importación:
+    el historial de casi-duplicados y las reglas de metas se cargan una sola
+    vez, así que las filas de bloques anteriores del mismo archivo no cuentan
+    como historial. Los montos no interpretables se reportan además en
+    bloque en results['amount_errors'] con su fila y valor original. Con
+    `row_index` se descartan las filas ya importadas al comienzo o al final
+    de la cartola (ver import_fingerprint_service).
+
+    Cada lote se confirma en un solo commit: sus filas, los saldos del
+    `ledger` y los enlaces del lote. Una importación interrumpida deja solo
+    lotes completos con sus saldos.
+    """
+    account_id = getattr(profile, 'account_id')
+    if ledger is None:
+        ledger = BalanceLedger()
+    amount_errors = []
+    import_id = row_index.import_id if row_index is not None else None
+    if row_index is not None:
+        parsed_rows = row_index.filter(parsed_rows)
+    duplicate_filter = get_account_filter(db, user_id, account_id)
+    near_index = None
+    if settings.IMPORT_NEAR_DUPLICATE_CHECK:
+        near_index = AccountNearDuplicateIndex(db, user_id, account_id)
+    possible_duplicates = results.setdefault('possible_duplicates', [])
+    row_errors = results.setdefault('row_errors', [])
+    goal_matcher = GoalContributionMatcher(db, user_id)
+    parsed_rows = iter(parsed_rows)
+    
+    while True:
+        batch = list(islice(parsed_rows, DUPLICATE_FILTER_BATCH_SIZE))
+        if not batch:
+            break
+        for _, transaction_data, _ in batch:
+            if transaction_data is not None:
+                transaction_data.account_id = account_id
+        if duplicate_filter is not None:
+            # Verificación en bloque de las filas que el filtro marca como posibles duplicados
+            duplicate_filter.prefetch(db, (item[1] for item in batch if item[1] is not None))
         
-        # Si no están disponibles, usar debit_amount/credit_amount
-        if expense_amount == 0 and income_amount == 0:
-            debit_amount = parse_excel_amount(get_cell_value('debit_amount', 0))
-            credit_amount = parse_excel_amount(get_cell_value('credit_amount', 0))
-            
-            debit_column_is_expense = getattr(profile, 'debit_column_is_expense', True)
-            
-            logger.debug(f"  Montos débito/crédito: debit={debit_amount}, credit={credit_amount}")
-            logger.debug(f"  debit_column_is_expense: {debit_column_is_expense}")
-            
-            if debit_amount != 0:
-                amount = -abs(debit_amount) if debit_column_is_expense else abs(debit_amount)
-                logger.debug(f"  Usando debit_amount: {amount}")
-            elif credit_amount != 0:
-                amount = abs(credit_amount) if not debit_column_is_expense else -abs(credit_amount)
-                logger.debug(f"  Usando credit_amount: {amount}")
-        else:
-            logger.debug(f"  Montos ingreso/gasto: expense={expense_amount}, income={income_amount}")
+        created = []
+        for row_idx, transaction_data, error in batch:
+            results['total_records'] += 1
             
-            if expense_amount != 0:
-                amount = -abs(expense_amount)  # Gastos siempre negativos
-                logger.debug(f"  Usando expense_amount: {amount}")
-            elif income_amount != 0:
-                amount = abs(income_amount)  # Ingresos siempre positivos
-                logger.debug(f"  Usando income_amount: {amount}")
+            try:
+                if error is not None:
+                    raise error
                 
-    elif has_single_amount:
-        # Usar columna única
-        logger.debug("  Usando lógica de columna única")
-        amount_value = get_cell_value('amount', 0)
-        amount = parse_excel_amount(amount_value)
-        
-        logger.debug(f"  Monto único obtenido: {amount}")
+                # Mismo movimiento ya registrado con la fecha corrida o la glosa reescrita
+                near_matches = []
+                if near_index is not None:
+                    near_matches = near_index.find(db, transaction_data.description, transaction_data.amount,
+                                                   transaction_data.transaction_date)
+                if near_matches and settings.IMPORT_NEAR_DUPLICATE_REJECT:
+                    raise DuplicateTransactionError(
+                        f"posible duplicado de ID {near_matches[0].transaction_id} "
+                        f"(similitud: {near_matches[0].similarity:.0%})"
+                    )
+                
+                transaction = create_transaction(db, user_id, transaction_data, ledger=ledger,
+                                                 duplicate_filter=duplicate_filter, import_id=import_id,
+                                                 import_row_number=row_idx, assign_merchant=False)
+                created.append(transaction)
+                if row_index is not None:
+                    row_index.record(transaction.content_hash)
+                results['successful_imports'] += 1
+                if near_matches:
+                    possible_duplicates.append({
+                        'row_number': row_idx,
+                        'transaction_id': near_matches[0].transaction_id,
+                        'similarity': round(near_matches[0].similarity, 4),
+                    })
+                logger.debug(f"Fila {row_idx} importada exitosamente")
+                
+            except AmountParseError as e:
+                results['failed_imports'] += 1
+                results['errors'].append(f"Fila {row_idx}: {str(e)}")
+                row_errors.append({'row_number': row_idx, 'error_type': AMOUNT_ERROR_TYPE, 'message': str(e)})
+                amount_errors.append({'row_number': row_idx, 'value': str(e.value)})
+                continue
+            except Exception as e:
+                results['failed_imports'] += 1
+                error_msg = f"Fila {row_idx}: {str(e)}"
+                results['errors'].append(error_msg)
+                error_type = DUPLICATE_ERROR_TYPE if isinstance(e, DuplicateTransactionError) else ROW_ERROR_TYPE
+                row_errors.append({'row_number': row_idx, 'error_type': error_type, 'message': str(e)})
+                logger.warning(f"Error en fila {row_idx}: {str(e)}")
+                continue
         
-        # Aplicar reglas de interpretación
-        positive_is_income = getattr(profile, 'positive_is_income', True)
-        if not positive_is_income:
-            amount = -amount  # Invertir signo si positivo no es ingreso
-            logger.debug(f"  Signo invertido por configuración: {amount}")
-    
-    else:
-        # No se encontraron columnas de monto válidas
-        logger.error(f"  No se encontraron columnas de monto válidas en el mapeo")
-        logger.error(f"  Columnas mapeadas: {list(column_map.keys())}")
-        raise ValueError("No se encontraron columnas de monto válidas en la configuración")
-    
-    if amount == 0:
-        logger.error(f"Fila {row_idx}: El monto no puede ser cero")
-        raise ValueError("El monto no puede ser cero")
-    
-    # Extraer otros campos
-    description = str(get_cell_value('description', '')).strip()
-    notes = str(get_cell_value('notes', '')).strip()
-    
-    logger.debug(f"  Monto final: {amount}")
-    logger.debug(f"  Descripción: '{description}'")
-    logger.debug(f"  Notas: '{notes}'")
-    
-    # Redondear el monto a 2 decimales para evitar problemas de precisión
-    amount = round(amount, 2)
-    
-    # Obtener un status_id válido  
-    default_status_id = get_default_transaction_status_id(db)
-    # Asegurarse de que sea un int
-    if hasattr(default_status_id, 'id'):
-        default_status_id = default_status_id.id
-    elif hasattr(default_status_id, 'value'):
-        default_status_id = default_status_id.value
-    elif isinstance(default_status_id, int):
-        pass  # already int
-    else:
-        raise ValueError("No se pudo obtener un status_id válido para la transacción")
+        if created:
+            _link_imported_batch(db, user_id, created, results, goal_matcher)
+        _commit_import_batch(db, ledger)
+    
+    if possible_duplicates:
+        logger.info(f"{len(possible_duplicates)} fila(s) importadas parecen duplicar transacciones existentes")
+    if duplicate_filter is not None:
+        persist_account_filter(duplicate_filter)
+        logger.debug(f"Filtro de duplicados de cuenta {account_id}: {duplicate_filter.stats}")
+    
+    if amount_errors:
+        results.setdefault('amount_errors', []).extend(amount_errors)
+        logger.warning(
+            f"Montos no válidos en {len(amount_errors)} fila(s): "
+            f"{', '.join(str(item['row_number']) for item in amount_errors[:20])}"
+            f"{'...' if len(amount_errors) > 20 else ''}"
+        )
 
-    transaction_request = TransactionCreateRequest(
-        amount=amount,
-        description=description,
-        transaction_date=transaction_date,
-        account_id=0,  # Se asignará después
-        notes=notes,
-        status_id=default_status_id,  # Usar status válido
-        # No incluir campos opcionales que no vienen del archivo
-        subcategory_id=None,
-        envelope_id=None,
-        transfer_account_id=None,
-        is_recurring=False,
-        is_planned=False,
-        kakebo_emotion=None,
-        external_id=None
-    )
-    
-    logger.debug(f"Transacción extraída exitosamente de fila {row_idx}")
-    return transaction_request
+def _link_imported_batch(
+    db: Session,
+    user_id: int,
+    created: List[Transaction],
+    results: Dict[str, Any],
+    goal_matcher: GoalContributionMatcher
+) -> None:
+    """
+    Enlaza un lote de transacciones importadas (sin commit): transferencias
+    internas, aportes a metas, comercios y montos reales de presupuesto.
+    Lo comparten la importación directa y la confirmación de una
+    previsualización.
+    """
+    # Transferencias internas entre el lote y las otras cuentas del usuario
+    transfer_pairs = link_transfer_pairs(db, user_id, created)
+    if transfer_pairs:
+        results['transfer_pairs'] = results.get('transfer_pairs', 0) + transfer_pairs
+    
+    # Aportes a metas del lote: un insert y una actualización por meta
+    if goal_matcher:
+        results['goal_contributions'] = results.get('goal_contributions', 0) + goal_matcher.link(db, created)
+    
+    # Comercio normalizado de cada transacción del lote
+    assign_merchants(db, created)
+    
+    # Montos reales de las partidas de presupuesto que tocó el lote
+    refresh_budget_actuals(db, user_id)
+
+def _extract_transaction_data(
+    db: Session,
+    row: List,
+    column_map: Dict[str, int],
+    profile: FileImportProfile,
+    row_idx: int,
+    default_status_id: Optional[int] = None
+) -> TransactionCreateRequest:
+    """
+    Extrae los datos de transacción de una fila usando el mapeo de columnas.
+    Con `default_status_id` no consulta la base (db puede ser None).
+
+    Las importaciones compilan el perfil una sola vez (ver
+    import_profile_compiler); esta función extrae una fila suelta.
+    """
+    if default_status_id is None:
+        default_status_id = get_default_transaction_status_id(db)
+    return CompiledProfile(profile).bind(column_map).extract(row, row_idx, default_status_id)
 
 # Funciones para el sistema de previsualización de importación
 
@@ -1270,22 +1222,11 @@ def preview_transactions_with_profile(
     preview_id = str(uuid.uuid4())
     
     try:
-        # Procesar archivo según tipo
-        filename_lower = filename.lower()
-        if filename_lower.endswith('.csv'):
+        # Procesar archivo según el formato detectado por contenido
+        if sniff_format(file_content) == FORMAT_CSV:
             transactions_preview = _process_csv_preview_with_profile(db, user_id, profile, column_mappings, file_content)
-        elif filename_lower.endswith(('.xlsx', '.xls')):
-            transactions_preview = _process_excel_preview_with_profile(db, user_id, profile, column_mappings, file_content)
         else:
-            # Intentar detectar por contenido
-            try:
-                content_preview = file_content[:1024].decode('utf-8', errors='ignore')
-                if any(delimiter in content_preview for delimiter in [',', ';', '\t']):
-                    transactions_preview = _process_csv_preview_with_profile(db, user_id, profile, column_mappings, file_content)
-                else:
-                    transactions_preview = _process_excel_preview_with_profile(db, user_id, profile, column_mappings, file_content)
-            except Exception:
-                transactions_preview = _process_excel_preview_with_profile(db, user_id, profile, column_mappings, file_content)
+            transactions_preview = _process_excel_preview_with_profile(db, user_id, profile, column_mappings, file_content)
         
         # Validar y enriquecer las transacciones
         validated_transactions = []
@@ -1416,6 +1357,9 @@ def confirm_transaction_preview(
     }
     
     default_status_id = get_default_transaction_status_id(db)
+    ledger = BalanceLedger()
+    goal_matcher = GoalContributionMatcher(db, user_id)
+    created = []
     
     for row_num, transaction_data in transactions_to_import:
         try:
@@ -1438,6 +1382,10 @@ def confirm_transaction_preview(
             )
             
             db.add(new_transaction)
+            created.append(new_transaction)
+            ledger.record(account.id, new_transaction.amount, new_transaction.transfer_account_id,
+                          transaction_date=new_transaction.transaction_date,
+                          envelope_id=new_transaction.envelope_id)
             results['successful_imports'] += 1
             
         except Exception as e:
@@ -1447,6 +1395,12 @@ def confirm_transaction_preview(
             logger.error(error_msg)
     
     try:
+        # Saldos en el mismo commit que las transacciones: un UPDATE por cuenta
+        ledger.apply(db)
+        if created:
+            # Mismo enlace por lote que la importación directa
+            db.flush()
+            _link_imported_batch(db, user_id, created, results, goal_matcher)
         db.commit()
         logger.info(f"Importación confirmada: {results['successful_imports']} éxitosas, {results['failed_imports']} fallidas")
         
@@ -1472,12 +1426,6 @@ def _process_csv_preview_with_profile(
     
     logger.info(f"Procesando CSV para previsualización")
     
-    encoding = getattr(profile, 'encoding', 'utf-8') or 'utf-8'
-    csv_content = file_content.decode(encoding)
-    
-    delimiter = getattr(profile, 'delimiter', ',') or ','
-    csv_reader = csv.reader(io.StringIO(csv_content), delimiter=delimiter)
-    
     # Crear mapeo de columnas
     column_map = {}
     for mapping in column_mappings:
@@ -1488,36 +1436,35 @@ def _process_csv_preview_with_profile(
     
     transactions = []
     
-    # Saltar headers si están configurados
-    rows = list(csv_reader)
-    start_row = getattr(profile, 'header_row', 0) or 0
-    if start_row > 0:
-        header_row = rows[start_row - 1] if start_row <= len(rows) else []
-        # Mapear nombres de columna a índices
-        for col_name, target_field in [(k, v) for k, v in column_map.items() if isinstance(k, str)]:
+    with _open_profile_reader(profile, file_content, FORMAT_CSV) as reader:
+        # Saltar headers si están configurados
+        start_row = getattr(profile, 'header_row', 0) or 0
+        if start_row > 0:
+            header_row = list(reader.read_row(start_row) or [])
+            # Mapear nombres de columna a índices
+            for col_name, target_field in [(k, v) for k, v in column_map.items() if isinstance(k, str)]:
+                try:
+                    col_index = header_row.index(col_name)
+                    column_map[col_index] = target_field
+                    del column_map[col_name]
+                except ValueError:
+                    logger.warning(f"Columna '{col_name}' no encontrada en headers")
+        
+        extractor = _bind_profile_extractor(profile, column_mappings, column_map, reader, start_row + 1)
+        data_rows = reader.iter_rows(start_row=start_row + 1)
+        for row_idx, (_, row) in enumerate(data_rows, 1):
+            row = list(row)
             try:
-                col_index = header_row.index(col_name)
-                column_map[col_index] = target_field
-                del column_map[col_name]
-            except ValueError:
-                logger.warning(f"Columna '{col_name}' no encontrada en headers")
-        
-        data_rows = rows[start_row:]
-    else:
-        data_rows = rows
-    
-    for row_idx, row in enumerate(data_rows, 1):
-        try:
-            transaction_data = _extract_transaction_data_preview(row, column_map, row_idx, profile)
-            transactions.append(transaction_data)
-        except Exception as e:
-            logger.warning(f"Error procesando fila {row_idx}: {str(e)}")
-            # Agregar fila con error para mostrar en preview
-            transactions.append({
-                'row_number': row_idx,
-                'raw_data': {f'col_{i}': val for i, val in enumerate(row)},
-                'error': str(e)
-            })
+                transaction_data = extractor.extract_preview(row, row_idx)
+                transactions.append(transaction_data)
+            except Exception as e:
+                logger.warning(f"Error procesando fila {row_idx}: {str(e)}")
+                # Agregar fila con error para mostrar en preview
+                transactions.append({
+                    'row_number': row_idx,
+                    'raw_data': {f'col_{i}': val for i, val in enumerate(row)},
+                    'error': str(e)
+                })
     
     return transactions
 
@@ -1532,49 +1479,6 @@ def _process_excel_preview_with_profile(
     
     logger.info(f"Procesando Excel para previsualización")
     
-    # Intentar cargar como .xlsx primero
-    workbook = None
-    worksheet = None
-    is_xls_format = False
-    
-    try:
-        logger.debug("Intentando cargar como Excel .xlsx...")
-        workbook = load_workbook(io.BytesIO(file_content), read_only=True)
-        sheet_name = getattr(profile, 'sheet_name', None) or workbook.sheetnames[0]
-        worksheet = workbook[sheet_name]
-        logger.info("Excel .xlsx cargado exitosamente para previsualización")
-        
-    except Exception as xlsx_error:
-        logger.warning(f"Error cargando como .xlsx: {str(xlsx_error)}")
-        try:
-            logger.debug("Intentando cargar como Excel .xls...")
-            workbook = xlrd.open_workbook(file_contents=file_content)
-            is_xls_format = True
-            
-            # Para .xls, seleccionar la hoja
-            sheet_name = getattr(profile, 'sheet_name', None)
-            if sheet_name:
-                try:
-                    worksheet = workbook.sheet_by_name(sheet_name)
-                    logger.debug(f"Hoja .xls seleccionada: {sheet_name}")
-                except Exception:
-                    available_sheets = workbook.sheet_names()
-                    error_msg = f"Hoja '{sheet_name}' no encontrada. Hojas disponibles: {', '.join(available_sheets)}"
-                    logger.error(error_msg)
-                    raise ValueError(error_msg)
-            else:
-                worksheet = workbook.sheet_by_index(0)
-                logger.debug("Hoja activa .xls seleccionada (índice 0)")
-                
-            logger.info("Excel .xls cargado exitosamente para previsualización")
-            
-        except Exception as xls_error:
-            logger.error(f"Error cargando como .xls: {str(xls_error)}")
-            raise ValueError(f"Archivo no es un Excel válido (.xlsx/.xls): {str(xlsx_error)} | {str(xls_error)}")
-    
-    if not worksheet:
-        raise ValueError("No se pudo cargar ninguna hoja de trabajo del archivo Excel")
-    
     # Crear mapeo de columnas
     column_map = {}
     for mapping in column_mappings:
@@ -1589,224 +1493,63 @@ def _process_excel_preview_with_profile(
     
     transactions = []
     
-    # Obtener todas las filas según el formato
-    if is_xls_format:
-        # Para .xls usar xlrd
-        rows = []
-        for row_idx in range(worksheet.nrows):
-            row_data = []
-            for col_idx in range(worksheet.ncols):
-                try:
-                    cell_value = worksheet.cell_value(row_idx, col_idx)
-                    row_data.append(cell_value)
-                except Exception:
-                    row_data.append(None)
-            rows.append(tuple(row_data))
-    else:
-        # Para .xlsx usar openpyxl
-        rows = list(worksheet.iter_rows(values_only=True))
-    
-    logger.debug(f"Total de filas obtenidas: {len(rows)}")
-    
-    start_row = getattr(profile, 'header_row', 0) or 0
-    logger.debug(f"Configuración header_row: {start_row}")
-    
-    if start_row > 0 and start_row <= len(rows):
-        header_row = rows[start_row - 1]
-        logger.debug(f"Header row encontrada (fila {start_row}): {header_row}")
+    with _open_profile_reader(profile, file_content) as reader:
+        logger.info(f"Excel .{reader.format} cargado exitosamente para previsualización, hoja: {reader.sheet_title}")
         
-        # Mapear nombres de columna a índices
-        final_column_map = {}
-        for col_name, target_field in [(k, v) for k, v in column_map.items() if isinstance(k, str)]:
-            try:
-                col_index = header_row.index(col_name)
-                final_column_map[col_index] = target_field
-                logger.debug(f"Mapeo convertido: '{col_name}' (índice {col_index}) -> {target_field}")
-            except ValueError:
-                logger.warning(f"Columna '{col_name}' no encontrada en headers: {header_row}")
+        start_row = getattr(profile, 'header_row', 0) or 0
+        logger.debug(f"Configuración header_row: {start_row}")
         
-        # Añadir mapeos por índice que ya existen
-        for col_index, target_field in [(k, v) for k, v in column_map.items() if isinstance(k, int)]:
-            final_column_map[col_index] = target_field
-            logger.debug(f"Mapeo por índice mantenido: columna {col_index} -> {target_field}")
+        header_row = reader.read_row(start_row) if start_row > 0 else None
+        if header_row is not None:
+            header_row = list(header_row)
+            logger.debug(f"Header row encontrada (fila {start_row}): {header_row}")
             
-        column_map = final_column_map
-        data_rows = rows[start_row:]
-        logger.debug(f"Filas de datos a procesar: {len(data_rows)} (desde fila {start_row + 1})")
-    else:
-        data_rows = rows
-        logger.debug(f"Sin headers, procesando todas las {len(rows)} filas")
-    
-    logger.debug(f"Mapeo final de columnas: {column_map}")
-    
-    for row_idx, row in enumerate(data_rows, 1):
-        if not any(cell for cell in row if cell is not None):
-            continue  # Saltar filas vacías
+            # Mapear nombres de columna a índices
+            final_column_map = {}
+            for col_name, target_field in [(k, v) for k, v in column_map.items() if isinstance(k, str)]:
+                try:
+                    col_index = header_row.index(col_name)
+                    final_column_map[col_index] = target_field
+                    logger.debug(f"Mapeo convertido: '{col_name}' (índice {col_index}) -> {target_field}")
+                except ValueError:
+                    logger.warning(f"Columna '{col_name}' no encontrada en headers: {header_row}")
             
-        try:
-            transaction_data = _extract_transaction_data_preview(row, column_map, row_idx, profile)
-            transactions.append(transaction_data)
-        except Exception as e:
-            logger.warning(f"Error procesando fila {row_idx}: {str(e)}")
-            transactions.append({
-                'row_number': row_idx,
-                'raw_data': {f'col_{i}': val for i, val in enumerate(row)},
-                'error': str(e)
-            })
-    
-    return transactions
-
-def _extract_transaction_data_preview(row, column_map: Dict, row_idx: int, profile: Optional[FileImportProfile] = None) -> Dict[str, Any]:
-    """Extrae datos de transacción para previsualización usando la misma lógica que la importación real"""
-    
-    transaction_data = {
-        'row_number': row_idx,
-        'raw_data': {f'col_{i}': val for i, val in enumerate(row)},
-    }
-    
-    logger.debug(f"Fila {row_idx} - Datos de fila: {row}")
-    logger.debug(f"Fila {row_idx} - Mapeo de columnas recibido: {column_map}")
-    
-    def get_cell_value(field_name: str, default=None):
-        # Buscar el índice de columna que mapea a este field_name
-        column_index = None
-        for col_idx, target_field in column_map.items():
-            if target_field == field_name:
-                column_index = col_idx
-                break
-        
-        if column_index is not None and column_index < len(row):
-            value = row[column_index]
-            logger.debug(f"Fila {row_idx} - {field_name}: {value} (columna {column_index})")
-            return value if value is not None else default
-        logger.debug(f"Fila {row_idx} - {field_name}: {default} (no mapeado o fuera de rango)")
-        return default
-    
-    try:
-        # Extraer fecha usando la misma lógica que la importación
-        date_value = get_cell_value('date')
-        logger.debug(f"Fila {row_idx} - Valor de fecha extraído: {date_value} (tipo: {type(date_value)})")
-        
-        if date_value:
-            try:
-                transaction_data['transaction_date'] = parse_excel_date(date_value)
-                logger.debug(f"Fila {row_idx} - Fecha procesada: {transaction_data['transaction_date']}")
-            except Exception as e:
-                transaction_data['transaction_date'] = None
-                transaction_data['date_error'] = str(e)
-                logger.warning(f"Fila {row_idx} - Error procesando fecha: {str(e)}")
-        else:
-            transaction_data['transaction_date'] = None
-            transaction_data['date_error'] = "Fecha requerida pero no encontrada"
-            logger.warning(f"Fila {row_idx} - Fecha no encontrada")
-        
-        # Extraer montos usando la misma lógica compleja que la importación
-        amount = 0.0
-        amount_error = None
-        
-        if profile:
-            amount_schema = getattr(profile, 'amount_schema', None)
-            if amount_schema is not None and hasattr(amount_schema, 'value'):
-                schema_value = amount_schema.value
-            else:
-                schema_value = str(amount_schema) if amount_schema else 'single'
+            # Añadir mapeos por índice que ya existen
+            for col_index, target_field in [(k, v) for k, v in column_map.items() if isinstance(k, int)]:
+                final_column_map[col_index] = target_field
+                logger.debug(f"Mapeo por índice mantenido: columna {col_index} -> {target_field}")
+                
+            column_map = final_column_map
+            data_rows = reader.iter_rows(start_row=start_row + 1)
+            logger.debug(f"Procesando filas de datos desde fila {start_row + 1}")
         else:
-            schema_value = 'single'
-        
-        # Detectar qué tipos de columnas están disponibles
-        has_single_amount = any(target_field == 'amount' for target_field in column_map.values())
-        has_separate_amounts = (any(target_field == 'expense_amount' for target_field in column_map.values()) and 
-                               any(target_field == 'income_amount' for target_field in column_map.values())) or \
-                              (any(target_field == 'debit_amount' for target_field in column_map.values()) and 
-                               any(target_field == 'credit_amount' for target_field in column_map.values()))
+            data_rows = reader.iter_rows()
+            logger.debug("Sin headers, procesando todas las filas")
         
-        logger.debug(f"Fila {row_idx} - Columnas disponibles: single_amount={has_single_amount}, separate_amounts={has_separate_amounts}")
-        logger.debug(f"Fila {row_idx} - Campos mapeados: {list(column_map.values())}")
+        logger.debug(f"Mapeo final de columnas: {column_map}")
+        extractor = _bind_profile_extractor(profile, column_mappings, column_map, reader,
+                                            start_row + 1 if header_row is not None else 1)
         
-        try:
-            if has_separate_amounts:
-                # Usar columnas separadas (prioritario)
-                logger.debug(f"Fila {row_idx} - Usando lógica de columnas separadas")
+        for row_idx, (_, row) in enumerate(data_rows, 1):
+            if not any(cell for cell in row if cell is not None):
+                continue  # Saltar filas vacías
                 
-                # Primero intentar con expense_amount/income_amount
-                expense_amount = parse_excel_amount(get_cell_value('expense_amount', 0))
-                income_amount = parse_excel_amount(get_cell_value('income_amount', 0))
-                
-                logger.debug(f"Fila {row_idx} - Montos ingreso/gasto: expense={expense_amount}, income={income_amount}")
-                
-                # Si no están disponibles, usar debit_amount/credit_amount
-                if expense_amount == 0 and income_amount == 0:
-                    debit_amount = parse_excel_amount(get_cell_value('debit_amount', 0))
-                    credit_amount = parse_excel_amount(get_cell_value('credit_amount', 0))
-                    
-                    debit_column_is_expense = getattr(profile, 'debit_column_is_expense', True) if profile else True
-                    
-                    logger.debug(f"Fila {row_idx} - Montos débito/crédito: debit={debit_amount}, credit={credit_amount}")
-                    logger.debug(f"Fila {row_idx} - debit_column_is_expense: {debit_column_is_expense}")
-                    
-                    if debit_amount != 0:
-                        amount = -abs(debit_amount) if debit_column_is_expense else abs(debit_amount)
-                        logger.debug(f"Fila {row_idx} - Usando debit_amount: {amount}")
-                    elif credit_amount != 0:
-                        amount = abs(credit_amount) if not debit_column_is_expense else -abs(credit_amount)
-                        logger.debug(f"Fila {row_idx} - Usando credit_amount: {amount}")
-                else:
-                    if expense_amount != 0:
-                        amount = -abs(expense_amount)  # Gastos siempre negativos
-                        logger.debug(f"Fila {row_idx} - Usando expense_amount: {amount}")
-                    elif income_amount != 0:
-                        amount = abs(income_amount)  # Ingresos siempre positivos
-                        logger.debug(f"Fila {row_idx} - Usando income_amount: {amount}")
-                        
-            elif has_single_amount:
-                # Usar columna única
-                logger.debug(f"Fila {row_idx} - Usando lógica de columna única")
-                amount_value = get_cell_value('amount', 0)
-                amount = parse_excel_amount(amount_value)
-                
-                logger.debug(f"Fila {row_idx} - Monto único obtenido: {amount}")
-                
-                # Aplicar reglas de interpretación
-                positive_is_income = getattr(profile, 'positive_is_income', True) if profile else True
-                if not positive_is_income:
-                    amount = -amount  # Invertir signo si positivo no es ingreso
-                    logger.debug(f"Fila {row_idx} - Signo invertido por configuración: {amount}")
-            else:
-                amount = 0
-                amount_error = "No se encontraron columnas de monto válidas en la configuración"
-                logger.warning(f"Fila {row_idx} - {amount_error}")
-            
-            # Redondear el monto a 2 decimales
-            amount = round(amount, 2)
-            transaction_data['amount'] = amount
-            logger.debug(f"Fila {row_idx} - Monto final: {amount}")
-            
-        except Exception as e:
-            transaction_data['amount'] = 0
-            amount_error = f"Error procesando monto: {str(e)}"
-            logger.error(f"Fila {row_idx} - {amount_error}")
-        
-        if amount_error:
-            transaction_data['amount_error'] = amount_error
-        
-        # Extraer otros campos
-        description = str(get_cell_value('description', '')).strip()
-        notes = str(get_cell_value('notes', '')).strip()
-        
-        transaction_data['description'] = description
-        transaction_data['notes'] = notes
-        
-        # Mapear todos los campos disponibles según el perfil
-        for col_idx, field_name in column_map.items():
-            if isinstance(col_idx, int) and col_idx < len(row) and field_name not in ['date', 'amount', 'description', 'notes', 'expense_amount', 'income_amount', 'debit_amount', 'credit_amount']:
-                value = row[col_idx]
-                if value is not None:
-                    transaction_data[field_name] = value
-        
-    except Exception as e:
-        transaction_data['extraction_error'] = str(e)
+            try:
+                transaction_data = extractor.extract_preview(row, row_idx)
+                transactions.append(transaction_data)
+            except Exception as e:
+                logger.warning(f"Error procesando fila {row_idx}: {str(e)}")
+                transactions.append({
+                    'row_number': row_idx,
+                    'raw_data': {f'col_{i}': val for i, val in enumerate(row)},
+                    'error': str(e)
+                })
     
-    return transaction_data
+    return transactions
+
+def _extract_transaction_data_preview(row, column_map: Dict, row_idx: int, profile: Optional[FileImportProfile] = None) -> Dict[str, Any]:
+    """Extrae datos de transacción para previsualización usando la misma lógica que la importación real"""
+    return CompiledProfile(profile).bind(column_map).extract_preview(row, row_idx)
 
 def _validate_and_enrich_transaction_preview(
     db: Session,
@@ -0,0 +1,276 @@
+"""
+Detección de transferencias internas entre cuentas de un mismo usuario.
+
+Un egreso en una cuenta y un abono por el mismo monto en otra cuenta del
+usuario, con fechas separadas por a lo más `TRANSFER_MATCH_WINDOW_DAYS` días,
+son los dos tramos de una transferencia. Los candidatos (sin transferencia
+ni contraparte, no planificados) se ordenan por (monto absoluto, fecha) y se
+recorren con un merge join: egresos y abonos avanzan juntos por monto y,
+dentro de cada monto, cada egreso toma el abono de otra cuenta más cercano
+en fecha dentro de la ventana. El costo lo domina el ordenamiento,
+O(n log n).
+
+Solo son candidatas las filas que pueden ser una transferencia: sin
+subcategoría, en una subcategoría de "Transferencias" o con una glosa de
+traspaso. Un gasto ya categorizado que coincide por azar en monto y fecha
+con un abono de otra cuenta no se empareja.
+
+Cada par queda enlazado en ambos sentidos: `transfer_account_id` apunta a la
+cuenta de la contraparte, `transfer_transaction_id` a su transacción, y los
+tramos sin subcategoría pasan a "Transferencia Interna"; la subcategoría que
+ya tenía un tramo no se sobrescribe. Un egreso
+emparejado no abona a la cuenta destino (el abono ya es su propia
+transacción), así que emparejar no cambia saldos. Los tramos que ya eran
+aportes a metas se vuelven a evaluar para no contar la transferencia dos
+veces.
+
+Uso:
+    link_transfer_pairs(db, user_id, transacciones_del_lote)   # por lote de importación, sin commit
+    match_internal_transfers(db, user_id)                      # revisar el historial
+"""
+
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.categories import Category, Subcategory
+from ..models.transactions import Transaction
+from .goal_contribution_service import relink_goal_contributions
+
+logger = logging.getLogger(__name__)
+
+TRANSFER_CATEGORY_NAME = "Transferencias"
+TRANSFER_SUBCATEGORY_NAME = "Transferencia Interna"
+# Glosas que delatan una transferencia aunque la fila tenga otra subcategoría
+TRANSFER_DESCRIPTION_KEYWORDS = ("TRASPASO", "TRANSF")
+UPDATE_CHUNK_SIZE = 1000
+
+
+class TransferCandidate(NamedTuple):
+    id: int
+    account_id: int
+    amount: Decimal
+    transaction_date: date
+
+
+def credited_transfer_account(transaction: Any) -> Optional[int]:
+    """Cuenta a la que abona un egreso: solo las transferencias sin contraparte emparejada"""
+    return None if transaction.transfer_transaction_id is not None else transaction.transfer_account_id
+
+
+def looks_like_transfer(description: Optional[str]) -> bool:
+    text = (description or "").upper()
+    return any(keyword in text for keyword in TRANSFER_DESCRIPTION_KEYWORDS)
+
+
+def _transfer_subcategories():
+    return (
+        select(Subcategory.id)
+        .join(Category, Category.id == Subcategory.category_id)
+        .where(Category.name == TRANSFER_CATEGORY_NAME)
+    )
+
+
+def _transfer_subcategory_ids(db: Session) -> Set[int]:
+    return set(db.execute(_transfer_subcategories()).scalars())
+
+
+def _is_transfer_candidate(transaction: Any, transfer_subcategory_ids: Set[int]) -> bool:
+    return (
+        transaction.transfer_account_id is None and transaction.transfer_transaction_id is None
+        and not transaction.is_planned
+        and (transaction.subcategory_id is None or transaction.subcategory_id in transfer_subcategory_ids
+             or looks_like_transfer(transaction.description))
+    )
+
+
+def unpair_transfer(db: Session, transaction: Transaction) -> None:
+    """
+    Deshace el emparejamiento de una transacción (sin commit). La contraparte
+    vuelve a ser un movimiento simple de su cuenta; los saldos no cambian.
+    """
+    counterpart = db.get(Transaction, transaction.transfer_transaction_id)
+    if counterpart is not None and counterpart.transfer_transaction_id == transaction.id:
+        counterpart.transfer_transaction_id = None
+        counterpart.transfer_account_id = None
+        counterpart.updated_at = datetime.utcnow()
+    transaction.transfer_transaction_id = None
+
+
+def _pair_group(outflows: List[TransferCandidate], inflows: List[TransferCandidate], window: timedelta,
+                anchors: Optional[Set[int]]) -> List[Tuple[int, int]]:
+    """Empareja egresos y abonos de un mismo monto, ambos ordenados por fecha"""
+    dates = [inflow.transaction_date for inflow in inflows]
+    used = [False] * len(inflows)
+    pairs = []
+    for outflow in outflows:
+        best = None
+        best_key = None
+        for index in range(bisect_left(dates, outflow.transaction_date - window),
+                           bisect_right(dates, outflow.transaction_date + window)):
+            inflow = inflows[index]
+            if used[index] or inflow.account_id == outflow.account_id:
+                continue
+            if anchors is not None and outflow.id not in anchors and inflow.id not in anchors:
+                continue
+            # El abono más cercano; a igual distancia, el posterior al egreso
+            key = (abs((inflow.transaction_date - outflow.transaction_date).days),
+                   inflow.transaction_date < outflow.transaction_date)
+            if best_key is None or key < best_key:
+                best, best_key = index, key
+        if best is not None:
+            used[best] = True
+            pairs.append((outflow.id, inflows[best].id))
+    return pairs
+
+
+def pair_transfers(candidates: Iterable[TransferCandidate], window_days: int,
+                   anchors: Optional[Set[int]] = None) -> List[Tuple[int, int]]:
+    """
+    Pares (egreso, abono) de cuentas distintas por el mismo monto absoluto y
+    dentro de la ventana. Con `anchors`, cada par incluye al menos uno de esos
+    ids.
+    """
+    candidates = list(candidates)
+    outflows = sorted((c for c in candidates if c.amount < 0), key=lambda c: (-c.amount, c.transaction_date, c.id))
+    inflows = sorted((c for c in candidates if c.amount > 0), key=lambda c: (c.amount, c.transaction_date, c.id))
+    window = timedelta(days=window_days)
+
+    pairs = []
+    i = j = 0
+    while i < len(outflows) and j < len(inflows):
+        amount = -outflows[i].amount
+        if amount < inflows[j].amount:
+            i += 1
+            continue
+        if amount > inflows[j].amount:
+            j += 1
+            continue
+        i_end, j_end = i, j
+        while i_end < len(outflows) and -outflows[i_end].amount == amount:
+            i_end += 1
+        while j_end < len(inflows) and inflows[j_end].amount == amount:
+            j_end += 1
+        pairs.extend(_pair_group(outflows[i:i_end], inflows[j:j_end], window, anchors))
+        i, j = i_end, j_end
+    return pairs
+
+
+def _load_candidates(db: Session, user_id: int, start: Optional[date] = None,
+                     end: Optional[date] = None) -> List[TransferCandidate]:
+    description = func.upper(Transaction.description)
+    query = select(Transaction.id, Transaction.account_id, Transaction.amount, Transaction.transaction_date).where(
+        Transaction.user_id == user_id,
+        Transaction.transfer_account_id.is_(None),
+        Transaction.transfer_transaction_id.is_(None),
+        Transaction.is_planned.is_(False),
+        or_(
+            Transaction.subcategory_id.is_(None),
+            Transaction.subcategory_id.in_(_transfer_subcategories()),
+            *[description.like(f"%{keyword}%") for keyword in TRANSFER_DESCRIPTION_KEYWORDS],
+        ),
+    )
+    if start is not None:
+        query = query.where(Transaction.transaction_date >= start)
+    if end is not None:
+        query = query.where(Transaction.transaction_date <= end)
+    return [
+        TransferCandidate(row.id, row.account_id, Decimal(str(row.amount)), row.transaction_date)
+        for row in db.execute(query)
+    ]
+
+
+def _transfer_subcategory_id(db: Session) -> Optional[int]:
+    return db.execute(
+        select(Subcategory.id)
+        .join(Category, Category.id == Subcategory.category_id)
+        .where(Subcategory.name == TRANSFER_SUBCATEGORY_NAME, Category.name == TRANSFER_CATEGORY_NAME)
+        .limit(1)
+    ).scalar()
+
+
+def _apply_pairs(db: Session, user_id: int, pairs: Sequence[Tuple[int, int]]) -> None:
+    """
+    Enlaza los pares (sin commit). Las filas se actualizan por la sesión para
+    que el flush invalide las cachés derivadas; el ORM agrupa los UPDATE.
+    """
+    if not pairs:
+        return
+    subcategory_id = _transfer_subcategory_id(db)
+    if subcategory_id is None:
+        logger.warning(f"No existe la subcategoría '{TRANSFER_SUBCATEGORY_NAME}'; se enlazan los pares sin categorizar")
+
+    counterparts: Dict[int, int] = {}
+    for outflow_id, inflow_id in pairs:
+        counterparts[outflow_id] = inflow_id
+        counterparts[inflow_id] = outflow_id
+    ids = sorted(counterparts)
+    transactions: Dict[int, Transaction] = {}
+    for offset in range(0, len(ids), UPDATE_CHUNK_SIZE):
+        chunk = ids[offset:offset + UPDATE_CHUNK_SIZE]
+        transactions.update({
+            transaction.id: transaction
+            for transaction in db.query(Transaction).filter(Transaction.id.in_(chunk))
+        })
+
+    now = datetime.utcnow()
+    for transaction_id, counterpart_id in counterparts.items():
+        transaction = transactions[transaction_id]
+        transaction.transfer_account_id = transactions[counterpart_id].account_id
+        transaction.transfer_transaction_id = counterpart_id
+        if subcategory_id is not None and transaction.subcategory_id is None:
+            transaction.subcategory_id = subcategory_id
+        transaction.updated_at = now
+    db.flush()
+    relink_goal_contributions(db, user_id, list(transactions.values()))
+
+
+def link_transfer_pairs(db: Session, user_id: int, transactions: Sequence[Any],
+                        window_days: Optional[int] = None) -> int:
+    """
+    Empareja las transacciones de un lote con las de otras cuentas en la
+    ventana de fechas del lote (sin commit). Devuelve el número de pares.
+    """
+    window_days = settings.TRANSFER_MATCH_WINDOW_DAYS if window_days is None else window_days
+    transfer_subcategory_ids = _transfer_subcategory_ids(db)
+    anchors = {
+        transaction.id for transaction in transactions
+        if _is_transfer_candidate(transaction, transfer_subcategory_ids)
+    }
+    if not anchors:
+        return 0
+
+    dates = [transaction.transaction_date for transaction in transactions if transaction.id in anchors]
+    window = timedelta(days=window_days)
+    candidates = _load_candidates(db, user_id, min(dates) - window, max(dates) + window)
+    pairs = pair_transfers(candidates, window_days, anchors)
+    _apply_pairs(db, user_id, pairs)
+    if pairs:
+        logger.debug(f"{len(pairs)} transferencia(s) interna(s) emparejadas en el lote del usuario {user_id}")
+    return len(pairs)
+
+
+def match_internal_transfers(db: Session, user_id: int, start: Optional[date] = None,
+                             end: Optional[date] = None, window_days: Optional[int] = None) -> int:
+    """
+    Empareja las transferencias internas del historial del usuario (o de un
+    rango de fechas). Hace commit y devuelve el número de pares.
+    """
+    window_days = settings.TRANSFER_MATCH_WINDOW_DAYS if window_days is None else window_days
+    pairs = pair_transfers(_load_candidates(db, user_id, start, end), window_days)
+    _apply_pairs(db, user_id, pairs)
+    db.commit()
+    logger.info(f"Transferencias internas emparejadas para usuario {user_id}: {len(pairs)}")
+    return len(pairs)
+
+
+def run_transfer_matching(db: Session, start: Optional[date] = None) -> Dict[int, int]:
+    """Empareja las transferencias internas de todos los usuarios con transacciones"""
+    user_ids = db.execute(select(Transaction.user_id).distinct().order_by(Transaction.user_id)).scalars().all()
+    return {user_id: match_internal_transfers(db, user_id, start=start) for user_id in user_ids}
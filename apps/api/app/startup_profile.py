@@ -0,0 +1,45 @@
+"""
+Perfil de tiempos de arranque de la API.
+
+Registra cuánto tarda cada etapa del arranque (imports de `main`, bootstrap
+de base de datos en `lifespan`) para reportarlo una vez que el worker está
+listo. Para el detalle módulo a módulo usar `python -X importtime`.
+"""
+
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+# Módulos pesados que solo deben cargarse al importar archivos
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "xlrd")
+
+_started_at = time.perf_counter()
+_sections: Dict[str, float] = {}
+
+
+@contextmanager
+def section(name: str) -> Iterator[None]:
+    """Mide la duración de una etapa del arranque"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _sections[name] = _sections.get(name, 0.0) + time.perf_counter() - started
+
+
+def loaded_heavy_modules() -> List[str]:
+    """Módulos pesados ya cargados en el proceso"""
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def report() -> str:
+    """Resumen del arranque: etapas, tiempo total y módulos cargados"""
+    lines = ["Perfil de arranque:"]
+    for name, elapsed in _sections.items():
+        lines.append(f"  {name:<28} {elapsed * 1000:8.1f} ms")
+    lines.append(f"  {'total desde el primer import':<28} {(time.perf_counter() - _started_at) * 1000:8.1f} ms")
+    lines.append(f"  módulos cargados: {len(sys.modules)}")
+    heavy = loaded_heavy_modules()
+    lines.append(f"  módulos pesados cargados: {', '.join(heavy) if heavy else 'ninguno'}")
+    return "\n".join(lines)
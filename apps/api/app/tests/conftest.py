@@ -0,0 +1,73 @@
+"""
+Fixtures compartidas: base SQLite en memoria con el esquema de la aplicación
+y datos semilla generados con la suite de benchmarks.
+"""
+
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Transaction
+from app.services.duplicate_filter import clear_account_filters
+from benchmarks.fixtures import create_benchmark_engine, reset_schema, seed_fixture
+from benchmarks.statement_generator import StatementSpec, generate_statement
+
+
+@pytest.fixture
+def engine():
+    engine = create_benchmark_engine("sqlite")
+    reset_schema(engine)
+    # Los filtros de duplicados en memoria son de la base anterior
+    clear_account_filters()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def make_statement():
+    """Genera una cartola sintética de N filas (por defecto CSV, formato ISO y sin duplicados)"""
+    def _make(rows: int, **overrides):
+        options = {"file_type": "csv", "locale": "iso", "duplicate_ratio": 0.0, **overrides}
+        return generate_statement(StatementSpec(rows=rows, **options))
+    return _make
+
+
+@pytest.fixture
+def seeded(db, make_statement):
+    """Usuario, cuenta, categorías, patrones y perfil de importación"""
+    statement = make_statement(10)
+    fixture = seed_fixture(db, statement)
+    db.expunge_all()
+    return fixture
+
+
+@pytest.fixture
+def add_transaction(db, seeded):
+    """
+    Agrega una transacción a la cuenta semilla sin pasar por el servicio (sin
+    saldos ni validación de duplicados). `subcategory` es el nombre de una
+    subcategoría semilla; sin `commit` la transacción queda en la sesión.
+    """
+    def _add(amount, when, description=None, subcategory=None, commit=False):
+        transaction = Transaction(
+            user_id=seeded.user_id,
+            account_id=seeded.account_id,
+            amount=Decimal(str(amount)),
+            description=description,
+            transaction_date=when,
+            status_id=1,
+            subcategory_id=seeded.subcategory_ids[subcategory] if subcategory else None,
+        )
+        db.add(transaction)
+        if commit:
+            db.commit()
+        return transaction
+    return _add
@@ -0,0 +1,57 @@
+"""
+Pruebas del parseo de montos por columna.
+"""
+
+import csv
+import io
+from decimal import Decimal
+
+import pytest
+
+from app.services import transaction_service
+from app.utils.amount_parser import AmountColumnParser, AmountParseError, infer_amount_separators
+
+
+def test_inferencia_de_separadores():
+    # Miles repetidos: formato chileno aunque el perfil diga "."
+    assert infer_amount_separators(["$1.234", "$500", "$12.345.678"], ".") == (".", ",")
+    assert infer_amount_separators(["1,234.56", "(12.00)"], ",") == (",", ".")
+    assert infer_amount_separators(["1.234,5"]) == (".", ",")
+    # Solo valores ambiguos: decide el perfil
+    assert infer_amount_separators(["1.234", "5.000"], ",") == (".", ",")
+    assert infer_amount_separators(["1.234", 5000.0]) == (",", ".")
+
+
+def test_parser_exacto():
+    parser = AmountColumnParser(".", ",")
+    assert parser.parse_decimal("$1.234.567") == Decimal("1234567")
+    assert parser.parse_decimal("($1.234,50)") == Decimal("-1234.50")
+    assert parser.parse_decimal("1.234-") == Decimal("-1234")
+    assert parser.parse_decimal("") == 0
+    assert parser.parse_decimal("-0,005") == Decimal("-0.005")
+    assert parser.parse_decimal(12.3) == Decimal("12.3")
+
+    for value in ("abc", "1,2,3", "1e5", " "):
+        with pytest.raises(AmountParseError):
+            parser.parse_decimal(value)
+
+
+@pytest.mark.parametrize("locale", ["es_CL", "en_US"])
+def test_importa_cartolas_con_formato_regional(db, seeded, make_statement, locale):
+    statement = make_statement(30, locale=locale)
+    records = list(csv.reader(io.StringIO(statement.content.decode()), delimiter=";"))
+    amount_column = 3 if records[5][3] else 4
+    records[5][amount_column] = "12x"
+    records[9][amount_column] = "N/A"
+    buffer = io.StringIO()
+    csv.writer(buffer, delimiter=";").writerows(records)
+
+    result = transaction_service.import_transactions_with_profile(
+        db, seeded.user_id, seeded.profile_id, buffer.getvalue().encode(), "cartola.csv"
+    )
+
+    assert result["successful_imports"] == 28
+    assert result["amount_errors"] == [
+        {"row_number": 6, "value": "12x"},
+        {"row_number": 10, "value": "N/A"},
+    ]
@@ -0,0 +1,104 @@
+"""
+Pruebas de los checkpoints mensuales de saldo y del saldo a una fecha.
+"""
+
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.models import AccountBalanceCheckpoint
+from app.schemas.transactions import TransactionCreateRequest, TransactionUpdateRequest
+from app.services import transaction_service
+from app.services.balance_checkpoint_service import (
+    get_balance_at, get_balance_series, rebuild_account_checkpoints
+)
+
+
+def _create(db, seeded, amount, transaction_date):
+    return transaction_service.create_transaction(
+        db,
+        seeded.user_id,
+        TransactionCreateRequest(
+            amount=Decimal(amount),
+            description=f"Movimiento {transaction_date}",
+            transaction_date=transaction_date,
+            account_id=seeded.account_id,
+            status_id=1,
+        ),
+    )
+
+
+def _closings(db, account_id):
+    db.expire_all()
+    rows = (
+        db.query(AccountBalanceCheckpoint)
+        .filter(AccountBalanceCheckpoint.account_id == account_id)
+        .order_by(AccountBalanceCheckpoint.month_start)
+    )
+    return {row.month_start: Decimal(str(row.closing_movements)).quantize(Decimal("0.01")) for row in rows}
+
+
+def _as_rebuilt(db, account_id):
+    incremental = _closings(db, account_id)
+    rebuild_account_checkpoints(db, account_id)
+    db.commit()
+    return incremental, _closings(db, account_id)
+
+
+def test_transaccion_con_fecha_pasada_repara_meses_posteriores(db, seeded):
+    _create(db, seeded, "100.00", date(2024, 1, 10))
+    _create(db, seeded, "-30.00", date(2024, 3, 5))
+    _create(db, seeded, "50.00", date(2023, 11, 20))
+
+    closings = _closings(db, seeded.account_id)
+    assert closings == {
+        date(2023, 11, 1): Decimal("50.00"),
+        date(2023, 12, 1): Decimal("50.00"),
+        date(2024, 1, 1): Decimal("150.00"),
+        date(2024, 2, 1): Decimal("150.00"),
+        date(2024, 3, 1): Decimal("120.00"),
+    }
+    incremental, rebuilt = _as_rebuilt(db, seeded.account_id)
+    assert incremental == rebuilt
+
+
+def test_saldo_a_fecha_y_series(db, seeded):
+    _create(db, seeded, "100.00", date(2024, 1, 10))
+    _create(db, seeded, "-30.00", date(2024, 3, 5))
+    _create(db, seeded, "-5.00", date(2024, 3, 20))
+
+    assert get_balance_at(db, seeded.account_id, date(2023, 12, 31)) == Decimal("0.00")
+    assert get_balance_at(db, seeded.account_id, date(2024, 3, 10)) == Decimal("70.00")
+    assert get_balance_at(db, seeded.account_id, date(2024, 6, 30)) == Decimal("65.00")
+
+    monthly = get_balance_series(db, seeded.account_id, date(2024, 1, 1), date(2024, 3, 10))
+    assert [(p["date"], p["balance"]) for p in monthly] == [
+        (date(2024, 1, 31), Decimal("100.00")),
+        (date(2024, 2, 29), Decimal("100.00")),
+        (date(2024, 3, 10), Decimal("70.00")),
+    ]
+
+    daily = get_balance_series(db, seeded.account_id, date(2024, 3, 4), date(2024, 3, 6), granularity="day")
+    assert [p["balance"] for p in daily] == [Decimal("100.00"), Decimal("70.00"), Decimal("70.00")]
+
+    # La serie diaria tiene un tope de días; los rangos largos van por mes
+    assert len(get_balance_series(db, seeded.account_id, date(2024, 1, 1), date(2024, 12, 31), granularity="day")) == 366
+    with pytest.raises(ValueError, match="a lo más 366 días"):
+        get_balance_series(db, seeded.account_id, date(2000, 1, 1), date(2024, 12, 31), granularity="day")
+
+
+def test_actualizar_y_eliminar_mantienen_checkpoints(db, seeded):
+    moved = _create(db, seeded, "100.00", date(2024, 1, 10))
+    removed = _create(db, seeded, "-40.00", date(2024, 2, 10))
+
+    transaction_service.update_transaction(
+        db, seeded.user_id, moved.id,
+        TransactionUpdateRequest(amount=Decimal("80.00"), transaction_date=date(2024, 3, 1))
+    )
+    transaction_service.delete_transaction(db, seeded.user_id, removed.id)
+
+    assert get_balance_at(db, seeded.account_id, date(2024, 2, 29)) == Decimal("0.00")
+    assert get_balance_at(db, seeded.account_id, date(2024, 3, 31)) == Decimal("80.00")
+    incremental, rebuilt = _as_rebuilt(db, seeded.account_id)
+    assert {m: v for m, v in incremental.items() if m in rebuilt} == rebuilt
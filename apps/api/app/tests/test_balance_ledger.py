@@ -0,0 +1,109 @@
+"""
+Pruebas del mantenimiento de saldos por deltas y de la conciliación.
+"""
+
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.models import Account, FileImport, Transaction
+from app.schemas.transactions import TransactionCreateRequest, TransactionUpdateRequest
+from app.services import transaction_service
+from app.services.balance_ledger import BalanceLedger, reconcile_account_balances, to_money
+from app.utils.query_counter import QueryCounter
+
+
+def _balance(db, account_id):
+    db.expire_all()
+    return db.get(Account, account_id).current_balance
+
+
+def _create(db, seeded, amount, description="Movimiento"):
+    return transaction_service.create_transaction(
+        db,
+        seeded.user_id,
+        TransactionCreateRequest(
+            amount=Decimal(amount),
+            description=description,
+            transaction_date=date(2024, 3, 1),
+            account_id=seeded.account_id,
+            status_id=1,
+        ),
+    )
+
+
+def test_ledger_agrega_deltas_por_cuenta():
+    ledger = BalanceLedger()
+    ledger.record(1, "-10.10")
+    ledger.record(1, "25.00")
+    ledger.record(2, "-5", transfer_account_id=3)
+    ledger.record(4, "7", sign=-1)
+    ledger.record(4, "7")
+
+    assert ledger.deltas == {1: Decimal("14.90"), 2: Decimal("-5.00"), 3: Decimal("5.00")}
+
+
+def test_crear_actualizar_y_eliminar_mantienen_el_saldo(db, seeded):
+    first = _create(db, seeded, "-1000.10", "Compra uno")
+    second = _create(db, seeded, "2500.25", "Abono")
+    assert _balance(db, seeded.account_id) == Decimal("1500.15")
+
+    transaction_service.update_transaction(db, seeded.user_id, first.id, TransactionUpdateRequest(amount=Decimal("-900.10")))
+    assert _balance(db, seeded.account_id) == Decimal("1600.15")
+
+    transaction_service.delete_transaction(db, seeded.user_id, second.id)
+    assert _balance(db, seeded.account_id) == Decimal("-900.10")
+    assert reconcile_account_balances(db, user_id=seeded.user_id) == []
+
+
+def test_importacion_aplica_un_update_de_saldo_por_cuenta(db, engine, seeded, make_statement):
+    statement = make_statement(30)
+
+    with QueryCounter(engine) as counter:
+        result = transaction_service.import_transactions_with_profile(
+            db, seeded.user_id, seeded.profile_id, statement.content, statement.filename
+        )
+
+    balance_updates = [s for s in counter.statements if s.lstrip().upper().startswith("UPDATE") and "current_balance" in s]
+    expected = sum((t.amount for t in db.query(Transaction).filter(Transaction.account_id == seeded.account_id)), Decimal("0.00"))
+    assert result["successful_imports"] == 30
+    assert len(balance_updates) == 1
+    assert _balance(db, seeded.account_id) == to_money(expected)
+    assert reconcile_account_balances(db, user_id=seeded.user_id) == []
+
+
+def test_importacion_interrumpida_deja_lotes_completos_con_sus_saldos(db, seeded, make_statement, monkeypatch):
+    statement = make_statement(1200)
+    refresh = transaction_service.refresh_budget_actuals
+    calls = []
+
+    def fail_on_second_batch(db, user_id):
+        calls.append(user_id)
+        if len(calls) == 2:
+            raise RuntimeError("caída a mitad de la importación")
+        return refresh(db, user_id)
+
+    monkeypatch.setattr(transaction_service, "refresh_budget_actuals", fail_on_second_batch)
+    with pytest.raises(ValueError, match="caída"):
+        transaction_service.import_transactions_with_profile(
+            db, seeded.user_id, seeded.profile_id, statement.content, statement.filename
+        )
+
+    # Solo el primer lote quedó confirmado, y con sus saldos; la re-subida no se responde del intento fallido
+    file_import = db.query(FileImport).one()
+    assert file_import.status.name == "FAILED"
+    assert db.query(Transaction).filter(Transaction.import_id == file_import.id).count() == transaction_service.DUPLICATE_FILTER_BATCH_SIZE
+    assert reconcile_account_balances(db, user_id=seeded.user_id) == []
+
+
+def test_conciliacion_detecta_y_corrige_descuadres(db, seeded):
+    _create(db, seeded, "-150.00")
+    db.query(Account).filter(Account.id == seeded.account_id).update({"current_balance": Decimal("42.00")})
+    db.commit()
+
+    discrepancies = reconcile_account_balances(db, user_id=seeded.user_id, fix=True)
+
+    assert [d["difference"] for d in discrepancies] == [Decimal("192.00")]
+    assert _balance(db, seeded.account_id) == Decimal("-150.00")
+    assert reconcile_account_balances(db, user_id=seeded.user_id) == []
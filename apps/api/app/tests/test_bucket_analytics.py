@@ -0,0 +1,70 @@
+"""
+Pruebas del análisis 50/30/20 y su caché mensual.
+"""
+
+import asyncio
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from app.models import BucketMonthlyTotal
+from app.schemas.transactions import TransactionUpdateRequest
+from app.services import bucket_analytics_service, transaction_service
+from app.services.bucket_analytics_service import get_bucket_series, set_subcategory_bucket
+
+
+def test_serie_por_bucket_y_cache(db, seeded, monkeypatch, add_transaction):
+    set_subcategory_bucket(db, seeded.user_id, seeded.subcategory_ids["Supermercado"], "needs")
+    for month in (1, 2):
+        add_transaction("1000000", date(2024, month, 1))
+        add_transaction("-400000", date(2024, month, 5), subcategory="Supermercado")
+    delivery = add_transaction("-150000", date(2024, 1, 9), subcategory="Delivery")
+    db.commit()
+
+    calls = []
+    original = bucket_analytics_service._bucket_totals
+    monkeypatch.setattr(bucket_analytics_service, "_bucket_totals",
+                        lambda db, user_id, start, end: calls.append((start, end)) or original(db, user_id, start, end))
+
+    january, february, march = get_bucket_series(db, seeded.user_id, date(2024, 1, 1), date(2024, 3, 31))
+    assert (january["income"], january["needs"]["actual"], january["wants"]["actual"]) == (1000000, 400000, 150000)
+    assert january["savings"]["actual"] == 450000
+    assert (january["needs"]["target"], january["needs"]["actual_percentage"]) == (500000, 40)
+    assert february["wants"]["actual"] == 0 and march["income"] == 0
+    assert march["savings"]["actual_percentage"] is None
+    assert db.query(BucketMonthlyTotal).count() == 3
+
+    # Con caché no se consultan las transacciones
+    get_bucket_series(db, seeded.user_id, date(2024, 1, 1), date(2024, 3, 1))
+    assert len(calls) == 1
+
+    # Mover un gasto de subcategoría solo invalida su mes
+    transaction_service.update_transaction(db, seeded.user_id, delivery.id, TransactionUpdateRequest(
+        subcategory_id=seeded.subcategory_ids["Supermercado"]))
+    january, _, _ = get_bucket_series(db, seeded.user_id, date(2024, 1, 1), date(2024, 3, 1))
+    assert calls[1] == (date(2024, 1, 1), date(2024, 2, 1))
+    assert (january["needs"]["actual"], january["wants"]["actual"]) == (550000, 0)
+
+    # Reasignar un bucket invalida todos los meses del usuario
+    set_subcategory_bucket(db, seeded.user_id, seeded.subcategory_ids["Supermercado"], "savings")
+    january, _, _ = get_bucket_series(db, seeded.user_id, date(2024, 1, 1), date(2024, 3, 1))
+    assert calls[2] == (date(2024, 1, 1), date(2024, 4, 1))
+    assert (january["needs"]["actual"], january["allocated_savings"], january["savings"]["actual"]) == (0, 550000, 1000000)
+
+
+def test_graphql_limita_el_rango_de_años(db, seeded, monkeypatch):
+    from app.graphql.queries import bucket_analytics
+
+    async def _user(info):
+        return SimpleNamespace(id=seeded.user_id)
+
+    monkeypatch.setattr(bucket_analytics, "get_authenticated_user", _user)
+    info = SimpleNamespace(context=SimpleNamespace(db=db))
+    series = asyncio.run(bucket_analytics.get_my_bucket_analytics(info, start_year=2023, end_year=2024))
+    assert len(series) == 24
+
+    with pytest.raises(ValueError, match="posterior"):
+        asyncio.run(bucket_analytics.get_my_bucket_analytics(info, start_year=2024, end_year=2023))
+    with pytest.raises(ValueError, match="a lo más"):
+        asyncio.run(bucket_analytics.get_my_bucket_analytics(info, start_year=1, end_year=9999))
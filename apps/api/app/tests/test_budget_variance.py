@@ -0,0 +1,66 @@
+"""
+Pruebas de la varianza presupuesto contra gasto real.
+"""
+
+from datetime import date
+
+import pytest
+
+from app.models import BudgetItem, BudgetPlan, FinancialMethod
+from app.services.budget_variance_service import get_budget_variance, refresh_budget_actuals
+
+
+def _plan(db, seeded):
+    method = FinancialMethod(name="Base cero", key="zero_based")
+    db.add(method)
+    db.flush()
+    plan = BudgetPlan(user_id=seeded.user_id, financial_method_id=method.id, name="Primer semestre",
+                      start_date=date(2024, 1, 1), end_date=date(2024, 6, 30))
+    db.add(plan)
+    db.flush()
+    items = {
+        (name, month_year): BudgetItem(budget_id=plan.id, subcategory_id=seeded.subcategory_ids[name],
+                                       amount=amount, month_year=month_year)
+        for name, month_year, amount in [
+            ("Supermercado", "2024-03", 100000),
+            ("Delivery", "03/2024", 50000),
+            ("Supermercado", "2024-04", 100000),
+        ]
+    }
+    db.add_all(items.values())
+    db.commit()
+    return plan, items
+
+
+def test_mes_normalizado():
+    item = BudgetItem(month_year="04/2024")
+    assert item.month_start == date(2024, 4, 1)
+    with pytest.raises(ValueError):
+        BudgetItem(month_year="abril")
+
+
+def test_varianza_y_celdas_afectadas(db, seeded, add_transaction):
+    add_transaction("-60000", date(2024, 3, 4), subcategory="Supermercado")
+    add_transaction("-35000", date(2024, 3, 20), subcategory="Supermercado")
+    add_transaction("-20000", date(2024, 3, 8), subcategory="Delivery")
+    add_transaction("-999", date(2024, 2, 28), subcategory="Supermercado")
+    plan, items = _plan(db, seeded)
+
+    variance = get_budget_variance(db, seeded.user_id, plan.id)
+    cells = {(cell["subcategory_name"], cell["month"].month): cell for cell in variance["cells"]}
+    assert (cells[("Supermercado", 3)]["actual"], cells[("Supermercado", 3)]["status"]) == (95000, "near_limit")
+    assert (cells[("Delivery", 3)]["variance"], cells[("Delivery", 3)]["status"]) == (30000, "on_track")
+    assert cells[("Supermercado", 4)]["actual"] == 0
+    assert (variance["total_budgeted"], variance["total_actual"]) == (250000, 115000)
+
+    # Una transacción nueva solo deja pendiente su celda (subcategoría, mes)
+    add_transaction("-10000", date(2024, 3, 25), subcategory="Supermercado")
+    db.commit()
+    pending = {key for key, item in items.items() if db.get(BudgetItem, item.id).actual_amount is None}
+    assert pending == {("Supermercado", "2024-03")}
+    assert refresh_budget_actuals(db, seeded.user_id) == 1
+    db.commit()
+
+    cells = {(cell["subcategory_name"], cell["month"].month): cell
+             for cell in get_budget_variance(db, seeded.user_id, plan.id)["cells"]}
+    assert (cells[("Supermercado", 3)]["actual"], cells[("Supermercado", 3)]["status"]) == (105000, "over_budget")
@@ -0,0 +1,54 @@
+"""
+Pruebas del parseo de fechas por columna.
+"""
+
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils.date_parser import (
+    DateColumnParser,
+    excel_serials_to_dates,
+    infer_date_format,
+    parse_excel_date,
+    profile_date_format,
+    resolve_date_format,
+)
+
+
+def test_inferencia_del_formato_de_la_columna():
+    assert infer_date_format(["15/01/2024", "03/02/2024", None, 45000]) == "%d/%m/%Y"
+    assert infer_date_format(["01/15/2024", "02/03/2024"]) == "%m/%d/%Y"
+    # Ambiguo: gana el formato del perfil si calza con toda la muestra
+    assert infer_date_format(["01/02/2024"], preferred="%m/%d/%Y") == "%m/%d/%Y"
+    assert infer_date_format([datetime(2024, 1, 2)]) is None
+
+
+def test_formato_del_perfil():
+    assert profile_date_format("DD/MM/YYYY") == "%d/%m/%Y"
+    assert profile_date_format("YYYYMMDD") == "%Y%m%d"
+
+    profile = SimpleNamespace(id=1, date_format="YYYY-MM-DD", auto_detect_format=True)
+    assert resolve_date_format(profile, ["15-01-2024", "16-01-2024"]) == "%d-%m-%Y"
+    assert resolve_date_format(profile, []) == "%Y-%m-%d"
+
+    profile.auto_detect_format = False
+    assert resolve_date_format(profile, ["15-01-2024"]) == "%Y-%m-%d"
+
+
+def test_parser_equivale_a_parse_excel_date():
+    parser = DateColumnParser("%d/%m/%Y")
+    values = ["15/01/2024", " 15/01/2024 ", "2024-01-16", 45000, 45000.75, datetime(2024, 1, 2, 10), date(2024, 1, 3)]
+    parser.prime(values)
+    assert [parser.parse(value) for value in values] == [parse_excel_date(value) for value in values]
+
+    with pytest.raises(ValueError, match="Formato de fecha no válido"):
+        parser.parse("32/13/2024")
+    with pytest.raises(ValueError, match="Formato de fecha no válido"):
+        parser.parse("32/13/2024")
+
+
+def test_seriales_vectorizados():
+    serials = [1, 59.5, 60, 45000.99]
+    assert excel_serials_to_dates(serials) == [parse_excel_date(serial) for serial in serials]
@@ -0,0 +1,62 @@
+"""
+Pruebas de la descripción normalizada persistida y su uso como filtro de patrones.
+"""
+
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from app.models import Transaction
+from app.services.description_pattern_service import DescriptionPatternService
+from app.services.pattern_utils import apply_patterns_bulk
+from app.utils.transaction_utils import generate_transaction_hash, normalize_description
+
+DESCRIPTIONS = ["  Compra   LIDER Santiago ", "PAGO VTR", "uber eats 50%_off", "Farmacias  Ahumada", None]
+
+
+def test_se_normaliza_al_escribir(db, seeded, add_transaction):
+    transaction = add_transaction("-100", date(2024, 1, 1), "  Compra   LIDER Santiago ", commit=True)
+    assert transaction.description_normalized == "compra lider santiago"
+
+    transaction.description = "Pago  VTR"
+    db.commit()
+    assert db.query(Transaction.description_normalized).filter(Transaction.id == transaction.id).scalar() == "pago vtr"
+
+    # El content_hash usa la misma normalización que la columna
+    assert generate_transaction_hash(1, 2, Decimal("1"), "A  b", date(2024, 1, 1)) == \
+        generate_transaction_hash(1, 2, Decimal("1"), normalize_description(" a B"), date(2024, 1, 1))
+
+
+@pytest.mark.parametrize("pattern_type,pattern", [
+    ("contains", "lider  santiago"),
+    ("contains", "50%_"),
+    ("starts_with", " PAGO"),
+    ("ends_with", "ahumada"),
+    ("exact", "pago vtr"),
+])
+def test_filtro_sql_incluye_todas_las_coincidencias(db, seeded, pattern_type, pattern, add_transaction):
+    ids = {
+        description: add_transaction("-100", date(2024, 1, 1), description, commit=True).id
+        for description in DESCRIPTIONS
+    }
+    rule = SimpleNamespace(pattern=pattern, pattern_type=pattern_type, is_case_sensitive=False, id=0)
+
+    selected = {row.id for row in db.query(Transaction.id).filter(DescriptionPatternService.pattern_prefilter(rule))}
+    expected = {ids[description] for description in DESCRIPTIONS
+                if DescriptionPatternService.test_pattern_match(rule, description)[0]}
+    assert expected <= selected
+
+
+def test_aplicacion_en_lote_sin_regex(db, seeded, add_transaction):
+    from app.models.recurring_patterns import DescriptionPattern
+
+    for description in DESCRIPTIONS:
+        add_transaction("-100", date(2024, 1, 1), description, commit=True)
+    db.query(DescriptionPattern).filter(DescriptionPattern.pattern_type == "regex").delete()
+    db.commit()
+
+    result = apply_patterns_bulk(db, seeded.user_id)
+    assert result["success"] and result["total_transactions"] == 4
+    assert result["applied_count"] == 4
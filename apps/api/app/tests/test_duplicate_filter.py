@@ -0,0 +1,120 @@
+"""
+Pruebas del filtro de Bloom de duplicados por cuenta.
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import event
+
+from app.models import Transaction
+from app.schemas.transactions import TransactionCreateRequest, TransactionUpdateRequest
+from app.services import duplicate_filter as duplicate_filter_module, transaction_service
+from app.services.duplicate_filter import AccountDuplicateFilter, BloomFilter, get_account_filter
+from app.utils.transaction_utils import generate_transaction_hash
+
+
+def _request(seeded, amount, description, day=1):
+    return TransactionCreateRequest(
+        account_id=seeded.account_id,
+        amount=amount,
+        description=description,
+        transaction_date=date(2024, 3, day),
+    )
+
+
+def _count_queries(db):
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_bloom_sin_falsos_negativos_y_serializable():
+    bloom = BloomFilter(1000)
+    keys = [f"h:{i}".encode() for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"x:{i}".encode() in bloom for i in range(10000))
+    assert false_positives < 300
+
+    duplicate_filter = AccountDuplicateFilter(1, 2, bloom, last_id=7, stamp=3)
+    restored = AccountDuplicateFilter.from_bytes(1, 2, duplicate_filter.to_bytes())
+    assert (restored.last_id, restored.stamp) == (7, 3) and all(key in restored.bloom for key in keys)
+
+
+def test_detecta_duplicados_y_descarta_filas_nuevas_sin_consultar(db, seeded):
+    transaction_service.create_transaction(db, seeded.user_id, _request(seeded, -1500, "COMPRA LIDER SANTIAGO"))
+    duplicate_filter = get_account_filter(db, seeded.user_id, seeded.account_id)
+
+    # Inserción de otro proceso (sin pasar por el filtro): se incorpora por id
+    db.add(Transaction(user_id=seeded.user_id, account_id=seeded.account_id, amount=Decimal("-990.00"),
+                       description="NETFLIX", transaction_date=date(2024, 3, 2), status_id=1))
+    db.commit()
+    duplicate_filter = get_account_filter(db, seeded.user_id, seeded.account_id)
+
+    rows = [
+        _request(seeded, -1500, "COMPRA LIDER SANTIAGO"),           # idéntica
+        _request(seeded, -1500, "SANTIAGO LIDER COMPRA"),           # similar
+        _request(seeded, -990, "NETFLIX", day=2),                   # insertada fuera del filtro
+        _request(seeded, -2000, "UBER TRIP", day=3),                # nueva
+    ]
+    duplicate_filter.prefetch(db, rows)
+
+    statements = _count_queries(db)
+    assert duplicate_filter.check(db, "nuevo", Decimal("-2000"), "UBER TRIP", date(2024, 3, 3)) == (False, None)
+    assert statements == []
+
+    results = []
+    for row in rows + [_request(seeded, -2000, "UBER TRIP", day=3)]:
+        try:
+            transaction_service.create_transaction(db, seeded.user_id, row, duplicate_filter=duplicate_filter)
+            results.append(None)
+        except ValueError as e:
+            results.append(str(e))
+
+    assert "idéntica" in results[0] or "content_hash" in results[0]
+    assert "similar" in results[1]
+    assert results[2] is not None
+    assert results[3] is None
+    # La fila repetida dentro del mismo lote se detecta tras insertar la primera
+    assert results[4] is not None
+
+
+def test_edicion_invalida_el_filtro_de_otros_procesos(db, seeded):
+    created = transaction_service.create_transaction(db, seeded.user_id, _request(seeded, -1500, "COMPRA LIDER"))
+    stale = get_account_filter(db, seeded.user_id, seeded.account_id)
+    other_process = dict(duplicate_filter_module._filters)
+
+    transaction_service.update_transaction(db, seeded.user_id, created.id, TransactionUpdateRequest(amount=-2500))
+
+    # Otro proceso conserva su filtro en memoria: el sello de la cuenta lo obliga a reconstruirlo
+    duplicate_filter_module._filters.update(other_process)
+    duplicate_filter = get_account_filter(db, seeded.user_id, seeded.account_id)
+    assert duplicate_filter is not stale
+    content_hash = generate_transaction_hash(user_id=seeded.user_id, account_id=seeded.account_id, amount=Decimal("-2500"),
+                                             description="COMPRA LIDER", transaction_date=date(2024, 3, 1))
+    exists, _ = duplicate_filter.check(db, content_hash, Decimal("-2500"), "COMPRA LIDER", date(2024, 3, 1))
+    assert exists
+
+
+def test_prefetch_incorpora_filas_confirmadas_tarde_con_id_menor(db, seeded):
+    db.add(Transaction(id=100, user_id=seeded.user_id, account_id=seeded.account_id, amount=Decimal("-1500.00"),
+                       description="COMPRA LIDER", transaction_date=date(2024, 3, 1), status_id=1))
+    db.commit()
+    duplicate_filter = get_account_filter(db, seeded.user_id, seeded.account_id)
+    assert duplicate_filter.last_id == 100
+
+    # Otro proceso confirma durante la importación una fila con id menor al último visto
+    db.add(Transaction(id=50, user_id=seeded.user_id, account_id=seeded.account_id, amount=Decimal("-990.00"),
+                       description="NETFLIX", transaction_date=date(2024, 3, 2), status_id=1))
+    db.commit()
+
+    duplicate_filter.prefetch(db, [_request(seeded, -990, "NETFLIX", day=2)])
+    content_hash = generate_transaction_hash(user_id=seeded.user_id, account_id=seeded.account_id, amount=Decimal("-990"),
+                                             description="NETFLIX", transaction_date=date(2024, 3, 2))
+    exists, _ = duplicate_filter.check(db, content_hash, Decimal("-990"), "NETFLIX", date(2024, 3, 2))
+    assert exists
+    count = duplicate_filter.bloom.count
+    duplicate_filter.catch_up(db)
+    assert duplicate_filter.bloom.count == count
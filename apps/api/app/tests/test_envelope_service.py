@@ -0,0 +1,86 @@
+"""
+Pruebas de los saldos de sobres y del cierre de mes.
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from app.models import Envelope, FinancialMethod, MethodEnvelope, Transaction
+from app.schemas.transactions import TransactionCreateRequest, TransactionUpdateRequest
+from app.services import transaction_service
+from app.services.envelope_service import reconcile_envelope_balances, run_envelope_rollover
+
+
+def _envelopes(db, seeded):
+    method = FinancialMethod(name="Sobres", key="envelope")
+    db.add(method)
+    db.flush()
+    envelopes = []
+    for rollover in (True, False):
+        config = MethodEnvelope(user_id=seeded.user_id, financial_method_id=method.id, rollover_unused=rollover)
+        db.add(config)
+        db.flush()
+        envelope = Envelope(user_id=seeded.user_id, method_envelope_id=config.id, name=f"Sobre {rollover}",
+                            budget_amount=100000, current_balance=0)
+        db.add(envelope)
+        envelopes.append(envelope)
+    db.commit()
+    return envelopes
+
+
+def _spend(db, seeded, envelope, amount, when):
+    return transaction_service.create_transaction(db, seeded.user_id, TransactionCreateRequest(
+        amount=amount, description=f"Gasto {envelope.name} {amount} {when}", transaction_date=when,
+        account_id=seeded.account_id, envelope_id=envelope.id,
+    ), skip_duplicate_check=True)
+
+
+def _balance(db, envelope):
+    db.refresh(envelope)
+    return envelope.current_balance
+
+
+def test_deltas_por_transaccion(db, seeded):
+    first, second = _envelopes(db, seeded)
+    transaction = _spend(db, seeded, first, -30000, date(2024, 7, 3))
+    assert _balance(db, first) == -30000
+
+    transaction_service.update_transaction(db, seeded.user_id, transaction.id,
+                                           TransactionUpdateRequest(amount=-20000, envelope_id=second.id))
+    assert (_balance(db, first), _balance(db, second)) == (0, -20000)
+
+    transaction_service.delete_transaction(db, seeded.user_id, transaction.id)
+    assert _balance(db, second) == 0
+    assert reconcile_envelope_balances(db, seeded.user_id) == []
+
+
+def test_cierre_de_mes(db, seeded):
+    rollover, reset = _envelopes(db, seeded)
+    assert run_envelope_rollover(db, date(2024, 7, 1)) == {"rolled_over": 1, "reset": 1}
+    _spend(db, seeded, rollover, -30000, date(2024, 7, 3))
+    _spend(db, seeded, reset, -30000, date(2024, 7, 3))
+
+    # Un movimiento del periodo nuevo registrado antes del cierre se conserva al reiniciar
+    _spend(db, seeded, reset, -5000, date(2024, 8, 1))
+    assert run_envelope_rollover(db, date(2024, 8, 15)) == {"rolled_over": 1, "reset": 1}
+    assert run_envelope_rollover(db, date(2024, 8, 1)) == {"rolled_over": 0, "reset": 0}
+    assert (_balance(db, rollover), _balance(db, reset)) == (170000, 95000)
+
+    # Un gasto tardío de julio solo afecta al sobre que acumula
+    _spend(db, seeded, rollover, -1000, date(2024, 7, 30))
+    _spend(db, seeded, reset, -1000, date(2024, 7, 30))
+    assert (_balance(db, rollover), _balance(db, reset)) == (169000, 95000)
+    assert reconcile_envelope_balances(db, seeded.user_id) == []
+
+
+def test_conciliacion(db, seeded):
+    envelope, _ = _envelopes(db, seeded)
+    run_envelope_rollover(db, date(2024, 7, 1))
+    db.add(Transaction(user_id=seeded.user_id, account_id=seeded.account_id, envelope_id=envelope.id,
+                       amount=Decimal("-2500"), description="Sin delta", transaction_date=date(2024, 7, 2), status_id=1))
+    db.commit()
+
+    (item,) = reconcile_envelope_balances(db, seeded.user_id, fix=True)
+    assert (item["envelope_id"], item["stored_balance"], item["expected_balance"]) == (envelope.id, 100000, 97500)
+    assert _balance(db, envelope) == 97500
+    assert reconcile_envelope_balances(db, seeded.user_id) == []
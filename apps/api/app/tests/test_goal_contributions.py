@@ -0,0 +1,153 @@
+"""
+Pruebas del registro automático de aportes a metas.
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from app.models import Account, FinancialGoal, GoalContribution, GoalContributionRule, Transaction
+from app.schemas.transactions import TransactionUpdateRequest
+from app.services import transaction_service
+from app.services.goal_contribution_service import link_goal_contributions
+from app.services.transfer_matching_service import match_internal_transfers
+
+
+def _goal(db, seeded, name, target, priority=0):
+    goal = FinancialGoal(user_id=seeded.user_id, name=name, target_amount=target, current_amount=0,
+                         start_date=date(2024, 1, 1), priority=priority)
+    db.add(goal)
+    db.flush()
+    return goal
+
+
+def test_aportes_en_la_importacion(db, seeded, make_statement):
+    statement = make_statement(60)
+    goal = _goal(db, seeded, "Supermercado del año", 10 ** 9)
+    db.add(GoalContributionRule(goal_id=goal.id, pattern="LIDER", pattern_type="contains"))
+    db.commit()
+
+    result = transaction_service.import_transactions_with_profile(
+        db, seeded.user_id, seeded.profile_id, statement.content, "cartola.csv"
+    )
+    matching = [row for row in statement.rows if "lider" in row.description.lower()]
+    assert matching and result["goal_contributions"] == len(matching)
+    db.refresh(goal)
+    assert goal.current_amount == sum(abs(row.amount) for row in matching)
+    assert db.query(GoalContribution).filter(GoalContribution.goal_id == goal.id).count() == len(matching)
+
+
+def test_transferencias_a_cuenta_de_ahorro(db, seeded):
+    checking = db.get(Account, seeded.account_id)
+    savings = Account(name="Ahorro", user_id=seeded.user_id, bank_id=checking.bank_id,
+                      account_type_id=checking.account_type_id, current_balance=0)
+    db.add(savings)
+    db.flush()
+    urgent = _goal(db, seeded, "Fondo de emergencia", 150000, priority=2)
+    later = _goal(db, seeded, "Auto", 5000000, priority=1)
+    db.add_all([
+        GoalContributionRule(goal_id=urgent.id, account_id=savings.id),
+        GoalContributionRule(goal_id=later.id, account_id=savings.id),
+        GoalContributionRule(goal_id=later.id, pattern="^DAP ", pattern_type="regex", is_case_sensitive=True),
+    ])
+    for day, (amount, description, transfer) in enumerate([
+        ("-100000", "Traspaso a ahorro", savings.id),
+        ("-60000", "Traspaso a ahorro", savings.id),
+        ("-300000", "DAP 30 dias", None),
+        ("-20000", "dap minúscula", None),
+        ("-5000", "Compra", None),
+    ], start=1):
+        db.add(Transaction(user_id=seeded.user_id, account_id=seeded.account_id, amount=Decimal(amount),
+                           description=description, transaction_date=date(2024, 3, day), status_id=1,
+                           transfer_account_id=transfer))
+    db.commit()
+
+    assert link_goal_contributions(db, seeded.user_id) == 3
+    db.refresh(urgent)
+    db.refresh(later)
+    assert (urgent.current_amount, urgent.is_completed) == (160000, True)
+    assert (later.current_amount, later.is_completed) == (300000, False)
+
+    # Las transacciones ya enlazadas no se vuelven a contar
+    assert link_goal_contributions(db, seeded.user_id) == 0
+
+
+def test_eliminar_o_editar_revierte_el_aporte(db, seeded):
+    goal = _goal(db, seeded, "Vacaciones", 100000)
+    db.add(GoalContributionRule(goal_id=goal.id, pattern="AHORRO VACACIONES", pattern_type="contains"))
+    transactions = [
+        Transaction(user_id=seeded.user_id, account_id=seeded.account_id, amount=Decimal(amount),
+                    description=f"Ahorro vacaciones {day}", transaction_date=date(2024, 5, day), status_id=1)
+        for day, amount in ((1, "-60000"), (2, "-50000"))
+    ]
+    db.add_all(transactions)
+    db.commit()
+    assert link_goal_contributions(db, seeded.user_id) == 2
+    db.refresh(goal)
+    assert (goal.current_amount, goal.is_completed) == (110000, True)
+
+    # Editar el monto ajusta el aporte y la meta deja de estar cumplida
+    transaction_service.update_transaction(db, seeded.user_id, transactions[0].id, TransactionUpdateRequest(amount=-1))
+    db.refresh(goal)
+    assert (goal.current_amount, goal.is_completed) == (50001, False)
+
+    # Eliminar la transacción elimina su aporte
+    transaction_service.delete_transaction(db, seeded.user_id, transactions[1].id)
+    db.refresh(goal)
+    assert goal.current_amount == 1
+    assert [c.amount for c in db.query(GoalContribution).filter(GoalContribution.goal_id == goal.id)] == [1]
+
+
+def test_transferencia_importada_aporta_una_sola_vez(db, seeded, make_statement):
+    checking = db.get(Account, seeded.account_id)
+    savings = Account(name="Ahorro", user_id=seeded.user_id, bank_id=checking.bank_id,
+                      account_type_id=checking.account_type_id, current_balance=0)
+    db.add(savings)
+    db.flush()
+    statement = make_statement(30)
+    row = statement.rows[0]
+    goal = _goal(db, seeded, "Ahorro", 10 ** 9)
+    db.add_all([
+        GoalContributionRule(goal_id=goal.id, account_id=savings.id),
+        GoalContributionRule(goal_id=goal.id, pattern=row.description, pattern_type="exact"),
+    ])
+    # Abono en la cuenta de ahorro que calza con el egreso importado
+    db.add(Transaction(user_id=seeded.user_id, account_id=savings.id, amount=abs(Decimal(str(row.amount))),
+                       description="Abono desde cuenta corriente", transaction_date=row.transaction_date, status_id=1))
+    db.commit()
+
+    result = transaction_service.import_transactions_with_profile(
+        db, seeded.user_id, seeded.profile_id, statement.content, "cartola.csv"
+    )
+    assert result["transfer_pairs"] == 1
+    link_goal_contributions(db, seeded.user_id)
+    others = [abs(other.amount) for other in statement.rows[1:] if other.description == row.description]
+    db.refresh(goal)
+    # El egreso emparejado no aporta por patrón: la transferencia cuenta solo por su abono
+    assert goal.current_amount == abs(row.amount) + sum(others)
+
+
+def test_emparejar_revierte_el_aporte_por_patron_del_egreso(db, seeded):
+    checking = db.get(Account, seeded.account_id)
+    savings = Account(name="Ahorro", user_id=seeded.user_id, bank_id=checking.bank_id,
+                      account_type_id=checking.account_type_id, current_balance=0)
+    db.add(savings)
+    db.flush()
+    goal = _goal(db, seeded, "Vacaciones", 10 ** 9)
+    db.add_all([
+        GoalContributionRule(goal_id=goal.id, account_id=savings.id),
+        GoalContributionRule(goal_id=goal.id, pattern="AHORRO VACACIONES", pattern_type="contains"),
+        Transaction(user_id=seeded.user_id, account_id=seeded.account_id, amount=Decimal("-80000"),
+                    description="Ahorro vacaciones", transaction_date=date(2024, 6, 1), status_id=1),
+    ])
+    db.commit()
+    assert link_goal_contributions(db, seeded.user_id) == 1
+
+    # El abono llega después (otra importación) y se empareja con el egreso ya enlazado
+    db.add(Transaction(user_id=seeded.user_id, account_id=savings.id, amount=Decimal("80000"),
+                       description="Ahorro vacaciones", transaction_date=date(2024, 6, 2), status_id=1))
+    db.commit()
+    assert match_internal_transfers(db, seeded.user_id) == 1
+    link_goal_contributions(db, seeded.user_id)
+    db.refresh(goal)
+    assert goal.current_amount == 80000
+    assert db.query(GoalContribution).filter(GoalContribution.goal_id == goal.id).count() == 1
@@ -0,0 +1,73 @@
+"""
+Pruebas de los pronósticos Monte Carlo de metas.
+"""
+
+from datetime import date
+
+from app.models import FinancialGoal, GoalContribution
+from app.services import goal_forecast_service
+from app.services.goal_forecast_service import get_goal_forecasts, simulate_completion_months
+
+TODAY = date(2024, 7, 10)
+
+
+def test_meses_de_cumplimiento():
+    months = simulate_completion_months([100.0], [0, 250, 10 ** 9], 12, paths=50)
+    assert months.shape == (3, 50)
+    assert set(months[0]) == {0} and set(months[1]) == {2} and set(months[2]) == {12}
+
+
+def test_meses_de_cumplimiento_por_bloques(monkeypatch):
+    samples, needs = [300.0, -200.0, 50.0, 120.0], [0, 400, 900, 5000]
+    whole = simulate_completion_months(samples, needs, 36, paths=100)
+    monkeypatch.setattr(goal_forecast_service, "SIMULATION_CHUNK_PATHS", 7)
+    assert (simulate_completion_months(samples, needs, 36, paths=100) == whole).all()
+
+    # Mismo resultado que contar los meses bajo el monto en la matriz completa
+    import numpy as np
+    best = np.maximum.accumulate(np.random.default_rng(0).choice(samples, size=(100, 36)).cumsum(axis=1), axis=1)
+    assert (whole[1:] == np.array([(best < need).sum(axis=1) for need in needs[1:]])).all()
+
+
+def test_pronosticos_en_cascada_y_cache(db, seeded, monkeypatch, add_transaction):
+    for month in range(1, 7):
+        add_transaction("1000", date(2024, month, 1))
+        add_transaction("-600", date(2024, month, 15))
+    first = FinancialGoal(user_id=seeded.user_id, name="Fondo de emergencia", target_amount=2000,
+                          current_amount=400, start_date=date(2024, 1, 1), target_date=date(2024, 12, 31), priority=1)
+    second = FinancialGoal(user_id=seeded.user_id, name="Vacaciones", target_amount=10000, current_amount=0,
+                           start_date=date(2024, 1, 1), target_date=date(2025, 1, 31), priority=0)
+    db.add_all([first, second])
+    db.commit()
+
+    calls = []
+    original = goal_forecast_service.simulate_completion_months
+    monkeypatch.setattr(goal_forecast_service, "simulate_completion_months",
+                        lambda samples, needs, *args, **kwargs: calls.append(needs) or original(samples, needs, *args, **kwargs))
+
+    forecasts = {forecast["goal_id"]: forecast for forecast in get_goal_forecasts(db, seeded.user_id, today=TODAY)}
+    # 1.600 pendientes a 400 por mes: cumple en octubre
+    assert forecasts[first.id]["success_probability"] == 1
+    assert forecasts[first.id]["expected_completion_date"] == date(2024, 10, 31)
+    # La segunda meta espera a la primera: 11.600 a 400 por mes
+    assert forecasts[second.id]["success_probability"] == 0
+    assert forecasts[second.id]["expected_completion_date"] == date(2026, 11, 30)
+    assert calls == [[1600.0, 11600.0]]
+
+    # Sin cambios (o con movimientos del mes en curso) se usa la caché
+    add_transaction("-50", date(2024, 7, 5))
+    db.commit()
+    get_goal_forecasts(db, seeded.user_id, today=TODAY)
+    assert len(calls) == 1
+
+    # Un aporte nuevo solo invalida su meta
+    db.add(GoalContribution(goal_id=second.id, amount=500, contribution_date=date(2024, 7, 6)))
+    db.commit()
+    get_goal_forecasts(db, seeded.user_id, today=TODAY)
+    assert calls[1] == [11600.0]
+
+    # Una transacción de un mes cerrado cambia la distribución de todas
+    add_transaction("-100", date(2024, 6, 20))
+    db.commit()
+    get_goal_forecasts(db, seeded.user_id, today=TODAY)
+    assert len(calls[2]) == 2
@@ -0,0 +1,116 @@
+"""
+Pruebas de huellas de archivos y solapamiento entre cartolas.
+"""
+
+import csv
+import io
+from datetime import datetime
+
+from app.models import FileImport, FileImportProfile, ImportError, Transaction
+from app.services import transaction_service
+from app.services.import_fingerprint_service import DUPLICATE_ERROR_TYPE, content_fingerprint
+
+
+def _rows_csv(content: bytes, start: int, end: int) -> bytes:
+    """Cartola con el header y los registros de datos [start, end)"""
+    records = list(csv.reader(io.StringIO(content.decode()), delimiter=";"))
+    buffer = io.StringIO()
+    csv.writer(buffer, delimiter=";").writerows([records[0]] + records[1 + start:1 + end])
+    return buffer.getvalue().encode()
+
+
+def _import(db, seeded, content):
+    return transaction_service.import_transactions_with_profile(db, seeded.user_id, seeded.profile_id, content, "cartola.csv")
+
+
+def test_huella_ignora_bom_y_fin_de_linea():
+    content = b"Fecha;Monto\r\n2024-01-01;10\r\n\r\n"
+    assert content_fingerprint(content, "csv") == content_fingerprint(b"\xef\xbb\xbfFecha;Monto\n2024-01-01;10 \n", "csv")
+    assert content_fingerprint(content, "csv") != content_fingerprint(b"Fecha;Monto\n2024-01-01;11\n", "csv")
+
+
+def test_resubida_devuelve_el_resultado_anterior(db, seeded, make_statement):
+    content = make_statement(25).content
+    first = _import(db, seeded, content)
+    again = _import(db, seeded, content.replace(b"\r\n", b"\n"))
+
+    assert first["successful_imports"] == 25
+    assert again["duplicate_of_import_id"] == first["import_id"]
+    assert again["successful_imports"] == 25
+    assert db.query(Transaction).filter(Transaction.user_id == seeded.user_id).count() == 25
+    assert db.query(FileImport).count() == 1
+
+
+def test_resubida_tras_eliminar_las_transacciones(db, seeded, make_statement):
+    content = make_statement(25).content
+    first = _import(db, seeded, content)
+    imported = db.query(Transaction).filter(Transaction.import_id == first["import_id"]).all()
+    assert len(imported) == 25
+
+    transaction_service.delete_transaction(db, seeded.user_id, imported[0].id)
+    again = _import(db, seeded, content)
+    assert "duplicate_of_import_id" not in again
+    assert (again["successful_imports"], len(again["errors"])) == (1, 24)
+
+    for transaction in db.query(Transaction).filter(Transaction.user_id == seeded.user_id).all():
+        transaction_service.delete_transaction(db, seeded.user_id, transaction.id)
+    third = _import(db, seeded, content)
+    assert (third["successful_imports"], third["skipped_duplicates"]) == (25, 0)
+    assert db.query(Transaction).filter(Transaction.user_id == seeded.user_id).count() == 25
+
+
+def test_resubida_con_otra_version_del_perfil(db, seeded, make_statement):
+    content = make_statement(25).content
+    first = _import(db, seeded, content)
+    profile = db.get(FileImportProfile, seeded.profile_id)
+    profile.updated_at = datetime(2030, 1, 1)
+    db.commit()
+
+    again = _import(db, seeded, content)
+    assert again.get("duplicate_of_import_id") != first["import_id"]
+    assert (again["successful_imports"], again["skipped_duplicates"]) == (0, 25)
+
+
+def test_solapamiento_de_prefijo_y_sufijo(db, seeded, make_statement):
+    content = make_statement(60).content
+    _import(db, seeded, _rows_csv(content, 30, 45))
+
+    # Prefijo 20-29 nuevo, 30-44 ya importado al medio, 45-49 nuevo
+    middle = _import(db, seeded, _rows_csv(content, 20, 50))
+    assert (middle["successful_imports"], middle["skipped_duplicates"]) == (15, 0)
+    assert all("duplicada" in error for error in middle["errors"])
+
+    # Prefijo 40-49 y sufijo ya importados, solo 50-59 es nuevo
+    overlap = _import(db, seeded, _rows_csv(content, 40, 60))
+    assert (overlap["successful_imports"], overlap["skipped_duplicates"], overlap["errors"]) == (10, 10, [])
+
+    suffix = _import(db, seeded, _rows_csv(content, 0, 35))
+    assert (suffix["successful_imports"], suffix["skipped_duplicates"], suffix["errors"]) == (20, 15, [])
+    assert db.query(Transaction).filter(Transaction.user_id == seeded.user_id).count() == 60
+
+
+def test_fila_fallida_se_reintenta_en_la_siguiente_cartola(db, seeded, make_statement, monkeypatch):
+    statement = make_statement(30)
+    target = statement.rows[5].description
+    create_transaction = transaction_service.create_transaction
+
+    def _failing(db, user_id, transaction_data, **kwargs):
+        if transaction_data.description == target:
+            raise ValueError("Error transitorio")
+        return create_transaction(db, user_id, transaction_data, **kwargs)
+
+    monkeypatch.setattr(transaction_service, "create_transaction", _failing)
+    first = _import(db, seeded, _rows_csv(statement.content, 0, 20))
+    assert first["failed_imports"] >= 1
+    monkeypatch.setattr(transaction_service, "create_transaction", create_transaction)
+
+    # La fila fallida no queda en el resumen: no se descarta como parte del prefijo ya importado
+    second = _import(db, seeded, _rows_csv(statement.content, 0, 30))
+    expected = sum(row.description == target for row in statement.rows)
+    assert db.query(Transaction).filter(Transaction.description == target).count() == expected
+
+    # Los errores se guardan con su tipo, sin interpretar el texto "Fila N: ..."
+    errors = db.query(ImportError).filter(ImportError.import_id == second["import_id"]).all()
+    file_import = db.get(FileImport, second["import_id"])
+    assert errors and {error.error_type for error in errors} == {DUPLICATE_ERROR_TYPE}
+    assert file_import.duplicate_count == second["skipped_duplicates"] + len(errors)
@@ -0,0 +1,92 @@
+"""
+Pruebas del compilador de perfiles de importación.
+"""
+
+import pickle
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import transaction_service
+from app.services.import_profile_compiler import clear_compiled_profiles, compile_import_profile
+
+
+def _profile(**overrides):
+    options = {"id": 7, "updated_at": datetime(2025, 1, 1), "positive_is_income": True, "debit_column_is_expense": True}
+    return SimpleNamespace(**{**options, **overrides})
+
+
+def _mapping(field, **overrides):
+    options = {
+        "target_field_name": field, "default_value": None, "amount_multiplier": "1",
+        "treat_empty_as_zero": True, "regex_pattern": None,
+    }
+    return SimpleNamespace(**{**options, **overrides})
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    clear_compiled_profiles()
+    yield
+    clear_compiled_profiles()
+
+
+def test_cache_por_id_y_fecha_de_actualizacion():
+    mappings = [_mapping("date"), _mapping("amount")]
+    compiled = compile_import_profile(_profile(), mappings)
+
+    assert compile_import_profile(_profile(), mappings) is compiled
+    assert compile_import_profile(_profile(updated_at=datetime(2025, 2, 1)), mappings) is not compiled
+
+
+def test_reglas_de_los_mapeos():
+    mappings = [
+        _mapping("date"),
+        _mapping("description", default_value="SIN GLOSA"),
+        _mapping("amount", amount_multiplier="1000", treat_empty_as_zero=False),
+        _mapping("notes", regex_pattern=r"^[A-Z]{3}-\d+$"),
+    ]
+    extractor = compile_import_profile(_profile(positive_is_income=False), mappings).bind(
+        {"date": 0, "description": 1, "amount": 2, "notes": 3}
+    )
+
+    data = extractor.extract(["2025-03-04", "", "1.5", "ABC-12"], 2, default_status_id=1)
+    assert (data.transaction_date, data.description, data.amount, data.notes) == (date(2025, 3, 4), "SIN GLOSA", -1500.0, "ABC-12")
+
+    with pytest.raises(ValueError, match="formato esperado"):
+        extractor.extract(["2025-03-04", "X", "10", "abc"], 3, default_status_id=1)
+    with pytest.raises(ValueError, match="Monto vacío"):
+        extractor.extract(["2025-03-04", "X", "", "ABC-1"], 4, default_status_id=1)
+
+
+def test_multiplicador_invalido_falla_al_compilar():
+    with pytest.raises(ValueError, match="Multiplicador inválido"):
+        compile_import_profile(_profile(), [_mapping("amount", amount_multiplier="x")])
+
+
+def test_monto_con_multiplicador_es_exacto():
+    mappings = [_mapping("date"), _mapping("description"), _mapping("amount", amount_multiplier="-1")]
+    extractor = compile_import_profile(_profile(), mappings).bind({"date": 0, "description": 1, "amount": 2})
+
+    # En float -2.675 se redondea a -2.67; con Decimal se conserva el valor de la cartola
+    data = extractor.extract(["2025-03-04", "Pago", "2.675"], 2, default_status_id=1)
+    assert data.amount == Decimal("-2.68")
+    assert extractor.extract_preview(["2025-03-04", "Pago", "2.675"], 2)["amount"] == Decimal("-2.68")
+
+
+def test_extractor_equivale_a_la_extraccion_por_fila():
+    profile = _profile(debit_column_is_expense=False)
+    column_map = {"date": 0, "description": 1, "debit_amount": 2, "credit_amount": 3}
+    extractor = compile_import_profile(profile, [_mapping(field) for field in column_map]).bind(column_map)
+    restored = pickle.loads(pickle.dumps(extractor))
+
+    for row in (["2025-01-02", " Pago ", "1500", ""], ["2025-01-03", "Abono", "", "200"]):
+        expected = transaction_service._extract_transaction_data(None, row, column_map, profile, 1, default_status_id=1)
+        assert extractor.extract(row, 1, 1) == expected
+        assert restored.extract(row, 1, 1) == expected
+
+    preview = extractor.extract_preview(["", "Sin fecha", "10", ""], 5)
+    assert preview["date_error"] == "Fecha requerida pero no encontrada"
+    assert preview["amount"] == 10.0
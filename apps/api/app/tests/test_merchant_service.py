@@ -0,0 +1,88 @@
+"""
+Pruebas de la normalización de comercios.
+"""
+
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from app.models import Merchant, Transaction
+from app.schemas.transactions import TransactionCreateRequest, TransactionUpdateRequest
+from app.services import transaction_service
+from app.services import merchant_service
+from app.services.merchant_service import (
+    DEFAULT_STRIP_PATTERNS, MerchantNormalizer, create_merchant_rule, get_merchant_normalizer, merchant_spend,
+    renormalize_merchants, rules_version, top_merchants
+)
+
+
+def test_limpieza_de_glosas():
+    normalizer = MerchantNormalizer("v1", DEFAULT_STRIP_PATTERNS, [(r"\bstgo\b", " ")], {"lider express": "lider"})
+    assert normalizer.key("COMPRA LIDER EXPRESS 0123 12/03 ****4521 STGO CL") == "lider"
+    assert normalizer.key("COMPRA UNIMARC TARJ ****2307") == "unimarc"
+    assert normalizer.key("UBER TRIP TERM 331148") == normalizer.key("UBER TRIP") == "uber trip"
+    assert normalizer.key("Compra nac JUMBO-2045 T998877") == "jumbo"
+    assert normalizer.key("Pago en Café Ñuñoa") == "cafe nunoa"
+    assert normalizer.key("0123 12/03") is None
+
+
+def test_version_incluye_la_tuberia(monkeypatch):
+    version = rules_version([])
+    monkeypatch.setattr(merchant_service, "DEFAULT_STRIP_PATTERNS", DEFAULT_STRIP_PATTERNS + (r"\bsa$",))
+    assert rules_version([]) != version
+    monkeypatch.setattr(merchant_service, "DEFAULT_STRIP_PATTERNS", DEFAULT_STRIP_PATTERNS)
+    monkeypatch.setattr(merchant_service, "PIPELINE_VERSION", merchant_service.PIPELINE_VERSION + 1)
+    assert rules_version([]) != version
+
+
+def test_importacion_y_renormalizacion(db, seeded, make_statement):
+    statement = make_statement(60)
+    result = transaction_service.import_transactions_with_profile(
+        db, seeded.user_id, seeded.profile_id, statement.content, "cartola.csv"
+    )
+    assert result["successful_imports"] == 60
+    imported = db.query(Transaction).filter(Transaction.description.in_([row.description for row in statement.rows]))
+    version = get_merchant_normalizer(db).version
+    assert {(t.merchant_id is not None, t.merchant_version) for t in imported} == {(True, version)}
+    assert renormalize_merchants(db)["changed"] == 0
+
+    # Un alias agrupa las sucursales; solo cambian las transacciones afectadas
+    create_merchant_rule(db, "alias", "lider express", merchant_name="Lider")
+    assert get_merchant_normalizer(db).version != version
+    lider = db.query(Merchant).filter(Merchant.key == "lider").one()
+    branches = [t.id for t in db.query(Transaction) if "LIDER EXPRESS" in t.description]
+    results = renormalize_merchants(db, batch_size=7)
+    assert results["changed"] == len(branches) > 0
+    assert renormalize_merchants(db)["processed"] == 0
+
+    spent = defaultdict(Decimal)
+    for t in db.query(Transaction).filter(Transaction.merchant_id == lider.id, Transaction.amount < 0):
+        spent[t.transaction_date.replace(day=1)] -= t.amount
+    series = merchant_spend(db, seeded.user_id, lider.id)
+    assert {item["month"]: item["total_spent"] for item in series} == spent
+
+    top = top_merchants(db, seeded.user_id, date(2000, 1, 1), date(2100, 1, 1), limit=3)
+    assert len(top) <= 3
+    assert [item["total_spent"] for item in top] == sorted((item["total_spent"] for item in top), reverse=True)
+
+
+def test_confirmacion_alta_y_edicion_asignan_comercio(db, seeded, make_statement):
+    statement = make_statement(20)
+    preview = transaction_service.preview_transactions_with_profile(
+        db, seeded.user_id, seeded.profile_id, statement.content, "cartola.csv"
+    )
+    assert transaction_service.confirm_transaction_preview(db, seeded.user_id, preview["preview_id"])["successful_imports"] == 20
+    version = get_merchant_normalizer(db).version
+    confirmed = db.query(Transaction).filter(Transaction.description.in_([row.description for row in statement.rows]))
+    assert {(t.merchant_id is not None, t.merchant_version) for t in confirmed} == {(True, version)}
+
+    manual = transaction_service.create_transaction(db, seeded.user_id, TransactionCreateRequest(
+        account_id=seeded.account_id, amount=-4990, description="COMPRA UNIMARC TARJ ****2307",
+        transaction_date=date(2025, 5, 2)
+    ))
+    assert manual.merchant.key == "unimarc"
+
+    edited = transaction_service.update_transaction(
+        db, seeded.user_id, manual.id, TransactionUpdateRequest(description="UBER TRIP TERM 331148")
+    )
+    assert (edited.merchant.key, edited.merchant_version) == ("uber trip", version)
@@ -0,0 +1,80 @@
+"""
+Pruebas de la detección de casi-duplicados (MinHash/LSH).
+"""
+
+import csv
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+
+from app.services import transaction_service
+from app.services.near_duplicate_service import (
+    NearDuplicateIndex, description_shingles, find_near_duplicates, jaccard, normalize_for_shingles
+)
+
+
+def test_normalizacion_y_similitud():
+    assert normalize_for_shingles("Compra LÍDER  Santiago 004512") == "compra lider santiago"
+    same = jaccard(description_shingles("COMPRA LIDER 1234"), description_shingles("compra lider 9876"))
+    assert same == 1.0
+    assert jaccard(description_shingles("NETFLIX.COM"), description_shingles("SPOTIFY")) < 0.2
+
+
+def test_indice_respeta_monto_ventana_y_umbral():
+    index = NearDuplicateIndex(threshold=0.5, window_days=3)
+    index.add(1, "COMPRA LIDER SANTIAGO 0045", Decimal("-15990"), date(2024, 5, 10))
+    index.add(2, "PAGO NETFLIX", Decimal("-15990"), date(2024, 5, 10))
+
+    matches = index.query("LIDER SANTIAGO COMPRA", Decimal("-15990.00"), date(2024, 5, 12))
+    assert [match.transaction_id for match in matches] == [1]
+    assert index.query("COMPRA LIDER SANTIAGO", Decimal("-15991"), date(2024, 5, 10)) == []
+    assert index.query("COMPRA LIDER SANTIAGO", Decimal("-15990"), date(2024, 5, 14)) == []
+
+
+def test_reporte_agrupa_movimientos_corridos(db, seeded, add_transaction):
+    first = add_transaction("-15990", date(2024, 5, 1), "COMPRA LIDER SANTIAGO 0045", commit=True).id
+    second = add_transaction("-15990", date(2024, 5, 3), "LIDER SANTIAGO", commit=True).id
+    third = add_transaction("-15990", date(2024, 5, 5), "COMPRA LIDER SANTIAGO", commit=True).id
+    add_transaction("-15990", date(2024, 5, 31), "COMPRA LIDER SANTIAGO", commit=True)  # fuera de la ventana
+    add_transaction("-990", date(2024, 5, 2), "NETFLIX", commit=True)
+
+    report = find_near_duplicates(db, seeded.user_id, threshold=0.5, window_days=3)
+    assert report["total_groups"] == 1
+    assert [item["id"] for item in report["groups"][0]["transactions"]] == [first, second, third]
+
+    assert find_near_duplicates(db, seeded.user_id, threshold=0.95, window_days=3)["total_groups"] == 0
+
+
+def test_importacion_informa_posibles_duplicados(db, seeded, make_statement, add_transaction):
+    statement = make_statement(20)
+    preview = transaction_service.preview_transactions_with_profile(
+        db, seeded.user_id, seeded.profile_id, statement.content, statement.filename
+    )
+    row = preview["transactions"][3]
+    # El banco publicó el mismo movimiento un día antes y con otra glosa
+    existing = add_transaction(row["amount"], row["transaction_date"] - timedelta(days=1),
+                               f"{row['description']} SUC 12", commit=True).id
+
+    result = transaction_service.import_transactions_with_profile(
+        db, seeded.user_id, seeded.profile_id, statement.content, statement.filename
+    )
+    assert result["successful_imports"] == 20
+    assert [item["transaction_id"] for item in result["possible_duplicates"]] == [existing]
+
+
+def test_filas_del_mismo_archivo_en_otro_bloque_no_son_historial(db, seeded, make_statement):
+    statement = make_statement(1105)
+    records = list(csv.reader(io.StringIO(statement.content.decode()), delimiter=";"))
+    # La fila 1101 repite el movimiento de la fila 11 un día después, en el segundo bloque de lectura
+    repeated = list(records[10])
+    repeated[0] = (date.fromisoformat(repeated[0]) + timedelta(days=1)).isoformat()
+    repeated[2] = "99999999"
+    records[1100] = repeated
+    buffer = io.StringIO()
+    csv.writer(buffer, delimiter=";").writerows(records)
+
+    result = transaction_service.import_transactions_with_profile(
+        db, seeded.user_id, seeded.profile_id, buffer.getvalue().encode(), statement.filename
+    )
+    assert result["successful_imports"] == 1105
+    assert result["possible_duplicates"] == []
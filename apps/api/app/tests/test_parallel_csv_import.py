@@ -0,0 +1,108 @@
+"""
+Pruebas del parseo paralelo de CSV grandes.
+"""
+
+import csv
+import io
+
+from app.config import settings
+from app.models import FileColumnMapping, FileImportProfile
+from app.services import transaction_service
+from app.services.import_profile_compiler import compile_import_profile
+from app.services.parallel_csv_import import find_record_end, parse_csv_in_parallel, split_csv_chunks
+from app.utils.tabular_reader import CsvReader
+
+BAD_ROWS = {7, 30}
+
+
+def _statement_with_quoted_rows(make_statement, rows=60):
+    """Cartola con glosas entre comillas que contienen saltos de línea y delimitadores"""
+    statement = make_statement(rows)
+    records = list(csv.reader(io.StringIO(statement.content.decode()), delimiter=";"))
+    for index in range(3, len(records), 5):
+        records[index][1] = f'GLOSA "{index}"\nSEGUNDA LINEA; {records[index][1]}'
+    for index in BAD_ROWS:
+        records[index][0] = "fecha-invalida"
+
+    buffer = io.StringIO()
+    csv.writer(buffer, delimiter=";", lineterminator="\r\n").writerows(records)
+    return buffer.getvalue().encode()
+
+
+def test_bloques_cortan_solo_fuera_de_comillas(make_statement):
+    content = _statement_with_quoted_rows(make_statement)
+    expected = list(csv.reader(io.StringIO(content.decode()), delimiter=";"))
+
+    chunks = split_csv_chunks(content, 9, delimiter=";")
+    rows = [
+        row
+        for start, end in chunks
+        for row in csv.reader(io.StringIO(content[start:end].decode()), delimiter=";")
+    ]
+
+    assert len(chunks) > 1
+    assert rows == expected
+
+
+def test_comilla_suelta_no_desplaza_los_cortes(make_statement):
+    statement = make_statement(40)
+    records = list(csv.reader(io.StringIO(statement.content.decode()), delimiter=";"))
+    # Comilla literal en un campo sin comillas, seguida de campos multilínea entre comillas
+    records[2][1] = 'MONITOR 27" LG'
+    for index in range(4, len(records), 3):
+        records[index][1] = f"{records[index][1]}\nSEGUNDA LINEA"
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";", lineterminator="\n")
+    for index, record in enumerate(records):
+        if index == 2:
+            buffer.write(";".join(record) + "\n")
+        else:
+            writer.writerow(record)
+    content = buffer.getvalue().encode()
+    expected = list(csv.reader(io.StringIO(content.decode()), delimiter=";"))
+    assert len(expected) == 41
+
+    for parts in (3, 7, 16):
+        rows = [
+            row
+            for start, end in split_csv_chunks(content, parts, delimiter=";")
+            for row in csv.reader(io.StringIO(content[start:end].decode()), delimiter=";")
+        ]
+        assert rows == expected
+
+
+def test_paralelo_coincide_con_el_parseo_secuencial(db, seeded, make_statement):
+    content = _statement_with_quoted_rows(make_statement)
+    profile = db.get(FileImportProfile, seeded.profile_id)
+    mappings = db.query(FileColumnMapping).filter(FileColumnMapping.profile_id == profile.id).all()
+    column_map = {mapping.target_field_name: mapping.source_column_index for mapping in mappings}
+
+    sequential = []
+    for row_idx, row in CsvReader(content, delimiter=";").iter_rows(start_row=2):
+        try:
+            data = transaction_service._extract_transaction_data(db, list(row), column_map, profile, row_idx)
+            sequential.append((row_idx, data, None))
+        except Exception as e:
+            sequential.append((row_idx, None, str(e)))
+
+    parallel = list(parse_csv_in_parallel(
+        content, find_record_end(content, 0, ";"), 2, "utf-8", ";",
+        compile_import_profile(profile, mappings).bind(column_map),
+        transaction_service.get_default_transaction_status_id(db), workers=2
+    ))
+
+    assert [(row_idx, data, error and str(error)) for row_idx, data, error in parallel] == sequential
+    assert [row_idx for row_idx, _, error in parallel if error] == [index + 1 for index in sorted(BAD_ROWS)]
+
+
+def test_importacion_usa_el_parseo_paralelo_sobre_el_umbral(db, seeded, make_statement, monkeypatch):
+    monkeypatch.setattr(settings, "IMPORT_PARALLEL_CSV_MIN_BYTES", 0)
+    monkeypatch.setattr(settings, "IMPORT_PARALLEL_CSV_WORKERS", 2)
+    content = _statement_with_quoted_rows(make_statement, rows=40)
+
+    result = transaction_service.import_transactions_with_profile(
+        db, seeded.user_id, seeded.profile_id, content, "cartola.csv"
+    )
+
+    assert result["successful_imports"] == 38
+    assert [error.split(":")[0] for error in result["errors"]] == ["Fila 8", "Fila 31"]
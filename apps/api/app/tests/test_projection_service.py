@@ -0,0 +1,78 @@
+"""
+Pruebas del motor de proyecciones.
+"""
+
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from app.models.projections import MonthlyProjections, ProjectionDetails, ProjectionSettings
+from app.services.projection_service import compute_projection, refresh_projection
+
+TODAY = date(2024, 7, 15)
+
+
+def _month(db, seeded, month_year):
+    return db.query(MonthlyProjections).filter(MonthlyProjections.user_id == seeded.user_id,
+                                               MonthlyProjections.month_year == month_year).one()
+
+
+def test_calculo_vectorizado():
+    history = np.array([[1000.0] * 6 + [0.0] * 6, [-400.0] * 6 + [0.0] * 6])
+    result = compute_projection(history, 6, np.zeros((2, 0)), 13, 100.0, 0.10, 0.05)
+    assert result.series[0, 0] == 1000.0 and result.series[1, 0] == -400.0
+    assert result.series[0, 12] == 1050.0 and result.series[1, 12] == -440.0
+    assert result.end_balance[0] == 700.0 and result.initial_balance[1] == 700.0
+
+    start = time.perf_counter()
+    compute_projection(np.random.default_rng(1).normal(0, 1000, (100, 12)), 12, np.zeros((100, 0)),
+                       36, 0.0, 0.03, 0.03)
+    assert time.perf_counter() - start < 0.05
+
+
+def test_persistencia_incremental(db, seeded, add_transaction):
+    db.add(ProjectionSettings(user_id=seeded.user_id, initial_balance=Decimal("50000"), inflation_rate=Decimal("0.03"),
+                              income_growth_rate=Decimal("0.02"), projection_months=24,
+                              created_at=datetime(2024, 5, 10), updated_at=datetime(2024, 5, 10)))
+    for month in range(1, 7):
+        add_transaction("-400000", date(2024, month, 3), subcategory="Supermercado")
+        add_transaction("1000000", date(2024, month, 1), subcategory="Delivery")
+    db.commit()
+
+    # Mayo y junio con montos reales, 24 meses proyectados desde julio
+    summary = refresh_projection(db, seeded.user_id, today=TODAY)
+    assert (summary["months"], summary["actual_months"], summary["months_written"]) == (26, 2, 26)
+    july = _month(db, seeded, "2024-07")
+    assert (july.income_total, july.expense_total, july.initial_balance) == (1000000, 400000, 1250000)
+
+    assert refresh_projection(db, seeded.user_id, today=TODAY)["months_written"] == 0
+
+    # Cambiar la inflación no toca los meses reales ni julio (factor 1)
+    db.query(ProjectionSettings).update({ProjectionSettings.inflation_rate: Decimal("0.10")})
+    db.commit()
+    assert refresh_projection(db, seeded.user_id, today=TODAY)["months_written"] == 23
+
+    # Un gasto nuevo en junio cambia junio y todo lo que sigue, no mayo
+    add_transaction("-60000", date(2024, 6, 20), subcategory="Supermercado")
+    db.commit()
+    assert refresh_projection(db, seeded.user_id, today=TODAY)["months_written"] == 25
+    june_detail = (
+        db.query(ProjectionDetails)
+        .filter(ProjectionDetails.projection_id == _month(db, seeded, "2024-06").id,
+                ProjectionDetails.subcategory_id == seeded.subcategory_ids["Supermercado"])
+        .one()
+    )
+    assert (june_detail.amount, june_detail.is_actual, june_detail.financial_bucket) == (-460000, True, "expense")
+    assert db.query(MonthlyProjections).filter(MonthlyProjections.user_id == seeded.user_id).count() == 26
+
+
+def test_tasa_invalida(db, seeded):
+    db.add(ProjectionSettings(user_id=seeded.user_id, initial_balance=Decimal("0"), inflation_rate=Decimal("-1"),
+                              income_growth_rate=Decimal("0.02"), projection_months=12,
+                              created_at=datetime(2024, 5, 10), updated_at=datetime(2024, 5, 10)))
+    db.commit()
+    with pytest.raises(ValueError, match="mayor que -100%"):
+        refresh_projection(db, seeded.user_id, today=TODAY)
@@ -0,0 +1,166 @@
+"""
+Presupuestos de consultas SQL por operación.
+
+Cada prueba ejecuta un servicio o una operación GraphQL con `QueryCounter` y
+`raise_on_lazy_load` activos: si un cambio introduce consultas por fila (N+1)
+o una carga perezosa sobre una relación caliente, la prueba falla aquí en
+lugar de aparecer como lentitud en producción.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import selectinload
+
+from app.models import Account, Category, CategoryGroup, Subcategory, Transaction, FileImportProfile
+from app.models.recurring_patterns import DescriptionPattern, PatternMatch
+from app.services import transaction_service
+from app.services.category_service import get_user_category_groups
+from app.services.description_pattern_service import DescriptionPatternService
+from app.utils.query_counter import QueryCounter, raise_on_lazy_load
+
+# Relaciones recorridas en los caminos calientes (listados, importación y patrones)
+HOT_RELATIONSHIPS = (
+    Transaction.account,
+    Transaction.subcategory,
+    Transaction.status,
+    Account.bank,
+    Account.account_type,
+    CategoryGroup.categories,
+    Category.subcategories,
+    Subcategory.category,
+    FileImportProfile.account,
+    FileImportProfile.column_mappings,
+    DescriptionPattern.subcategory,
+    PatternMatch.pattern,
+)
+
+
+@pytest.fixture
+def budget(engine, db):
+    """Devuelve un contexto que cuenta consultas y prohíbe cargas perezosas calientes"""
+    class _Budget:
+        def __init__(self):
+            self.counter = QueryCounter(engine)
+            self._lazy = raise_on_lazy_load(db, HOT_RELATIONSHIPS)
+
+        def __enter__(self):
+            self._lazy.__enter__()
+            return self.counter.__enter__()
+
+        def __exit__(self, *exc_info):
+            self.counter.__exit__(*exc_info)
+            self._lazy.__exit__(*exc_info)
+
+    return _Budget
+
+
+def _import(db, seeded, statement):
+    result = transaction_service.import_transactions_with_profile(
+        db, seeded.user_id, seeded.profile_id, statement.content, statement.filename
+    )
+    db.expunge_all()
+    return result
+
+
+def test_raise_on_lazy_load_detecta_n_mas_1(db, seeded, budget):
+    groups = db.query(CategoryGroup).all()
+
+    with budget():
+        with pytest.raises(InvalidRequestError):
+            [category.name for group in groups for category in group.categories]
+
+
+def test_raise_on_lazy_load_permite_carga_explicita(db, seeded, budget):
+    with budget() as counter:
+        groups = db.query(CategoryGroup).options(
+            selectinload(CategoryGroup.categories).subqueryload(Category.subcategories)
+        ).all()
+        [subcategory.name for group in groups for category in group.categories for subcategory in category.subcategories]
+
+    assert counter.count == 3, counter.report()
+
+
+@pytest.mark.parametrize("rows", [20, 200])
+def test_preview_consultas_constantes(db, seeded, make_statement, budget, rows):
+    statement = make_statement(rows)
+
+    with budget() as counter:
+        preview = transaction_service.preview_transactions_with_profile(
+            db, seeded.user_id, seeded.profile_id, statement.content, statement.filename
+        )
+
+    assert preview["valid_transactions"] == rows
+    assert counter.count <= 3, counter.report()
+
+
+@pytest.mark.parametrize("rows", [10, 60])
+def test_get_user_transactions_una_consulta(db, seeded, make_statement, budget, rows):
+    _import(db, seeded, make_statement(rows))
+
+    with budget() as counter:
+        transactions = transaction_service.get_user_transactions(db, seeded.user_id, limit=100)
+
+    assert len(transactions) == rows
+    assert counter.count == 1, counter.report()
+
+
+def test_get_pattern_statistics_consultas_constantes(db, seeded, budget):
+    with budget() as counter:
+        stats = DescriptionPatternService.get_pattern_statistics(db, seeded.user_id)
+
+    assert stats["total_patterns"] == len(seeded.pattern_ids)
+    assert counter.count <= 4, counter.report()
+
+
+def test_get_user_category_groups_carga_el_arbol_en_una_consulta(db, seeded, budget):
+    with budget() as counter:
+        groups = get_user_category_groups(db, seeded.user_id)
+        names = [sub.name for group in groups for category in group.categories for sub in category.subcategories]
+
+    assert len(names) == len(seeded.subcategory_ids)
+    assert counter.count == 1, counter.report()
+
+
+# ============================
+# Operaciones GraphQL
+# ============================
+
+def _execute(query, db, user_id, token=None):
+    from app.graphql.schema import schema
+
+    request = SimpleNamespace(headers={"Authorization": f"Bearer {token}"} if token else {})
+    context = SimpleNamespace(db=db, request=request, user={"id": user_id})
+    result = asyncio.run(schema.execute(query, context_value=context))
+    assert result.errors is None, result.errors
+    return result.data
+
+
+def test_graphql_my_category_groups(db, seeded, budget):
+    from app.services.auth_service import AuthService
+
+    token = asyncio.run(AuthService.create_access_token({"sub": str(seeded.user_id)}))
+    query = "{ myCategoryGroups { id name categories { id subcategories { id name } } } }"
+
+    with budget() as counter:
+        data = _execute(query, db, seeded.user_id, token)
+
+    assert data["myCategoryGroups"]
+    # Usuario del token + árbol de categorías
+    assert counter.count <= 2, counter.report()
+
+
+def test_graphql_my_transactions(db, seeded, make_statement, budget, monkeypatch):
+    from app.graphql.queries import transaction_simple
+
+    _import(db, seeded, make_statement(40))
+    monkeypatch.setattr(transaction_simple, "get_db", lambda: iter([db]))
+    query = "{ myTransactions(limit: 100) { totalCount transactions { id amount description } } }"
+
+    with budget() as counter:
+        data = _execute(query, db, seeded.user_id)
+
+    assert data["myTransactions"]["totalCount"] == 40
+    assert counter.count == 1, counter.report()
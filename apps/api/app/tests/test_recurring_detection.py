@@ -0,0 +1,54 @@
+"""
+Pruebas del detector de transacciones recurrentes.
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+from app.models import RecurringPattern, Transaction
+from app.services.recurring_detection_service import (
+    amount_bands, classify_periodicity, detect_recurring_transactions
+)
+
+
+def _monthly(day, months, start=(2024, 1)):
+    year, month = start
+    for offset in range(months):
+        yield date(year + (month - 1 + offset) // 12, (month - 1 + offset) % 12 + 1, day)
+
+
+def test_periodicidad_y_bandas():
+    weekly = [date(2024, 1, 1) + timedelta(days=7 * i + (i % 2)) for i in range(6)]
+    monthly = list(_monthly(28, 5))
+    yearly = [date(2020 + i, 3, 10 + i) for i in range(4)]
+    irregular = [date(2024, 1, 1), date(2024, 1, 5), date(2024, 3, 1), date(2024, 3, 2)]
+    assert classify_periodicity([weekly, monthly, yearly, irregular, monthly[:2]]) == [
+        "weekly", "monthly", "yearly", None, None
+    ]
+    assert amount_bands([Decimal("-100"), Decimal("-108"), Decimal("-500"), Decimal("100")]) == [1, 1, 0, 2]
+
+
+def test_deteccion_incremental(db, seeded, add_transaction):
+    for when in _monthly(5, 4):
+        add_transaction("-9990", when, "NETFLIX.COM")
+    for index, when in enumerate(_monthly(20, 4)):
+        add_transaction(str(-30000 - 1500 * index), when, "CGE  Electricidad")
+    add_transaction("-15990", date(2024, 1, 3), "COMPRA LIDER")
+    add_transaction("-2990", date(2024, 2, 3), "COMPRA LIDER")
+    db.commit()
+
+    summary = detect_recurring_transactions(db, seeded.user_id)
+    assert summary["patterns_created"] == 2
+    netflix = db.query(RecurringPattern).filter(RecurringPattern.match_key == "netflix.com").one()
+    assert (netflix.frequency, netflix.day_of_month, netflix.next_expected_date) == ("monthly", 5, date(2024, 5, 5))
+    assert db.query(Transaction).filter(Transaction.recurring_pattern_id == netflix.id).count() == 4
+
+    # Solo se procesan las transacciones nuevas; la de mayo se enlaza al patrón existente
+    add_transaction("-9990", date(2024, 5, 6), "NETFLIX.COM")
+    db.commit()
+    again = detect_recurring_transactions(db, seeded.user_id)
+    assert (again["processed_transactions"], again["linked_transactions"], again["patterns_created"]) == (1, 1, 0)
+    db.refresh(netflix)
+    assert (netflix.occurrence_count, netflix.last_transaction_date) == (5, date(2024, 5, 6))
+
+    assert detect_recurring_transactions(db, seeded.user_id)["processed_transactions"] == 0
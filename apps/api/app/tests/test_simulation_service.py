@@ -0,0 +1,108 @@
+"""
+Pruebas del motor de simulaciones.
+"""
+
+import asyncio
+import threading
+from datetime import date
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.models import FinancialMethod
+from app.models.simulations import FinancialSimulation, SimulationParameter, SimulationResult, SimulationScenario
+from app.services import simulation_service
+from app.services.simulation_service import (
+    evaluate_in_parallel, evaluate_scenarios, get_simulation_results, parameter_vector, run_simulation,
+    shutdown_process_pool
+)
+
+
+def test_parametros_tipados():
+    vector = dict(zip(["income_growth_rate", "inflation_rate"], parameter_vector([("income_growth_rate", "5%")])))
+    assert vector == {"income_growth_rate": 0.05, "inflation_rate": 0.03}
+    with pytest.raises(ValueError):
+        parameter_vector([("tasa", "1")])
+    with pytest.raises(ValueError):
+        parameter_vector([("change_start_month", "1.5")])
+    # Con -100% el factor mensual es cero y el kernel dividiría por cero
+    for rate in ("-100%", "-1.5", "nan"):
+        with pytest.raises(ValueError, match="mayor que -100%"):
+            parameter_vector([("savings_return_rate", rate)])
+
+
+def test_kernel():
+    vectors = [
+        parameter_vector([("expense_ratio", "0.5"), ("inflation_rate", "0")]),
+        parameter_vector([("monthly_expenses", "800"), ("inflation_rate", "0"), ("income_change", "-1000"),
+                          ("change_start_month", "2"), ("initial_savings", "100")]),
+    ]
+    income, expense, savings, accumulated, net_worth = evaluate_scenarios(1000.0, 3, vectors)
+    assert accumulated[0].tolist() == [500, 1000, 1500]
+    assert income[1].tolist() == [1000, 1000, 0] and accumulated[1].tolist() == [300, 500, -300]
+
+    many = np.tile(vectors, (50, 1))
+    assert np.allclose(evaluate_in_parallel(1000.0, 24, many, workers=2), evaluate_scenarios(1000.0, 24, many))
+    # El pool de procesos se reutiliza entre ejecuciones
+    pool = simulation_service._pool
+    assert np.allclose(evaluate_in_parallel(1000.0, 24, many, workers=2), evaluate_scenarios(1000.0, 24, many))
+    assert pool is not None and simulation_service._pool is pool
+    shutdown_process_pool()
+
+
+def test_mutacion_evalua_fuera_del_event_loop(monkeypatch):
+    from app.graphql.mutations import simulations
+
+    threads = []
+
+    async def _user(info):
+        return SimpleNamespace(id=1)
+
+    def _run(db, simulation_id, user_id, force=False):
+        threads.append(threading.current_thread())
+        return {"scenarios": 0, "evaluated": 0, "cached": 0}
+
+    monkeypatch.setattr(simulations, "get_authenticated_user", _user)
+    monkeypatch.setattr(simulations, "run_simulation", _run)
+    monkeypatch.setattr(simulations, "get_simulation_results", lambda *args: [])
+    asyncio.run(simulations.run_my_simulation(SimpleNamespace(context=SimpleNamespace(db=None)), 7))
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_memoizacion_por_escenario(db, seeded):
+    method = FinancialMethod(name="50/30/20", key="50_30_20")
+    db.add(method)
+    db.flush()
+    simulation = FinancialSimulation(user_id=seeded.user_id, name="Plan", financial_method_id=method.id,
+                                     base_income=1000000, start_date=date(2025, 1, 1), months_duration=12)
+    db.add(simulation)
+    db.flush()
+    scenarios = [SimulationScenario(simulation_id=simulation.id, name=name, is_baseline=index == 0)
+                 for index, name in enumerate(["Base", "Aumento", "Aumento bis"])]
+    db.add_all(scenarios)
+    db.flush()
+    db.add_all([SimulationParameter(scenario_id=scenarios[index].id, parameter_key="income_change",
+                                    parameter_value="100000") for index in (1, 2)])
+    db.commit()
+
+    assert run_simulation(db, simulation.id, seeded.user_id) == {"scenarios": 3, "evaluated": 3, "cached": 0}
+    assert db.query(SimulationResult).count() == 36
+    last = db.query(SimulationResult).filter(SimulationResult.scenario_id == scenarios[1].id,
+                                             SimulationResult.month_year == "2025-12").one()
+    assert last.income_total == 1100000
+
+    assert run_simulation(db, simulation.id, seeded.user_id)["evaluated"] == 0
+
+    db.query(SimulationParameter).filter(SimulationParameter.scenario_id == scenarios[2].id).update(
+        {SimulationParameter.parameter_value: "200000"})
+    db.commit()
+    assert run_simulation(db, simulation.id, seeded.user_id) == {"scenarios": 3, "evaluated": 1, "cached": 2}
+    assert db.query(SimulationResult).count() == 36
+
+    results = get_simulation_results(db, simulation.id, seeded.user_id)
+    assert [(item["name"], len(item["months"])) for item in results] == [("Base", 12), ("Aumento", 12), ("Aumento bis", 12)]
+    assert results[2]["months"][-1]["month_year"] == "2025-12" and results[2]["months"][-1]["income_total"] == 1200000
+
+    with pytest.raises(ValueError):
+        run_simulation(db, simulation.id, seeded.user_id + 1)
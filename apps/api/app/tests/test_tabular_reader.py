@@ -0,0 +1,48 @@
+"""
+Pruebas del lector tabular unificado (CSV, XLSX y XLS).
+"""
+
+import pytest
+
+from app.services import transaction_service
+from app.utils.tabular_reader import (
+    FORMAT_CSV, FORMAT_XLS, FORMAT_XLSX, open_tabular_reader, sniff_format
+)
+from benchmarks.statement_generator import xls_supported
+
+FILE_TYPES = ["csv", "xlsx"] + (["xls"] if xls_supported() else [])
+
+
+@pytest.mark.parametrize("file_type", FILE_TYPES)
+def test_formato_por_magic_bytes_y_filas_por_bloques(make_statement, file_type):
+    statement = make_statement(25, file_type=file_type)
+    assert sniff_format(statement.content) == {"csv": FORMAT_CSV, "xlsx": FORMAT_XLSX, "xls": FORMAT_XLS}[file_type]
+
+    with open_tabular_reader(statement.content, delimiter=statement.spec.delimiter) as reader:
+        header = reader.read_row(1)
+        chunks = list(reader.iter_chunks(start_row=2, chunk_size=10))
+        rows = list(reader.iter_rows(start_row=2))
+
+    assert header and all(isinstance(value, str) for value in header if value)
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    assert [item for chunk in chunks for item in chunk] == rows
+    assert [number for number, _ in rows] == list(range(2, 27))
+
+
+def test_archivo_invalido_falla_en_el_primer_intento(make_statement):
+    with pytest.raises(ValueError, match="no reconocido"):
+        sniff_format(b"\x00\x01\x02binario")
+    with pytest.raises(ValueError, match=".xlsx inválido"):
+        open_tabular_reader(b"PK\x03\x04" + b"\x00" * 200)
+    with pytest.raises(ValueError, match="Hoja 'Otra' no encontrada"):
+        open_tabular_reader(make_statement(3, file_type="xlsx").content, sheet_name="Otra")
+
+
+def test_importacion_detecta_excel_aunque_la_extension_diga_csv(db, seeded, make_statement):
+    statement = make_statement(12, file_type="xlsx")
+
+    result = transaction_service.import_transactions_with_profile(
+        db, seeded.user_id, seeded.profile_id, statement.content, "cartola.csv"
+    )
+
+    assert result["successful_imports"] == 12
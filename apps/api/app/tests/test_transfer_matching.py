@@ -0,0 +1,116 @@
+"""
+Pruebas del emparejamiento de transferencias internas.
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from app.models import Account, Category, Subcategory, Transaction
+from app.schemas.transactions import TransactionCreateRequest, TransactionUpdateRequest
+from app.services import transaction_service
+from app.services.balance_ledger import reconcile_account_balances
+from app.services.transfer_matching_service import TransferCandidate, match_internal_transfers, pair_transfers
+
+
+def _candidate(id, account_id, amount, day):
+    return TransferCandidate(id, account_id, Decimal(amount), date(2024, 3, day))
+
+
+def test_merge_por_monto_y_fecha():
+    candidates = [
+        _candidate(1, 1, "-500", 10),
+        _candidate(2, 2, "500", 14),   # fuera de la ventana
+        _candidate(3, 2, "500", 8),
+        _candidate(4, 3, "500", 11),   # más cercano que el 3
+        _candidate(5, 1, "500", 10),   # misma cuenta
+        _candidate(6, 1, "-70", 1),
+        _candidate(7, 2, "80", 1),
+    ]
+    assert pair_transfers(candidates, 3) == [(1, 4)]
+    # Con anclas, cada par debe incluir al menos una
+    assert pair_transfers(candidates, 3, anchors={3}) == [(1, 3)]
+    assert pair_transfers(candidates, 3, anchors={6}) == []
+
+
+def _setup(db, seeded):
+    checking = db.get(Account, seeded.account_id)
+    savings = Account(name="Ahorro", user_id=seeded.user_id, bank_id=checking.bank_id,
+                      account_type_id=checking.account_type_id, current_balance=0)
+    category = Category(name="Transferencias", is_income=False)
+    db.add_all([savings, category])
+    db.flush()
+    subcategory = Subcategory(category_id=category.id, name="Transferencia Interna")
+    db.add(subcategory)
+    db.commit()
+    return savings, subcategory
+
+
+def _create(db, seeded, account_id, amount, day):
+    return transaction_service.create_transaction(db, seeded.user_id, TransactionCreateRequest(
+        amount=amount, description=f"Traspaso {account_id} {amount} {day}", transaction_date=date(2024, 3, day),
+        account_id=account_id,
+    ), skip_duplicate_check=True)
+
+
+def test_emparejar_historial_sin_cambiar_saldos(db, seeded):
+    savings, subcategory = _setup(db, seeded)
+    outflow = _create(db, seeded, seeded.account_id, -100000, 1)
+    inflow = _create(db, seeded, savings.id, 100000, 2)
+    _create(db, seeded, savings.id, 100000, 20)
+    assert reconcile_account_balances(db, seeded.user_id) == []
+
+    assert match_internal_transfers(db, seeded.user_id) == 1
+    db.refresh(outflow)
+    db.refresh(inflow)
+    assert (outflow.transfer_account_id, outflow.transfer_transaction_id) == (savings.id, inflow.id)
+    assert (inflow.transfer_account_id, inflow.transfer_transaction_id) == (seeded.account_id, outflow.id)
+    assert outflow.subcategory_id == inflow.subcategory_id == subcategory.id
+    assert reconcile_account_balances(db, seeded.user_id) == []
+    assert match_internal_transfers(db, seeded.user_id) == 0
+
+    # Al eliminar un tramo, el otro vuelve a ser un movimiento simple
+    transaction_service.delete_transaction(db, seeded.user_id, inflow.id)
+    db.refresh(outflow)
+    assert (outflow.transfer_account_id, outflow.transfer_transaction_id) == (None, None)
+    assert reconcile_account_balances(db, seeded.user_id) == []
+
+
+def test_emparejar_en_la_importacion(db, seeded, make_statement):
+    savings, _ = _setup(db, seeded)
+    statement = make_statement(30)
+    row = statement.rows[0]
+    # El signo importado depende del perfil: se siembran ambas contrapartes y solo una calza
+    for sign in (1, -1):
+        db.add(Transaction(user_id=seeded.user_id, account_id=savings.id, amount=sign * Decimal(str(row.amount)),
+                           description=f"Contraparte {sign}", transaction_date=row.transaction_date, status_id=1))
+    db.commit()
+
+    result = transaction_service.import_transactions_with_profile(
+        db, seeded.user_id, seeded.profile_id, statement.content, "cartola.csv"
+    )
+    assert result["transfer_pairs"] == 1
+    (paired,) = db.query(Transaction).filter(Transaction.account_id == savings.id,
+                                             Transaction.transfer_transaction_id.isnot(None)).all()
+    counterpart = db.get(Transaction, paired.transfer_transaction_id)
+    assert (paired.transfer_account_id, counterpart.transfer_transaction_id) == (seeded.account_id, paired.id)
+    assert counterpart.amount == -paired.amount
+
+
+def test_no_empareja_ni_recategoriza_gastos_categorizados(db, seeded):
+    savings, subcategory = _setup(db, seeded)
+    groceries = seeded.subcategory_ids["Supermercado"]
+    expense = transaction_service.create_transaction(db, seeded.user_id, TransactionCreateRequest(
+        amount=-25000, description="COMPRA LIDER", transaction_date=date(2024, 3, 1),
+        account_id=seeded.account_id, subcategory_id=groceries,
+    ), skip_duplicate_check=True)
+    _create(db, seeded, savings.id, 25000, 1)
+    assert match_internal_transfers(db, seeded.user_id) == 0
+
+    # Una glosa de traspaso se empareja, pero conserva la subcategoría que ya tenía
+    transaction_service.update_transaction(db, seeded.user_id, expense.id,
+                                           TransactionUpdateRequest(description="TRASPASO A AHORRO"))
+    assert match_internal_transfers(db, seeded.user_id) == 1
+    db.refresh(expense)
+    assert expense.transfer_transaction_id is not None
+    assert expense.subcategory_id == groceries
+    assert db.get(Transaction, expense.transfer_transaction_id).subcategory_id == subcategory.id
@@ -0,0 +1,132 @@
+"""
+Prueba diferencial del motor .xlsx por streaming contra openpyxl.
+"""
+
+import io
+import zipfile
+from datetime import date, datetime, time
+
+import pytest
+from openpyxl import Workbook
+
+from app.utils.tabular_reader import StreamingXlsxReader, XlsxReader
+from benchmarks.statement_generator import generate_statement, StatementSpec
+
+
+def _workbook_bytes(build) -> bytes:
+    workbook = Workbook()
+    build(workbook)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def _mixed_types(workbook):
+    sheet = workbook.active
+    sheet.title = "Movimientos"
+    sheet.append(["Fecha", "Glosa", "Monto", "Activo", "Hora", "Nota"])
+    sheet.append([date(2024, 1, 15), "Compra supermercado", -100.5, True, time(13, 45), None])
+    sheet.append([datetime(2024, 2, 29, 8, 30), "Abono", 2500, False, None, "x"])
+    sheet.append([45292, "Serial sin formato", 1e-3, None, None, None])
+    sheet["A4"].number_format = "dd/mm/yyyy"
+    sheet["B7"] = "Fila tras un hueco"
+    sheet["C7"] = 12.0
+    sheet["C7"].number_format = "#,##0.00"
+    sheet["F9"] = "=C7*2"
+
+
+def _several_sheets(workbook):
+    workbook.active.append(["Primera"])
+    second = workbook.create_sheet("Cartola")
+    second.append(["Fecha", "Monto"])
+    second.append([date(2023, 12, 31), -1])
+    workbook.active = 1
+
+
+def _handcrafted_inline_strings() -> bytes:
+    """Celdas inlineStr, sin coordenadas, tipo 'd' y calendario 1904"""
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    rel_ns = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+    files = {
+        "[Content_Types].xml": (
+            '<?xml version="1.0"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            '</Types>'
+        ),
+        "_rels/.rels": (
+            '<?xml version="1.0"?><Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ),
+        "xl/workbook.xml": (
+            f'<?xml version="1.0"?><workbook {ns} {rel_ns}><workbookPr date1904="1"/>'
+            '<sheets><sheet name="Datos" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            '<?xml version="1.0"?><Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="/xl/worksheets/sheet1.xml"/>'
+            '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+            '</Relationships>'
+        ),
+        "xl/styles.xml": (
+            f'<?xml version="1.0"?><styleSheet {ns}><numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd"/></numFmts>'
+            '<cellXfs count="2"><xf numFmtId="0"/><xf numFmtId="164"/></cellXfs></styleSheet>'
+        ),
+        "xl/worksheets/sheet1.xml": (
+            f'<?xml version="1.0"?><worksheet {ns}><sheetData>'
+            '<row><c t="inlineStr"><is><t>Fecha</t></is></c><c t="inlineStr"><is><r><t>Glo</t></r><r><t>sa</t></r></is></c></row>'
+            '<row><c s="1"><v>43000</v></c><c t="inlineStr"><is><t xml:space="preserve"> con espacios </t></is></c><c t="b"><v>1</v></c></row>'
+            '<row r="5"><c r="C5" t="d"><v>2024-03-01T00:00:00</v></c><c r="A5" t="e"><v>#N/A</v></c></row>'
+            '</sheetData></worksheet>'
+        ),
+    }
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+CORPUS = {
+    "tipos_mixtos": lambda: _workbook_bytes(_mixed_types),
+    "varias_hojas": lambda: _workbook_bytes(_several_sheets),
+    "inline_1904": _handcrafted_inline_strings,
+    "cartola_tipada": lambda: generate_statement(StatementSpec(rows=300, file_type="xlsx")).content,
+    "cartola_texto": lambda: generate_statement(StatementSpec(rows=300, file_type="xlsx", typed_cells=False, layout="single_amount")).content,
+}
+
+
+def _rows(reader, start_row=1, columns=None):
+    with reader:
+        reader.select_columns(columns)
+        return [(number, tuple(row)) for number, row in reader.iter_rows(start_row)]
+
+
+def _project(rows, columns):
+    return [(number, tuple(value if i in columns else None for i, value in enumerate(row))) for number, row in rows]
+
+
+@pytest.mark.parametrize("name", sorted(CORPUS))
+@pytest.mark.parametrize("start_row", [1, 2, 6])
+def test_stream_coincide_con_openpyxl(name, start_row):
+    content = CORPUS[name]()
+
+    expected = _rows(XlsxReader(content), start_row)
+    actual = _rows(StreamingXlsxReader(content, chunk_size=7), start_row)
+
+    assert actual == expected
+
+
+@pytest.mark.parametrize("name", ["tipos_mixtos", "cartola_tipada"])
+def test_stream_solo_materializa_columnas_seleccionadas(name):
+    content = CORPUS[name]()
+    columns = {0, 2}
+
+    expected = _project(_rows(XlsxReader(content), 2), columns)
+    actual = _rows(StreamingXlsxReader(content), 2, columns)
+
+    assert actual == expected
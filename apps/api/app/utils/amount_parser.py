@@ -0,0 +1,170 @@
+"""
+Parseo de montos por columna.
+
+Las cartolas chilenas mezclan separadores de miles, símbolo `$`, paréntesis
+para negativos y el separador decimal configurado en el perfil. En lugar de
+limpiar cada valor por separado, los separadores de miles y decimal de la
+columna se infieren de una muestra (contrastándolos con
+`FileImportProfile.decimal_separator`) y cada texto se normaliza con una
+única tabla de `str.translate` precompilada, sin expresiones regulares por
+valor. El resultado es un Decimal exacto, que se conserva hasta crear la
+transacción.
+
+Uso:
+    thousands, decimal = resolve_amount_separators(profile, muestra_de_celdas)
+    parser = AmountColumnParser(thousands, decimal)
+    monto = parser.parse_decimal("$1.234.567")   # Decimal('1234567')
+"""
+
+import logging
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+from typing import Any, Iterable, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEPARATORS = (".", ",")
+# Símbolos y espacios que se descartan de los montos
+CURRENCY_SYMBOLS = "$€£"
+BLANKS = " \u00a0\u202f\t"
+
+AMOUNT_SAMPLE_SIZE = 200
+
+
+class AmountParseError(ValueError):
+    """Monto que no se pudo interpretar; conserva el valor original"""
+
+    def __init__(self, value: Any):
+        self.value = value
+        super().__init__(f"Monto no válido: {value}")
+
+    def __reduce__(self):
+        return (AmountParseError, (self.value,))
+
+
+def _other(separator: str) -> str:
+    return "," if separator == "." else "."
+
+
+def _separator_votes(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (separador de miles, separador decimal) que se deducen con certeza de un
+    texto, o None donde el texto es ambiguo ("1.234" puede ser cualquiera).
+    """
+    stripped = text.strip().strip(CURRENCY_SYMBOLS + BLANKS + "()+-")
+    positions = [(i, char) for i, char in enumerate(stripped) if char in SEPARATORS]
+    if not positions:
+        return None, None
+
+    last_index, last = positions[-1]
+    if len({char for _, char in positions}) == 2:
+        # Ambos presentes: el último es el decimal
+        return _other(last), last
+    if len(positions) > 1:
+        # Un separador repetido solo puede ser de miles
+        return last, None
+    if len(stripped) - last_index - 1 != 3:
+        # Una sola aparición sin exactamente tres dígitos detrás: decimal
+        return None, last
+    return None, None
+
+
+def infer_amount_separators(values: Iterable[Any], configured_decimal: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Separadores (miles, decimal) de una columna a partir de una muestra. Los
+    textos ambiguos no votan; si ninguno decide, se usa el separador decimal
+    configurado (o "." si no hay).
+    """
+    thousands_votes: Counter = Counter()
+    decimal_votes: Counter = Counter()
+    for value in values:
+        if not isinstance(value, str):
+            continue
+        thousands, decimal = _separator_votes(value)
+        if thousands:
+            thousands_votes[thousands] += 1
+        if decimal:
+            decimal_votes[decimal] += 1
+
+    if decimal_votes:
+        decimal = decimal_votes.most_common(1)[0][0]
+    elif thousands_votes:
+        decimal = _other(thousands_votes.most_common(1)[0][0])
+    else:
+        decimal = configured_decimal if configured_decimal in SEPARATORS else "."
+    return _other(decimal), decimal
+
+
+def resolve_amount_separators(profile, samples: Sequence[Any]) -> Tuple[str, str]:
+    """
+    Separadores para las columnas de monto de una importación. Con
+    `auto_detect_format` desactivado se respeta el separador decimal del perfil.
+    """
+    configured = getattr(profile, 'decimal_separator', None)
+    configured = configured if configured in SEPARATORS else None
+    if getattr(profile, 'auto_detect_format', True) is False and configured:
+        return _other(configured), configured
+
+    thousands, decimal = infer_amount_separators(samples, configured)
+    if configured and decimal != configured:
+        logger.warning(
+            f"Perfil {getattr(profile, 'id', None)}: separador decimal configurado '{configured}' "
+            f"no coincide con el archivo, se usa '{decimal}'"
+        )
+    return thousands, decimal
+
+
+class AmountColumnParser:
+    """Parser de una columna de montos con separadores fijos"""
+
+    def __init__(self, thousands: str = ",", decimal: str = "."):
+        if thousands == decimal:
+            raise ValueError("El separador de miles y el decimal deben ser distintos")
+        self.thousands = thousands
+        self.decimal = decimal
+        table = {ord(char): None for char in CURRENCY_SYMBOLS + BLANKS + thousands}
+        table[ord(decimal)] = "."
+        self._table = table
+
+    def __getstate__(self):
+        return {"thousands": self.thousands, "decimal": self.decimal}
+
+    def __setstate__(self, state):
+        self.__init__(state["thousands"], state["decimal"])
+
+    def parse_decimal(self, value: Any) -> Decimal:
+        """Convierte una celda a Decimal exacto (vacío = 0); lanza AmountParseError"""
+        if value is None or value == '':
+            return Decimal(0)
+        if isinstance(value, Decimal):
+            return value
+        if isinstance(value, int):
+            return Decimal(value)
+        if isinstance(value, float):
+            if value != value or value in (float("inf"), float("-inf")):
+                raise AmountParseError(value)
+            return Decimal(repr(value))
+        if not isinstance(value, str):
+            raise ValueError(f"Tipo de monto no soportado: {type(value)}")
+
+        text = value.translate(self._table)
+        negative = False
+        if text.startswith("(") and text.endswith(")"):
+            negative, text = True, text[1:-1]
+        if text.endswith("-"):
+            negative, text = not negative, text[:-1]
+        if text.startswith("-"):
+            negative, text = not negative, text[1:]
+        elif text.startswith("+"):
+            text = text[1:]
+
+        # Solo dígitos con, a lo más, un punto decimal
+        whole, _, fraction = text.partition(".")
+        digits = whole + fraction
+        if not digits or not digits.isdigit():
+            raise AmountParseError(value)
+        try:
+            amount = Decimal(text)
+        except InvalidOperation:
+            raise AmountParseError(value)
+        return -amount if negative else amount
@@ -0,0 +1,264 @@
+"""
+Parseo de fechas por columna.
+
+Una cartola usa un único formato de fecha por columna y repite muchas veces
+las mismas fechas. En lugar de probar todos los formatos en cada celda, el
+formato de la columna se infiere de una muestra de filas (contrastándolo con
+`FileImportProfile.date_format`) y luego cada texto se parsea con ese único
+formato, guardando el resultado en un memo acotado texto -> fecha. Los
+seriales de Excel de un bloque se convierten de una vez con NumPy.
+
+Uso:
+    date_format = resolve_date_format(profile, muestra_de_celdas)
+    parser = DateColumnParser(date_format)
+    parser.prime(celdas_del_bloque)       # seriales de Excel vectorizados
+    fecha = parser.parse(celda)
+"""
+
+import logging
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Formatos soportados, en orden de preferencia ante ambigüedad (día antes que mes)
+DATE_FORMATS = (
+    '%Y-%m-%d',      # 2024-01-15
+    '%d/%m/%Y',      # 15/01/2024
+    '%d-%m-%Y',      # 15-01-2024
+    '%m/%d/%Y',      # 01/15/2024
+    '%d/%m/%y',      # 15/01/24
+    '%Y%m%d',        # 20240115
+)
+
+# Formatos de `BudgetItem.month_year` (y de los month_year de proyecciones y simulaciones)
+MONTH_YEAR_FORMATS = (
+    '%Y-%m',         # 2024-01
+    '%m/%Y',         # 01/2024
+    '%m-%Y',         # 01-2024
+    '%Y/%m',         # 2024/01
+    '%Y-%m-%d',      # 2024-01-01
+)
+
+EXCEL_EPOCH = datetime(1899, 12, 30)
+# Seriales representables como date de Python (hasta 9999-12-31)
+MAX_EXCEL_SERIAL = 2958466
+
+DATE_SAMPLE_SIZE = 200
+DATE_MEMO_SIZE = 4096
+
+_PROFILE_TOKENS = re.compile(r"YYYY|YY|MM|DD")
+_PROFILE_TOKEN_MAP = {"YYYY": "%Y", "YY": "%y", "MM": "%m", "DD": "%d"}
+
+
+def profile_date_format(value: Optional[str]) -> Optional[str]:
+    """
+    Convierte el formato del perfil ("DD/MM/YYYY") al de strptime ("%d/%m/%Y").
+    Acepta también formatos que ya vienen en sintaxis strptime.
+    """
+    if not value or not str(value).strip():
+        return None
+    value = str(value).strip()
+    if "%" in value:
+        return value
+    return _PROFILE_TOKENS.sub(lambda match: _PROFILE_TOKEN_MAP[match.group(0)], value.upper())
+
+
+def _matches(text: str, fmt: str) -> bool:
+    try:
+        datetime.strptime(text, fmt)
+        return True
+    except ValueError:
+        return False
+
+
+def parse_excel_date(value):
+    """Convierte diferentes formatos de fecha de Excel a date"""
+    if value is None:
+        return None
+    
+    logger.debug(f"Parseando fecha: {value} (tipo: {type(value)})")
+    
+    # Si ya es un objeto datetime
+    if isinstance(value, datetime):
+        result = value.date()
+        logger.debug(f"Fecha convertida desde datetime: {result}")
+        return result
+    
+    # Si ya es un objeto date
+    if isinstance(value, date):
+        logger.debug(f"Fecha ya es date: {value}")
+        return value
+    
+    # Si es string, intentar parsear los formatos soportados
+    if isinstance(value, str):
+        for fmt in DATE_FORMATS:
+            try:
+                result = datetime.strptime(value.strip(), fmt).date()
+                logger.debug(f"Fecha parseada con formato {fmt}: {result}")
+                return result
+            except ValueError:
+                continue
+        
+        logger.error(f"Formato de fecha no válido: {value}")
+        raise ValueError(f"Formato de fecha no válido: {value}")
+    
+    # Si es un número (serial date de Excel)
+    if isinstance(value, (int, float)):
+        try:
+            # Excel cuenta días desde 1900-01-01 (con ajuste por bug de año bisiesto)
+            result = (EXCEL_EPOCH + timedelta(days=value)).date()
+            logger.debug(f"Fecha convertida desde serial Excel {value}: {result}")
+            return result
+        except Exception as e:
+            logger.error(f"Error convirtiendo fecha numérica {value}: {str(e)}")
+            raise ValueError(f"Fecha numérica no válida: {value}")
+    
+    logger.error(f"Tipo de fecha no soportado: {type(value)}")
+    raise ValueError(f"Tipo de fecha no soportado: {type(value)}")
+
+
+def parse_month_year(value: Any) -> date:
+    """Primer día del mes de un texto mes-año ("2024-01", "01/2024", ...); ValueError si no calza"""
+    if isinstance(value, date):
+        return value.replace(day=1)
+    text = str(value or '').strip()
+    for fmt in MONTH_YEAR_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().replace(day=1)
+        except ValueError:
+            continue
+    raise ValueError(f"Mes no válido: '{value}'. Use el formato AAAA-MM")
+
+
+def infer_date_format(values: Iterable[Any], preferred: Optional[str] = None) -> Optional[str]:
+    """
+    Formato que parsea todos los textos de la muestra (las celdas que ya son
+    fecha o número se ignoran). Si varios formatos calzan, gana `preferred`
+    y luego el orden de DATE_FORMATS. None si no hay textos o ninguno calza.
+    """
+    samples = {value.strip() for value in values if isinstance(value, str) and value.strip()}
+    if not samples:
+        return None
+
+    candidates = list(DATE_FORMATS)
+    if preferred and preferred not in candidates:
+        candidates.insert(0, preferred)
+    matching = [fmt for fmt in candidates if all(_matches(sample, fmt) for sample in samples)]
+    if not matching:
+        return None
+    return preferred if preferred in matching else matching[0]
+
+
+def resolve_date_format(profile, samples: Sequence[Any]) -> Optional[str]:
+    """
+    Formato fijo para la columna de fecha de una importación.
+
+    Con `auto_detect_format` desactivado se usa el formato del perfil tal cual;
+    si no, se infiere de la muestra y se avisa cuando no coincide con el perfil.
+    """
+    configured = profile_date_format(getattr(profile, 'date_format', None))
+    if getattr(profile, 'auto_detect_format', True) is False and configured:
+        return configured
+
+    inferred = infer_date_format(samples, preferred=configured)
+    if inferred and configured and inferred != configured:
+        logger.warning(
+            f"Perfil {getattr(profile, 'id', None)}: formato de fecha configurado {configured} "
+            f"no coincide con el archivo, se usa {inferred}"
+        )
+    return inferred or configured
+
+
+def excel_serials_to_dates(serials: Sequence[float], epoch: datetime = EXCEL_EPOCH) -> List[date]:
+    """Convierte un lote de seriales de Excel a fechas con una sola operación NumPy"""
+    if not serials:
+        return []
+    import numpy as np
+
+    days = np.floor(np.asarray(serials, dtype="float64")).astype("int64")
+    base = np.datetime64(epoch.date(), "D")
+    return (base + days.astype("timedelta64[D]")).tolist()
+
+
+class DateColumnParser:
+    """Parser de una columna de fechas con formato fijo y memo acotado"""
+
+    def __init__(self, date_format: Optional[str] = None, memo_size: int = DATE_MEMO_SIZE):
+        self.date_format = date_format
+        self.memo_size = memo_size
+        self._memo: Dict[Any, Optional[date]] = {}
+
+    def __getstate__(self):
+        # El memo no viaja a los workers del parseo paralelo
+        return {"date_format": self.date_format, "memo_size": self.memo_size}
+
+    def __setstate__(self, state):
+        self.__init__(state["date_format"], state["memo_size"])
+
+    def _remember(self, key, value: Optional[date]) -> None:
+        if len(self._memo) >= self.memo_size:
+            self._memo.clear()
+        self._memo[key] = value
+
+    def _parse_text(self, text: str) -> Optional[date]:
+        stripped = text.strip()
+        if self.date_format == '%Y-%m-%d' and len(stripped) == 10:
+            try:
+                return date.fromisoformat(stripped)
+            except ValueError:
+                pass
+        elif self.date_format:
+            try:
+                return datetime.strptime(stripped, self.date_format).date()
+            except ValueError:
+                pass
+        # Celda con otro formato: se prueban todos los soportados
+        try:
+            return parse_excel_date(stripped)
+        except ValueError:
+            return None
+
+    def parse(self, value: Any) -> Optional[date]:
+        """
+        Convierte una celda a fecha con las mismas reglas que parse_excel_date
+        (lanza ValueError si el texto no es una fecha válida).
+        """
+        if value is None:
+            return None
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        if not isinstance(value, (str, int, float)):
+            raise ValueError(f"Tipo de fecha no soportado: {type(value)}")
+
+        try:
+            result = self._memo[value]
+        except KeyError:
+            if isinstance(value, str):
+                result = self._parse_text(value)
+            else:
+                try:
+                    result = (EXCEL_EPOCH + timedelta(days=value)).date()
+                except (OverflowError, ValueError):
+                    raise ValueError(f"Fecha numérica no válida: {value}")
+            self._remember(value, result)
+
+        if result is None:
+            raise ValueError(f"Formato de fecha no válido: {value}")
+        return result
+
+    def prime(self, values: Iterable[Any]) -> None:
+        """Precalcula en bloque los seriales de Excel aún no memorizados"""
+        pending = sorted({
+            value for value in values
+            if isinstance(value, (int, float)) and 0 <= value < MAX_EXCEL_SERIAL
+            and value not in self._memo
+        })
+        if not pending:
+            return
+        converted = excel_serials_to_dates(pending)
+        for serial, result in zip(pending, converted):
+            self._remember(serial, result)
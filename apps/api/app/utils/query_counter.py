@@ -0,0 +1,86 @@
+"""
+Herramientas para detectar regresiones de consultas SQL (N+1).
+
+`QueryCounter` cuenta las sentencias que un engine envía a la base de datos
+dentro de un bloque `with`, y `raise_on_lazy_load` hace fallar cualquier carga
+perezosa de las relaciones indicadas, con la misma semántica que
+`lazy='raise_on_sql'` pero sin modificar los modelos de producción.
+"""
+
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+
+
+class QueryCounter:
+    """
+    Cuenta las sentencias SQL emitidas por un engine.
+
+    Uso:
+        with QueryCounter(engine) as counter:
+            servicio(db, ...)
+        assert counter.count <= 3, counter.report()
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.statements: List[str] = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements.append(statement)
+
+    def __enter__(self) -> "QueryCounter":
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def report(self, limit: Optional[int] = 20) -> str:
+        """Resumen legible de las sentencias capturadas, útil en mensajes de assert"""
+        shown = self.statements if limit is None else self.statements[:limit]
+        lines = [f"{self.count} sentencias SQL:"]
+        lines.extend(f"  {i + 1}. {' '.join(s.split())[:200]}" for i, s in enumerate(shown))
+        if limit is not None and self.count > limit:
+            lines.append(f"  ... y {self.count - limit} más")
+        return "\n".join(lines)
+
+
+@contextmanager
+def raise_on_lazy_load(session: Session, relationships: Iterable[InstrumentedAttribute]) -> Iterator[None]:
+    """
+    Hace fallar las cargas perezosas de las relaciones indicadas que requieran SQL.
+
+    Las relaciones muchos-a-uno que se resuelven desde el identity map no emiten
+    consultas y por lo tanto se permiten, igual que las cargas explícitas
+    (selectinload/subqueryload), que también son cargas de relación pero no
+    parten de una instancia.
+    """
+    watched = {attribute.property for attribute in relationships}
+
+    def _check(orm_execute_state) -> None:
+        # Solo las cargas perezosas tienen una instancia de origen
+        if not orm_execute_state.is_relationship_load or orm_execute_state.lazy_loaded_from is None:
+            return
+        prop = orm_execute_state.loader_strategy_path.prop
+        if prop in watched:
+            raise InvalidRequestError(
+                f"'{prop}' no está disponible por lazy='raise': cargue la relación "
+                "explícitamente (selectinload/joinedload) para evitar consultas N+1"
+            )
+
+    event.listen(session, "do_orm_execute", _check)
+    try:
+        yield
+    finally:
+        event.remove(session, "do_orm_execute", _check)
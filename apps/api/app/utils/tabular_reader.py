@@ -0,0 +1,541 @@
+"""
+Lectura unificada de archivos tabulares (CSV, XLSX y XLS).
+
+El formato se decide una sola vez a partir de los primeros bytes del archivo
+(firma ZIP para .xlsx, OLE2 para .xls y texto para CSV) en lugar de probar
+un parser tras otro: un archivo inválido falla en el primer intento, sin
+volver a parsearse completo con cada librería.
+
+Todos los lectores exponen la misma interfaz: filas como tuplas de valores
+con su número de fila (base 1) y lectura en bloques de tamaño fijo.
+
+Para .xlsx hay dos motores: openpyxl (por defecto) y "stream", que recorre el
+XML de la hoja con iterparse y solo materializa las columnas seleccionadas
+con `select_columns` (ver StreamingXlsxReader).
+
+Uso:
+    with open_tabular_reader(file_content, sheet_name="Movimientos") as reader:
+        header = reader.read_row(1)
+        for chunk in reader.iter_chunks(start_row=2):
+            for row_number, row in chunk:
+                ...
+"""
+
+import codecs
+import csv
+import io
+import logging
+import posixpath
+import re
+import zipfile
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from xml.etree.ElementTree import iterparse, fromstring
+
+logger = logging.getLogger(__name__)
+
+FORMAT_CSV = "csv"
+FORMAT_XLSX = "xlsx"
+FORMAT_XLS = "xls"
+
+XLSX_ENGINE_OPENPYXL = "openpyxl"
+XLSX_ENGINE_STREAM = "stream"
+XLSX_ENGINES = (XLSX_ENGINE_OPENPYXL, XLSX_ENGINE_STREAM)
+
+ZIP_MAGIC = b"PK\x03\x04"
+OLE2_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+TEXT_BOMS = (codecs.BOM_UTF8, codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+
+DEFAULT_CHUNK_SIZE = 1000
+
+Row = Tuple[int, tuple]
+
+
+def sniff_format(content: bytes) -> str:
+    """Detecta el formato del archivo por sus bytes iniciales"""
+    if not content:
+        raise ValueError("El archivo está vacío")
+    if content.startswith(ZIP_MAGIC):
+        return FORMAT_XLSX
+    if content.startswith(OLE2_MAGIC):
+        return FORMAT_XLS
+
+    sample = content[:4096]
+    if b"\x00" in sample and not sample.startswith(TEXT_BOMS):
+        raise ValueError("Formato de archivo no reconocido: se esperaba CSV, .xlsx o .xls")
+    return FORMAT_CSV
+
+
+class TabularReader:
+    """Interfaz común de los lectores tabulares"""
+
+    format: str = ""
+
+    @property
+    def sheet_title(self) -> Optional[str]:
+        return None
+
+    def iter_rows(self, start_row: int = 1) -> Iterator[Row]:
+        """Filas desde `start_row` (base 1) como (número de fila, tupla de valores)"""
+        raise NotImplementedError
+
+    def iter_chunks(self, start_row: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Row]]:
+        """Filas desde `start_row` agrupadas en bloques de hasta `chunk_size`"""
+        rows = self.iter_rows(start_row)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def read_row(self, row_number: int) -> Optional[tuple]:
+        """Valores de una fila (base 1) o None si no existe"""
+        for _, row in self.iter_rows(row_number):
+            return row
+        return None
+
+    def select_columns(self, columns: Optional[Iterable[int]]) -> None:
+        """
+        Indica las columnas (base 0) que se usarán en las próximas lecturas.
+        Es solo una pista: los lectores que no la aprovechan devuelven la fila
+        completa, y los que sí dejan en None las columnas no seleccionadas.
+        """
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CsvReader(TabularReader):
+    """Lector de CSV: decodifica el contenido una vez y lo recorre en streaming"""
+
+    format = FORMAT_CSV
+
+    def __init__(self, content: bytes, encoding: str = "utf-8", delimiter: str = ","):
+        try:
+            self._text = content.decode(encoding)
+        except (UnicodeDecodeError, LookupError) as e:
+            raise ValueError(f"No se pudo decodificar el CSV con encoding '{encoding}': {str(e)}")
+        self.delimiter = delimiter
+
+    def iter_rows(self, start_row: int = 1) -> Iterator[Row]:
+        reader = csv.reader(io.StringIO(self._text), delimiter=self.delimiter)
+        for row_number, row in enumerate(islice(reader, start_row - 1, None), start=start_row):
+            yield row_number, tuple(row)
+
+
+class XlsxReader(TabularReader):
+    """Lector de .xlsx sobre openpyxl en modo read-only (valores, no fórmulas)"""
+
+    format = FORMAT_XLSX
+
+    def __init__(self, content: bytes, sheet_name: Optional[str] = None):
+        # Carga diferida: los workers que no importan Excel no pagan su costo
+        from openpyxl import load_workbook
+
+        try:
+            self.workbook = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+        except Exception as e:
+            raise ValueError(f"Archivo .xlsx inválido: {str(e)}")
+
+        if sheet_name:
+            if sheet_name not in self.workbook.sheetnames:
+                available_sheets = self.workbook.sheetnames
+                self.workbook.close()
+                raise ValueError(f"Hoja '{sheet_name}' no encontrada. Hojas disponibles: {', '.join(available_sheets)}")
+            self.worksheet = self.workbook[sheet_name]
+        else:
+            self.worksheet = self.workbook.active or self.workbook.worksheets[0]
+
+    @property
+    def sheet_title(self) -> Optional[str]:
+        return self.worksheet.title
+
+    def iter_rows(self, start_row: int = 1) -> Iterator[Row]:
+        return enumerate(self.worksheet.iter_rows(min_row=start_row, values_only=True), start=start_row)
+
+    def close(self) -> None:
+        self.workbook.close()
+
+
+# Espacios de nombres de SpreadsheetML
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_ROW_TAG = _MAIN_NS + "row"
+_CELL_TAG = _MAIN_NS + "c"
+_VALUE_TAG = _MAIN_NS + "v"
+_INLINE_TAG = _MAIN_NS + "is"
+_TEXT_TAG = _MAIN_NS + "t"
+_RUN_TAG = _MAIN_NS + "r"
+_SHEET_DATA_TAG = _MAIN_NS + "sheetData"
+_DIMENSION_TAG = _MAIN_NS + "dimension"
+
+_COORDINATE_RE = re.compile(r"^\$?([A-Z]+)\$?(\d+)$")
+_DIGITS = "0123456789"
+
+
+def _column_number(letters: str) -> int:
+    number = 0
+    for letter in letters:
+        number = number * 26 + (ord(letter) - 64)
+    return number
+
+
+def _split_coordinate(coordinate: str) -> Tuple[int, int]:
+    """'B12' -> (12, 2)"""
+    match = _COORDINATE_RE.match(coordinate.upper())
+    if not match:
+        raise ValueError(f"Coordenada de celda inválida: {coordinate}")
+    return int(match.group(2)), _column_number(match.group(1))
+
+
+def _cast_number(value: str):
+    """Igual que openpyxl: entero salvo que el texto tenga parte decimal o exponente"""
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+
+def _string_content(node) -> str:
+    """Texto de un <si>/<is>: el <t> directo más los <t> de cada run (sin fonética)"""
+    parts = []
+    for child in node:
+        if child.tag == _TEXT_TAG:
+            parts.append(child.text or "")
+        elif child.tag == _RUN_TAG:
+            text = child.findtext(_TEXT_TAG)
+            if text is not None:
+                parts.append(text)
+    return "".join(parts)
+
+
+class StreamingXlsxReader(TabularReader):
+    """
+    Lector rápido de .xlsx sin openpyxl en el bucle de filas.
+
+    Abre el zip una vez, carga `sharedStrings.xml` en una lista y recorre
+    `sheetN.xml` con iterparse, liberando cada fila ya procesada. Solo se
+    convierten los valores de las columnas seleccionadas y las fechas
+    (seriales con formato de fecha) se convierten por bloque, una vez por
+    serial distinto.
+
+    La salida replica la de openpyxl en modo read-only con values_only=True:
+    filas rellenadas hasta la dimensión de la hoja, filas faltantes como
+    tuplas vacías de None y la misma tipificación de números, booleanos,
+    fechas y textos. El reglamento de formatos de fecha se toma de openpyxl
+    para no divergir en formatos personalizados.
+    """
+
+    format = FORMAT_XLSX
+
+    def __init__(self, content: bytes, sheet_name: Optional[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        try:
+            self.archive = zipfile.ZipFile(io.BytesIO(content))
+            sheets, active_index, date1904 = self._read_workbook()
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Archivo .xlsx inválido: {str(e)}")
+
+        if not sheets:
+            raise ValueError("Archivo .xlsx inválido: no contiene hojas de cálculo")
+        names = [name for name, _ in sheets]
+        if sheet_name:
+            if sheet_name not in names:
+                self.archive.close()
+                raise ValueError(f"Hoja '{sheet_name}' no encontrada. Hojas disponibles: {', '.join(names)}")
+            self._title, self._sheet_path = sheets[names.index(sheet_name)]
+        else:
+            self._title, self._sheet_path = sheets[active_index if active_index < len(sheets) else 0]
+
+        from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900
+        self._epoch = CALENDAR_MAC_1904 if date1904 else CALENDAR_WINDOWS_1900
+        self._date_styles, self._timedelta_styles = self._read_date_styles()
+        self._shared_strings = self._read_shared_strings()
+        self._max_row, self._max_column = self._read_dimension()
+        self._columns: Optional[Set[int]] = None
+        self.chunk_size = chunk_size
+
+    # ---- Metadatos del libro ----
+
+    def _read_workbook(self) -> Tuple[List[Tuple[str, str]], int, bool]:
+        workbook = fromstring(self.archive.read("xl/workbook.xml"))
+        rels = fromstring(self.archive.read("xl/_rels/workbook.xml.rels"))
+        targets = {
+            rel.get("Id"): rel.get("Target")
+            for rel in rels.iter(_PKG_REL_NS + "Relationship")
+            if rel.get("Type", "").endswith("/worksheet")
+        }
+
+        sheets = []
+        for sheet in workbook.iter(_MAIN_NS + "sheet"):
+            target = targets.get(sheet.get(_REL_NS + "id"))
+            if target is None:
+                continue  # hojas de gráfico u otros tipos
+            path = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+            sheets.append((sheet.get("name"), path))
+
+        view = workbook.find(f"{_MAIN_NS}bookViews/{_MAIN_NS}workbookView")
+        active_index = int(view.get("activeTab", 0)) if view is not None else 0
+        properties = workbook.find(_MAIN_NS + "workbookPr")
+        date1904 = properties is not None and properties.get("date1904") in ("1", "true")
+        return sheets, active_index, date1904
+
+    def _read_date_styles(self) -> Tuple[Set[int], Set[int]]:
+        """Índices de estilo de celda (cellXfs) cuyo formato numérico es fecha u hora"""
+        try:
+            styles = fromstring(self.archive.read("xl/styles.xml"))
+        except KeyError:
+            return set(), set()
+
+        from openpyxl.styles.numbers import builtin_format_code, is_date_format, is_timedelta_format
+
+        custom = {
+            int(fmt.get("numFmtId")): fmt.get("formatCode")
+            for fmt in styles.iter(_MAIN_NS + "numFmt")
+        }
+        date_styles, timedelta_styles = set(), set()
+        cell_xfs = styles.find(_MAIN_NS + "cellXfs")
+        for idx, xf in enumerate(cell_xfs if cell_xfs is not None else []):
+            num_fmt_id = int(xf.get("numFmtId", 0))
+            fmt = custom.get(num_fmt_id) or builtin_format_code(num_fmt_id)
+            if is_date_format(fmt):
+                date_styles.add(idx)
+            if is_timedelta_format(fmt):
+                timedelta_styles.add(idx)
+        return date_styles, timedelta_styles
+
+    def _read_shared_strings(self) -> List[str]:
+        try:
+            source = self.archive.open("xl/sharedStrings.xml")
+        except KeyError:
+            return []
+        strings = []
+        with source:
+            for _, node in iterparse(source):
+                if node.tag == _MAIN_NS + "si":
+                    strings.append(_string_content(node).replace("x005F_", ""))
+                    node.clear()
+        return strings
+
+    def _read_dimension(self) -> Tuple[Optional[int], Optional[int]]:
+        with self.archive.open(self._sheet_path) as source:
+            for _, node in iterparse(source):
+                if node.tag == _DIMENSION_TAG:
+                    ref = node.get("ref") or ""
+                    last = ref.split(":")[-1]
+                    if not last:
+                        return None, None
+                    return _split_coordinate(last)
+                if node.tag == _SHEET_DATA_TAG or node.tag == _ROW_TAG:
+                    break
+        return None, None
+
+    # ---- Lectura de filas ----
+
+    @property
+    def sheet_title(self) -> Optional[str]:
+        return self._title
+
+    def select_columns(self, columns: Optional[Iterable[int]]) -> None:
+        self._columns = None if columns is None else {int(column) for column in columns}
+
+    def _parse_rows(self, start_row: int, pending_dates: List) -> Iterator[Tuple[int, List]]:
+        """
+        Filas crudas (número, lista de valores) desde `start_row`. Las celdas con
+        formato de fecha quedan con el serial y se anotan en `pending_dates`.
+        """
+        shared_strings = self._shared_strings
+        date_styles = self._date_styles
+        timedelta_styles = self._timedelta_styles
+        columns = self._columns
+        max_column = self._max_column
+        column_numbers: Dict[str, int] = {}
+        row_counter = 0
+
+        with self.archive.open(self._sheet_path) as source:
+            sheet_data = None
+            for event, node in iterparse(source, events=("start", "end")):
+                if event == "start":
+                    if node.tag == _SHEET_DATA_TAG:
+                        sheet_data = node
+                    continue
+                if node.tag != _ROW_TAG:
+                    continue
+
+                row_attr = node.get("r")
+                row_counter = int(float(row_attr)) if row_attr else row_counter + 1
+                if row_counter < start_row:
+                    sheet_data.clear()
+                    continue
+
+                cells: Dict[int, Any] = {}
+                column = 0
+                for cell in node:
+                    if cell.tag != _CELL_TAG:
+                        continue
+                    coordinate = cell.get("r")
+                    if coordinate:
+                        letters = coordinate.rstrip(_DIGITS)
+                        column = column_numbers.get(letters) or column_numbers.setdefault(letters, _column_number(letters))
+                    else:
+                        column += 1
+                    if columns is not None and column - 1 not in columns:
+                        continue
+
+                    data_type = cell.get("t", "n")
+                    if data_type == "inlineStr":
+                        inline = cell.find(_INLINE_TAG)
+                        cells[column] = _string_content(inline) if inline is not None else None
+                        continue
+
+                    value = cell.findtext(_VALUE_TAG) or None
+                    if value is not None:
+                        if data_type == "n":
+                            value = _cast_number(value)
+                            style = int(cell.get("s", 0) or 0)
+                            if style in date_styles:
+                                pending_dates.append((row_counter, column, value, style in timedelta_styles))
+                        elif data_type == "s":
+                            value = shared_strings[int(value)]
+                        elif data_type == "b":
+                            value = bool(int(value))
+                        elif data_type == "d":
+                            from openpyxl.utils.datetime import from_ISO8601
+                            value = from_ISO8601(value)
+                    cells[column] = value
+
+                width = max_column or column
+                values = [None] * width
+                for position, value in cells.items():
+                    if position <= width:
+                        values[position - 1] = value
+                sheet_data.clear()
+                yield row_counter, values
+
+    def _convert_dates(self, rows: Dict[int, List], pending_dates: List) -> None:
+        """Convierte por bloque los seriales de fecha, una vez por serial distinto"""
+        if not pending_dates:
+            return
+        from openpyxl.utils.datetime import from_excel
+
+        converted: Dict[Tuple[Any, bool], Any] = {}
+        for row_number, column, serial, is_timedelta in pending_dates:
+            key = (serial, is_timedelta)
+            if key not in converted:
+                try:
+                    converted[key] = from_excel(serial, self._epoch, timedelta=is_timedelta)
+                except (OverflowError, ValueError):
+                    converted[key] = "#VALUE!"
+            values = rows.get(row_number)
+            if values is not None and column <= len(values):
+                values[column - 1] = converted[key]
+        pending_dates.clear()
+
+    def iter_rows(self, start_row: int = 1) -> Iterator[Row]:
+        max_row = self._max_row
+        empty_row = (None,) * self._max_column if self._max_column is not None else ()
+        counter = start_row
+        pending_dates: List = []
+        parsed = self._parse_rows(start_row, pending_dates)
+
+        while True:
+            chunk = list(islice(parsed, self.chunk_size))
+            if not chunk:
+                return
+            self._convert_dates(dict(chunk), pending_dates)
+
+            for row_number, values in chunk:
+                if max_row is not None and row_number > max_row:
+                    # Como openpyxl: se completa hasta la dimensión declarada
+                    while counter <= max_row:
+                        yield counter, empty_row
+                        counter += 1
+                    return
+                # Filas ausentes en el XML
+                while counter < row_number:
+                    yield counter, empty_row
+                    counter += 1
+                if counter <= row_number:
+                    counter += 1
+                    yield row_number, tuple(values)
+
+    def close(self) -> None:
+        self.archive.close()
+
+
+class XlsReader(TabularReader):
+    """Lector de .xls (BIFF) sobre xlrd, leyendo filas completas con `row_values`"""
+
+    format = FORMAT_XLS
+
+    def __init__(self, content: bytes, sheet_name: Optional[str] = None):
+        import xlrd
+
+        try:
+            self.workbook = xlrd.open_workbook(file_contents=content, on_demand=True)
+        except Exception as e:
+            raise ValueError(f"Archivo .xls inválido: {str(e)}")
+
+        if sheet_name:
+            if sheet_name not in self.workbook.sheet_names():
+                available_sheets = self.workbook.sheet_names()
+                self.workbook.release_resources()
+                raise ValueError(f"Hoja '{sheet_name}' no encontrada. Hojas disponibles: {', '.join(available_sheets)}")
+            self.worksheet = self.workbook.sheet_by_name(sheet_name)
+        else:
+            self.worksheet = self.workbook.sheet_by_index(0)
+
+    @property
+    def sheet_title(self) -> Optional[str]:
+        return self.worksheet.name
+
+    def iter_rows(self, start_row: int = 1) -> Iterator[Row]:
+        worksheet = self.worksheet
+        for row_idx in range(max(start_row - 1, 0), worksheet.nrows):
+            yield row_idx + 1, tuple(worksheet.row_values(row_idx))
+
+    def close(self) -> None:
+        self.workbook.release_resources()
+
+
+def open_tabular_reader(
+    content: bytes,
+    sheet_name: Optional[str] = None,
+    encoding: str = "utf-8",
+    delimiter: str = ",",
+    file_format: Optional[str] = None,
+    xlsx_engine: str = XLSX_ENGINE_OPENPYXL
+) -> TabularReader:
+    """
+    Abre el lector adecuado para el contenido.
+
+    Args:
+        content: Bytes del archivo
+        sheet_name: Hoja a leer en archivos Excel (None = hoja activa/primera)
+        encoding: Encoding del CSV
+        delimiter: Delimitador del CSV
+        file_format: Formato ya detectado (si es None se detecta por magic bytes)
+        xlsx_engine: Motor para .xlsx: "openpyxl" o "stream"
+    """
+    file_format = file_format or sniff_format(content)
+    logger.debug(f"Abriendo lector tabular para formato {file_format}")
+
+    if file_format == FORMAT_XLSX:
+        if xlsx_engine == XLSX_ENGINE_STREAM:
+            return StreamingXlsxReader(content, sheet_name)
+        if xlsx_engine != XLSX_ENGINE_OPENPYXL:
+            raise ValueError(f"Motor .xlsx no soportado: {xlsx_engine}. Opciones: {', '.join(XLSX_ENGINES)}")
+        return XlsxReader(content, sheet_name)
+    if file_format == FORMAT_XLS:
+        return XlsReader(content, sheet_name)
+    if file_format == FORMAT_CSV:
+        return CsvReader(content, encoding, delimiter)
+    raise ValueError(f"Formato de archivo no soportado: {file_format}")
@@ -3,6 +3,24 @@ from typing import Optional
 from decimal import Decimal
 from datetime import date
 
+class DuplicateTransactionError(ValueError):
+    """Transacción que ya existe (o casi) en la cuenta; conserva el motivo"""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+        super().__init__(f"Transacción duplicada: {reason}")
+
+    def __reduce__(self):
+        return (DuplicateTransactionError, (self.reason,))
+
+def normalize_description(description: Optional[str]) -> str:
+    """
+    Descripción normalizada (minúsculas y espacios colapsados). Es la forma
+    que se guarda en `transactions.description_normalized` y la que usa el
+    content_hash, así que no debe cambiar sin recalcular ambos.
+    """
+    return ' '.join(description.lower().split()) if description else ''
+
 def generate_transaction_hash(
     user_id: int,
     account_id: int,
@@ -16,7 +34,7 @@ def generate_transaction_hash(
     Esto ayuda a detectar duplicados incluso si el external_id no está disponible.
     """
     # Normalizar la descripción (quitar espacios extra, convertir a minúsculas)
-    normalized_description = ' '.join(description.strip().lower().split()) if description else ''
+    normalized_description = normalize_description(description)
     
     # Crear string único combinando los campos principales
     hash_string = f"{user_id}|{account_id}|{amount}|{normalized_description}|{transaction_date}"
@@ -64,38 +82,49 @@ def check_transaction_exists(
         if existing:
             return True, f"content_hash duplicado: {content_hash[:16]}..."
     
-    # 3. Verificar por combinación de campos principales (duplicados exactos)
-    existing = db.query(Transaction).filter(
+    # 3 y 4. Misma cuenta, fecha y monto: duplicado exacto si la descripción es
+    # igual, o "similar" si la descripción normalizada se parece (la misma
+    # transacción con pequeñas variaciones en la descripción). Una sola consulta
+    # trae los candidatos con su descripción ya normalizada.
+    similar_transactions = db.query(
+        Transaction.id, Transaction.description, Transaction.description_normalized
+    ).filter(
         Transaction.user_id == user_id,
         Transaction.account_id == account_id,
         Transaction.amount == amount,
-        Transaction.transaction_date == transaction_date,
-        Transaction.description == description
-    ).first()
+        Transaction.transaction_date == transaction_date
+    ).order_by(Transaction.id).all()
     
+    existing = next((row for row in similar_transactions if row.description == description), None)
     if existing:
         return True, f"transacción idéntica encontrada (ID: {existing.id})"
     
-    # 4. Verificar duplicados "similares" (misma fecha, cuenta y monto, descripción similar)
-    # Esto es útil para detectar la misma transacción con pequeñas variaciones en la descripción
-    similar_transactions = db.query(Transaction).filter(
-        Transaction.user_id == user_id,
-        Transaction.account_id == account_id,
-        Transaction.amount == amount,
-        Transaction.transaction_date == transaction_date
-    ).all()
+    reason = similar_transaction_reason(description, similar_transactions)
+    if reason:
+        return True, reason
+    
+    return False, None
+
+def similar_transaction_reason(description: str, candidates) -> Optional[str]:
+    """
+    Motivo de duplicado si alguna de las transacciones candidatas (misma
+    cuenta, fecha y monto) tiene una descripción al menos 80% similar.
+    """
+    normalized_desc = normalize_description(description)
+    if not normalized_desc:
+        return None
     
-    if similar_transactions:
-        normalized_desc = ' '.join(description.strip().lower().split()) if description else ''
+    for similar in candidates:
+        # Las transacciones guardan la descripción ya normalizada
+        existing_desc = getattr(similar, 'description_normalized', None)
+        if existing_desc is None:
+            existing_desc = normalize_description(similar.description)
         
-        for similar in similar_transactions:
-            existing_desc = ' '.join(similar.description.strip().lower().split()) if similar.description else ''
+        # Calcular similitud simple (puede mejorarse con algoritmos más sofisticados)
+        if existing_desc:
+            similarity = len(set(normalized_desc.split()) & set(existing_desc.split())) / max(len(normalized_desc.split()), len(existing_desc.split()))
             
-            # Calcular similitud simple (puede mejorarse con algoritmos más sofisticados)
-            if normalized_desc and existing_desc:
-                similarity = len(set(normalized_desc.split()) & set(existing_desc.split())) / max(len(normalized_desc.split()), len(existing_desc.split()))
-                
-                if similarity > 0.8:  # 80% de similitud
-                    return True, f"transacción similar encontrada (ID: {similar.id}, similitud: {similarity:.0%})"
+            if similarity > 0.8:  # 80% de similitud
+                return f"transacción similar encontrada (ID: {similar.id}, similitud: {similarity:.0%})"
     
-    return False, None
\ No newline at end of file
+    return None
\ No newline at end of file
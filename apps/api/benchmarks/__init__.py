@@ -0,0 +1,13 @@
+"""
+Suite de benchmarks de importación y categorización de MoneyDiary.
+
+Genera cartolas bancarias sintéticas (CSV, XLSX y XLS) con la misma
+estructura que configuran los perfiles de importación (`FileImportProfile`)
+y mide de punta a punta los servicios de importación, deduplicación y
+patrones contra SQLite y PostgreSQL. Los resultados se guardan como JSON
+para poder comparar commits entre sí.
+
+Uso (desde apps/api):
+    python -m benchmarks run --rows 1000 5000 --formats csv xlsx
+    python -m benchmarks compare benchmarks/results/a.json benchmarks/results/b.json
+"""
@@ -0,0 +1,82 @@
+"""
+Punto de entrada de línea de comandos de la suite de benchmarks.
+
+Requiere las mismas variables de entorno que la API (ver .env.example), ya
+que los servicios medidos importan la configuración de la aplicación.
+"""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks de importación de MoneyDiary")
+    parser.add_argument("--log-level", default="WARNING", help="Nivel de logging de la aplicación (default: WARNING)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Ejecuta los benchmarks y guarda los resultados en JSON")
+    run.add_argument("--rows", type=int, nargs="+", default=[1000], help="Tamaños de cartola a generar")
+    run.add_argument("--formats", nargs="+", default=["csv", "xlsx"], choices=["csv", "xlsx", "xls"])
+    run.add_argument("--backends", nargs="+", default=["sqlite"], choices=["sqlite", "postgresql"])
+    run.add_argument("--layout", default="debit_credit", choices=["single_amount", "debit_credit"])
+    run.add_argument("--locale", default="es_CL", choices=["es_CL", "en_US", "iso"])
+    run.add_argument("--duplicate-ratio", type=float, default=0.05, help="Fracción de filas repetidas en la cartola")
+    run.add_argument("--repeat", type=int, default=3, help="Repeticiones por operación")
+    run.add_argument("--operations", nargs="+", default=None, help="Subconjunto de operaciones a medir")
+    run.add_argument("--postgres-url", default=None, help="URL de PostgreSQL (default: $BENCHMARK_POSTGRES_URL)")
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--output", type=Path, default=None, help="Archivo JSON de salida")
+
+    compare = subparsers.add_parser("compare", help="Compara dos archivos de resultados")
+    compare.add_argument("baseline", type=Path)
+    compare.add_argument("current", type=Path)
+    compare.add_argument("--threshold", type=float, default=0.10, help="Variación relativa tolerada (default: 0.10)")
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = _build_parser().parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.WARNING), force=True)
+
+    # Importación diferida: 'compare' no necesita cargar la aplicación
+    from . import runner
+
+    if args.command == "compare":
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        current = json.loads(args.current.read_text(encoding="utf-8"))
+        table, regressions = runner.format_comparison(runner.compare_results(baseline, current), args.threshold)
+        print(table)
+        if regressions:
+            print(f"\n{regressions} regresión(es) sobre el umbral de {args.threshold:.0%}")
+            return 1
+        return 0
+
+    config = runner.BenchmarkConfig(
+        backends=args.backends,
+        file_types=args.formats,
+        rows=args.rows,
+        layout=args.layout,
+        locale=args.locale,
+        duplicate_ratio=args.duplicate_ratio,
+        repeat=args.repeat,
+        operations=args.operations or list(runner.OPERATIONS),
+        postgres_url=args.postgres_url,
+        seed=args.seed,
+    )
+    document = runner.run_benchmarks(config)
+    output = runner.save_results(document, args.output)
+
+    for result in document["results"]:
+        timing = f"{result['median_s']:.4f}s" if result.get("median_s") is not None else "-"
+        status = f"{result.get('rows_per_s') or 0:,.0f} filas/s"
+        print(f"{result['backend']:<10} {result['file_type']:<5} {result['rows']:>7}  {result['operation']:<36} {timing:>10}  {status}")
+    print(f"\nResultados guardados en {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,448 @@
+"""
+Ejecución de los benchmarks y persistencia de resultados en JSON.
+
+Cada escenario (backend × tipo de archivo × número de filas) mide de punta
+a punta las operaciones de importación, previsualización, confirmación,
+deduplicación y patrones sobre una base recién creada.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import sqlalchemy
+from sqlalchemy import update, delete
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models import Account, FileImport, ImportError, Transaction
+from app.schemas.description_patterns import PatternSuggestionRequest
+from app.services import transaction_service
+from app.services.description_pattern_service import DescriptionPatternService
+from app.services.duplicate_filter import invalidate_account_filters
+from app.services.pattern_utils import apply_patterns_bulk
+from app.utils.transaction_utils import check_transaction_exists, generate_transaction_hash
+
+from .fixtures import BenchmarkFixture, create_benchmark_engine, reset_schema, seed_fixture
+from .statement_generator import GeneratedStatement, StatementSpec, generate_statement, xls_supported
+
+logger = logging.getLogger("moneydiary.benchmarks")
+
+RESULTS_SCHEMA_VERSION = 1
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+OPERATIONS = (
+    "preview_transactions_with_profile",
+    "confirm_transaction_preview",
+    "import_transactions_with_profile",
+    "check_transaction_exists",
+    "apply_patterns_bulk",
+    "generate_pattern_suggestions",
+)
+
+# Número máximo de consultas de duplicados por escenario
+DUPLICATE_PROBES = 500
+
+
+@dataclass
+class BenchmarkConfig:
+    """Parámetros de una corrida completa de benchmarks"""
+    backends: List[str] = field(default_factory=lambda: ["sqlite"])
+    file_types: List[str] = field(default_factory=lambda: ["csv", "xlsx"])
+    rows: List[int] = field(default_factory=lambda: [1000])
+    layout: str = "debit_credit"
+    locale: str = "es_CL"
+    duplicate_ratio: float = 0.05
+    repeat: int = 3
+    operations: List[str] = field(default_factory=lambda: list(OPERATIONS))
+    postgres_url: Optional[str] = None
+    seed: int = 42
+
+
+@dataclass
+class Measurement:
+    """Resultado de medir una operación en un escenario"""
+    operation: str
+    backend: str
+    file_type: str
+    rows: int
+    layout: str
+    locale: str
+    duplicate_ratio: float
+    timings_s: List[float] = field(default_factory=list)
+    details: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def key(self) -> Tuple:
+        return (self.operation, self.backend, self.file_type, self.rows, self.layout, self.locale, self.duplicate_ratio)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        if self.timings_s:
+            median = statistics.median(self.timings_s)
+            data.update({
+                "min_s": min(self.timings_s),
+                "max_s": max(self.timings_s),
+                "mean_s": statistics.fmean(self.timings_s),
+                "median_s": median,
+                "stdev_s": statistics.stdev(self.timings_s) if len(self.timings_s) > 1 else 0.0,
+                "rows_per_s": (self.details.get("measured_rows", self.rows) / median) if median else None,
+            })
+        return data
+
+
+# ============================
+# Utilidades de medición
+# ============================
+
+def _timed(function: Callable[[], Any]) -> Tuple[float, Any]:
+    started = time.perf_counter()
+    result = function()
+    return time.perf_counter() - started, result
+
+
+def _clear_transactions(db: Session, fixture: BenchmarkFixture) -> None:
+    """Elimina las transacciones e importaciones registradas y reinicia el saldo de la cuenta"""
+    imports = db.query(FileImport.id).filter(FileImport.user_id == fixture.user_id)
+    db.execute(delete(ImportError).where(ImportError.import_id.in_(imports.scalar_subquery())))
+    db.execute(delete(FileImport).where(FileImport.user_id == fixture.user_id))
+    db.execute(delete(Transaction).where(Transaction.user_id == fixture.user_id))
+    db.execute(update(Account).where(Account.id == fixture.account_id).values(current_balance=0.0))
+    invalidate_account_filters(db, fixture.user_id, [fixture.account_id])
+    db.commit()
+    db.expunge_all()
+
+
+def _import_statement(db: Session, fixture: BenchmarkFixture, statement: GeneratedStatement) -> Dict[str, Any]:
+    return transaction_service.import_transactions_with_profile(
+        db, fixture.user_id, fixture.profile_id, statement.content, statement.filename
+    )
+
+
+def _preview_statement(db: Session, fixture: BenchmarkFixture, statement: GeneratedStatement) -> Dict[str, Any]:
+    return transaction_service.preview_transactions_with_profile(
+        db, fixture.user_id, fixture.profile_id, statement.content, statement.filename
+    )
+
+
+# ============================
+# Operaciones medidas
+# ============================
+
+def _bench_preview(db, fixture, statement, measurement, repeat):
+    for _ in range(repeat):
+        elapsed, preview = _timed(lambda: _preview_statement(db, fixture, statement))
+        transaction_service._preview_cache.pop(preview["preview_id"], None)
+        measurement.timings_s.append(elapsed)
+        measurement.details.update({
+            "valid_transactions": preview["valid_transactions"],
+            "invalid_transactions": preview["invalid_transactions"],
+        })
+
+
+def _unique_preview_rows(preview: Dict[str, Any]) -> List[int]:
+    """
+    Filas válidas de la previsualización sin las repeticiones dentro del
+    archivo: la confirmación no descarta duplicados y el índice único de
+    transacciones haría fallar todo el commit.
+    """
+    seen = set()
+    selected = []
+    for row_num, item in enumerate(preview["transactions"], 1):
+        key = (item["amount"], item["transaction_date"], item["description"])
+        if item["is_valid"] and key not in seen:
+            seen.add(key)
+            selected.append(row_num)
+    return selected
+
+
+def _bench_confirm(db, fixture, statement, measurement, repeat):
+    for _ in range(repeat):
+        _clear_transactions(db, fixture)
+        preview = _preview_statement(db, fixture, statement)
+        selected = _unique_preview_rows(preview)
+        elapsed, result = _timed(lambda: transaction_service.confirm_transaction_preview(
+            db, fixture.user_id, preview["preview_id"], selected_transactions=selected
+        ))
+        if result["failed_imports"]:
+            raise RuntimeError(f"{result['failed_imports']} fila(s) no se confirmaron: {result['errors'][:3]}")
+        measurement.timings_s.append(elapsed)
+        measurement.details.update({
+            "measured_rows": len(selected),
+            "successful_imports": result["successful_imports"],
+            "failed_imports": result["failed_imports"],
+        })
+
+
+def _bench_import(db, fixture, statement, measurement, repeat):
+    for _ in range(repeat):
+        _clear_transactions(db, fixture)
+        elapsed, result = _timed(lambda: _import_statement(db, fixture, statement))
+        measurement.timings_s.append(elapsed)
+        measurement.details.update({
+            "successful_imports": result["successful_imports"],
+            "failed_imports": result["failed_imports"],
+        })
+
+
+def _ensure_imported(db: Session, fixture: BenchmarkFixture, statement: GeneratedStatement) -> None:
+    """Deja la cartola importada para las operaciones que consultan el historial"""
+    existing = db.query(Transaction).filter(Transaction.user_id == fixture.user_id).count()
+    if not existing:
+        _import_statement(db, fixture, statement)
+
+
+def _duplicate_probes(db: Session, fixture: BenchmarkFixture) -> List[Dict[str, Any]]:
+    """
+    Construye consultas de duplicados: la mitad corresponde a transacciones
+    existentes y la otra mitad a movimientos nuevos (monto desplazado).
+    """
+    stored = db.query(Transaction).filter(
+        Transaction.user_id == fixture.user_id
+    ).order_by(Transaction.id).limit(DUPLICATE_PROBES // 2).all()
+
+    probes = []
+    for transaction in stored:
+        base = {
+            "account_id": transaction.account_id,
+            "description": transaction.description or "",
+            "transaction_date": transaction.transaction_date,
+        }
+        probes.append({**base, "amount": Decimal(str(transaction.amount))})
+        probes.append({**base, "amount": Decimal(str(transaction.amount)) + Decimal("0.13"),
+                       "transaction_date": transaction.transaction_date + timedelta(days=1)})
+    return probes
+
+
+def _bench_check_exists(db, fixture, statement, measurement, repeat):
+    _ensure_imported(db, fixture, statement)
+    probes = _duplicate_probes(db, fixture)
+    measurement.details["measured_rows"] = len(probes)
+
+    def run_probes():
+        hits = 0
+        for probe in probes:
+            content_hash = generate_transaction_hash(user_id=fixture.user_id, **probe)
+            exists, _ = check_transaction_exists(db, user_id=fixture.user_id, content_hash=content_hash, **probe)
+            hits += int(exists)
+        return hits
+
+    for _ in range(repeat):
+        elapsed, hits = _timed(run_probes)
+        measurement.timings_s.append(elapsed)
+        measurement.details["hits"] = hits
+
+
+def _bench_apply_patterns(db, fixture, statement, measurement, repeat):
+    _ensure_imported(db, fixture, statement)
+    for _ in range(repeat):
+        db.execute(update(Transaction).where(Transaction.user_id == fixture.user_id).values(subcategory_id=None))
+        db.commit()
+        db.expunge_all()
+        elapsed, result = _timed(lambda: apply_patterns_bulk(db, fixture.user_id))
+        measurement.timings_s.append(elapsed)
+        measurement.details.update({
+            "total_transactions": result["total_transactions"],
+            "applied_count": result["applied_count"],
+        })
+        if not result["success"]:
+            raise RuntimeError(result.get("error"))
+
+
+def _bench_suggestions(db, fixture, statement, measurement, repeat):
+    _ensure_imported(db, fixture, statement)
+    request = PatternSuggestionRequest(limit=20, min_occurrences=3)
+    for _ in range(repeat):
+        db.expunge_all()
+        elapsed, response = _timed(lambda: DescriptionPatternService.generate_pattern_suggestions(
+            db, fixture.user_id, request
+        ))
+        measurement.timings_s.append(elapsed)
+        measurement.details["suggestions"] = len(response.suggestions)
+
+
+_OPERATION_RUNNERS = {
+    "preview_transactions_with_profile": _bench_preview,
+    "confirm_transaction_preview": _bench_confirm,
+    "import_transactions_with_profile": _bench_import,
+    "check_transaction_exists": _bench_check_exists,
+    "apply_patterns_bulk": _bench_apply_patterns,
+    "generate_pattern_suggestions": _bench_suggestions,
+}
+
+
+# ============================
+# Orquestación
+# ============================
+
+def run_scenario(config: BenchmarkConfig, backend: str, file_type: str, rows: int) -> List[Measurement]:
+    """Ejecuta todas las operaciones configuradas para un escenario"""
+    spec = StatementSpec(
+        rows=rows,
+        file_type=file_type,
+        layout=config.layout,
+        locale=config.locale,
+        duplicate_ratio=config.duplicate_ratio,
+        seed=config.seed,
+    )
+    statement = generate_statement(spec)
+
+    engine = create_benchmark_engine(backend, config.postgres_url if backend == "postgresql" else None)
+    reset_schema(engine)
+    SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    measurements = []
+    try:
+        with SessionFactory() as db:
+            fixture = seed_fixture(db, statement)
+
+            for operation in config.operations:
+                measurement = Measurement(
+                    operation=operation,
+                    backend=backend,
+                    file_type=file_type,
+                    rows=rows,
+                    layout=config.layout,
+                    locale=config.locale,
+                    duplicate_ratio=config.duplicate_ratio,
+                )
+                logger.info(f"{backend}/{file_type}/{rows}: {operation}")
+                try:
+                    _OPERATION_RUNNERS[operation](db, fixture, statement, measurement, config.repeat)
+                except Exception as e:
+                    # Un resultado parcial no sirve como línea base: se detiene la corrida
+                    db.rollback()
+                    raise RuntimeError(f"{backend}/{file_type}/{rows}: {operation} falló: {type(e).__name__}: {e}") from e
+                measurements.append(measurement)
+    finally:
+        engine.dispose()
+
+    return measurements
+
+
+def run_benchmarks(config: BenchmarkConfig) -> Dict[str, Any]:
+    """Ejecuta la matriz completa de escenarios y devuelve el documento de resultados"""
+    unknown = set(config.operations) - set(OPERATIONS)
+    if unknown:
+        raise ValueError(f"Operaciones desconocidas: {', '.join(sorted(unknown))}")
+
+    results = []
+    for backend in config.backends:
+        for file_type in config.file_types:
+            if file_type == "xls" and not xls_supported():
+                logger.warning("Se omiten los escenarios .xls: instale 'xlwt' para generarlos")
+                continue
+            for rows in config.rows:
+                results.extend(m.to_dict() for m in run_scenario(config, backend, file_type, rows))
+
+    return {
+        "schema_version": RESULTS_SCHEMA_VERSION,
+        "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "git": _git_metadata(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sqlalchemy": sqlalchemy.__version__,
+        },
+        "config": asdict(config),
+        "results": results,
+    }
+
+
+def _git_metadata() -> Dict[str, Any]:
+    def git(*args: str) -> Optional[str]:
+        try:
+            return subprocess.check_output(["git", *args], stderr=subprocess.DEVNULL, text=True).strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    status = git("status", "--porcelain")
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "branch": git("rev-parse", "--abbrev-ref", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+    }
+
+
+def save_results(document: Dict[str, Any], output: Optional[Path] = None) -> Path:
+    """Guarda los resultados como JSON; por defecto en benchmarks/results/"""
+    if output is None:
+        commit = (document.get("git") or {}).get("commit") or "nocommit"
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        output = RESULTS_DIR / f"{stamp}_{commit[:10]}.json"
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(document, indent=2, ensure_ascii=False, default=str), encoding="utf-8")
+    return output
+
+
+# ============================
+# Comparación entre corridas
+# ============================
+
+@dataclass
+class Comparison:
+    key: Tuple
+    baseline_s: Optional[float]
+    current_s: Optional[float]
+
+    @property
+    def ratio(self) -> Optional[float]:
+        if not self.baseline_s or self.current_s is None:
+            return None
+        return self.current_s / self.baseline_s
+
+
+def _index_results(document: Dict[str, Any]) -> Dict[Tuple, Dict[str, Any]]:
+    return {
+        (r["operation"], r["backend"], r["file_type"], r["rows"], r["layout"], r["locale"], r["duplicate_ratio"]): r
+        for r in document.get("results", [])
+    }
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Comparison]:
+    """Empareja los escenarios de dos corridas por operación y parámetros"""
+    baseline_index = _index_results(baseline)
+    current_index = _index_results(current)
+    return [
+        Comparison(
+            key=key,
+            baseline_s=baseline_index.get(key, {}).get("median_s"),
+            current_s=current_index.get(key, {}).get("median_s"),
+        )
+        for key in sorted(set(baseline_index) | set(current_index), key=str)
+    ]
+
+
+def format_comparison(comparisons: Iterable[Comparison], threshold: float) -> Tuple[str, int]:
+    """Devuelve la tabla de comparación y el número de regresiones detectadas"""
+    lines = [f"{'operación':<36} {'backend':<10} {'tipo':<5} {'filas':>7} {'base (s)':>10} {'actual (s)':>10} {'ratio':>7}"]
+    regressions = 0
+    for comparison in comparisons:
+        operation, backend, file_type, rows = comparison.key[:4]
+        ratio = comparison.ratio
+        flag = ""
+        if ratio is not None and ratio > 1 + threshold:
+            flag = "  REGRESIÓN"
+            regressions += 1
+        elif ratio is not None and ratio < 1 - threshold:
+            flag = "  mejora"
+        lines.append(
+            f"{operation:<36} {backend:<10} {file_type:<5} {rows:>7} "
+            f"{_fmt(comparison.baseline_s):>10} {_fmt(comparison.current_s):>10} "
+            f"{(f'{ratio:.2f}x' if ratio is not None else '-'):>7}{flag}"
+        )
+    return "\n".join(lines), regressions
+
+
+def _fmt(value: Optional[float]) -> str:
+    return f"{value:.4f}" if value is not None else "-"
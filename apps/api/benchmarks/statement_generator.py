@@ -0,0 +1,429 @@
+"""
+Generador de cartolas bancarias sintéticas para benchmarks.
+
+Produce archivos CSV, XLSX y XLS realistas a partir de una especificación
+(`StatementSpec`): número de filas, disposición de columnas compatible con
+`FileImportProfile`/`FileColumnMapping`, proporción de duplicados y formato
+regional de fechas y montos. Junto al archivo se entrega la definición del
+perfil de importación que permite leerlo, de modo que el benchmark pueda
+sembrarlo tal cual en la base de datos.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import random
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from openpyxl import Workbook
+
+try:  # xlwt sólo es necesario para generar archivos .xls (BIFF8)
+    import xlwt  # type: ignore
+except ImportError:  # pragma: no cover - dependencia opcional
+    xlwt = None
+
+
+# ============================
+# Formatos regionales
+# ============================
+
+@dataclass(frozen=True)
+class LocaleFormat:
+    """Formato regional de fechas y montos de una cartola"""
+    date_format: str  # Formato strftime usado al escribir fechas
+    profile_date_format: str  # Formato equivalente en notación de FileImportProfile
+    thousands_separator: str
+    decimal_separator: str
+    currency_symbol: str
+    decimals: int
+    negative_style: str = "minus"  # "minus" (-1.000) o "parentheses" ((1.000))
+
+
+LOCALES: Dict[str, LocaleFormat] = {
+    # Bancos chilenos: 15/01/2024, $1.234.567 sin decimales
+    "es_CL": LocaleFormat("%d/%m/%Y", "DD/MM/YYYY", ".", ",", "$", 0),
+    # Exportaciones en inglés: 01/15/2024, $1,234.56 con paréntesis para negativos
+    "en_US": LocaleFormat("%m/%d/%Y", "MM/DD/YYYY", ",", ".", "$", 2, "parentheses"),
+    # Formato técnico: 2024-01-15, 1234.56
+    "iso": LocaleFormat("%Y-%m-%d", "YYYY-MM-DD", "", ".", "", 2),
+}
+
+
+# ============================
+# Disposiciones de columnas
+# ============================
+
+@dataclass(frozen=True)
+class ColumnLayout:
+    """Disposición de columnas de una cartola y su mapeo a campos destino"""
+    amount_schema: str  # Valor de AmountSchemaType
+    headers: Tuple[str, ...]
+    # target_field_name -> índice de columna
+    mappings: Dict[str, int]
+
+
+LAYOUTS: Dict[str, ColumnLayout] = {
+    # Una columna de monto con signo (cuenta corriente / tarjeta)
+    "single_amount": ColumnLayout(
+        amount_schema="single_column",
+        headers=("Fecha", "Descripción", "Monto", "Saldo"),
+        mappings={"date": 0, "description": 1, "amount": 2},
+    ),
+    # Columnas separadas de cargos y abonos (formato típico de cartola chilena)
+    "debit_credit": ColumnLayout(
+        amount_schema="separate_columns",
+        headers=("Fecha", "Detalle", "N° Documento", "Cargos", "Abonos", "Saldo"),
+        mappings={"date": 0, "description": 1, "reference": 2, "debit_amount": 3, "credit_amount": 4},
+    ),
+}
+
+FILE_TYPES = ("csv", "xlsx", "xls")
+
+
+# Comercios y glosas frecuentes en cartolas reales (con ruido de terminal,
+# sufijo de tarjeta y ciudad que dificulta la agrupación)
+_MERCHANTS: List[Tuple[str, int, int]] = [
+    # (glosa base, monto mínimo, monto máximo) en pesos
+    ("COMPRA LIDER EXPRESS", 2500, 85000),
+    ("COMPRA JUMBO", 5000, 150000),
+    ("COMPRA UNIMARC", 1500, 60000),
+    ("COMPRA SANTA ISABEL", 1500, 45000),
+    ("COMPRA COPEC", 10000, 70000),
+    ("COMPRA SHELL", 10000, 65000),
+    ("UBER TRIP", 2500, 18000),
+    ("UBER EATS", 6000, 35000),
+    ("RAPPI", 5000, 40000),
+    ("NETFLIX.COM", 7990, 11990),
+    ("SPOTIFY", 5990, 6990),
+    ("FARMACIAS CRUZ VERDE", 2000, 50000),
+    ("FARMACIAS AHUMADA", 2000, 45000),
+    ("PAGO SERVIPAG ENEL", 15000, 80000),
+    ("PAGO SERVIPAG AGUAS ANDINAS", 8000, 35000),
+    ("PAGO VTR", 20000, 45000),
+    ("PAGO ENTEL", 12000, 30000),
+    ("FALABELLA", 5000, 250000),
+    ("PARIS", 5000, 200000),
+    ("MERCADOPAGO", 1000, 90000),
+]
+
+_INCOMES: List[Tuple[str, int, int]] = [
+    ("TRANSFERENCIA DE TERCEROS", 10000, 500000),
+    ("ABONO REMUNERACIONES", 900000, 2500000),
+    ("DEVOLUCION COMPRA", 2000, 60000),
+]
+
+_TRANSFERS: List[Tuple[str, int, int]] = [
+    ("TRANSFERENCIA A CUENTA", 10000, 400000),
+    ("PAGO TARJETA DE CREDITO", 50000, 800000),
+    ("GIRO CAJERO AUTOMATICO", 10000, 200000),
+]
+
+_CITIES = ("SANTIAGO", "LAS CONDES", "PROVIDENCIA", "NUNOA", "MAIPU", "VINA DEL MAR", "CONCEPCION")
+
+
+@dataclass
+class StatementSpec:
+    """Especificación de una cartola sintética"""
+    rows: int = 1000
+    file_type: str = "csv"  # csv, xlsx, xls
+    layout: str = "debit_credit"  # Clave en LAYOUTS
+    locale: str = "es_CL"  # Clave en LOCALES
+    duplicate_ratio: float = 0.0  # Proporción de filas que repiten una fila anterior
+    start_date: date = date(2024, 1, 1)
+    days: int = 365
+    seed: int = 42
+    delimiter: str = ";"
+    encoding: str = "utf-8"
+    typed_cells: bool = True  # En Excel, escribir fechas y montos como celdas tipadas
+
+    def __post_init__(self):
+        if self.file_type not in FILE_TYPES:
+            raise ValueError(f"Tipo de archivo no soportado: {self.file_type}")
+        if self.layout not in LAYOUTS:
+            raise ValueError(f"Disposición de columnas desconocida: {self.layout}")
+        if self.locale not in LOCALES:
+            raise ValueError(f"Formato regional desconocido: {self.locale}")
+        if not 0 <= self.duplicate_ratio < 1:
+            raise ValueError("duplicate_ratio debe estar en el rango [0, 1)")
+
+    @property
+    def filename(self) -> str:
+        return f"cartola_{self.layout}_{self.locale}_{self.rows}.{self.file_type}"
+
+
+@dataclass
+class StatementRow:
+    """Movimiento lógico de una cartola (antes de aplicar el formato regional)"""
+    transaction_date: date
+    description: str
+    amount: Decimal  # Negativo = cargo, positivo = abono
+    reference: str
+    balance: Decimal
+
+
+@dataclass
+class GeneratedStatement:
+    """Cartola generada junto con el perfil de importación que la describe"""
+    spec: StatementSpec
+    content: bytes
+    rows: List[StatementRow]
+    duplicate_count: int
+    profile: Dict[str, Any] = field(default_factory=dict)
+    column_mappings: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def filename(self) -> str:
+        return self.spec.filename
+
+
+# ============================
+# Generación de movimientos
+# ============================
+
+def _make_description(rng: random.Random, base: str) -> str:
+    """Agrega el ruido habitual de las glosas bancarias a una glosa base"""
+    variant = rng.random()
+    if variant < 0.35:
+        return f"{base} {rng.choice(_CITIES)}"
+    if variant < 0.6:
+        return f"{base} TERM {rng.randint(100000, 999999)}"
+    if variant < 0.8:
+        return f"{base} TARJ ****{rng.randint(1000, 9999)}"
+    return base
+
+
+def _random_amount(rng: random.Random, low: int, high: int, decimals: int) -> Decimal:
+    value = Decimal(rng.randint(low, high))
+    if decimals:
+        value += Decimal(rng.randint(0, 99)) / Decimal(100)
+    return value
+
+
+def generate_rows(spec: StatementSpec) -> Tuple[List[StatementRow], int]:
+    """Genera los movimientos lógicos de la cartola según la especificación"""
+    rng = random.Random(spec.seed)
+    decimals = LOCALES[spec.locale].decimals
+    balance = Decimal(1500000)
+
+    unique_count = spec.rows - int(spec.rows * spec.duplicate_ratio)
+    rows: List[StatementRow] = []
+
+    for index in range(unique_count):
+        kind = rng.random()
+        if kind < 0.8:
+            base, low, high = rng.choice(_MERCHANTS)
+            amount = -_random_amount(rng, low, high, decimals)
+        elif kind < 0.9:
+            base, low, high = rng.choice(_TRANSFERS)
+            amount = -_random_amount(rng, low, high, decimals)
+        else:
+            base, low, high = rng.choice(_INCOMES)
+            amount = _random_amount(rng, low, high, decimals)
+
+        balance += amount
+        rows.append(StatementRow(
+            transaction_date=spec.start_date + timedelta(days=rng.randrange(max(spec.days, 1))),
+            description=_make_description(rng, base),
+            amount=amount,
+            reference=f"{rng.randint(10000000, 99999999)}",
+            balance=balance,
+        ))
+
+    # Duplicados exactos de filas anteriores (re-exportaciones, solapes de período)
+    duplicate_count = spec.rows - unique_count
+    for _ in range(duplicate_count):
+        source = rows[rng.randrange(len(rows))] if rows else None
+        if source is None:
+            break
+        rows.append(StatementRow(
+            transaction_date=source.transaction_date,
+            description=source.description,
+            amount=source.amount,
+            reference=source.reference,
+            balance=source.balance,
+        ))
+
+    rows.sort(key=lambda row: row.transaction_date)
+    return rows, duplicate_count
+
+
+# ============================
+# Formato regional
+# ============================
+
+def format_amount(value: Decimal, locale: LocaleFormat, signed: bool = True) -> str:
+    """Formatea un monto según el formato regional (separadores y símbolo)"""
+    negative = value < 0
+    quantized = abs(value).quantize(Decimal(1).scaleb(-locale.decimals))
+    integer_part, _, fraction_part = f"{quantized:f}".partition(".")
+
+    if locale.thousands_separator:
+        groups = []
+        while len(integer_part) > 3:
+            groups.insert(0, integer_part[-3:])
+            integer_part = integer_part[:-3]
+        groups.insert(0, integer_part)
+        integer_part = locale.thousands_separator.join(groups)
+
+    text = integer_part
+    if locale.decimals:
+        text = f"{text}{locale.decimal_separator}{fraction_part}"
+    if locale.currency_symbol:
+        text = f"{locale.currency_symbol}{text}"
+
+    if negative and signed:
+        if locale.negative_style == "parentheses":
+            return f"({text})"
+        return f"-{text}"
+    return text
+
+
+def _money_cell(value: Decimal, locale: LocaleFormat, typed: bool, signed: bool = True) -> Any:
+    if typed:
+        return float(value if signed else abs(value))
+    return format_amount(value, locale, signed)
+
+
+def _row_cells(row: StatementRow, layout: ColumnLayout, locale: LocaleFormat, typed: bool) -> List[Any]:
+    """Convierte un movimiento en la lista de celdas según la disposición"""
+    date_cell: Any = row.transaction_date if typed else row.transaction_date.strftime(locale.date_format)
+    balance = _money_cell(row.balance, locale, typed)
+
+    if layout.amount_schema == "single_column":
+        return [date_cell, row.description, _money_cell(row.amount, locale, typed), balance]
+
+    debit = _money_cell(row.amount, locale, typed, signed=False) if row.amount < 0 else ""
+    credit = _money_cell(row.amount, locale, typed, signed=False) if row.amount > 0 else ""
+    return [date_cell, row.description, row.reference, debit, credit, balance]
+
+
+# ============================
+# Escritura de archivos
+# ============================
+
+def _write_csv(spec: StatementSpec, layout: ColumnLayout, rows: List[StatementRow]) -> bytes:
+    locale = LOCALES[spec.locale]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=spec.delimiter, lineterminator="\r\n")
+    writer.writerow(layout.headers)
+    for row in rows:
+        writer.writerow(_row_cells(row, layout, locale, typed=False))
+    return buffer.getvalue().encode(spec.encoding)
+
+
+def _write_xlsx(spec: StatementSpec, layout: ColumnLayout, rows: List[StatementRow]) -> bytes:
+    locale = LOCALES[spec.locale]
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet("Movimientos")
+    worksheet.append(list(layout.headers))
+    for row in rows:
+        worksheet.append(_row_cells(row, layout, locale, typed=spec.typed_cells))
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def _write_xls(spec: StatementSpec, layout: ColumnLayout, rows: List[StatementRow]) -> bytes:
+    if xlwt is None:
+        raise RuntimeError("Para generar archivos .xls se requiere el paquete 'xlwt'")
+
+    locale = LOCALES[spec.locale]
+    workbook = xlwt.Workbook(encoding="utf-8")
+    worksheet = workbook.add_sheet("Movimientos")
+    date_style = xlwt.easyxf(num_format_str="DD/MM/YYYY")
+
+    for col, header in enumerate(layout.headers):
+        worksheet.write(0, col, header)
+
+    for row_idx, row in enumerate(rows, start=1):
+        for col, value in enumerate(_row_cells(row, layout, locale, typed=spec.typed_cells)):
+            if isinstance(value, date):
+                worksheet.write(row_idx, col, value, date_style)
+            else:
+                worksheet.write(row_idx, col, value)
+
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+_WRITERS = {
+    "csv": _write_csv,
+    "xlsx": _write_xlsx,
+    "xls": _write_xls,
+}
+
+
+def xls_supported() -> bool:
+    """Indica si el entorno puede generar archivos .xls"""
+    return xlwt is not None
+
+
+# ============================
+# Perfil de importación
+# ============================
+
+def build_profile_definition(spec: StatementSpec) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Construye los atributos de FileImportProfile y FileColumnMapping que
+    describen la cartola, listos para instanciar los modelos.
+    """
+    layout = LAYOUTS[spec.layout]
+    locale = LOCALES[spec.locale]
+
+    profile = {
+        "name": f"Benchmark {spec.layout} {spec.locale} {spec.file_type}",
+        "description": "Perfil generado por la suite de benchmarks",
+        "is_default": False,
+        "file_type": "CSV" if spec.file_type == "csv" else spec.file_type.upper(),
+        "delimiter": spec.delimiter,
+        "has_header": True,
+        "date_format": locale.profile_date_format,
+        "decimal_separator": locale.decimal_separator,
+        "encoding": spec.encoding,
+        "amount_schema": layout.amount_schema,
+        "transaction_type_detection": "by_amount_sign" if layout.amount_schema == "single_column" else "by_column_type",
+        "positive_is_income": True,
+        "debit_column_is_expense": True,
+        "sheet_name": None,
+        "header_row": 1,
+        "start_row": 2,
+        "skip_empty_rows": True,
+        "auto_detect_format": True,
+    }
+
+    column_mappings = [
+        {
+            "source_column_name": layout.headers[column_index],
+            "source_column_index": column_index,
+            "target_field_name": target_field,
+            "is_required": target_field in ("date", "description", "amount"),
+            "position": position,
+            "amount_multiplier": "1",
+            "treat_empty_as_zero": True,
+        }
+        for position, (target_field, column_index) in enumerate(layout.mappings.items())
+    ]
+
+    return profile, column_mappings
+
+
+def generate_statement(spec: StatementSpec) -> GeneratedStatement:
+    """Genera una cartola completa (contenido, movimientos y perfil)"""
+    layout = LAYOUTS[spec.layout]
+    rows, duplicate_count = generate_rows(spec)
+    content = _WRITERS[spec.file_type](spec, layout, rows)
+    profile, column_mappings = build_profile_definition(spec)
+
+    return GeneratedStatement(
+        spec=spec,
+        content=content,
+        rows=rows,
+        duplicate_count=duplicate_count,
+        profile=profile,
+        column_mappings=column_mappings,
+    )
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""
+Detección nocturna de transacciones recurrentes.
+Uso: python scripts/detect_recurring.py [--user-id 12] [--full]
+
+Sin --full solo se analizan las transacciones nuevas desde la última ejecución.
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+# Añadir el directorio raíz del proyecto al path para poder importar las dependencias
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from app.database import SessionLocal
+from app.services.recurring_detection_service import detect_recurring_transactions, run_recurring_detection
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detecta transacciones recurrentes")
+    parser.add_argument("--user-id", type=int, help="Analizar solo este usuario")
+    parser.add_argument("--full", action="store_true", help="Reanalizar todo el historial")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        if args.user_id:
+            results = {args.user_id: detect_recurring_transactions(db, args.user_id, full=args.full)}
+        else:
+            results = run_recurring_detection(db, full=args.full)
+    finally:
+        db.close()
+
+    for user_id, summary in results.items():
+        print(f"Usuario {user_id}: {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""
+Cierre de mes de los sobres (método envelope).
+Uso: python scripts/envelope_rollover.py [--month 2024-07] [--user-id 12] [--reconcile [--fix]]
+
+Abre el periodo indicado (por defecto el mes actual) en todos los sobres
+activos; volver a ejecutarlo para el mismo mes no tiene efecto.
+"""
+
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime
+
+# Añadir el directorio raíz del proyecto al path para poder importar las dependencias
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from app.database import SessionLocal
+from app.services.envelope_service import reconcile_envelope_balances, run_envelope_rollover
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cierre de mes de los sobres")
+    parser.add_argument("--month", type=lambda value: datetime.strptime(value, "%Y-%m").date(),
+                        help="Periodo a abrir (AAAA-MM)")
+    parser.add_argument("--user-id", type=int, help="Procesar solo este usuario")
+    parser.add_argument("--reconcile", action="store_true", help="Verificar los saldos contra las transacciones")
+    parser.add_argument("--fix", action="store_true", help="Corregir los saldos descuadrados (con --reconcile)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        print(f"Cierre: {run_envelope_rollover(db, month=args.month, user_id=args.user_id)}")
+        if args.reconcile:
+            for item in reconcile_envelope_balances(db, user_id=args.user_id, fix=args.fix):
+                print(f"Sobre {item['envelope_id']}: guardado {item['stored_balance']}, "
+                      f"esperado {item['expected_balance']}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
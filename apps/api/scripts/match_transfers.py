@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+"""
+Emparejamiento de transferencias internas en el historial.
+Uso: python scripts/match_transfers.py [--user-id 12] [--since 2024-01-01]
+
+Las importaciones ya emparejan cada lote; este script revisa las
+transacciones anteriores o ingresadas a mano.
+"""
+
+import argparse
+import logging
+import os
+import sys
+from datetime import date
+
+# Añadir el directorio raíz del proyecto al path para poder importar las dependencias
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from app.database import SessionLocal
+from app.services.transfer_matching_service import match_internal_transfers, run_transfer_matching
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Empareja transferencias internas entre cuentas")
+    parser.add_argument("--user-id", type=int, help="Revisar solo este usuario")
+    parser.add_argument("--since", type=date.fromisoformat, help="Revisar desde esta fecha (AAAA-MM-DD)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        if args.user_id:
+            results = {args.user_id: match_internal_transfers(db, args.user_id, start=args.since)}
+        else:
+            results = run_transfer_matching(db, start=args.since)
+    finally:
+        db.close()
+
+    for user_id, pairs in results.items():
+        print(f"Usuario {user_id}: {pairs} transferencia(s) emparejada(s)")
+
+
+if __name__ == "__main__":
+    main()
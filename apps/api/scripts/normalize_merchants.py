@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+"""
+Renormalización de comercios tras cambiar las reglas.
+Uso: python scripts/normalize_merchants.py [--batch-size 1000]
+
+Solo procesa las transacciones normalizadas con otra versión de las reglas
+(o nunca normalizadas); sin cambios en las reglas no hay nada que hacer.
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+# Añadir el directorio raíz del proyecto al path para poder importar las dependencias
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from app.database import SessionLocal
+from app.services.merchant_service import QUERY_CHUNK_SIZE, renormalize_merchants
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcula el comercio de las transacciones")
+    parser.add_argument("--batch-size", type=int, default=QUERY_CHUNK_SIZE, help="Transacciones por lote")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        results = renormalize_merchants(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+
+    print(f"Transacciones procesadas: {results['processed']}, comercio cambiado: {results['changed']}")
+
+
+if __name__ == "__main__":
+    main()